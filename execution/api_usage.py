@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+api_usage.py - Contabilidade real de tokens e latencia das chamadas ao Gemini
+
+Antes, a extracao estimava tokens contando palavras do prompt e da resposta
+(len(texto.split())), o que ignora os tokens de imagem e o tokenizador do
+modelo, e a classificacao nao registrava nada. Cada resposta do Gemini traz
+usage_metadata com a contagem real; este modulo registra, por request:
+
+- modelo que respondeu (model_version, ou o nome pedido)
+- tentativas (retries e modelos de fallback, cada envio conta uma)
+- tokens de prompt, de resposta, em cache, de raciocinio e total (somados
+  entre as tentativas) e os tokens de saida so da ultima resposta
+- latencia do cliente (envio ate o fim da resposta) e latencia informada
+  pelo servidor (cabecalho server-timing, quando presente)
+- motivo de fim da resposta (finish_reason; MAX_TOKENS = cortada no teto)
+
+Os registros (CallUsage.to_metadata) vao para o JSON de cada documento e
+sao consolidados por usage_report nos relatorios.
+
+Uso:
+    from execution.api_usage import CallUsage, usage_report
+
+    usage = CallUsage()
+    started = usage.start_attempt()
+    response = client.models.generate_content(...)
+    usage.record(response, model_name, started)
+    metadados['chamadas_api'] = [usage.to_metadata()]
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Campos de usage_metadata -> chave no registro
+USAGE_FIELDS = {
+    'prompt_token_count': 'tokens_prompt',
+    'candidates_token_count': 'tokens_resposta',
+    'cached_content_token_count': 'tokens_cache',
+    'thoughts_token_count': 'tokens_raciocinio',
+    'total_token_count': 'tokens_total'
+}
+SERVER_TIMING_HEADER = 'server-timing'
+SERVER_TIMING_PATTERN = re.compile(r'dur=([\d.]+)')
+FINISH_MAX_TOKENS = 'MAX_TOKENS'  # finish_reason de resposta cortada em max_output_tokens
+
+
+# =============================================================================
+# REGISTRO POR REQUEST
+# =============================================================================
+
+def server_latency_ms(response: Any) -> Optional[float]:
+    """Latencia informada pelo servidor (cabecalho server-timing), em ms; None se ausente."""
+    http_response = getattr(response, 'sdk_http_response', None)
+    headers = getattr(http_response, 'headers', None) or {}
+    for name, value in headers.items():
+        if name.lower() == SERVER_TIMING_HEADER:
+            match = SERVER_TIMING_PATTERN.search(value or '')
+            if match:
+                return float(match.group(1))
+    return None
+
+
+def finish_reason(response: Any) -> Optional[str]:
+    """finish_reason do primeiro candidato (ex: STOP, MAX_TOKENS); None se ausente."""
+    candidates = getattr(response, 'candidates', None) or []
+    reason = getattr(candidates[0], 'finish_reason', None) if candidates else None
+    if reason is None:
+        return None
+    return getattr(reason, 'name', None) or str(reason)
+
+
+@dataclass
+class CallUsage:
+    """
+    Uso da API em um request (uma chamada logica, com todas as tentativas).
+
+    Tokens sao somados entre as respostas recebidas (inclusive respostas
+    vazias que levaram ao modelo de fallback, que tambem consomem cota);
+    modelo e latencias sao os da ultima resposta. Em streaming interrompido
+    (--parar-nos-dados), os tokens de resposta sao os gerados ate o corte.
+    """
+    modelo: Optional[str] = None
+    tentativas: int = 0
+    tokens_prompt: int = 0
+    tokens_resposta: int = 0
+    tokens_cache: int = 0
+    tokens_raciocinio: int = 0
+    tokens_total: int = 0
+    latencia_s: Optional[float] = None
+    latencia_servidor_ms: Optional[float] = None
+    motivo_fim: Optional[str] = None
+    max_tokens_saida: Optional[int] = None  # Teto de saida do ultimo envio (extracao)
+    tokens_saida_ultima_resposta: Optional[int] = None  # Resposta + raciocinio so da ultima resposta
+    orcamento_excedido: bool = False  # Repetido com o teto padrao apos corte no orcamento
+
+    def start_attempt(self) -> float:
+        """Conta um envio e retorna o horario de inicio (para record)."""
+        self.tentativas += 1
+        self.motivo_fim = None
+        self.tokens_saida_ultima_resposta = None
+        return time.time()
+
+    def record(
+        self,
+        response: Any,
+        model_name: str,
+        started: float,
+        timing_response: Any = None
+    ) -> None:
+        """
+        Registra uma resposta recebida.
+
+        Args:
+            response: Resposta (ou ultimo trecho do streaming) com usage_metadata
+            model_name: Modelo pedido no request
+            started: Retorno de start_attempt
+            timing_response: Resposta com os cabecalhos HTTP, se outra (primeiro
+                             trecho do streaming)
+        """
+        self.latencia_s = round(time.time() - started, 2)
+        self.modelo = getattr(response, 'model_version', None) or model_name
+        self.latencia_servidor_ms = server_latency_ms(timing_response or response)
+        self.motivo_fim = finish_reason(response)
+        metadata = getattr(response, 'usage_metadata', None)
+        if metadata is None:
+            return
+        for field, key in USAGE_FIELDS.items():
+            setattr(self, key, getattr(self, key) + (getattr(metadata, field, None) or 0))
+        # Os totais somam todas as tentativas; o aprendizado de orcamentos usa so a resposta final
+        self.tokens_saida_ultima_resposta = (
+            (getattr(metadata, 'candidates_token_count', None) or 0)
+            + (getattr(metadata, 'thoughts_token_count', None) or 0)
+        )
+
+    @property
+    def has_tokens(self) -> bool:
+        """Indica se alguma resposta trouxe usage_metadata."""
+        return self.tokens_total > 0
+
+    def to_metadata(self, documentos_lote: int = 1) -> Dict[str, Any]:
+        """
+        Registro do request para o JSON do documento (metadados['chamadas_api']).
+
+        Args:
+            documentos_lote: Documentos atendidos pelo request (classificacao em
+                             batch); usage_report rateia o request entre eles
+        """
+        record = {
+            'modelo': self.modelo,
+            'tentativas': self.tentativas,
+            **{key: getattr(self, key) for key in USAGE_FIELDS.values()},
+            'latencia_s': self.latencia_s,
+            'latencia_servidor_ms': self.latencia_servidor_ms,
+            'motivo_fim': self.motivo_fim
+        }
+        if self.max_tokens_saida is not None:
+            record['max_tokens_saida'] = self.max_tokens_saida
+        if self.tokens_saida_ultima_resposta is not None:
+            record['tokens_saida_ultima_resposta'] = self.tokens_saida_ultima_resposta
+        if self.orcamento_excedido:
+            record['orcamento_excedido'] = True
+        if documentos_lote > 1:
+            record['documentos_lote'] = documentos_lote
+        return record
+
+
+# =============================================================================
+# CONSOLIDACAO
+# =============================================================================
+
+def summarize_usage(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Consolida registros de CallUsage.to_metadata.
+
+    Um request em batch aparece em cada documento do lote; cada copia conta
+    1/documentos_lote, de modo que o request e contado uma vez no total.
+
+    Args:
+        records: Registros de chamadas
+
+    Returns:
+        Totais de chamadas, tentativas e tokens, latencias media/maxima e
+        chamadas/tokens por modelo
+    """
+    totals = {'chamadas': 0.0, 'tentativas': 0.0, **{key: 0.0 for key in USAGE_FIELDS.values()}}
+    latency_sum = latency_weight = 0.0
+    server_sum = server_weight = 0.0
+    latency_max = 0.0
+    models: Dict[str, Dict[str, float]] = {}
+
+    for record in records:
+        share = 1.0 / max(record.get('documentos_lote', 1), 1)
+        totals['chamadas'] += share
+        totals['tentativas'] += share * record.get('tentativas', 0)
+        for key in USAGE_FIELDS.values():
+            totals[key] += share * (record.get(key) or 0)
+        if record.get('latencia_s') is not None:
+            latency_sum += share * record['latencia_s']
+            latency_weight += share
+            latency_max = max(latency_max, record['latencia_s'])
+        if record.get('latencia_servidor_ms') is not None:
+            server_sum += share * record['latencia_servidor_ms']
+            server_weight += share
+        model = models.setdefault(record.get('modelo') or 'sem_resposta', {'chamadas': 0.0, 'tokens_total': 0.0})
+        model['chamadas'] += share
+        model['tokens_total'] += share * (record.get('tokens_total') or 0)
+
+    summary: Dict[str, Any] = {key: int(round(value)) for key, value in totals.items()}
+    summary['latencia_media_s'] = round(latency_sum / latency_weight, 2) if latency_weight else None
+    summary['latencia_max_s'] = round(latency_max, 2) if latency_weight else None
+    summary['latencia_servidor_media_ms'] = round(server_sum / server_weight, 1) if server_weight else None
+    summary['por_modelo'] = {
+        name: {key: int(round(value)) for key, value in model.items()}
+        for name, model in sorted(models.items())
+    }
+    return summary
+
+
+def usage_report(entries: Iterable[Dict[str, Any]], calls_key: str = 'chamadas_api') -> Dict[str, Any]:
+    """
+    Consolida o uso da API de uma execucao, no total e por tipo de documento.
+
+    Args:
+        entries: Resultados por documento (extracoes ou classificacoes)
+        calls_key: Chave da lista de registros em entry['metadados'] ou, se
+                   o resultado nao tiver metadados, na propria entry
+
+    Returns:
+        summarize_usage de todos os registros, com 'por_tipo'
+    """
+    by_type: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        calls = (entry.get('metadados') or entry).get(calls_key) or []
+        if calls:
+            by_type.setdefault(entry.get('tipo_documento') or 'SEM_TIPO', []).extend(calls)
+
+    report = summarize_usage(call for calls in by_type.values() for call in calls)
+    report['por_tipo'] = {tipo: summarize_usage(calls) for tipo, calls in sorted(by_type.items())}
+    return report
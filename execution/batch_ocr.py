@@ -36,16 +36,22 @@ import os
 import sys
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import as_completed
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Union
 
 # Adiciona o diretorio raiz ao path para imports
 ROOT_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT_DIR))
 
+from execution.preflight import preflight_rejection
+from execution.prep_pool import (
+    PREP_BACKENDS, DEFAULT_PREP_BACKEND, SharedBytes, create_prep_executor, from_shared_bytes,
+    read_shared_file, resolve_prep_workers
+)
+
 # Configuracao de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -216,7 +222,7 @@ class PreparedOCRDocument:
     - process_prepared_document(): Envia para API com rate limit (sequencial)
     """
     file_info: Dict[str, Any]  # Info do catalogo
-    file_content: Optional[bytes] = None  # Conteudo carregado em memoria
+    file_content: Union[bytes, SharedBytes, None] = None  # Conteudo (SharedBytes ate restore_content)
     file_path: Path = field(default_factory=Path)  # Caminho do arquivo
     mime_type: str = ''  # MIME type do arquivo
     is_temp_file: bool = False  # True se for DOCX convertido para PDF
@@ -231,10 +237,16 @@ class PreparedOCRDocument:
     @property
     def file_size_mb(self) -> float:
         """Retorna tamanho do arquivo em MB."""
+        if isinstance(self.file_content, SharedBytes):
+            return self.file_content.size / (1024 * 1024)
         if self.file_content:
             return len(self.file_content) / (1024 * 1024)
         return 0.0
 
+    def restore_content(self) -> None:
+        """Traz o conteudo de volta da memoria compartilhada (backend 'process')."""
+        self.file_content = from_shared_bytes(self.file_content)
+
 
 # =============================================================================
 # FUNCOES DE PREPARACAO PARALELA
@@ -244,7 +256,8 @@ def prepare_document(file_info: Dict[str, Any], escritura_id: str) -> PreparedOC
     """
     Prepara um documento para OCR (carrega, valida, converte DOCX se necessario).
 
-    Esta funcao roda em paralelo via ThreadPoolExecutor.
+    Esta funcao roda em paralelo via ThreadPoolExecutor ou ProcessPoolExecutor
+    (ver prep_pool.py) e retorna apenas objetos picklaveis.
     NAO faz chamadas a API do Document AI.
 
     Para arquivos DOCX/DOC, converte para PDF usando Microsoft Word via docx2pdf.
@@ -375,11 +388,10 @@ def prepare_document(file_info: Dict[str, Any], escritura_id: str) -> PreparedOC
         # Determinar MIME type
         mime_type = MIME_TYPES.get(ext, 'application/pdf')
 
-        # Carregar conteudo em memoria
-        with open(file_path, 'rb') as f:
-            content = f.read()
+        # Carregar conteudo em memoria (em processos filhos, direto para memoria compartilhada)
+        content = read_shared_file(file_path)
 
-        logger.debug(f"Preparado: {file_name} ({len(content)/1024:.1f} KB){' [convertido de DOCX]' if is_temp_file else ''}")
+        logger.debug(f"Preparado: {file_name} ({file_size/1024:.1f} KB){' [convertido de DOCX]' if is_temp_file else ''}")
 
         return PreparedOCRDocument(
             file_info=file_info,
@@ -402,6 +414,30 @@ def prepare_document(file_info: Dict[str, Any], escritura_id: str) -> PreparedOC
         )
 
 
+def page_text_offsets(document: Any, leading_chars: int = 0) -> List[int]:
+    """
+    Posicao do inicio de cada pagina no texto do Document AI.
+
+    Gravada no cabecalho INICIO_PAGINAS do arquivo OCR, permite dividir o
+    texto por pagina depois (poda de matriculas, matricula_pruning.py).
+
+    Args:
+        document: Documento retornado pelo Document AI
+        leading_chars: Caracteres removidos do inicio do texto (strip)
+
+    Returns:
+        Inicio de cada pagina no texto gravado, ou lista vazia se alguma
+        pagina nao tiver posicao
+    """
+    offsets = []
+    for page in document.pages or []:
+        segments = page.layout.text_anchor.text_segments if page.layout else None
+        if not segments:
+            return []
+        offsets.append(max(0, int(segments[0].start_index) - leading_chars))
+    return offsets
+
+
 def process_prepared_document(
     prepared_doc: PreparedOCRDocument,
     client,
@@ -474,8 +510,9 @@ def process_prepared_document(
                 api_result = client.process_document(request=request)
                 document = api_result.document
 
-                # Extrai texto
+                # Extrai texto (e a posicao de cada pagina nele)
                 text = document.text.strip() if document.text else ''
+                offsets = page_text_offsets(document, len(document.text or '') - len((document.text or '').lstrip()))
 
                 # Calcula confianca media
                 confidence = 0.0
@@ -503,8 +540,10 @@ TIPO: {prepared_doc.file_path.suffix.upper().lstrip('.')}
 PAGINAS: {pages}
 CONFIANCA: {confidence:.2f}
 DATA_PROCESSAMENTO: {datetime.now().isoformat()}
----
 """
+                if len(offsets) > 1:
+                    header += f"INICIO_PAGINAS: {','.join(str(offset) for offset in offsets)}\n"
+                header += "---\n"
                 output_file.write_text(header + text, encoding='utf-8')
 
                 # Atualiza resultado
@@ -555,12 +594,13 @@ def run_parallel_batch(
     output_dir: Path,
     catalog: Dict[str, Any],
     limit: Optional[int] = None,
-    workers: int = PARALLEL_WORKERS
+    workers: int = PARALLEL_WORKERS,
+    prep_backend: str = DEFAULT_PREP_BACKEND
 ) -> Dict[str, Any]:
     """
     Executa processamento OCR em batch com preparacao paralela.
 
-    Stage 1: Preparacao paralela (ThreadPoolExecutor)
+    Stage 1: Preparacao paralela (threads ou processos, conforme prep_backend)
     - Carrega arquivos em memoria
     - Valida extensoes e tamanhos
     - Prepara payloads
@@ -579,6 +619,7 @@ def run_parallel_batch(
         catalog: Catalogo para atualizar
         limit: Limite de arquivos (para testes)
         workers: Numero de workers na preparacao paralela
+        prep_backend: Backend da preparacao ('thread' ou 'process')
 
     Returns:
         Estatisticas do processamento
@@ -595,6 +636,7 @@ def run_parallel_batch(
         'data_inicio': datetime.now().isoformat(),
         'modo_processamento': 'paralelo',
         'workers_preparacao': workers,
+        'backend_preparacao': prep_backend,
         'total_arquivos': total,
         'processados_sucesso': 0,
         'processados_erro': 0,
@@ -611,12 +653,12 @@ def run_parallel_batch(
     # STAGE 1: Preparacao paralela
     # ==========================================================================
     logger.info(f"=" * 60)
-    logger.info(f"[STAGE 1] Preparando {total} documentos em paralelo ({workers} workers)...")
+    logger.info(f"[STAGE 1] Preparando {total} documentos em paralelo ({workers} workers, {prep_backend})...")
     prep_start = time.time()
 
     prepared_docs: List[PreparedOCRDocument] = []
 
-    with ThreadPoolExecutor(max_workers=workers) as executor:
+    with create_prep_executor(prep_backend, workers) as executor:
         # Submete todas as tarefas de preparacao
         future_to_file = {
             executor.submit(prepare_document, file_info, escritura_id): file_info
@@ -628,6 +670,7 @@ def run_parallel_batch(
             file_info = future_to_file[future]
             try:
                 prepared = future.result()
+                prepared.restore_content()
                 prepared_docs.append(prepared)
                 logger.debug(f"  Preparado {idx}/{total}: {file_info['nome']} ({prepared.preparation_time:.2f}s)")
             except Exception as e:
@@ -843,6 +886,12 @@ def get_pending_files(catalog: Dict[str, Any], force: bool = False) -> List[Dict
             logger.warning(f"Extensao nao suportada para OCR: {arquivo['nome']} ({ext})")
             continue
 
+        # Ignora arquivos rejeitados no preflight do inventario
+        rejection = preflight_rejection(arquivo)
+        if rejection:
+            logger.warning(f"Ignorado pelo preflight: {arquivo['nome']} ({rejection})")
+            continue
+
         # Verifica status
         status_ocr = arquivo.get('status_ocr', 'pendente')
 
@@ -1313,9 +1362,11 @@ Modo Paralelo (recomendado para lotes grandes):
   python batch_ocr.py FC_515_124_p280509 --parallel
   python batch_ocr.py FC_515_124_p280509 --parallel --workers 8
   python batch_ocr.py FC_515_124_p280509 --parallel --mock
+  python batch_ocr.py FC_515_124_p280509 --parallel --prep-backend process
 
 O modo paralelo prepara documentos (carrega arquivos em memoria) em paralelo
 enquanto mantém o rate limit de 2s entre chamadas a API Document AI.
+Com --prep-backend process a preparacao usa processos (um por nucleo).
 
 O script le o catalogo da Fase 1 e processa cada arquivo via Document AI.
 Arquivos DOCX/DOC sao convertidos automaticamente para PDF antes do OCR.
@@ -1374,8 +1425,16 @@ O progresso e salvo a cada 5 arquivos processados.
     parser.add_argument(
         '--workers', '-w',
         type=int,
-        default=PARALLEL_WORKERS,
-        help=f'Numero de workers para preparacao paralela (default: {PARALLEL_WORKERS})'
+        default=None,
+        help=f'Numero de workers para preparacao paralela '
+             f'(default: {PARALLEL_WORKERS} threads, ou um por nucleo com --prep-backend process)'
+    )
+
+    parser.add_argument(
+        '--prep-backend',
+        choices=PREP_BACKENDS,
+        default=DEFAULT_PREP_BACKEND,
+        help='Backend da preparacao paralela: "thread" (padrao) ou "process" (escala por todos os nucleos)'
     )
 
     args = parser.parse_args()
@@ -1452,7 +1511,8 @@ O progresso e salvo a cada 5 arquivos processados.
                     output_dir=output_dir,
                     catalog=catalog,
                     limit=args.limit,
-                    workers=args.workers
+                    workers=resolve_prep_workers(args.prep_backend, args.workers, PARALLEL_WORKERS),
+                    prep_backend=args.prep_backend
                 )
         else:
             # Modo serial: processamento tradicional sequencial
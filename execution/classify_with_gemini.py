@@ -25,7 +25,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Union
 
 # Adiciona o diretório raiz ao path para imports
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -36,15 +36,32 @@ try:
     from dotenv import load_dotenv
     from google import genai
     from google.genai import types
-    from PIL import Image
-    import fitz  # PyMuPDF
-    import io
+    from PIL import Image, ImageOps
     import base64
 except ImportError as e:
     print(f"Erro: Biblioteca não encontrada - {e}")
-    print("Instale as dependências: pip install python-dotenv google-genai Pillow PyMuPDF")
+    print("Instale as dependências: pip install -r execution/requirements.txt")
     sys.exit(1)
 
+# PyMuPDF e NumPy sao obrigatorios (image_utils os importa no topo): sem fallback
+import fitz  # PyMuPDF
+
+from execution.api_usage import CallUsage, usage_report
+from execution.image_utils import (
+    clean_document_photo, extract_embedded_page_image, pixmap_image
+)
+from execution.memory_budget import (
+    DEFAULT_MEMORY_BUDGET_MB, ENCODE_MEMORY_FACTOR, configure_memory_budget, decoded_image_bytes,
+    get_memory_budget
+)
+from execution.page_cache import DEFAULT_CACHE_MB, configure_page_cache, file_digest, get_page_cache, page_key
+from execution.preflight import preflight_rejection
+from execution.render_profiles import FASE_CLASSIFICACAO, encode_for_profile, get_render_profile
+from execution.prep_pool import (
+    PREP_BACKENDS, DEFAULT_PREP_BACKEND, SharedBytes, create_prep_executor, from_shared_bytes,
+    resolve_prep_workers, to_shared_bytes
+)
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -63,6 +80,12 @@ SUPPORTED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
 SUPPORTED_PDF_EXTENSION = '.pdf'
 SUPPORTED_DOCX_EXTENSIONS = {'.docx', '.doc'}
 
+# Perfil das imagens de classificacao: so o layout da primeira pagina e
+# necessario (zoom, lado maior e orcamento em execution/render_profiles.py)
+CLASSIFY_PROFILE = get_render_profile(None, FASE_CLASSIFICACAO)
+# Recorte/correcao de inclinacao de fotos de celular (ver image_utils.clean_document_photo)
+DEFAULT_CROP_PHOTOS = os.getenv("RECORTAR_FOTOS", "").lower() in ('1', 'true', 'sim')
+
 # Constantes para processamento paralelo
 PARALLEL_WORKERS = 10  # Numero de workers para preparacao paralela
 PARALLEL_BATCH_SIZE = 10  # Tamanho do lote de preparacao
@@ -189,23 +212,37 @@ class PreparedDocument:
     Documento preparado para envio ao Gemini.
 
     Contem todas as informacoes necessarias para a classificacao,
-    ja com a imagem carregada (ou resultado pre-computado para DOCX/mock).
+    ja com a imagem codificada (JPEG, ou PNG/WebP de 1 bit; ou resultado pre-computado para DOCX/mock).
+
+    Guarda bytes e nao a imagem PIL: o objeto precisa ser picklavel para
+    voltar do pool de processos, e as threads de API nao recodificam a
+    imagem a cada tentativa. No backend 'process', imagens grandes voltam
+    por memoria compartilhada (SharedBytes) ate restore_image().
     """
     file_info: Dict[str, Any]
-    image: Optional[Any]  # PIL.Image ou None
+    image_bytes: Union[bytes, SharedBytes, None]  # Imagem pronta para envio (ver mime_type) ou None
     pre_result: Optional[Dict[str, Any]]  # Resultado pre-computado (DOCX, mock, erro)
     preparation_time: float
     error: Optional[str]
+    mime_type: str = 'image/jpeg'
 
     @property
     def needs_api_call(self) -> bool:
         """Retorna True se este documento precisa de chamada a API."""
-        return self.pre_result is None and self.image is not None
+        return self.pre_result is None and self.image_bytes is not None
 
     @property
     def is_ready(self) -> bool:
         """Retorna True se o documento esta pronto para processamento."""
-        return self.pre_result is not None or self.image is not None or self.error is not None
+        return self.pre_result is not None or self.image_bytes is not None or self.error is not None
+
+    def restore_image(self) -> None:
+        """Traz a imagem de volta da memoria compartilhada (backend 'process')."""
+        self.image_bytes = from_shared_bytes(self.image_bytes)
+
+    def to_part(self) -> types.Part:
+        """Retorna a imagem preparada como Part do SDK google.genai."""
+        return types.Part.from_bytes(data=self.image_bytes, mime_type=self.mime_type)
 
 # Tipos de documento válidos (para normalização)
 VALID_DOCUMENT_TYPES = {
@@ -381,69 +418,101 @@ def configure_gemini(api_key: str, mock_mode: bool = False) -> Optional[genai.Cl
     return client
 
 
-def pil_image_to_part(image: Image.Image) -> types.Part:
+def encode_first_page_from_pdf(pdf_path: Path) -> Optional[Tuple[bytes, str]]:
     """
-    Converte uma imagem PIL para Part do novo SDK google.genai.
+    Renderiza e codifica a primeira pagina de um PDF para classificacao.
+
+    Se a pagina for apenas uma imagem embutida, encaminha o stream original.
+    Caso contrario, codifica direto do buffer do Pixmap (pixmap_image), sem
+    copiar os pixels para uma imagem PIL intermediaria. O resultado fica no
+    cache de paginas em disco (page_cache.py): reexecucoes nao renderizam de novo.
 
     Args:
-        image: Imagem PIL
+        pdf_path: Caminho para o arquivo PDF
 
     Returns:
-        Part com dados da imagem em base64
+        Tuple (bytes, mime_type) ou None se falhar
     """
-    # Converte para JPEG em memoria
-    buffer = io.BytesIO()
-    image.save(buffer, format='JPEG', quality=85)
-    buffer.seek(0)
-
-    # Codifica em base64
-    image_bytes = buffer.getvalue()
-
-    # Cria Part com inline_data
-    return types.Part.from_bytes(
-        data=image_bytes,
-        mime_type='image/jpeg'
-    )
+    try:
+        cache = get_page_cache()
+        key = page_key(file_digest(pdf_path), 0, CLASSIFY_PROFILE) if cache.enabled else None
+        cached = cache.get(key) if key else None
+        if cached is not None:
+            logger.debug(f"Primeira pagina lida do cache: {pdf_path.name}")
+            return cached
+
+        with fitz.open(str(pdf_path)) as doc:
+            if len(doc) == 0:
+                logger.warning(f"PDF vazio: {pdf_path}")
+                return None
+
+            page = doc[0]
+            embedded = extract_embedded_page_image(page, CLASSIFY_PROFILE.max_bytes)
+            if embedded is not None:
+                logger.debug(f"Imagem embutida encaminhada sem recodificar: {pdf_path.name}")
+                if key:
+                    cache.put(key, *embedded)
+                return embedded
+
+            zoom = CLASSIFY_PROFILE.zoom_for(1, max(page.rect.width, page.rect.height))
+            page_bytes = decoded_image_bytes(page.rect.width * zoom, page.rect.height * zoom)
+            with get_memory_budget().reserve(page_bytes * ENCODE_MEMORY_FACTOR, pdf_path.name):
+                pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+                with pixmap_image(pix) as img:
+                    encoded = encode_for_profile(img, CLASSIFY_PROFILE)
+                pix = None
+
+        if key:
+            cache.put(key, encoded.data, encoded.mime_type)
+        return encoded.data, encoded.mime_type
 
+    except Exception as e:
+        logger.error(f"Erro ao extrair página do PDF {pdf_path}: {e}")
+        return None
 
-def extract_first_page_from_pdf(pdf_path: Path) -> Optional[Image.Image]:
-    """
-    Extrai a primeira página de um PDF como imagem usando PyMuPDF.
 
-    Args:
-        pdf_path: Caminho para o arquivo PDF
+def _draft_for_classification(img: Image.Image) -> None:
+    """
+    Ativa a decodificacao reduzida de JPEGs ainda nao carregados.
 
-    Returns:
-        Imagem PIL da primeira página ou None se falhar
+    O draft escolhe a maior reducao JPEG (1/2, 1/4 ou 1/8) que ainda deixa a
+    imagem >= ao max_long_edge de CLASSIFY_PROFILE; img.size passa a refletir
+    o tamanho que sera decodificado.
     """
-    try:
-        doc = fitz.open(str(pdf_path))
-        if len(doc) == 0:
-            logger.warning(f"PDF vazio: {pdf_path}")
-            return None
+    scale = CLASSIFY_PROFILE.max_long_edge / max(img.size)
+    if img.format == 'JPEG' and scale < 1:
+        img.draft('RGB', (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
 
-        # Pega a primeira página
-        page = doc[0]
 
-        # Renderiza em alta resolução (300 DPI)
-        zoom = 2.0  # Fator de zoom para melhor qualidade
-        mat = fitz.Matrix(zoom, zoom)
-        pix = page.get_pixmap(matrix=mat)
+def estimate_image_memory(file_path: Path) -> int:
+    """
+    Estima o pico de memoria para carregar, tratar e codificar uma imagem.
 
-        # Converte para PIL Image
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    Le apenas o cabecalho do arquivo (com o draft aplicado em JPEGs, como em
+    load_image) - nenhum pixel e decodificado.
 
-        doc.close()
-        return img
+    Args:
+        file_path: Caminho para a imagem
 
-    except Exception as e:
-        logger.error(f"Erro ao extrair página do PDF {pdf_path}: {e}")
-        return None
+    Returns:
+        Bytes a reservar no orcamento de memoria (0 se o cabecalho nao abrir)
+    """
+    try:
+        with Image.open(file_path) as img:
+            _draft_for_classification(img)
+            return decoded_image_bytes(*img.size) * ENCODE_MEMORY_FACTOR
+    except Exception:
+        return 0
 
 
 def load_image(file_path: Path) -> Optional[Image.Image]:
     """
-    Carrega uma imagem de arquivo (suporta imagens e PDFs).
+    Carrega uma imagem de arquivo (PDFs vao por encode_first_page_from_pdf).
+
+    A classificacao so precisa do layout, entao a imagem ja sai reduzida:
+    JPEGs sao decodificados em modo draft (o decoder reduz por 1/2, 1/4 ou
+    1/8 sem decodificar a resolucao cheia), a orientacao EXIF e aplicada e
+    o lado maior e limitado ao max_long_edge de CLASSIFY_PROFILE.
 
     Args:
         file_path: Caminho para o arquivo
@@ -454,13 +523,20 @@ def load_image(file_path: Path) -> Optional[Image.Image]:
     extension = file_path.suffix.lower()
 
     try:
-        if extension == SUPPORTED_PDF_EXTENSION:
-            return extract_first_page_from_pdf(file_path)
-        elif extension in SUPPORTED_IMAGE_EXTENSIONS:
+        if extension in SUPPORTED_IMAGE_EXTENSIONS:
             img = Image.open(file_path)
+            _draft_for_classification(img)
+            max_long_edge = CLASSIFY_PROFILE.max_long_edge
+
+            # Fotos de celular costumam vir deitadas com a tag de orientacao
+            img = ImageOps.exif_transpose(img)
+
             # Converte para RGB se necessário (remove alpha channel)
             if img.mode in ('RGBA', 'P'):
                 img = img.convert('RGB')
+
+            if max(img.size) > max_long_edge:
+                img.thumbnail((max_long_edge, max_long_edge), Image.LANCZOS)
             return img
         else:
             logger.warning(f"Extensão não suportada: {extension} - {file_path}")
@@ -470,6 +546,49 @@ def load_image(file_path: Path) -> Optional[Image.Image]:
         return None
 
 
+def load_encoded_image(file_path: Path, crop_photos: bool = False) -> Optional[Tuple[bytes, str]]:
+    """
+    Carrega a imagem de classificacao ja codificada para envio.
+
+    PDFs sao tratados por encode_first_page_from_pdf (imagem embutida
+    encaminhada sem recodificar, ou codificacao direto do Pixmap). Imagens
+    sao carregadas via load_image e codificadas dentro do orcamento.
+
+    Args:
+        file_path: Caminho para o arquivo
+        crop_photos: Recorta o documento e corrige a inclinacao de fotos
+
+    Returns:
+        Tuple (bytes, mime_type) ou None se falhar
+    """
+    if file_path.suffix.lower() == SUPPORTED_PDF_EXTENSION:
+        return encode_first_page_from_pdf(file_path)
+
+    # A imagem decodificada (antes da reducao) conta no orcamento de memoria
+    # compartilhado pelos workers de preparacao
+    with get_memory_budget().reserve(estimate_image_memory(file_path), file_path.name):
+        image = load_image(file_path)
+        if image is None:
+            return None
+
+        if crop_photos and file_path.suffix.lower() in SUPPORTED_IMAGE_EXTENSIONS:
+            try:
+                cleanup = clean_document_photo(image)
+                if cleanup.changed:
+                    logger.debug(
+                        f"Foto tratada: {file_path.name} {image.width}x{image.height} -> "
+                        f"{cleanup.image.width}x{cleanup.image.height} (angulo={cleanup.deskew_angle:+.1f})"
+                    )
+                image.close()
+                image = cleanup.image
+            except Exception as e:
+                logger.debug(f"Falha ao tratar foto {file_path.name}, usando original: {e}")
+
+        encoded = encode_for_profile(image, CLASSIFY_PROFILE)
+        image.close()
+    return encoded.data, encoded.mime_type
+
+
 def normalize_document_type(tipo: str) -> str:
     """
     Normaliza o tipo de documento para o formato padrão.
@@ -984,7 +1103,13 @@ def pre_classify_by_filename(file_info: dict) -> Optional[dict]:
     return None
 
 
-def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id: str = 'unknown') -> dict:
+def classify_document(
+    model,
+    file_info: dict,
+    mock_mode: bool = False,
+    caso_id: str = 'unknown',
+    crop_photos: bool = False
+) -> dict:
     """
     Classifica um único documento usando o Gemini.
     Implementa retry com backoff exponencial.
@@ -996,6 +1121,7 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
         file_info: Informações do arquivo do inventário
         mock_mode: Se True, usa classificação mock
         caso_id: ID do caso/escritura para registro de descobertas
+        crop_photos: Recorta o documento e corrige a inclinação de fotos
 
     Returns:
         Resultado da classificação
@@ -1029,6 +1155,20 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
             'erro_mensagem': f'Extensão não suportada: {ext}'
         }
 
+    # Rejeitado no preflight do inventario (corrompido, protegido, vazio)
+    rejection = preflight_rejection(file_info)
+    if rejection:
+        return {
+            'id': file_info['id'],
+            'nome': file_info['nome'],
+            'tipo_documento': None,
+            'confianca': None,
+            'pessoa_relacionada': None,
+            'observacao': None,
+            'status': 'erro',
+            'erro_mensagem': f'Preflight: {rejection}'
+        }
+
     # Arquivos DOCX/DOC sao classificados por heuristica (nao visual)
     if ext in SUPPORTED_DOCX_EXTENSIONS:
         docx_result = classify_docx_by_name(file_info)
@@ -1055,9 +1195,9 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
             'status': 'sucesso'
         }
 
-    # Carrega a imagem
-    image = load_image(file_path)
-    if image is None:
+    # Carrega a imagem (ja codificada para envio)
+    loaded = load_encoded_image(file_path, crop_photos)
+    if loaded is None:
         return {
             'id': file_info['id'],
             'nome': file_info['nome'],
@@ -1070,16 +1210,19 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
         }
 
     # Retry com backoff exponencial
+    usage = CallUsage()
     for attempt in range(MAX_RETRIES):
         try:
-            # Converte imagem para Part do novo SDK
-            image_part = pil_image_to_part(image)
+            # Cria Part do novo SDK com a imagem codificada
+            image_part = types.Part.from_bytes(data=loaded[0], mime_type=loaded[1])
 
             # Envia para o Gemini usando novo SDK
+            started = usage.start_attempt()
             response = model.models.generate_content(
                 model=GEMINI_MODEL,
                 contents=[CLASSIFICATION_PROMPT, image_part]
             )
+            usage.record(response, GEMINI_MODEL, started)
 
             # Parse da resposta
             result = parse_gemini_response(response.text)
@@ -1092,7 +1235,8 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
                 'confianca': result.get('confianca'),
                 'pessoa_relacionada': result.get('pessoa_relacionada'),
                 'observacao': result.get('observacao'),
-                'status': 'sucesso'
+                'status': 'sucesso',
+                'chamadas_api': [usage.to_metadata()]
             }
 
             # Se for DESCONHECIDO, adiciona campos extras e salva descoberta
@@ -1125,7 +1269,8 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
         'pessoa_relacionada': None,
         'observacao': None,
         'status': 'erro',
-        'erro_mensagem': f'Falha após {MAX_RETRIES} tentativas'
+        'erro_mensagem': f'Falha após {MAX_RETRIES} tentativas',
+        'chamadas_api': [usage.to_metadata()]
     }
 
 
@@ -1133,23 +1278,30 @@ def classify_document(model, file_info: dict, mock_mode: bool = False, caso_id:
 # PROCESSAMENTO PARALELO - Funcoes para batch processing otimizado
 # =============================================================================
 
-def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> PreparedDocument:
+def prepare_document(
+    file_info: Dict[str, Any],
+    mock_mode: bool = False,
+    crop_photos: bool = False
+) -> PreparedDocument:
     """
     Prepara um documento para classificacao (sem chamar a API).
 
-    Esta funcao faz todo o trabalho de I/O:
+    Esta funcao faz todo o trabalho de I/O e CPU:
     - Verifica se arquivo existe
     - Carrega imagem ou converte PDF
+    - Codifica a imagem dentro do orcamento de classificacao (JPEG ou 1 bit)
     - Trata casos especiais (DOCX, mock)
 
-    Pode ser executada em paralelo pois nao faz chamadas a API.
+    Pode ser executada em paralelo pois nao faz chamadas a API - tanto em
+    threads quanto em processos (retorna apenas objetos picklaveis).
 
     Args:
         file_info: Informacoes do arquivo do inventario
         mock_mode: Se True, prepara resultado mock
+        crop_photos: Recorta o documento e corrige a inclinacao de fotos
 
     Returns:
-        PreparedDocument com imagem carregada ou resultado pre-computado
+        PreparedDocument com imagem codificada ou resultado pre-computado
     """
     start_time = time.time()
     file_path = Path(file_info['caminho_absoluto'])
@@ -1158,7 +1310,7 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
     if not file_path.exists():
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1178,7 +1330,7 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
     if ext not in SUPPORTED_IMAGE_EXTENSIONS and ext != SUPPORTED_PDF_EXTENSION and ext not in SUPPORTED_DOCX_EXTENSIONS:
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1193,12 +1345,32 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
             error=f'Extensão não suportada: {ext}'
         )
 
+    # Rejeitado no preflight do inventario: nem carrega o arquivo
+    rejection = preflight_rejection(file_info)
+    if rejection:
+        return PreparedDocument(
+            file_info=file_info,
+            image_bytes=None,
+            pre_result={
+                'id': file_info['id'],
+                'nome': file_info['nome'],
+                'tipo_documento': None,
+                'confianca': None,
+                'pessoa_relacionada': None,
+                'observacao': None,
+                'status': 'erro',
+                'erro_mensagem': f'Preflight: {rejection}'
+            },
+            preparation_time=time.time() - start_time,
+            error=f'Preflight: {rejection}'
+        )
+
     # Arquivos DOCX/DOC - resultado pre-computado por heuristica
     if ext in SUPPORTED_DOCX_EXTENSIONS:
         docx_result = classify_docx_by_name(file_info)
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1217,7 +1389,7 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
         mock_result = classify_with_mock(file_info)
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1239,7 +1411,7 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
         logger.debug(f"Pre-classificado por nome: {file_info['nome']} -> {pre_class_result['tipo_documento']}")
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1256,11 +1428,11 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
 
     # Carrega a imagem (I/O pesado - beneficia de paralelismo)
     try:
-        image = load_image(file_path)
-        if image is None:
+        loaded = load_encoded_image(file_path, crop_photos)
+        if loaded is None:
             return PreparedDocument(
                 file_info=file_info,
-                image=None,
+                image_bytes=None,
                 pre_result={
                     'id': file_info['id'],
                     'nome': file_info['nome'],
@@ -1275,9 +1447,12 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
                 error='Não foi possível ler o arquivo'
             )
 
+        image_bytes, mime_type = loaded
+
         return PreparedDocument(
             file_info=file_info,
-            image=image,
+            image_bytes=to_shared_bytes(image_bytes),
+            mime_type=mime_type,
             pre_result=None,  # Precisa de chamada a API
             preparation_time=time.time() - start_time,
             error=None
@@ -1287,7 +1462,7 @@ def prepare_document(file_info: Dict[str, Any], mock_mode: bool = False) -> Prep
         logger.error(f"Erro ao preparar documento {file_info['nome']}: {e}")
         return PreparedDocument(
             file_info=file_info,
-            image=None,
+            image_bytes=None,
             pre_result={
                 'id': file_info['id'],
                 'nome': file_info['nome'],
@@ -1331,7 +1506,7 @@ def classify_prepared_document(
         return prepared.pre_result
 
     # Se nao tem imagem, algo deu errado
-    if prepared.image is None:
+    if prepared.image_bytes is None:
         return {
             'id': prepared.file_info['id'],
             'nome': prepared.file_info['nome'],
@@ -1349,16 +1524,19 @@ def classify_prepared_document(
         logger.debug(f"Rate limit: aguardou {wait_time:.2f}s para {prepared.file_info['nome']}")
 
     # Retry com backoff exponencial
+    usage = CallUsage()
     for attempt in range(MAX_RETRIES):
         try:
-            # Converte imagem para Part do novo SDK
-            image_part = pil_image_to_part(prepared.image)
+            # Imagem ja codificada na preparacao
+            image_part = prepared.to_part()
 
             # Envia para o Gemini usando novo SDK
+            started = usage.start_attempt()
             response = model.models.generate_content(
                 model=GEMINI_MODEL,
                 contents=[CLASSIFICATION_PROMPT, image_part]
             )
+            usage.record(response, GEMINI_MODEL, started)
 
             # Parse da resposta
             result = parse_gemini_response(response.text)
@@ -1371,7 +1549,8 @@ def classify_prepared_document(
                 'confianca': result.get('confianca'),
                 'pessoa_relacionada': result.get('pessoa_relacionada'),
                 'observacao': result.get('observacao'),
-                'status': 'sucesso'
+                'status': 'sucesso',
+                'chamadas_api': [usage.to_metadata()]
             }
 
             # Se for DESCONHECIDO, adiciona campos extras e salva descoberta
@@ -1404,7 +1583,8 @@ def classify_prepared_document(
         'pessoa_relacionada': None,
         'observacao': None,
         'status': 'erro',
-        'erro_mensagem': f'Falha após {MAX_RETRIES} tentativas'
+        'erro_mensagem': f'Falha após {MAX_RETRIES} tentativas',
+        'chamadas_api': [usage.to_metadata()]
     }
 
 
@@ -1507,6 +1687,7 @@ def classify_batch(
         logger.debug(f"Rate limit: aguardou {wait_time:.2f}s para batch")
 
     # Retry com backoff exponencial
+    usage = CallUsage()
     for attempt in range(MAX_RETRIES):
         try:
             # Monta o prompt com o numero correto de documentos
@@ -1515,15 +1696,16 @@ def classify_batch(
             # Cria lista de contents: prompt + todas as imagens
             contents = [prompt]
             for prepared in prepared_docs:
-                if prepared.image is not None:
-                    image_part = pil_image_to_part(prepared.image)
-                    contents.append(image_part)
+                if prepared.image_bytes is not None:
+                    contents.append(prepared.to_part())
 
             # Envia para o Gemini
+            started = usage.start_attempt()
             response = model.models.generate_content(
                 model=GEMINI_MODEL,
                 contents=contents
             )
+            usage.record(response, GEMINI_MODEL, started)
 
             # Parse da resposta (array JSON)
             parsed_results = parse_batch_response(response.text, num_docs)
@@ -1546,7 +1728,9 @@ def classify_batch(
                     'confianca': parsed.get('confianca'),
                     'pessoa_relacionada': parsed.get('pessoa_relacionada'),
                     'observacao': parsed.get('observacao'),
-                    'status': 'sucesso'
+                    'status': 'sucesso',
+                    # O request atende o lote inteiro: usage_report rateia entre os documentos
+                    'chamadas_api': [usage.to_metadata(documentos_lote=num_docs)]
                 }
 
                 # Se for DESCONHECIDO, salva descoberta (sem campos extras no batch)
@@ -1571,6 +1755,8 @@ def classify_batch(
     results = []
     for prepared in prepared_docs:
         result = classify_prepared_document(model, prepared, rate_limiter, caso_id)
+        # As tentativas do batch que falhou tambem consumiram cota
+        result.setdefault('chamadas_api', []).insert(0, usage.to_metadata(documentos_lote=num_docs))
         results.append(result)
 
     return results
@@ -1661,13 +1847,16 @@ def run_classification_parallel(
     limit: Optional[int] = None,
     num_workers: int = PARALLEL_WORKERS,
     num_api_workers: int = API_WORKERS,
-    batch_size: int = CLASSIFICATION_BATCH_SIZE
+    batch_size: int = CLASSIFICATION_BATCH_SIZE,
+    prep_backend: str = DEFAULT_PREP_BACKEND,
+    crop_photos: bool = DEFAULT_CROP_PHOTOS
 ) -> Dict[str, Any]:
     """
     Executa o pipeline de classificacao com processamento paralelo.
 
     Estrategia de 2 estagios:
-    1. Preparacao paralela: Carrega imagens/PDFs em paralelo (I/O bound)
+    1. Preparacao paralela: Carrega imagens/PDFs e codifica JPEG em paralelo
+       (threads ou processos - com 'process' escala por todos os nucleos)
     2. Classificacao paralela: Multiplos workers fazem chamadas API simultaneas
        respeitando rate limit global (150 RPM no plano pago)
 
@@ -1685,6 +1874,8 @@ def run_classification_parallel(
         num_workers: Numero de workers para preparacao paralela
         num_api_workers: Numero de workers para chamadas API paralelas
         batch_size: Numero de imagens por request (1 = desabilitado)
+        prep_backend: Backend da preparacao ('thread' ou 'process')
+        crop_photos: Recorta o documento e corrige a inclinacao de fotos
 
     Returns:
         Resultado completo da classificacao
@@ -1716,7 +1907,7 @@ def run_classification_parallel(
     use_batch = batch_size > 1 and not mock_mode
     logger.info(f"=" * 60)
     logger.info(f"MODO PARALELO ATIVADO")
-    logger.info(f"  Workers de preparacao: {num_workers}")
+    logger.info(f"  Workers de preparacao: {num_workers} ({prep_backend})")
     logger.info(f"  Workers de API: {num_api_workers}")
     logger.info(f"  Batch size: {batch_size} {'(ATIVADO)' if use_batch else '(desativado)'}")
     logger.info(f"  Total de arquivos: {total}")
@@ -1730,6 +1921,8 @@ def run_classification_parallel(
         'modelo_utilizado': model_name,
         'modo_processamento': 'paralelo',
         'workers_preparacao': num_workers,
+        'backend_preparacao': prep_backend,
+        'recortar_fotos': crop_photos,
         'workers_api': num_api_workers,
         'batch_size': batch_size,
         'total_processados': 0,
@@ -1751,10 +1944,10 @@ def run_classification_parallel(
 
     prepared_docs: List[PreparedDocument] = []
 
-    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    with create_prep_executor(prep_backend, num_workers) as executor:
         # Submete todas as tarefas de preparacao
         future_to_file = {
-            executor.submit(prepare_document, file_info, mock_mode): file_info
+            executor.submit(prepare_document, file_info, mock_mode, crop_photos): file_info
             for file_info in files_to_process
         }
 
@@ -1763,6 +1956,7 @@ def run_classification_parallel(
             file_info = future_to_file[future]
             try:
                 prepared = future.result()
+                prepared.restore_image()
                 prepared_docs.append(prepared)
                 logger.debug(f"Preparado {idx}/{total}: {file_info['nome']} ({prepared.preparation_time:.2f}s)")
             except Exception as e:
@@ -1770,7 +1964,7 @@ def run_classification_parallel(
                 # Cria documento com erro
                 prepared_docs.append(PreparedDocument(
                     file_info=file_info,
-                    image=None,
+                    image_bytes=None,
                     pre_result={
                         'id': file_info['id'],
                         'nome': file_info['nome'],
@@ -1897,8 +2091,12 @@ def run_classification_parallel(
     total_time = time.time() - start_time
     result['data_classificacao'] = datetime.now().isoformat()
     result['tempo_total'] = total_time
+    # Com o backend 'process' o orcamento e de cada processo (pico so do processo principal)
+    result['memoria_imagens'] = get_memory_budget().stats()
+    result['cache_paginas'] = get_page_cache().stats()
     result['docs_pre_classificados'] = docs_pre_classified
     result['docs_enviados_api'] = docs_need_api
+    result['uso_api'] = usage_report(result['classificacoes'])
     save_progress(output_path, result)
 
     # Resumo
@@ -1914,6 +2112,8 @@ def run_classification_parallel(
     logger.info(f"  Tempo de classificacao: {class_time:.2f}s")
     logger.info(f"  Tempo total: {total_time:.2f}s")
     logger.info(f"  Rate limiter stats: {rate_limiter.get_stats()}")
+    logger.info(f"  Tokens (usage_metadata): {result['uso_api']['tokens_total']} "
+                f"em {result['uso_api']['chamadas']} chamadas")
     logger.info(f"  Arquivo de saida: {output_path}")
     logger.info("=" * 60)
 
@@ -2185,7 +2385,8 @@ def run_classification(
     input_path: Path,
     output_path: Path,
     mock_mode: bool = False,
-    limit: Optional[int] = None
+    limit: Optional[int] = None,
+    crop_photos: bool = DEFAULT_CROP_PHOTOS
 ):
     """
     Executa o pipeline de classificação completo.
@@ -2195,6 +2396,7 @@ def run_classification(
         output_path: Caminho do arquivo de saída
         mock_mode: Se True, usa classificação mock sem API
         limit: Limita o número de arquivos processados (para testes)
+        crop_photos: Recorta o documento e corrige a inclinação de fotos
     """
     # Carrega ambiente e configura Gemini
     if not mock_mode:
@@ -2236,7 +2438,7 @@ def run_classification(
         logger.info(f"Processando {idx}/{total}: {file_info['nome']}")
 
         # Classifica
-        classification = classify_document(model, file_info, mock_mode, escritura_id)
+        classification = classify_document(model, file_info, mock_mode, escritura_id, crop_photos)
         result['classificacoes'].append(classification)
 
         # Atualiza contadores
@@ -2259,6 +2461,7 @@ def run_classification(
 
     # Salva resultado final
     result['data_classificacao'] = datetime.now().isoformat()
+    result['uso_api'] = usage_report(result['classificacoes'])
     save_progress(output_path, result)
 
     # Resumo
@@ -2268,6 +2471,8 @@ def run_classification(
     logger.info(f"  Total processados: {result['total_processados']}")
     logger.info(f"  Sucesso: {result['total_sucesso']}")
     logger.info(f"  Erros: {result['total_erro']}")
+    logger.info(f"  Tokens (usage_metadata): {result['uso_api']['tokens_total']} "
+                f"em {result['uso_api']['chamadas']} chamadas")
     logger.info(f"  Arquivo de saída: {output_path}")
     logger.info("=" * 50)
 
@@ -2290,6 +2495,7 @@ Modo Paralelo (recomendado - plano PAGO do Gemini):
   python classify_with_gemini.py --parallel FC_515_124
   python classify_with_gemini.py --parallel --workers 8 --api-workers 5 FC_515_124
   python classify_with_gemini.py --parallel --mock FC_515_124
+  python classify_with_gemini.py --parallel --prep-backend process FC_515_124  # Todos os nucleos
 
 Batch Processing (multiplas imagens por request):
   python classify_with_gemini.py --parallel --batch-size 4 FC_515_124
@@ -2299,7 +2505,8 @@ Consolidar Descobertas (documentos DESCONHECIDO):
   python classify_with_gemini.py --consolidar-descobertas
 
 O modo paralelo usa duas estrategias:
-  1. Preparacao paralela: carrega imagens/PDFs em paralelo (I/O bound)
+  1. Preparacao paralela: carrega imagens/PDFs e codifica JPEG em paralelo
+     (--prep-backend process usa processos e escala por todos os nucleos)
   2. API paralela: multiplos workers fazem chamadas simultaneas ao Gemini
      respeitando o rate limit global (150 RPM no plano pago = 0.5s entre requests)
 
@@ -2364,8 +2571,43 @@ Documentos DESCONHECIDO:
     parser.add_argument(
         '--workers', '-w',
         type=int,
-        default=PARALLEL_WORKERS,
-        help=f'Numero de workers para preparacao paralela (default: {PARALLEL_WORKERS})'
+        default=None,
+        help=f'Numero de workers para preparacao paralela '
+             f'(default: {PARALLEL_WORKERS} threads, ou um por nucleo com --prep-backend process)'
+    )
+
+    parser.add_argument(
+        '--prep-backend',
+        choices=PREP_BACKENDS,
+        default=DEFAULT_PREP_BACKEND,
+        help='Backend da preparacao paralela: "thread" (padrao) ou "process" '
+             '(renderizacao/JPEG escalam por todos os nucleos, sem o limite do GIL)'
+    )
+
+    parser.add_argument(
+        '--recortar-fotos',
+        action='store_true',
+        default=DEFAULT_CROP_PHOTOS,
+        help='Recorta o documento e corrige a inclinacao de fotos de celular antes da '
+             'classificacao (variavel RECORTAR_FOTOS)'
+    )
+
+    parser.add_argument(
+        '--memoria-mb',
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET_MB,
+        metavar='MB',
+        help=f'Orcamento de memoria para imagens decodificadas durante a preparacao, somado entre '
+             f'os workers (default: {DEFAULT_MEMORY_BUDGET_MB}, variavel MEMORIA_IMAGENS_MB). '
+             f'Use 0 para desabilitar.'
+    )
+
+    parser.add_argument(
+        '--sem-cache-paginas',
+        action='store_true',
+        default=DEFAULT_CACHE_MB <= 0,
+        help='Renderiza a primeira pagina dos PDFs de novo, sem usar o cache em .tmp/cache/paginas '
+             '(limite do cache: variavel CACHE_PAGINAS_MB)'
     )
 
     parser.add_argument(
@@ -2394,6 +2636,15 @@ Documentos DESCONHECIDO:
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    if args.memoria_mb < 0:
+        parser.error("--memoria-mb deve ser 0 (sem limite) ou positivo")
+    configure_memory_budget(args.memoria_mb)
+    # Processos de preparacao (backend 'process') leem o orcamento e o cache do ambiente
+    os.environ['MEMORIA_IMAGENS_MB'] = str(args.memoria_mb)
+    if args.sem_cache_paginas:
+        configure_page_cache(0)
+        os.environ['CACHE_PAGINAS_MB'] = '0'
+
     # Se solicitou consolidação de descobertas, executa e sai
     if args.consolidar_descobertas:
         logger.info("Consolidando descobertas de documentos DESCONHECIDO...")
@@ -2448,9 +2699,11 @@ Documentos DESCONHECIDO:
                 output_path=output_path,
                 mock_mode=args.mock,
                 limit=args.limit,
-                num_workers=args.workers,
+                num_workers=resolve_prep_workers(args.prep_backend, args.workers, PARALLEL_WORKERS),
                 num_api_workers=args.api_workers,
-                batch_size=args.batch_size
+                batch_size=args.batch_size,
+                prep_backend=args.prep_backend,
+                crop_photos=args.recortar_fotos
             )
         else:
             # Modo serial: processamento tradicional sequencial
@@ -2459,7 +2712,8 @@ Documentos DESCONHECIDO:
                 input_path=input_path,
                 output_path=output_path,
                 mock_mode=args.mock,
-                limit=args.limit
+                limit=args.limit,
+                crop_photos=args.recortar_fotos
             )
 
         # Retorna código de saída baseado em erros
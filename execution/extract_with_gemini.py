@@ -22,18 +22,26 @@ Versao: 2.0 - Migrado para google.genai SDK
 """
 
 import argparse
+import asyncio
 import base64
+import functools
+import io
 import json
 import logging
+import math
 import os
 import re
 import sys
+import tempfile
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, FrozenSet, List, Optional, Any, Callable, Set, Tuple, Union
 
 # Adiciona o diretorio raiz ao path para imports
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -44,13 +52,40 @@ try:
     from dotenv import load_dotenv
     from google import genai
     from google.genai import types
-    from PIL import Image
-    import fitz  # PyMuPDF
+    from PIL import Image, ImageOps
 except ImportError as e:
     print(f"Erro: Biblioteca nao encontrada - {e}")
-    print("Instale as dependencias: pip install python-dotenv google-genai Pillow PyMuPDF")
+    print("Instale as dependencias: pip install -r execution/requirements.txt")
     sys.exit(1)
 
+# PyMuPDF e NumPy sao obrigatorios (image_utils os importa no topo): sem fallback
+import fitz  # PyMuPDF
+
+from execution.api_usage import FINISH_MAX_TOKENS, CallUsage, usage_report
+from execution.image_utils import (
+    clean_document_photo, crop_card_region, detect_card_regions, extract_embedded_page_image,
+    is_blank_page, pixmap_image, DEFAULT_BLANK_INK_RATIO
+)
+from execution.matricula_pruning import (
+    PagePruning, format_page_ranges, ocr_page_texts, plan_document_pruning, select_page_texts, skipped_page_set
+)
+from execution.matricula_windows import merge_window_data, merge_window_texts, plan_page_windows
+from execution.output_budgets import BUDGET_SOURCE_DEFAULT, DEFAULT_MAX_OUTPUT_TOKENS, output_budget, size_class
+from execution.page_cache import DEFAULT_CACHE_MB, configure_page_cache, file_digest, get_page_cache, page_key
+from execution.preflight import preflight_rejection
+from execution.response_schemas import JSON_ONLY_PROMPT, build_response_schema, parse_json_response
+from execution.response_stream import STREAM_DATA_FIRST_PROMPT, StreamingResponse
+from execution.memory_budget import (
+    DEFAULT_MEMORY_BUDGET_MB, DEFAULT_SPILL_TO_DISK, ENCODE_MEMORY_FACTOR,
+    configure_memory_budget, decoded_image_bytes, get_memory_budget
+)
+from execution.prep_pool import (
+    SharedBytes, from_shared_bytes, get_shared_process_pool, split_ranges, to_shared_bytes
+)
+from execution.render_profiles import (
+    COLOR_GRAY, DEFAULT_PROFILES, FASE_EXTRACAO, RenderProfile, encode_for_profile, get_render_profile
+)
+
 # Bibliotecas opcionais para conversao DOCX
 DOCX_SUPPORT_AVAILABLE = False
 DOCX_CONVERSION_METHOD = None
@@ -93,6 +128,7 @@ logger = logging.getLogger(__name__)
 # Constantes
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")  # Modelo Gemini configurado via .env
 GEMINI_MODEL_FALLBACK = os.getenv("GEMINI_MODEL_FALLBACK", "gemini-2.5-flash")  # Fallback configurado via .env
+EXTRACTION_MODELS = [GEMINI_MODEL, GEMINI_MODEL_FALLBACK, "gemini-2.0-flash"]  # Ordem de fallback
 PROMPTS_DIR = ROOT_DIR / 'execution' / 'prompts'
 TMP_DIR = ROOT_DIR / '.tmp'
 RATE_LIMIT_DELAY = 4  # Segundos entre requisicoes (15 RPM = 4s)
@@ -107,6 +143,100 @@ DEFAULT_WORKERS = 5  # Numero padrao de workers
 DEFAULT_RPM_FREE = 15  # Rate limit para tier gratuito
 DEFAULT_RPM_PAID = 150  # Rate limit para tier pago
 
+# Motor assincrono (--async)
+DEFAULT_MAX_IN_FLIGHT = int(os.getenv("GEMINI_EM_VOO", 16))  # Requests simultaneos na API
+ASYNC_PREP_WORKERS = int(os.getenv("ASYNC_PREP_WORKERS", 4))  # Threads de carga/renderizacao
+
+# Modos de envio de PDFs ao Gemini
+PDF_MODE_PAGES = 'paginas'  # Cada pagina como uma imagem separada, em ordem, no mesmo request
+PDF_MODE_CONCAT = 'concatenado'  # Todas as paginas empilhadas em uma unica imagem (modo legado)
+PDF_MODE_NATIVE = 'nativo'  # Bytes originais do PDF enviados como application/pdf, sem rasterizar
+PDF_MODES = (PDF_MODE_PAGES, PDF_MODE_CONCAT, PDF_MODE_NATIVE)
+DEFAULT_PDF_MODE = os.getenv("PDF_MODE", PDF_MODE_PAGES)
+# Tipos de documento cujos PDFs sao enviados no modo nativo (ex: "CNDT,ITBI,VVR")
+DEFAULT_PDF_NATIVE_TYPES = {
+    t.strip().upper() for t in os.getenv("PDF_NATIVO_TIPOS", "").split(",") if t.strip()
+}
+MAX_INLINE_PDF_BYTES = 20 * 1024 * 1024  # Limite de payload inline da API Gemini
+
+# Camada de texto: tipos tipicamente nato-digitais que podem ir como texto puro
+TEXT_LAYER_TYPES = {'CNDT', 'ITBI', 'CND_MUNICIPAL', 'VVR', 'PROTOCOLO_ONR'}
+TEXT_LAYER_MODE = 'camada_texto'
+TEXT_LAYER_MIN_CHARS_PER_PAGE = 200  # Abaixo disso a pagina e considerada escaneada
+TEXT_LAYER_MIN_CHARS_SCANNED_PAGE = 800  # Paginas dominadas por imagem (scan + carimbo digital)
+TEXT_LAYER_SCANNED_IMAGE_COVERAGE = 0.5  # Fracao da pagina coberta por uma unica imagem
+TEXT_LAYER_MIN_PRINTABLE_RATIO = 0.9  # Texto com muito lixo indica fonte sem mapeamento Unicode
+
+# Orcamentos de bytes das imagens enviadas (ver execution/image_utils.py).
+# Zoom, cor, paginas e orcamento por pagina vem de execution/render_profiles.py
+SINGLE_IMAGE_MAX_BYTES = 8_000_000  # Imagem unica (PDF concatenado ou DOCX renderizado)
+PHOTO_IMAGE_MAX_BYTES = 1_500_000  # Foto de documento apos recorte/correcao
+
+# Recorte e correcao de inclinacao de fotos de celular (ver image_utils.clean_document_photo)
+PHOTO_CLEANUP_MODE = 'foto_tratada'
+DEFAULT_CROP_PHOTOS = os.getenv("RECORTAR_FOTOS", "").lower() in ('1', 'true', 'sim')
+
+# Recorte dos cartoes de RG/CNH (perfis com card_short_edge, ver render_profiles.py)
+CARD_CROP_MODE = 'recorte_cartao'
+CARD_RENDER_ZOOM = 3.0  # ~216 DPI em paginas renderizadas: cartao pequeno em A4 ainda rende recorte nitido
+DEFAULT_CROP_CARDS = os.getenv("RECORTAR_CARTOES", "1").lower() in ('1', 'true', 'sim')
+
+# Renderizacao paralela de PDFs longos (faixas de paginas em processos separados)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", os.cpu_count() or 1))
+PARALLEL_RENDER_MIN_PAGES = 8  # Abaixo disso o custo de despachar para processos nao compensa
+
+# Orcamento de memoria das imagens decodificadas, compartilhado pelos workers (ver memory_budget.py)
+CONCAT_PAGE_COPIES = 2  # Modo concatenado: samples crus + imagem PIL de cada pagina ate a colagem
+SPILL_CHUNK_PAGES = 8  # Paginas renderizadas por vez quando as paginas vao para o disco (spill)
+
+# Paginas em branco (versos, folhas separadoras): descartadas antes do envio
+BLANK_PAGE_INK_RATIO = float(os.getenv("BLANK_PAGE_INK_RATIO", DEFAULT_BLANK_INK_RATIO))
+
+# Matriculas longas: extracao em janelas de paginas sobrepostas (ver matricula_windows.py)
+WINDOWED_TYPES = {'MATRICULA_IMOVEL'}
+WINDOWED_MODE = 'janelas'
+MATRICULA_WINDOW_PAGES = int(os.getenv("JANELA_MATRICULA_PAGINAS", 15))  # 0 = desativado
+MATRICULA_WINDOW_OVERLAP = 2  # Paginas repetidas entre janelas vizinhas (atos na quebra de pagina)
+MATRICULA_WINDOW_PROMPT = """
+
+## EXTRACAO EM JANELAS
+Este envio contem apenas as paginas {inicio} a {fim} de um documento de {total} paginas.
+As demais paginas sao extraidas em outros envios e os resultados serao combinados.
+- Extraia SOMENTE o que estiver visivel nestas paginas; use null ou lista vazia para o resto
+- Mantenha a numeracao original dos atos (R-X/AV-X com o numero da matricula)
+- Se uma averbacao destas paginas cancelar um onus registrado antes, inclua o onus em
+  onus_historicos com o registro original, mesmo sem ver o registro
+- proprietarios_atuais: quem e proprietario apos o ultimo ato visivel nestas paginas
+"""
+
+# Matriculas: poda de paginas de atos superados pelo conteudo (ver matricula_pruning.py)
+PRUNED_TYPES = {'MATRICULA_IMOVEL'}
+DEFAULT_PRUNE_MATRICULAS = os.getenv("PODAR_MATRICULA", "").lower() in ('1', 'true', 'sim')
+MATRICULA_PRUNED_PROMPT = """
+
+## PAGINAS OMITIDAS
+Este documento tem {total} paginas, mas foram enviadas apenas as paginas {mantidas}:
+abertura da matricula, atos a partir da ultima transmissao, onus possivelmente vigentes
+e paginas finais. As paginas {removidas} trazem atos anteriores ja superados.
+- Nao conclua que um ato nao existe por nao estar nas paginas enviadas
+- Se um onus citado nas paginas enviadas tiver sido registrado em pagina omitida,
+  mantenha a referencia ao registro original (R-X/AV-X)
+"""
+
+# Saida estruturada: so os dados_catalogados, em JSON validado por schema (ver response_schemas.py)
+RESPONSE_MODE_SECTIONS = 'secoes'  # Reescrita + explicacao + bloco JSON (parse_gemini_response)
+RESPONSE_MODE_JSON = 'json'  # response_mime_type application/json + response_schema
+DEFAULT_JSON_OUTPUT = os.getenv("SAIDA_JSON", "").lower() in ('1', 'true', 'sim')
+
+# Streaming: dados_catalogados gravados assim que o bloco JSON fecha (ver response_stream.py)
+DEFAULT_STREAM = os.getenv("STREAMING", "").lower() in ('1', 'true', 'sim')
+DEFAULT_STOP_ON_DATA = os.getenv("PARAR_NOS_DADOS", "").lower() in ('1', 'true', 'sim')
+PARTIAL_DIR_NAME = 'parcial'  # Subpasta da saida com os dados parciais (fora do glob do map_to_fields)
+
+# Teto de tokens de saida por tipo/modo/classe de tamanho, aprendido do historico (ver output_budgets.py)
+DEFAULT_OUTPUT_BUDGETS = os.getenv("ORCAMENTO_SAIDA", "1").lower() in ('1', 'true', 'sim')
+TEXT_CHARS_PER_PAGE = 3000  # Paginas estimadas de documentos enviados como texto sem contagem de paginas
+
 # Semaforo global para rate limiting (inicializado em run_extraction_parallel)
 _rate_limit_semaphore: Optional[threading.Semaphore] = None
 _rate_limit_lock = threading.Lock()  # Lock para operacoes thread-safe
@@ -136,6 +266,89 @@ class ParseError(GeminiExtractionError):
     pass
 
 
+# =============================================================================
+# ESTRUTURAS DE DADOS
+# =============================================================================
+
+@dataclass
+class DocumentPayload:
+    """
+    Conteudo de um documento pronto para envio ao Gemini.
+
+    Apenas um dos campos de conteudo e preenchido:
+    - content: arquivo unico (imagem original, JPEG concatenado ou texto)
+    - pages: lista ordenada de (bytes, mime_type), uma entrada por pagina
+    """
+    mime_type: Optional[str] = None
+    content: Optional[bytes] = None
+    pages: List[Tuple[bytes, str]] = field(default_factory=list)
+    modo: str = 'arquivo'
+    metadados: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def size_bytes(self) -> int:
+        """Retorna o tamanho total do payload em bytes."""
+        if self.pages:
+            return sum(len(data) for data, _ in self.pages)
+        return len(self.content) if self.content else 0
+
+
+@dataclass
+class ExtractionRequest:
+    """Request de extracao pronto para o Gemini (prepare_extraction_request)."""
+    prompt: str
+    payload: DocumentPayload
+    ocr_text: Optional[str] = None
+    response_schema: Optional[Dict[str, Any]] = None  # Modo JSON: schema dos dados_catalogados
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS  # Orcamento de saida do request
+
+
+@dataclass
+class ExtractionOptions:
+    """
+    Opcoes de carregamento e envio de documentos ao Gemini.
+
+    Repassadas de main() ate process_document() nos modos serial e paralelo.
+    """
+    pdf_mode: str = DEFAULT_PDF_MODE  # Modo padrao de envio de PDFs
+    pdf_native_types: Set[str] = field(default_factory=lambda: set(DEFAULT_PDF_NATIVE_TYPES))
+    use_text_layer: bool = True  # Envia como texto PDFs nato-digitais de TEXT_LAYER_TYPES
+    render_workers: int = RENDER_WORKERS  # Processos para renderizar PDFs longos
+    blank_ink_ratio: Optional[float] = BLANK_PAGE_INK_RATIO  # None mantem paginas em branco
+    crop_photos: bool = DEFAULT_CROP_PHOTOS  # Recorta/endireita fotos antes do envio
+    crop_cards: bool = DEFAULT_CROP_CARDS  # Envia so os cartoes de RG/CNH (perfis com card_short_edge)
+    window_pages: int = MATRICULA_WINDOW_PAGES  # Paginas por janela em matriculas longas (0 = desativado)
+    prune_matriculas: bool = DEFAULT_PRUNE_MATRICULAS  # Envia so as paginas vigentes de matriculas
+    json_output: bool = DEFAULT_JSON_OUTPUT  # Pede so os dados_catalogados, em JSON com schema
+    stream: bool = DEFAULT_STREAM  # Recebe a resposta em streaming (generate_content_stream)
+    stop_on_data: bool = DEFAULT_STOP_ON_DATA  # Streaming: interrompe a resposta quando os dados chegam
+    output_budgets: bool = DEFAULT_OUTPUT_BUDGETS  # Usa os orcamentos de saida de orcamentos_saida.json
+
+    def render_profile_for(self, tipo_documento: str) -> RenderProfile:
+        """Retorna o perfil de renderizacao de extracao para um tipo de documento."""
+        return get_render_profile(tipo_documento, FASE_EXTRACAO)
+
+    def pdf_mode_for(self, tipo_documento: str) -> str:
+        """Retorna o modo de envio de PDF para um tipo de documento."""
+        if (tipo_documento or '').upper() in self.pdf_native_types:
+            return PDF_MODE_NATIVE
+        return self.pdf_mode
+
+    def try_text_layer_for(self, tipo_documento: str) -> bool:
+        """Indica se a camada de texto do PDF deve ser testada para o tipo."""
+        return self.use_text_layer and (tipo_documento or '').upper() in TEXT_LAYER_TYPES
+
+    def window_pages_for(self, tipo_documento: str) -> int:
+        """Retorna as paginas por janela para o tipo (0 = enviar o documento inteiro)."""
+        if (tipo_documento or '').upper() not in WINDOWED_TYPES or self.window_pages <= 0:
+            return 0
+        return min(self.window_pages, self.render_profile_for(tipo_documento).max_pages)
+
+    def prune_for(self, tipo_documento: str) -> bool:
+        """Indica se as paginas superadas do documento devem ser podadas antes do envio."""
+        return self.prune_matriculas and (tipo_documento or '').upper() in PRUNED_TYPES
+
+
 # =============================================================================
 # FUNCOES DE CONFIGURACAO
 # =============================================================================
@@ -301,8 +514,8 @@ def extract_first_page_from_pdf(pdf_path: Path) -> Optional[Image.Image]:
         # Pega a primeira pagina
         page = doc[0]
 
-        # Renderiza em alta resolucao (300 DPI)
-        zoom = 2.0
+        # Renderiza com o zoom do perfil padrao de extracao
+        zoom = DEFAULT_PROFILES[FASE_EXTRACAO].zoom_for(1)
         mat = fitz.Matrix(zoom, zoom)
         pix = page.get_pixmap(matrix=mat)
 
@@ -317,7 +530,421 @@ def extract_first_page_from_pdf(pdf_path: Path) -> Optional[Image.Image]:
         return None
 
 
-def extract_all_pages_from_pdf(pdf_path: Path, max_pages: int = 50) -> Optional[Image.Image]:
+def _render_page_range(
+    pdf_path: str,
+    start: int,
+    end: int,
+    zoom: float,
+    profile: RenderProfile,
+    encode: bool = False,
+    blank_ink_ratio: Optional[float] = None,
+    digest: Optional[str] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> List[Optional[Tuple[Any, ...]]]:
+    """
+    Renderiza as paginas [start, end) de um PDF (executado no pool de processos).
+
+    Cada chamada abre seu proprio documento fitz - objetos fitz nao podem ser
+    compartilhados entre processos. Retorna apenas tipos picklaveis; no pool,
+    os bytes grandes voltam por memoria compartilhada (SharedBytes, ver
+    _restore_shared_page).
+
+    No modo JPEG, paginas escaneadas que sao apenas uma imagem embutida sao
+    encaminhadas com o stream original (extract_embedded_page_image), sem
+    decodificar nem recodificar.
+
+    Com digest, paginas codificadas sao lidas do/gravadas no cache de paginas
+    em disco (page_cache.py); um acerto pula a pagina inteira, inclusive a
+    verificacao de pagina em branco.
+
+    Args:
+        pdf_path: Caminho do PDF (str, para pickle)
+        start: Primeira pagina (inclusiva, base 0)
+        end: Ultima pagina (exclusiva)
+        zoom: Fator de zoom da renderizacao
+        profile: Perfil de renderizacao (modo de cor e configuracoes do encoder)
+        encode: Se True, codifica cada pagina dentro de profile.max_bytes (JPEG,
+                ou PNG/WebP de 1 bit em paginas monocromaticas, ver
+                encode_for_profile) e retorna (bytes, mime_type); se False, retorna pixels crus
+                como (modo, largura, altura, samples)
+        blank_ink_ratio: Se informado, paginas com cobertura de tinta abaixo
+                         desse valor nao sao renderizadas (entrada None)
+        digest: Hash do PDF (file_digest) para usar o cache de paginas; so
+                vale com encode=True
+        skip_pages: Paginas (base 0) que nao sao renderizadas (entrada None),
+                    ex: paginas podadas de matriculas
+
+    Returns:
+        Lista na ordem das paginas (None nas paginas em branco descartadas e nas puladas)
+    """
+    mat = fitz.Matrix(zoom, zoom)
+    colorspace = fitz.csGRAY if profile.render_mode == COLOR_GRAY else fitz.csRGB
+    cache = get_page_cache() if encode and digest else None
+    rendered: List[Tuple[Any, ...]] = []
+
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, end):
+            if page_num in skip_pages:
+                rendered.append(None)
+                continue
+
+            # O limite de tinta entra na chave: um acerto ja e uma pagina nao-branca
+            key = page_key(digest, page_num, profile, zoom, blank_ink_ratio) if cache else None
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                rendered.append((to_shared_bytes(cached[0]), cached[1]))
+                continue
+
+            if blank_ink_ratio is not None and is_blank_page(doc[page_num], blank_ink_ratio):
+                rendered.append(None)
+                continue
+
+            if encode:
+                embedded = extract_embedded_page_image(doc[page_num], profile.max_bytes)
+                if embedded is not None:
+                    rendered.append((to_shared_bytes(embedded[0]), embedded[1]))
+                    if cache:
+                        cache.put(key, *embedded)
+                    continue
+
+            pix = doc[page_num].get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+            if not encode:
+                # Pixels crus precisam ser bytes para voltar do pool de processos
+                # (copiados direto do buffer do Pixmap)
+                rendered.append((profile.render_mode, pix.width, pix.height, to_shared_bytes(pix.samples_mv)))
+            else:
+                # Codifica direto do buffer do Pixmap, sem copia intermediaria
+                with pixmap_image(pix) as img:
+                    encoded = encode_for_profile(img, profile)
+                rendered.append((to_shared_bytes(encoded.data), encoded.mime_type))
+                if cache:
+                    cache.put(key, encoded.data, encoded.mime_type)
+            pix = None
+
+    return rendered
+
+
+def _restore_shared_page(page_data: Optional[Tuple[Any, ...]]) -> Optional[Tuple[Any, ...]]:
+    """Traz de volta da memoria compartilhada os bytes de uma pagina vinda do pool."""
+    if page_data is None:
+        return None
+    return tuple(from_shared_bytes(value) if isinstance(value, SharedBytes) else value for value in page_data)
+
+
+def render_pdf_pages(
+    pdf_path: Path,
+    num_pages: int,
+    profile: RenderProfile,
+    encode: bool = False,
+    workers: int = RENDER_WORKERS,
+    blank_ink_ratio: Optional[float] = None,
+    first_page: int = 0,
+    zoom: Optional[float] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> List[Optional[Tuple[Any, ...]]]:
+    """
+    Renderiza num_pages paginas de um PDF a partir de first_page, em paralelo se compensar.
+
+    PDFs longos (>= PARALLEL_RENDER_MIN_PAGES) sao divididos em faixas
+    contiguas, renderizadas concorrentemente no pool de processos compartilhado
+    e remontadas em ordem. Documentos curtos sao renderizados no proprio
+    processo.
+
+    Com blank_ink_ratio, paginas em branco viram None, assim como as de
+    skip_pages. Manter uma pagina quando todas sao em branco fica a cargo do
+    chamador (_render_blank_fallback), uma vez por documento - e nao a cada
+    parte renderizada.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        num_pages: Numero de paginas a renderizar (a partir de first_page)
+        profile: Perfil de renderizacao (zoom, cor, encoder)
+        encode: Codifica as paginas em JPEG (False = pixels crus, ver _render_page_range)
+        workers: Numero maximo de faixas/processos
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco (None = desativado)
+        first_page: Primeira pagina a renderizar (base 0)
+        zoom: Fator de zoom (padrao: profile.zoom_for(num_pages)); informado
+              quando o documento e renderizado em partes
+        skip_pages: Paginas (base 0) que nao sao renderizadas
+
+    Returns:
+        Lista na ordem das paginas, no formato de _render_page_range
+    """
+    zoom = zoom or profile.zoom_for(num_pages)
+    last_page = first_page + num_pages
+    # Paginas codificadas passam pelo cache em disco (os processos do pool leem o mesmo diretorio)
+    digest = file_digest(pdf_path) if encode and get_page_cache().enabled else None
+
+    if workers <= 1 or num_pages < PARALLEL_RENDER_MIN_PAGES:
+        rendered = _render_page_range(
+            str(pdf_path), first_page, last_page, zoom, profile, encode, blank_ink_ratio, digest, skip_pages
+        )
+    else:
+        ranges = [
+            (first_page + start, first_page + end)
+            for start, end in split_ranges(num_pages, workers)
+        ]
+        logger.debug(f"Renderizando {num_pages} paginas em {len(ranges)} faixas paralelas: {pdf_path.name}")
+
+        pool = get_shared_process_pool(workers)
+        futures = [
+            pool.submit(
+                _render_page_range, str(pdf_path), start, end, zoom, profile, encode,
+                blank_ink_ratio, digest, skip_pages
+            )
+            for start, end in ranges
+        ]
+
+        rendered = []
+        for future in futures:
+            rendered.extend(_restore_shared_page(page_data) for page_data in future.result())
+
+    return rendered
+
+
+def _render_blank_fallback(
+    pdf_path: Path,
+    page_num: int,
+    profile: RenderProfile,
+    zoom: float,
+    encode: bool = False
+) -> Tuple[Any, ...]:
+    """
+    Renderiza, sem o filtro de paginas em branco, a pagina mantida quando todas parecem em branco.
+
+    Chamado uma vez por documento pelos carregadores, depois de renderizadas
+    todas as partes, para nunca enviar um documento vazio.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        page_num: Primeira pagina descartada como em branco (base 0)
+        profile: Perfil de renderizacao
+        zoom: Fator de zoom usado nas demais paginas
+        encode: Mesmo formato das demais paginas (ver _render_page_range)
+
+    Returns:
+        Pagina no formato de _render_page_range
+    """
+    logger.warning(f"Todas as paginas parecem em branco, mantendo a pagina {page_num + 1}: {pdf_path.name}")
+    return _render_page_range(str(pdf_path), page_num, page_num + 1, zoom, profile, encode)[0]
+
+
+def _clamp_page_range(page_range: Optional[Tuple[int, int]], num_pages: int) -> Tuple[int, int]:
+    """Limita uma faixa (inicio, fim) de paginas ao documento; None = documento inteiro."""
+    if page_range is None:
+        return 0, num_pages
+    start, end = page_range
+    start = max(0, min(start, num_pages - 1))
+    return start, max(start + 1, min(end, num_pages))
+
+
+def _limit_page_span(
+    first_page: int,
+    last_page: int,
+    max_pages: int,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Tuple[int, int]:
+    """
+    Limita a faixa [first_page, last_page) a max_pages paginas nao puladas.
+
+    Returns:
+        Tuple (fim da faixa a renderizar, paginas que serao renderizadas)
+    """
+    kept = [page for page in range(first_page, last_page) if page not in skip_pages]
+    if len(kept) > max_pages:
+        return kept[max_pages - 1] + 1, max_pages
+    return last_page, len(kept)
+
+
+def _render_concurrency(num_pages: int, workers: int) -> int:
+    """Paginas renderizadas ao mesmo tempo por render_pdf_pages (uma por faixa paralela)."""
+    if workers <= 1 or num_pages < PARALLEL_RENDER_MIN_PAGES:
+        return 1
+    return len(split_ranges(num_pages, workers))
+
+
+def _decoded_page_bytes(
+    doc: Any,
+    first_page: int,
+    num_pages: int,
+    zoom: float,
+    mode: str,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> List[int]:
+    """
+    Estima a memoria de cada pagina renderizada, sem renderizar.
+
+    Args:
+        doc: Documento fitz aberto
+        first_page: Primeira pagina (base 0)
+        num_pages: Numero de paginas
+        zoom: Fator de zoom da renderizacao
+        mode: Modo PIL das paginas ('RGB' ou 'L')
+        skip_pages: Paginas que nao serao renderizadas (contam 0 bytes)
+
+    Returns:
+        Bytes decodificados de cada pagina, na ordem
+    """
+    return [
+        0 if page_num in skip_pages
+        else decoded_image_bytes(doc[page_num].rect.width * zoom, doc[page_num].rect.height * zoom, mode)
+        for page_num in range(first_page, first_page + num_pages)
+    ]
+
+
+def estimate_pdf_render_bytes(
+    pdf_path: Path,
+    profile: RenderProfile,
+    page_range: Optional[Tuple[int, int]] = None,
+    max_pages: Optional[int] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> List[int]:
+    """
+    Estima a memoria de cada pagina de um PDF renderizada com o perfil.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        profile: Perfil de renderizacao (zoom e modo de cor)
+        page_range: Faixa (inicio, fim) de paginas (padrao: documento inteiro)
+        max_pages: Numero maximo de paginas (padrao: profile.max_pages)
+        skip_pages: Paginas que nao serao renderizadas (contam 0 bytes)
+
+    Returns:
+        Bytes decodificados de cada pagina (lista vazia se o arquivo nao abrir)
+    """
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            if len(doc) == 0:
+                return []
+            first_page, last_page = _clamp_page_range(page_range, len(doc))
+            span_end, num_pages = _limit_page_span(
+                first_page, last_page, max_pages or profile.max_pages, skip_pages
+            )
+            return _decoded_page_bytes(
+                doc, first_page, span_end - first_page, profile.zoom_for(num_pages),
+                profile.render_mode, skip_pages
+            )
+    except Exception as e:
+        logger.warning(f"Nao foi possivel estimar a memoria de {pdf_path}: {e}")
+        return []
+
+
+def concat_memory_plan(page_bytes: List[int]) -> Tuple[Optional[Path], int, int]:
+    """
+    Planeja a memoria do modo concatenado a partir do tamanho de cada pagina.
+
+    A reserva cobre as paginas em memoria (samples + imagem PIL), a imagem
+    final e as copias feitas ao codifica-la. Com spill em disco, so
+    SPILL_CHUNK_PAGES paginas ficam em memoria por vez.
+
+    Args:
+        page_bytes: Bytes decodificados de cada pagina (estimate_pdf_render_bytes)
+
+    Returns:
+        Tuple (diretorio de spill ou None, paginas renderizadas por vez, bytes a reservar)
+    """
+    total = sum(page_bytes)
+    spill_dir = get_memory_budget().spill_dir_for(total)
+    chunk_pages = SPILL_CHUNK_PAGES if spill_dir else max(1, len(page_bytes))
+    in_flight = max(
+        (sum(page_bytes[idx:idx + chunk_pages]) for idx in range(0, len(page_bytes), chunk_pages)),
+        default=0
+    )
+    return spill_dir, chunk_pages, in_flight * CONCAT_PAGE_COPIES + total * ENCODE_MEMORY_FACTOR
+
+
+def count_pdf_pages(pdf_path: Path) -> int:
+    """
+    Conta as paginas de um PDF sem renderizar.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+
+    Returns:
+        Numero de paginas (0 se o arquivo nao abrir)
+    """
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            return len(doc)
+    except Exception as e:
+        logger.warning(f"Nao foi possivel contar as paginas de {pdf_path}: {e}")
+        return 0
+
+
+def blank_pdf_pages(
+    pdf_path: Path,
+    blank_ink_ratio: Optional[float],
+    skip_pages: FrozenSet[int] = frozenset()
+) -> FrozenSet[int]:
+    """
+    Paginas em branco de um PDF, sem renderizar (mesmo criterio de _render_page_range).
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        blank_ink_ratio: Limite de tinta (None = nenhuma pagina e considerada em branco)
+        skip_pages: Paginas (base 0) que nao sao verificadas
+
+    Returns:
+        Paginas em branco (base 0); vazio se o arquivo nao abrir
+    """
+    if blank_ink_ratio is None:
+        return frozenset()
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            return frozenset(
+                page_num for page_num in range(len(doc))
+                if page_num not in skip_pages and is_blank_page(doc[page_num], blank_ink_ratio)
+            )
+    except Exception as e:
+        logger.warning(f"Nao foi possivel verificar paginas em branco de {pdf_path}: {e}")
+        return frozenset()
+
+
+def slice_pdf_bytes(
+    pdf_path: Path,
+    page_range: Optional[Tuple[int, int]],
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Optional[bytes]:
+    """
+    Gera um PDF com apenas parte das paginas do original (modo nativo em janelas ou podado).
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        page_range: Faixa (inicio, fim) de paginas, base 0 e fim exclusivo
+                    (None = documento inteiro)
+        skip_pages: Paginas (base 0) deixadas de fora
+
+    Returns:
+        Bytes do novo PDF, ou None se falhar
+    """
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            start, end = _clamp_page_range(page_range, len(doc))
+            kept = [page for page in range(start, end) if page not in skip_pages]
+            with fitz.open() as part:
+                # Uma insercao por sequencia de paginas mantidas
+                run_start = None
+                for idx, page in enumerate(kept):
+                    run_start = page if run_start is None else run_start
+                    if idx + 1 == len(kept) or kept[idx + 1] != page + 1:
+                        part.insert_pdf(doc, from_page=run_start, to_page=page)
+                        run_start = None
+                return part.tobytes(garbage=3, deflate=True)
+    except Exception as e:
+        logger.error(f"Erro ao recortar paginas do PDF {pdf_path}: {e}")
+        return None
+
+
+def extract_all_pages_from_pdf(
+    pdf_path: Path,
+    max_pages: Optional[int] = None,
+    render_workers: int = RENDER_WORKERS,
+    blank_ink_ratio: Optional[float] = None,
+    dropped_pages: Optional[List[int]] = None,
+    profile: Optional[RenderProfile] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Optional[Image.Image]:
     """
     Extrai TODAS as paginas de um PDF e concatena em uma unica imagem vertical.
 
@@ -325,87 +952,318 @@ def extract_all_pages_from_pdf(pdf_path: Path, max_pages: int = 50) -> Optional[
     criando uma imagem longa que contem todas as paginas empilhadas verticalmente.
     O Gemini consegue processar imagens grandes, entao essa abordagem e preferida.
 
+    A memoria das paginas e da imagem final e reservada no orcamento global
+    (concat_memory_plan); com spill em disco ativo, documentos grandes sao
+    renderizados em partes e as paginas aguardam a colagem em disco.
+
     Args:
         pdf_path: Caminho para o arquivo PDF
-        max_pages: Numero maximo de paginas a processar (padrao: 50)
+        max_pages: Numero maximo de paginas a processar (padrao: profile.max_pages)
+        render_workers: Processos para renderizar PDFs longos (ver render_pdf_pages)
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco (None = desativado)
+        dropped_pages: Se informada, recebe os numeros (base 1) das paginas descartadas
+        profile: Perfil de renderizacao (padrao: perfil de extracao padrao)
+        page_range: Faixa (inicio, fim) de paginas, base 0 e fim exclusivo
+                    (padrao: documento inteiro)
+        skip_pages: Paginas (base 0) podadas: nao sao renderizadas nem contam
+                    como descartadas
 
     Returns:
         Imagem PIL concatenada verticalmente com todas as paginas, ou None se falhar
     """
+    profile = profile or DEFAULT_PROFILES[FASE_EXTRACAO]
+    max_pages = max_pages or profile.max_pages
+
     try:
-        doc = fitz.open(str(pdf_path))
-        num_pages = len(doc)
+        with fitz.open(str(pdf_path)) as doc:
+            num_pages = len(doc)
 
         if num_pages == 0:
             logger.warning(f"PDF vazio: {pdf_path}")
-            doc.close()
             return None
 
-        # Limita o numero de paginas se necessario
-        pages_to_process = min(num_pages, max_pages)
-        if num_pages > max_pages:
-            logger.warning(f"PDF tem {num_pages} paginas, processando apenas as primeiras {max_pages}")
+        # Limita o numero de paginas se necessario (paginas podadas nao contam)
+        first_page, last_page = _clamp_page_range(page_range, num_pages)
+        span_end, pages_to_process = _limit_page_span(first_page, last_page, max_pages, skip_pages)
+        if span_end < last_page:
+            logger.warning(
+                f"PDF tem mais de {max_pages} paginas a enviar, processando apenas as primeiras {max_pages}"
+            )
 
         logger.info(f"Extraindo {pages_to_process} pagina(s) do PDF: {pdf_path.name}")
 
-        # Lista para armazenar as imagens de cada pagina
-        page_images: List[Image.Image] = []
+        # O zoom vem do perfil (reduzido em documentos longos)
+        zoom = profile.zoom_for(pages_to_process)
+        with fitz.open(str(pdf_path)) as doc:
+            page_bytes = _decoded_page_bytes(
+                doc, first_page, span_end - first_page, zoom, profile.render_mode, skip_pages
+            )
 
-        # Renderiza cada pagina
-        # Usa zoom 2.0 para ~150 DPI (balanco entre qualidade e tamanho)
-        # Para PDFs muito grandes, podemos reduzir o zoom
-        zoom = 2.0 if pages_to_process <= 10 else 1.5
-        mat = fitz.Matrix(zoom, zoom)
+        # Com spill, as paginas vao para o disco enquanto aguardam a colagem e
+        # em memoria fica so a parte sendo renderizada (ver concat_memory_plan)
+        spill_dir, chunk_pages, reserve_bytes = concat_memory_plan(page_bytes)
+
+        with ExitStack() as stack:
+            stack.enter_context(get_memory_budget().reserve(reserve_bytes, pdf_path.name))
+            spill_path = Path(stack.enter_context(tempfile.TemporaryDirectory(dir=spill_dir))) if spill_dir else None
+            if spill_path:
+                logger.info(
+                    f"Paginas gravadas em disco ate a colagem ({sum(page_bytes) / (1024 * 1024):.0f}MB): "
+                    f"{pdf_path.name}"
+                )
 
-        for page_num in range(pages_to_process):
-            page = doc[page_num]
-            pix = page.get_pixmap(matrix=mat)
+            # Lista com a imagem (ou o arquivo em disco) de cada pagina
+            page_images: List[Any] = []
+            page_sizes: List[Tuple[int, int]] = []
+            blank_pages: List[int] = []
+
+            # Renderiza cada pagina (em faixas paralelas para PDFs longos)
+            for chunk_start in range(first_page, span_end, chunk_pages):
+                rendered = render_pdf_pages(
+                    pdf_path, min(chunk_pages, span_end - chunk_start), profile,
+                    workers=render_workers, blank_ink_ratio=blank_ink_ratio,
+                    first_page=chunk_start, zoom=zoom, skip_pages=skip_pages
+                )
+                for page_num, page_data in enumerate(rendered, start=chunk_start):
+                    if page_num in skip_pages:
+                        continue
+                    if page_data is None:
+                        logger.debug(f"  Pagina {page_num + 1}/{num_pages}: em branco, descartada")
+                        blank_pages.append(page_num)
+                        continue
+
+                    mode, width, height, samples = page_data
+                    if spill_path:
+                        page_file = spill_path / f"{page_num:05d}.raw"
+                        page_file.write_bytes(samples)
+                        page_images.append(page_file)
+                    else:
+                        # Converte para PIL Image
+                        page_images.append(Image.frombuffer(mode, (width, height), samples, 'raw', mode, 0, 1))
+                    page_sizes.append((width, height))
+
+                    logger.debug(f"  Pagina {page_num + 1}/{num_pages}: {width}x{height} pixels")
+                rendered = None
+
+            # Todas em branco: mantem a primeira, decidido uma vez para o documento inteiro
+            if not page_images and blank_pages:
+                mode, width, height, samples = _render_blank_fallback(pdf_path, blank_pages.pop(0), profile, zoom)
+                page_images.append(Image.frombuffer(mode, (width, height), samples, 'raw', mode, 0, 1))
+                page_sizes.append((width, height))
+            if dropped_pages is not None:
+                dropped_pages.extend(page_num + 1 for page_num in blank_pages)
+
+            mode = profile.render_mode
+
+            # Se so tem uma pagina, retorna diretamente
+            if len(page_images) == 1:
+                return _load_page_image(page_images[0], mode, page_sizes[0])
+
+            # Concatena todas as paginas verticalmente
+            # Calcula dimensoes da imagem final
+            total_width = max(width for width, _ in page_sizes)
+            total_height = sum(height for _, height in page_sizes)
+
+            # Adiciona uma pequena margem entre as paginas (5 pixels)
+            margin = 5
+            total_height += margin * (len(page_images) - 1)
+
+            logger.info(f"Concatenando {len(page_images)} paginas em imagem {total_width}x{total_height}")
+
+            # Cria imagem final com fundo branco (no modo de cor do perfil)
+            final_image = Image.new(mode, (total_width, total_height), color='white')
+
+            # Cola cada pagina na posicao correta
+            y_offset = 0
+            for page, size in zip(page_images, page_sizes):
+                img = _load_page_image(page, mode, size)
+                # Centraliza horizontalmente se a pagina for menor que a largura maxima
+                x_offset = (total_width - img.width) // 2
+                final_image.paste(img, (x_offset, y_offset))
+                y_offset += img.height + margin
+                # Limpa memoria das imagens individuais
+                img.close()
+
+            return final_image
+
+    except Exception as e:
+        logger.error(f"Erro ao extrair paginas do PDF {pdf_path}: {e}")
+        return None
 
-            # Converte para PIL Image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            page_images.append(img)
 
-            logger.debug(f"  Pagina {page_num + 1}/{pages_to_process}: {pix.width}x{pix.height} pixels")
+def _load_page_image(page: Any, mode: str, size: Tuple[int, int]) -> Image.Image:
+    """Retorna a imagem de uma pagina renderizada, lendo do disco se ela foi para o spill."""
+    if isinstance(page, Path):
+        return Image.frombytes(mode, size, page.read_bytes())
+    return page
 
-        doc.close()
 
-        # Se so tem uma pagina, retorna diretamente
-        if len(page_images) == 1:
-            return page_images[0]
+def extract_pages_from_pdf(
+    pdf_path: Path,
+    max_pages: Optional[int] = None,
+    render_workers: int = RENDER_WORKERS,
+    blank_ink_ratio: Optional[float] = None,
+    dropped_pages: Optional[List[int]] = None,
+    profile: Optional[RenderProfile] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Optional[List[Tuple[bytes, str]]]:
+    """
+    Extrai as paginas de um PDF como imagens JPEG independentes.
+
+    Diferente de extract_all_pages_from_pdf, nenhuma imagem concatenada e
+    criada: cada pagina e renderizada, codificada e liberada antes da proxima,
+    entao o pico de memoria acompanha o tamanho de UMA pagina (por worker) e
+    nao o do documento inteiro. As paginas sao enviadas ao Gemini como uma
+    lista ordenada de Parts no mesmo request.
+
+    PDFs longos sao renderizados em faixas paralelas (render_pdf_pages).
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        max_pages: Numero maximo de paginas a processar (padrao: profile.max_pages)
+        render_workers: Processos para renderizar PDFs longos
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco (None = desativado)
+        dropped_pages: Se informada, recebe os numeros (base 1) das paginas descartadas
+        profile: Perfil de renderizacao - zoom, cor e orcamento de bytes de cada
+                 pagina (padrao: perfil de extracao padrao)
+        page_range: Faixa (inicio, fim) de paginas, base 0 e fim exclusivo
+                    (padrao: documento inteiro)
+        skip_pages: Paginas (base 0) podadas: nao sao renderizadas nem contam
+                    como descartadas
+
+    Returns:
+        Lista de (bytes JPEG, mime_type) na ordem das paginas, ou None se falhar
+    """
+    profile = profile or DEFAULT_PROFILES[FASE_EXTRACAO]
+    max_pages = max_pages or profile.max_pages
 
-        # Concatena todas as paginas verticalmente
-        # Calcula dimensoes da imagem final
-        total_width = max(img.width for img in page_images)
-        total_height = sum(img.height for img in page_images)
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            num_pages = len(doc)
+
+            if num_pages == 0:
+                logger.warning(f"PDF vazio: {pdf_path}")
+                return None
+
+            first_page, last_page = _clamp_page_range(page_range, num_pages)
+            span_end, pages_to_process = _limit_page_span(first_page, last_page, max_pages, skip_pages)
+            page_bytes = _decoded_page_bytes(
+                doc, first_page, span_end - first_page, profile.zoom_for(pages_to_process),
+                profile.render_mode, skip_pages
+            )
 
-        # Adiciona uma pequena margem entre as paginas (5 pixels)
-        margin = 5
-        total_height += margin * (len(page_images) - 1)
+        if span_end < last_page:
+            logger.warning(
+                f"PDF tem mais de {max_pages} paginas a enviar, processando apenas as primeiras {max_pages}"
+            )
 
-        logger.info(f"Concatenando {len(page_images)} paginas em imagem {total_width}x{total_height}")
+        logger.info(f"Extraindo {pages_to_process} pagina(s) do PDF (modo paginas): {pdf_path.name}")
 
-        # Cria imagem final com fundo branco
-        final_image = Image.new('RGB', (total_width, total_height), color=(255, 255, 255))
+        # Reserva a maior pagina (e suas copias no encoder) por faixa em paralelo
+        reserve_bytes = (
+            max(page_bytes) * ENCODE_MEMORY_FACTOR * _render_concurrency(span_end - first_page, render_workers)
+        )
 
-        # Cola cada pagina na posicao correta
-        y_offset = 0
-        for idx, img in enumerate(page_images):
-            # Centraliza horizontalmente se a pagina for menor que a largura maxima
-            x_offset = (total_width - img.width) // 2
-            final_image.paste(img, (x_offset, y_offset))
-            y_offset += img.height + margin
+        # Mesmo perfil do modo concatenado, para comparacao justa entre os modos
+        with get_memory_budget().reserve(reserve_bytes, pdf_path.name):
+            rendered = render_pdf_pages(
+                pdf_path, span_end - first_page, profile, encode=True,
+                workers=render_workers, blank_ink_ratio=blank_ink_ratio, first_page=first_page,
+                zoom=profile.zoom_for(pages_to_process), skip_pages=skip_pages
+            )
 
-        # Limpa memoria das imagens individuais
-        for img in page_images:
-            img.close()
+        pages: List[Tuple[bytes, str]] = []
+        blank_pages: List[int] = []
+        for page_num, page_data in enumerate(rendered, start=first_page):
+            if page_num in skip_pages:
+                continue
+            if page_data is None:
+                logger.debug(f"  Pagina {page_num + 1}/{num_pages}: em branco, descartada")
+                blank_pages.append(page_num)
+                continue
+            pages.append(page_data)
+            logger.debug(f"  Pagina {page_num + 1}/{num_pages}: {len(page_data[0]) / 1024:.0f}KB")
+
+        if not pages and blank_pages:
+            pages.append(_render_blank_fallback(
+                pdf_path, blank_pages.pop(0), profile, profile.zoom_for(pages_to_process), encode=True
+            ))
+        if dropped_pages is not None:
+            dropped_pages.extend(page_num + 1 for page_num in blank_pages)
 
-        return final_image
+        total_mb = sum(len(data) for data, _ in pages) / (1024 * 1024)
+        logger.info(f"PDF convertido em {len(pages)} imagem(ns) de pagina: {total_mb:.2f}MB no total")
+        return pages
 
     except Exception as e:
         logger.error(f"Erro ao extrair paginas do PDF {pdf_path}: {e}")
         return None
 
 
+def extract_text_layer_from_pdf(
+    pdf_path: Path,
+    max_pages: int = 50,
+    min_chars_per_page: int = TEXT_LAYER_MIN_CHARS_PER_PAGE
+) -> Optional[str]:
+    """
+    Extrai a camada de texto embutida de um PDF nato-digital.
+
+    O texto so e considerado utilizavel se TODAS as paginas tiverem texto
+    suficiente e legivel - uma unica pagina escaneada ja invalida o atalho,
+    pois seu conteudo seria perdido no envio como texto. Paginas cobertas por
+    uma imagem grande (scan com carimbo/assinatura digital sobreposto) exigem
+    bem mais texto para serem aceitas.
+
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        max_pages: Numero maximo de paginas (PDFs maiores usam imagem)
+        min_chars_per_page: Minimo de caracteres nao-brancos por pagina
+
+    Returns:
+        Texto com marcadores de pagina, ou None se nao houver camada utilizavel
+    """
+    try:
+        with fitz.open(str(pdf_path)) as pdf_document:
+            num_pages = len(pdf_document)
+            if num_pages == 0 or num_pages > max_pages:
+                return None
+
+            text_parts = []
+            for page_num in range(num_pages):
+                page = pdf_document[page_num]
+                page_text = page.get_text("text", sort=True).strip()
+                content_chars = [c for c in page_text if not c.isspace()]
+
+                page_area = abs(page.rect) or 1.0
+                image_coverage = max(
+                    (abs(fitz.Rect(info['bbox']) & page.rect) / page_area for info in page.get_image_info()),
+                    default=0.0
+                )
+                required_chars = (
+                    TEXT_LAYER_MIN_CHARS_SCANNED_PAGE
+                    if image_coverage >= TEXT_LAYER_SCANNED_IMAGE_COVERAGE
+                    else min_chars_per_page
+                )
+
+                if len(content_chars) < required_chars:
+                    return None
+
+                printable = sum(1 for c in content_chars if c.isprintable() and c != '\ufffd')
+                if printable / len(content_chars) < TEXT_LAYER_MIN_PRINTABLE_RATIO:
+                    return None
+
+                page_text = re.sub(r'[ \t]{2,}', '  ', page_text)
+                text_parts.append(f"[PAGINA {page_num + 1}]\n{page_text}")
+
+        logger.info(f"Camada de texto utilizavel: {pdf_path.name} ({num_pages} paginas)")
+        return "\n\n".join(text_parts)
+
+    except Exception as e:
+        logger.warning(f"Erro ao ler camada de texto do PDF {pdf_path}: {e}")
+        return None
+
+
 def extract_text_from_docx(docx_path: Path) -> Optional[str]:
     """
     Extrai texto de um arquivo DOCX usando python-docx.
@@ -594,7 +1452,15 @@ def convert_docx_to_images(docx_path: Path, max_pages: int = 50) -> Optional[Ima
     return None
 
 
-def load_original_file(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]:
+def load_original_file(
+    file_path: Path,
+    render_workers: int = RENDER_WORKERS,
+    blank_ink_ratio: Optional[float] = None,
+    dropped_pages: Optional[List[int]] = None,
+    profile: Optional[RenderProfile] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Tuple[Optional[bytes], Optional[str]]:
     """
     Carrega arquivo original como bytes e detecta MIME type.
 
@@ -603,11 +1469,19 @@ def load_original_file(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]
 
     Args:
         file_path: Caminho para o arquivo
+        render_workers: Processos para renderizar PDFs longos
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco de PDFs
+        dropped_pages: Se informada, recebe os numeros (base 1) das paginas descartadas
+        profile: Perfil de renderizacao de PDFs (padrao: perfil de extracao padrao)
+        page_range: Faixa (inicio, fim) de paginas de PDFs (padrao: documento inteiro)
+        skip_pages: Paginas (base 0) de PDFs deixadas de fora (poda)
 
     Returns:
         Tuple (bytes/texto do arquivo, MIME type) ou (None, None) se falhar
         Para DOCX: retorna (texto_str.encode('utf-8'), 'text/plain')
     """
+    profile = profile or DEFAULT_PROFILES[FASE_EXTRACAO]
+
     if not file_path.exists():
         logger.error(f"Arquivo nao encontrado: {file_path}")
         return None, None
@@ -653,63 +1527,68 @@ def load_original_file(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]
                 logger.error(f"Falha ao processar DOCX: {file_path}")
                 return None, None
 
-            # Converte imagem para bytes JPEG
-            import io
-            buffer = io.BytesIO()
-
-            total_pixels = img.width * img.height
-            if total_pixels > 50_000_000:
-                quality = 70
-            elif total_pixels > 20_000_000:
-                quality = 80
-            else:
-                quality = 95
-
-            img.save(buffer, format='JPEG', quality=quality)
-            image_bytes = buffer.getvalue()
+            # Converte imagem para bytes dentro do orcamento (JPEG, ou 1 bit se monocromatica)
+            encoded = encode_for_profile(img, profile, SINGLE_IMAGE_MAX_BYTES)
 
-            size_mb = len(image_bytes) / (1024 * 1024)
-            logger.info(f"DOCX convertido para imagem: {img.width}x{img.height} pixels, {size_mb:.2f}MB")
+            size_mb = len(encoded.data) / (1024 * 1024)
+            logger.info(
+                f"DOCX convertido para imagem: {encoded.width}x{encoded.height} pixels, "
+                f"q{encoded.quality}, {size_mb:.2f}MB"
+            )
 
             img.close()
-            return image_bytes, 'image/jpeg'
+            return encoded.data, encoded.mime_type
 
         # Para PDFs, converte TODAS as paginas para imagem concatenada
         if ext == '.pdf':
-            img = extract_all_pages_from_pdf(file_path)
-            if img is None:
-                return None, None
-
-            # Converte imagem para bytes JPEG
-            # Usa qualidade adaptativa baseada no tamanho da imagem
-            import io
-            buffer = io.BytesIO()
-
-            # Calcula qualidade baseada no tamanho total (para evitar imagens muito grandes)
-            # Gemini aceita ate ~20MB, mas queremos manter razoavel
-            total_pixels = img.width * img.height
-            if total_pixels > 50_000_000:  # Mais de 50 megapixels
-                quality = 70
-                logger.info(f"Imagem muito grande ({total_pixels/1_000_000:.1f}MP), usando qualidade {quality}%")
-            elif total_pixels > 20_000_000:  # Mais de 20 megapixels
-                quality = 80
-            else:
-                quality = 95
+            # Uma reserva cobre renderizar, concatenar e codificar (a reserva
+            # interna de extract_all_pages_from_pdf fica coberta por esta)
+            _, _, reserve_bytes = concat_memory_plan(
+                estimate_pdf_render_bytes(file_path, profile, page_range, skip_pages=skip_pages)
+            )
+            with get_memory_budget().reserve(reserve_bytes, file_path.name):
+                img = extract_all_pages_from_pdf(
+                    file_path,
+                    render_workers=render_workers,
+                    blank_ink_ratio=blank_ink_ratio,
+                    dropped_pages=dropped_pages,
+                    profile=profile,
+                    page_range=page_range,
+                    skip_pages=skip_pages
+                )
+                if img is None:
+                    return None, None
 
-            img.save(buffer, format='JPEG', quality=quality)
-            image_bytes = buffer.getvalue()
+                # Converte imagem para bytes dentro do orcamento (JPEG, ou 1 bit se monocromatica)
+                # (qualidade e escala adaptativas; Gemini aceita ate ~20MB inline)
+                encoded = encode_for_profile(img, profile, SINGLE_IMAGE_MAX_BYTES)
+                img.close()
 
-            # Log do tamanho final
-            size_mb = len(image_bytes) / (1024 * 1024)
-            logger.info(f"PDF convertido: {img.width}x{img.height} pixels, {size_mb:.2f}MB")
+            size_mb = len(encoded.data) / (1024 * 1024)
+            logger.info(
+                f"PDF convertido: {encoded.width}x{encoded.height} pixels, "
+                f"q{encoded.quality}, {size_mb:.2f}MB"
+            )
 
-            img.close()
-            return image_bytes, 'image/jpeg'
+            return encoded.data, encoded.mime_type
 
         # Para imagens, le diretamente
         with open(file_path, 'rb') as f:
             content = f.read()
 
+        # Imagens acima do limite inline da API sao recodificadas (preflight: acao 'recodificar')
+        if len(content) > MAX_INLINE_PDF_BYTES:
+            with Image.open(io.BytesIO(content)) as img:
+                with get_memory_budget().reserve(
+                    decoded_image_bytes(img.width, img.height, img.mode) * ENCODE_MEMORY_FACTOR, file_path.name
+                ):
+                    encoded = encode_for_profile(ImageOps.exif_transpose(img), profile, SINGLE_IMAGE_MAX_BYTES)
+            logger.info(
+                f"Imagem acima do limite inline ({len(content) / (1024 * 1024):.1f}MB) recodificada: "
+                f"{encoded.width}x{encoded.height} pixels, {len(encoded.data) / (1024 * 1024):.2f}MB"
+            )
+            return encoded.data, encoded.mime_type
+
         return content, mime_type
 
     except Exception as e:
@@ -717,127 +1596,409 @@ def load_original_file(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]
         return None, None
 
 
-def load_ocr_text(ocr_path: str) -> Optional[str]:
+def load_cleaned_photo(file_path: Path, profile: RenderProfile) -> Optional[DocumentPayload]:
     """
-    Carrega texto OCR correspondente.
+    Carrega uma foto de documento recortada, endireitada e recodificada.
 
     Args:
-        ocr_path: Caminho para o arquivo OCR
+        file_path: Caminho para a imagem
+        profile: Perfil de renderizacao (configuracoes do encoder)
 
     Returns:
-        Texto OCR ou None
+        DocumentPayload com a foto tratada, ou None se nada mudou ou se
+        falhar (o chamador recorre ao envio do arquivo original)
     """
+    original_bytes = file_path.stat().st_size
     try:
-        path = Path(ocr_path)
-        if not path.exists():
-            logger.warning(f"Arquivo OCR nao encontrado: {ocr_path}")
-            return None
-
-        content = path.read_text(encoding='utf-8')
-
-        # Remove cabecalho do OCR (linhas antes de ---)
-        if '---' in content:
-            content = content.split('---', 1)[1]
-
-        return content.strip()
-
+        with Image.open(file_path) as img, \
+                get_memory_budget().reserve(decoded_image_bytes(*img.size) * ENCODE_MEMORY_FACTOR, file_path.name):
+            cleanup = clean_document_photo(img)
+            if not cleanup.changed:
+                logger.debug(f"Foto sem recorte/inclinacao, enviando original: {file_path.name}")
+                return None
+            # O upload tratado nunca deve ficar maior que o arquivo original
+            max_bytes = min(PHOTO_IMAGE_MAX_BYTES, original_bytes)
+            encoded = encode_for_profile(cleanup.image, profile, max_bytes)
     except Exception as e:
-        logger.error(f"Erro ao carregar OCR {ocr_path}: {e}")
+        logger.warning(f"Falha ao tratar foto {file_path.name}, enviando original: {e}")
         return None
 
+    logger.info(
+        f"Foto tratada: {file_path.name} {cleanup.original_size[0]}x{cleanup.original_size[1]} -> "
+        f"{encoded.width}x{encoded.height} (recorte={cleanup.cropped}, angulo={cleanup.deskew_angle:+.1f}), "
+        f"{original_bytes / 1024:.0f}KB -> {len(encoded.data) / 1024:.0f}KB"
+    )
 
-# =============================================================================
-# FUNCOES DE CHAMADA AO GEMINI
-# =============================================================================
+    return DocumentPayload(
+        mime_type=encoded.mime_type,
+        content=encoded.data,
+        modo=PHOTO_CLEANUP_MODE,
+        metadados={'tratamento_foto': cleanup.to_metadata()}
+    )
 
-def call_gemini(
-    client: genai.Client,
-    prompt: str,
-    image_bytes: bytes,
-    mime_type: str,
-    ocr_text: Optional[str] = None
-) -> str:
+
+def _encode_card_crops(
+    image: Image.Image,
+    profile: RenderProfile,
+    page_number: int,
+    regions: List[Dict[str, Any]]
+) -> List[Tuple[bytes, str]]:
     """
-    Chama Gemini com imagem usando o novo SDK google.genai.
+    Detecta os cartoes de uma imagem e codifica cada recorte.
 
     Args:
-        client: Cliente Gemini configurado
-        prompt: Prompt do tipo de documento
-        image_bytes: Bytes da imagem
-        mime_type: Tipo MIME da imagem
-        ocr_text: Texto OCR (opcional, para referencia - DEPRECATED)
+        image: Foto ou pagina renderizada
+        profile: Perfil com card_short_edge/card_max_bytes
+        page_number: Numero da pagina (base 1), para os metadados
+        regions: Recebe um resumo de cada recorte codificado
 
     Returns:
-        Texto da resposta do Gemini
+        Lista de (bytes, mime_type), vazia se nenhum cartao for encontrado
     """
-    # Monta o prompt completo (OCR nao e mais usado, mas mantido para compatibilidade)
-    full_prompt = prompt
+    crops = []
+    for box in detect_card_regions(image):
+        crop = crop_card_region(image, box, profile.card_short_edge)
+        encoded = encode_for_profile(crop, profile, profile.card_max_bytes)
+        crop.close()
+        crops.append((encoded.data, encoded.mime_type))
+        regions.append({
+            'pagina': page_number,
+            'caixa': list(box),
+            'tamanho_final': [encoded.width, encoded.height]
+        })
+    return crops
+
+
+def load_card_regions(
+    file_path: Path,
+    profile: RenderProfile,
+    blank_ink_ratio: Optional[float] = None
+) -> Optional[DocumentPayload]:
+    """
+    Carrega apenas os cartoes (frente e verso) de um RG/CNH fotografado ou escaneado.
+
+    Cada pagina (ou a foto) e analisada com detect_card_regions; os cartoes
+    encontrados sao enviados como imagens separadas, com o menor lado
+    reduzido a profile.card_short_edge. Paginas de PDF sem cartao detectado,
+    ou em que os recortes nao ficam menores que o scan embutido da pagina,
+    seguem inteiras - a pagina inteira so e renderizada nesses casos. Paginas
+    em branco descartadas ficam em metadados['paginas_descartadas'].
+
+    Args:
+        file_path: Caminho para o PDF ou imagem
+        profile: Perfil de renderizacao do tipo (card_short_edge definido)
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco de PDFs
+
+    Returns:
+        DocumentPayload com uma imagem por cartao, ou None se nenhum cartao
+        for encontrado ou se falhar (o chamador segue o caminho normal)
+    """
+    is_pdf = file_path.suffix.lower() == SUPPORTED_PDF_EXTENSION
+    regions: List[Dict[str, Any]] = []
+    pages: List[Tuple[bytes, str]] = []
+    dropped_pages: List[int] = []
+    budget = get_memory_budget()
+
+    try:
+        if is_pdf:
+            digest = file_digest(file_path) if get_page_cache().enabled else None
+            with fitz.open(str(file_path)) as doc:
+                num_pages = min(len(doc), profile.max_pages)
+                zoom = profile.zoom_for(num_pages)
+                mat = fitz.Matrix(CARD_RENDER_ZOOM, CARD_RENDER_ZOOM)
+                for page_num in range(num_pages):
+                    if blank_ink_ratio is not None and is_blank_page(doc[page_num], blank_ink_ratio):
+                        dropped_pages.append(page_num + 1)
+                        continue
+
+                    # Scans que sao so uma imagem: detecta na resolucao original do scan
+                    page_regions: List[Dict[str, Any]] = []
+                    embedded = extract_embedded_page_image(doc[page_num])
+                    if embedded is not None:
+                        with Image.open(io.BytesIO(embedded[0])) as img, \
+                                budget.reserve(decoded_image_bytes(*img.size) * ENCODE_MEMORY_FACTOR, file_path.name):
+                            crops = _encode_card_crops(img.convert('RGB'), profile, page_num + 1, page_regions)
+                    else:
+                        rect = doc[page_num].rect
+                        page_bytes = decoded_image_bytes(rect.width * CARD_RENDER_ZOOM, rect.height * CARD_RENDER_ZOOM)
+                        with budget.reserve(page_bytes * ENCODE_MEMORY_FACTOR, file_path.name):
+                            pix = doc[page_num].get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False)
+                            with pixmap_image(pix) as img:
+                                crops = _encode_card_crops(img, profile, page_num + 1, page_regions)
+                            pix = None
+
+                    # Recortes de um scan embutido so valem se menores que o proprio scan
+                    crops_bytes = sum(len(data) for data, _ in crops)
+                    if crops and (embedded is None or crops_bytes < len(embedded[0])):
+                        pages.extend(crops)
+                        regions.extend(page_regions)
+                        continue
+
+                    # Pagina inteira, como no modo paginas (JPEG embutido encaminhado sem recodificar)
+                    pages.append(_render_page_range(
+                        str(file_path), page_num, page_num + 1, zoom, profile, encode=True, digest=digest
+                    )[0])
+        else:
+            with Image.open(file_path) as original, \
+                    budget.reserve(decoded_image_bytes(*original.size) * ENCODE_MEMORY_FACTOR, file_path.name):
+                img = ImageOps.exif_transpose(original).convert('RGB')
+                pages = _encode_card_crops(img, profile, 1, regions)
+                img.close()
+            # O upload recortado nunca deve ficar maior que o arquivo original
+            if sum(len(data) for data, _ in pages) >= file_path.stat().st_size:
+                regions = []
+    except Exception as e:
+        logger.warning(f"Falha ao recortar cartoes de {file_path.name}, enviando documento inteiro: {e}")
+        return None
+
+    if not regions:
+        logger.debug(f"Nenhum cartao recortado, enviando documento inteiro: {file_path.name}")
+        return None
 
-    # Prepara a imagem no formato do novo SDK
-    image_part = types.Part.from_bytes(
-        data=image_bytes,
-        mime_type=mime_type
+    logger.info(
+        f"Cartoes recortados: {file_path.name} -> {len(regions)} recorte(s), "
+        f"{sum(len(data) for data, _ in pages) / 1024:.0f}KB"
     )
 
-    # Configura geracao com temperatura baixa para extracao precisa
-    config = types.GenerateContentConfig(
-        temperature=0.1,
-        max_output_tokens=16384
+    metadados = {
+        'paginas_enviadas': len(pages),
+        'formatos_paginas': dict(Counter(page_mime for _, page_mime in pages)),
+        'recortes_cartao': regions
+    }
+    if dropped_pages:
+        logger.info(f"Paginas em branco descartadas de {file_path.name}: {dropped_pages}")
+        metadados['paginas_descartadas'] = dropped_pages
+
+    return DocumentPayload(
+        mime_type='image/jpeg',
+        pages=pages,
+        modo=CARD_CROP_MODE,
+        metadados=metadados
     )
 
-    # Envia para o Gemini usando o novo SDK
-    # Tenta usar gemini-3-flash-preview com fallbacks
-    model_names = [GEMINI_MODEL, GEMINI_MODEL_FALLBACK, "gemini-2.0-flash"]
 
-    last_error = None
-    for model_name in model_names:
-        try:
-            response = client.models.generate_content(
-                model=model_name,
-                contents=[image_part, full_prompt],
-                config=config
+def load_document(
+    file_path: Path,
+    pdf_mode: str = DEFAULT_PDF_MODE,
+    try_text_layer: bool = False,
+    render_workers: int = RENDER_WORKERS,
+    blank_ink_ratio: Optional[float] = None,
+    crop_photos: bool = False,
+    profile: Optional[RenderProfile] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    crop_cards: bool = False,
+    skip_pages: FrozenSet[int] = frozenset()
+) -> Optional[DocumentPayload]:
+    """
+    Carrega um documento no formato de envio adequado ao Gemini.
+
+    PDFs seguem o modo escolhido:
+    - 'paginas': uma imagem JPEG por pagina, enviadas em ordem no mesmo request
+    - 'concatenado': todas as paginas em uma unica imagem (load_original_file)
+    - 'nativo': bytes originais do PDF, sem rasterizacao nem JPEG
+
+    Com try_text_layer, PDFs nato-digitais com camada de texto completa sao
+    enviados como 'text/plain' (mesmo caminho do DOCX), independente do modo.
+
+    Com crop_cards, perfis com card_short_edge (RG/CNH) enviam so os
+    cartoes encontrados na foto ou nas paginas (load_card_regions), exceto
+    no modo nativo.
+
+    Com crop_photos, imagens (fotos de celular) passam por recorte do
+    documento e correcao de inclinacao, e sao recodificadas no orcamento
+    PHOTO_IMAGE_MAX_BYTES.
+
+    Demais arquivos (imagens, DOCX) sao carregados via load_original_file.
+
+    Args:
+        file_path: Caminho para o arquivo
+        pdf_mode: Modo de envio de PDFs (um de PDF_MODES)
+        try_text_layer: Testa a camada de texto antes de rasterizar o PDF
+        render_workers: Processos para renderizar PDFs longos em faixas paralelas
+        blank_ink_ratio: Limite de tinta para descartar paginas em branco de PDFs
+                         rasterizados (None = desativado). As paginas descartadas
+                         ficam em metadados['paginas_descartadas'].
+        crop_photos: Recorta e endireita imagens antes do envio
+        profile: Perfil de renderizacao do tipo de documento (zoom, cor,
+                 paginas, encoder); padrao: perfil de extracao padrao
+        page_range: Faixa (inicio, fim) de paginas de um PDF, base 0 e fim
+                    exclusivo (extracao em janelas). A camada de texto nao e
+                    testada e o modo nativo envia um PDF so com essas paginas.
+        crop_cards: Recorta os cartoes de documentos de identificacao
+        skip_pages: Paginas (base 0) de um PDF deixadas de fora (poda de
+                    matriculas); nao aparecem em paginas_descartadas
+
+    Returns:
+        DocumentPayload pronto para envio, ou None se falhar
+    """
+    is_pdf = file_path.suffix.lower() == SUPPORTED_PDF_EXTENSION
+    profile = profile or DEFAULT_PROFILES[FASE_EXTRACAO]
+    is_image = file_path.suffix.lower() in SUPPORTED_IMAGE_EXTENSIONS
+
+    if (crop_cards and profile.card_short_edge and file_path.exists()
+            and (is_image or (is_pdf and pdf_mode != PDF_MODE_NATIVE))):
+        payload = load_card_regions(file_path, profile, blank_ink_ratio)
+        if payload is not None:
+            return payload
+
+    if crop_photos and is_image:
+        payload = load_cleaned_photo(file_path, profile)
+        if payload is not None:
+            return payload
+
+    if is_pdf and pdf_mode in (PDF_MODE_PAGES, PDF_MODE_NATIVE) and not file_path.exists():
+        logger.error(f"Arquivo nao encontrado: {file_path}")
+        return None
+
+    if is_pdf and try_text_layer and page_range is None and not skip_pages and file_path.exists():
+        text = extract_text_layer_from_pdf(file_path)
+        if text:
+            return DocumentPayload(
+                mime_type='text/plain',
+                content=text.encode('utf-8'),
+                modo=TEXT_LAYER_MODE
             )
 
-            # Validacao: verifica se response tem texto
-            if response is None or not response.text:
-                finish_reason = getattr(response, 'finish_reason', 'UNKNOWN') if response else 'NO_RESPONSE'
-                logger.warning(
-                    f"Modelo {model_name} retornou resposta vazia. Finish reason: {finish_reason}"
-                )
-                # Tenta proximo modelo
-                continue
+    if is_pdf and pdf_mode == PDF_MODE_NATIVE:
+        if page_range is not None or skip_pages:
+            pdf_bytes = slice_pdf_bytes(file_path, page_range, skip_pages)
+            if pdf_bytes is None:
+                return None
+            file_size = len(pdf_bytes)
+        else:
+            pdf_bytes = None
+            file_size = file_path.stat().st_size
+        if file_size <= MAX_INLINE_PDF_BYTES:
+            pdf_bytes = pdf_bytes or file_path.read_bytes()
+            logger.info(f"PDF enviado no modo nativo: {file_path.name} ({file_size / (1024 * 1024):.2f}MB)")
+            return DocumentPayload(
+                mime_type='application/pdf',
+                content=pdf_bytes,
+                modo=PDF_MODE_NATIVE
+            )
 
-            return response.text
-        except Exception as e:
-            last_error = e
-            if "not found" in str(e).lower() or "unavailable" in str(e).lower():
-                logger.warning(f"Modelo {model_name} nao disponivel, tentando proximo...")
-                continue
-            raise  # Re-raise se for outro tipo de erro
+        logger.warning(
+            f"PDF muito grande para envio nativo ({file_size / (1024 * 1024):.1f}MB > "
+            f"{MAX_INLINE_PDF_BYTES // (1024 * 1024)}MB), usando modo {PDF_MODE_PAGES}: {file_path.name}"
+        )
+        pdf_mode = PDF_MODE_PAGES
+
+    dropped_pages: List[int] = []
+
+    if is_pdf and pdf_mode == PDF_MODE_PAGES:
+        pages = extract_pages_from_pdf(
+            file_path,
+            render_workers=render_workers,
+            blank_ink_ratio=blank_ink_ratio,
+            dropped_pages=dropped_pages,
+            profile=profile,
+            page_range=page_range,
+            skip_pages=skip_pages
+        )
+        if not pages:
+            return None
 
-    raise RuntimeError(f"Nenhum modelo Gemini disponivel: {last_error}")
+        metadados = {
+            'paginas_enviadas': len(pages),
+            'formatos_paginas': dict(Counter(page_mime for _, page_mime in pages))
+        }
+        if dropped_pages:
+            logger.info(f"Paginas em branco descartadas de {file_path.name}: {dropped_pages}")
+            metadados['paginas_descartadas'] = dropped_pages
+
+        return DocumentPayload(
+            mime_type='image/jpeg',
+            pages=pages,
+            modo=PDF_MODE_PAGES,
+            metadados=metadados
+        )
 
+    content, mime_type = load_original_file(
+        file_path, render_workers, blank_ink_ratio, dropped_pages, profile, page_range, skip_pages
+    )
+    if content is None:
+        return None
 
-def call_gemini_text_only(
-    client: genai.Client,
+    modo = PDF_MODE_CONCAT if is_pdf else 'arquivo'
+    payload = DocumentPayload(mime_type=mime_type, content=content, modo=modo)
+    if dropped_pages:
+        logger.info(f"Paginas em branco descartadas de {file_path.name}: {dropped_pages}")
+        payload.metadados['paginas_descartadas'] = dropped_pages
+    return payload
+
+
+def load_ocr_text(ocr_path: str) -> Optional[str]:
+    """
+    Carrega texto OCR correspondente.
+
+    Args:
+        ocr_path: Caminho para o arquivo OCR
+
+    Returns:
+        Texto OCR ou None
+    """
+    try:
+        path = Path(ocr_path)
+        if not path.exists():
+            logger.warning(f"Arquivo OCR nao encontrado: {ocr_path}")
+            return None
+
+        content = path.read_text(encoding='utf-8')
+
+        # Remove cabecalho do OCR (linhas antes de ---)
+        if '---' in content:
+            content = content.split('---', 1)[1]
+
+        return content.strip()
+
+    except Exception as e:
+        logger.error(f"Erro ao carregar OCR {ocr_path}: {e}")
+        return None
+
+
+# =============================================================================
+# FUNCOES DE CHAMADA AO GEMINI
+# =============================================================================
+
+def image_contents(
     prompt: str,
-    document_text: str
-) -> str:
+    image_bytes: Optional[bytes],
+    mime_type: Optional[str],
+    pages: Optional[List[Tuple[bytes, str]]] = None
+) -> List[Any]:
     """
-    Chama Gemini apenas com texto (sem imagem).
+    Monta o conteudo de um request com imagem(ns): as imagens em ordem e o prompt no fim.
 
-    Esta funcao e usada para processar documentos DOCX onde o texto
-    foi extraido diretamente. O Gemini processa texto com alta qualidade.
+    Args:
+        prompt: Prompt do tipo de documento
+        image_bytes: Bytes da imagem (ignorado se pages for informado)
+        mime_type: Tipo MIME da imagem
+        pages: Lista ordenada de (bytes, mime_type), uma entrada por pagina
+
+    Returns:
+        Lista de contents para generate_content
+    """
+    if pages:
+        image_parts = [
+            types.Part.from_bytes(data=page_bytes, mime_type=page_mime)
+            for page_bytes, page_mime in pages
+        ]
+    else:
+        image_parts = [types.Part.from_bytes(data=image_bytes, mime_type=mime_type)]
+    return [*image_parts, prompt]
+
+
+def text_contents(prompt: str, document_text: str) -> List[Any]:
+    """
+    Monta o conteudo de um request so com texto (DOCX ou camada de texto do PDF).
 
     Args:
-        client: Cliente Gemini configurado
         prompt: Prompt do tipo de documento
         document_text: Texto extraido do documento
 
     Returns:
-        Texto da resposta do Gemini
+        Lista de contents para generate_content
     """
-    # Monta o prompt com o texto do documento
     full_prompt = f"""{prompt}
 
 === CONTEUDO DO DOCUMENTO ===
@@ -847,37 +2008,274 @@ def call_gemini_text_only(
 === FIM DO DOCUMENTO ===
 
 Analise o documento acima e forneca a resposta no formato solicitado."""
+    return [full_prompt]
+
 
-    # Configura geracao com temperatura baixa para extracao precisa
-    config = types.GenerateContentConfig(
+def extraction_config(
+    response_schema: Optional[Dict[str, Any]] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> types.GenerateContentConfig:
+    """
+    Configuracao de geracao da extracao (temperatura baixa para extracao precisa).
+
+    Args:
+        response_schema: Schema dos dados_catalogados (modo JSON); None = resposta em secoes
+        max_output_tokens: Teto de tokens de saida (orcamento do request)
+
+    Returns:
+        Configuracao para generate_content
+    """
+    if response_schema:
+        return types.GenerateContentConfig(
+            temperature=0.1,
+            max_output_tokens=max_output_tokens,
+            response_mime_type='application/json',
+            response_schema=response_schema
+        )
+    return types.GenerateContentConfig(
         temperature=0.1,
-        max_output_tokens=16384
+        max_output_tokens=max_output_tokens
+    )
+
+
+def _response_text(response: Any, model_name: str) -> Optional[str]:
+    """Texto da resposta, ou None (com aviso) se o modelo respondeu vazio."""
+    if response is None or not response.text:
+        finish_reason = getattr(response, 'finish_reason', 'UNKNOWN') if response else 'NO_RESPONSE'
+        logger.warning(f"Modelo {model_name} retornou resposta vazia. Finish reason: {finish_reason}")
+        return None
+    return response.text
+
+
+def _is_model_unavailable(error: Exception) -> bool:
+    """Indica se o erro pede o proximo modelo da lista de fallback."""
+    message = str(error).lower()
+    return "not found" in message or "unavailable" in message
+
+
+def _stream_text(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    config: types.GenerateContentConfig,
+    stream: StreamingResponse,
+    usage: CallUsage
+) -> Optional[str]:
+    """
+    Recebe a resposta em streaming, trecho a trecho, em stream.
+
+    Se a conexao cair depois que os dados_catalogados ja chegaram, o texto
+    recebido ate ali e aproveitado. O usage_metadata vem no ultimo trecho
+    recebido; os cabecalhos HTTP, no primeiro.
+
+    Returns:
+        Texto recebido, ou None (com aviso) se o modelo nao respondeu nada
+    """
+    stream.start()
+    started = usage.start_attempt()
+    first_chunk = last_chunk = None
+    chunks = client.models.generate_content_stream(model=model_name, contents=contents, config=config)
+    try:
+        for chunk in chunks:
+            first_chunk = first_chunk or chunk
+            last_chunk = chunk
+            if stream.feed(chunk.text):
+                logger.info(f"Dados completos apos {stream.metadata()['tempo_ate_dados_s']}s: streaming interrompido")
+                break
+    except Exception as e:
+        if stream.data is None:
+            raise
+        logger.warning(f"Streaming interrompido apos os dados: {e}")
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+        if first_chunk is not None:
+            usage.record(last_chunk, model_name, started, first_chunk)
+
+    if not stream.text:
+        logger.warning(f"Modelo {model_name} retornou streaming vazio")
+        return None
+    return stream.text
+
+
+async def _stream_text_async(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    config: types.GenerateContentConfig,
+    stream: StreamingResponse,
+    usage: CallUsage
+) -> Optional[str]:
+    """Versao assincrona de _stream_text, no cliente client.aio."""
+    stream.start()
+    started = usage.start_attempt()
+    first_chunk = last_chunk = None
+    chunks = await client.aio.models.generate_content_stream(model=model_name, contents=contents, config=config)
+    try:
+        async for chunk in chunks:
+            first_chunk = first_chunk or chunk
+            last_chunk = chunk
+            if stream.feed(chunk.text):
+                logger.info(f"Dados completos apos {stream.metadata()['tempo_ate_dados_s']}s: streaming interrompido")
+                break
+    except Exception as e:
+        if stream.data is None:
+            raise
+        logger.warning(f"Streaming interrompido apos os dados: {e}")
+    finally:
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose:
+            await aclose()
+        if first_chunk is not None:
+            usage.record(last_chunk, model_name, started, first_chunk)
+
+    if not stream.text:
+        logger.warning(f"Modelo {model_name} retornou streaming vazio")
+        return None
+    return stream.text
+
+
+def _cut_by_budget(usage: CallUsage, stream: Optional[StreamingResponse], max_output_tokens: int) -> bool:
+    """
+    Indica se a resposta foi cortada por um orcamento menor que o teto padrao.
+
+    Nesse caso o request e repetido com DEFAULT_MAX_OUTPUT_TOKENS; no
+    streaming, so se os dados_catalogados ainda nao tiverem chegado.
+    """
+    if usage.motivo_fim != FINISH_MAX_TOKENS or max_output_tokens >= DEFAULT_MAX_OUTPUT_TOKENS:
+        return False
+    if stream is not None and stream.data is not None:
+        return False
+    logger.warning(
+        f"Resposta cortada no orcamento de {max_output_tokens} tokens de saida: "
+        f"repetindo com {DEFAULT_MAX_OUTPUT_TOKENS}"
     )
+    usage.orcamento_excedido = True
+    return True
+
 
-    # Envia para o Gemini usando o novo SDK
-    model_names = [GEMINI_MODEL, GEMINI_MODEL_FALLBACK, "gemini-2.0-flash"]
+def _generate_text(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    config: types.GenerateContentConfig,
+    stream: Optional[StreamingResponse],
+    usage: CallUsage
+) -> Optional[str]:
+    """Um envio a um modelo (inteiro ou em streaming); None se o modelo respondeu vazio."""
+    usage.max_tokens_saida = config.max_output_tokens
+    if stream is not None:
+        return _stream_text(client, model_name, contents, config, stream, usage)
+    started = usage.start_attempt()
+    response = client.models.generate_content(model=model_name, contents=contents, config=config)
+    usage.record(response, model_name, started)
+    return _response_text(response, model_name)
+
+
+async def _generate_text_async(
+    client: genai.Client,
+    model_name: str,
+    contents: List[Any],
+    config: types.GenerateContentConfig,
+    stream: Optional[StreamingResponse],
+    usage: CallUsage
+) -> Optional[str]:
+    """Versao assincrona de _generate_text, no cliente client.aio."""
+    usage.max_tokens_saida = config.max_output_tokens
+    if stream is not None:
+        return await _stream_text_async(client, model_name, contents, config, stream, usage)
+    started = usage.start_attempt()
+    response = await client.aio.models.generate_content(model=model_name, contents=contents, config=config)
+    usage.record(response, model_name, started)
+    return _response_text(response, model_name)
+
+
+def generate_with_fallback(
+    client: genai.Client,
+    contents: List[Any],
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> str:
+    """
+    Envia um request ao Gemini, passando para o proximo modelo se o atual nao responder.
+
+    Tenta GEMINI_MODEL, GEMINI_MODEL_FALLBACK e gemini-2.0-flash, nessa ordem.
+    Resposta cortada por um orcamento de saida menor que o padrao e repetida
+    no mesmo modelo com DEFAULT_MAX_OUTPUT_TOKENS.
+
+    Args:
+        client: Cliente Gemini configurado
+        contents: Conteudo do request (image_contents ou text_contents)
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming neste objeto (None = resposta inteira)
+        usage: Acumula tentativas, usage_metadata e latencias do request (opcional)
+        max_output_tokens: Orcamento de tokens de saida (output_budgets.py)
 
+    Returns:
+        Texto da resposta do Gemini
+    """
+    usage = usage if usage is not None else CallUsage()
     last_error = None
-    for model_name in model_names:
+    for model_name in EXTRACTION_MODELS:
         try:
-            response = client.models.generate_content(
-                model=model_name,
-                contents=[full_prompt],
-                config=config
-            )
+            config = extraction_config(response_schema, max_output_tokens)
+            text = _generate_text(client, model_name, contents, config, stream, usage)
+            if _cut_by_budget(usage, stream, max_output_tokens):
+                text = _generate_text(client, model_name, contents, extraction_config(response_schema), stream, usage)
+            if text is None:
+                continue  # Tenta proximo modelo
+            return text
+        except Exception as e:
+            last_error = e
+            if _is_model_unavailable(e):
+                logger.warning(f"Modelo {model_name} nao disponivel, tentando proximo...")
+                continue
+            raise  # Re-raise se for outro tipo de erro
+
+    raise RuntimeError(f"Nenhum modelo Gemini disponivel: {last_error}")
+
+
+async def generate_with_fallback_async(
+    client: genai.Client,
+    contents: List[Any],
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> str:
+    """
+    Versao assincrona de generate_with_fallback, no cliente client.aio.
+
+    Args:
+        client: Cliente Gemini configurado
+        contents: Conteudo do request (image_contents ou text_contents)
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming neste objeto (None = resposta inteira)
+        usage: Acumula tentativas, usage_metadata e latencias do request (opcional)
+        max_output_tokens: Orcamento de tokens de saida (output_budgets.py)
 
-            # Validacao: verifica se response tem texto
-            if response is None or not response.text:
-                finish_reason = getattr(response, 'finish_reason', 'UNKNOWN') if response else 'NO_RESPONSE'
-                logger.warning(
-                    f"Modelo {model_name} retornou resposta vazia. Finish reason: {finish_reason}"
+    Returns:
+        Texto da resposta do Gemini
+    """
+    usage = usage if usage is not None else CallUsage()
+    last_error = None
+    for model_name in EXTRACTION_MODELS:
+        try:
+            config = extraction_config(response_schema, max_output_tokens)
+            text = await _generate_text_async(client, model_name, contents, config, stream, usage)
+            if _cut_by_budget(usage, stream, max_output_tokens):
+                text = await _generate_text_async(
+                    client, model_name, contents, extraction_config(response_schema), stream, usage
                 )
+            if text is None:
                 continue
-
-            return response.text
+            return text
         except Exception as e:
             last_error = e
-            if "not found" in str(e).lower() or "unavailable" in str(e).lower():
+            if _is_model_unavailable(e):
                 logger.warning(f"Modelo {model_name} nao disponivel, tentando proximo...")
                 continue
             raise
@@ -885,13 +2283,88 @@ Analise o documento acima e forneca a resposta no formato solicitado."""
     raise RuntimeError(f"Nenhum modelo Gemini disponivel: {last_error}")
 
 
+def call_gemini(
+    client: genai.Client,
+    prompt: str,
+    image_bytes: bytes,
+    mime_type: str,
+    ocr_text: Optional[str] = None,
+    pages: Optional[List[Tuple[bytes, str]]] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> str:
+    """
+    Chama Gemini com imagem usando o novo SDK google.genai.
+
+    Se `pages` for informado, cada pagina vira um Part separado (na ordem
+    da lista) e image_bytes/mime_type sao ignorados.
+
+    Args:
+        client: Cliente Gemini configurado
+        prompt: Prompt do tipo de documento
+        image_bytes: Bytes da imagem
+        mime_type: Tipo MIME da imagem
+        ocr_text: Texto OCR (opcional, para referencia - DEPRECATED)
+        pages: Lista ordenada de (bytes, mime_type), uma entrada por pagina
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming (opcional)
+        usage: Acumula o uso da API do request (opcional)
+        max_output_tokens: Orcamento de tokens de saida
+
+    Returns:
+        Texto da resposta do Gemini
+    """
+    # OCR nao e mais usado, mas mantido na assinatura para compatibilidade
+    contents = image_contents(prompt, image_bytes, mime_type, pages)
+    return generate_with_fallback(client, contents, response_schema, stream, usage, max_output_tokens)
+
+
+def call_gemini_text_only(
+    client: genai.Client,
+    prompt: str,
+    document_text: str,
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+) -> str:
+    """
+    Chama Gemini apenas com texto (sem imagem).
+
+    Esta funcao e usada para processar documentos DOCX onde o texto
+    foi extraido diretamente. O Gemini processa texto com alta qualidade.
+
+    Args:
+        client: Cliente Gemini configurado
+        prompt: Prompt do tipo de documento
+        document_text: Texto extraido do documento
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming (opcional)
+        usage: Acumula o uso da API do request (opcional)
+        max_output_tokens: Orcamento de tokens de saida
+
+    Returns:
+        Texto da resposta do Gemini
+    """
+    return generate_with_fallback(
+        client, text_contents(prompt, document_text), response_schema, stream, usage, max_output_tokens
+    )
+
+
 def call_gemini_with_retry(
     client: genai.Client,
     prompt: str,
     image_bytes: bytes,
     mime_type: str,
     ocr_text: Optional[str] = None,
-    max_retries: int = MAX_RETRIES
+    max_retries: int = MAX_RETRIES,
+    pages: Optional[List[Tuple[bytes, str]]] = None,
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
 ) -> str:
     """
     Chama Gemini com retry e backoff exponencial.
@@ -903,6 +2376,11 @@ def call_gemini_with_retry(
         mime_type: Tipo MIME da imagem
         ocr_text: Texto OCR (opcional - DEPRECATED)
         max_retries: Numero maximo de tentativas
+        pages: Lista ordenada de (bytes, mime_type) por pagina (opcional)
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming (opcional)
+        usage: Acumula o uso da API do request, em todas as tentativas (opcional)
+        max_output_tokens: Orcamento de tokens de saida
 
     Returns:
         Texto da resposta do Gemini
@@ -914,7 +2392,10 @@ def call_gemini_with_retry(
 
     for attempt in range(max_retries):
         try:
-            return call_gemini(client, prompt, image_bytes, mime_type, ocr_text)
+            return call_gemini(
+                client, prompt, image_bytes, mime_type, ocr_text, pages, response_schema, stream, usage,
+                max_output_tokens
+            )
 
         except Exception as e:
             last_error = e
@@ -933,7 +2414,11 @@ def call_gemini_text_only_with_retry(
     client: genai.Client,
     prompt: str,
     document_text: str,
-    max_retries: int = MAX_RETRIES
+    max_retries: int = MAX_RETRIES,
+    response_schema: Optional[Dict[str, Any]] = None,
+    stream: Optional[StreamingResponse] = None,
+    usage: Optional[CallUsage] = None,
+    max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
 ) -> str:
     """
     Chama Gemini com texto puro (sem imagem) com retry e backoff exponencial.
@@ -943,6 +2428,10 @@ def call_gemini_text_only_with_retry(
         prompt: Prompt do tipo de documento
         document_text: Texto extraido do documento
         max_retries: Numero maximo de tentativas
+        response_schema: Schema dos dados_catalogados (modo JSON)
+        stream: Recebe a resposta em streaming (opcional)
+        usage: Acumula o uso da API do request, em todas as tentativas (opcional)
+        max_output_tokens: Orcamento de tokens de saida
 
     Returns:
         Texto da resposta do Gemini
@@ -954,7 +2443,9 @@ def call_gemini_text_only_with_retry(
 
     for attempt in range(max_retries):
         try:
-            return call_gemini_text_only(client, prompt, document_text)
+            return call_gemini_text_only(
+                client, prompt, document_text, response_schema, stream, usage, max_output_tokens
+            )
 
         except Exception as e:
             last_error = e
@@ -1034,25 +2525,38 @@ def parse_gemini_response(response: str) -> Dict[str, Any]:
 # FUNCOES DE PROCESSAMENTO
 # =============================================================================
 
-def process_document(
-    client: genai.Client,
+def plan_document(
     doc_info: Dict[str, Any],
-    escritura_id: str
-) -> Dict[str, Any]:
+    options: ExtractionOptions
+) -> Tuple[Optional[PagePruning], int]:
     """
-    Processa um documento completo com Gemini.
+    Planeja poda e janelas de um documento antes de carrega-lo.
 
     Args:
-        client: Cliente Gemini configurado
         doc_info: Informacoes do documento do catalogo
-        escritura_id: ID da escritura
+        options: Opcoes de carregamento/envio
 
     Returns:
-        Dicionario com resultado da extracao
+        Tupla (poda ou None, numero de paginas se o documento deve ser
+        extraido em janelas ou 0)
     """
-    start_time = time.time()
-
-    result = {
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    file_path = Path(doc_info.get('caminho_absoluto', ''))
+    is_pdf = file_path.suffix.lower() == SUPPORTED_PDF_EXTENSION
+    pruning = None
+    if options.prune_for(tipo) and is_pdf and file_path.exists():
+        pruning = plan_document_pruning(file_path, doc_info.get('arquivo_ocr'))
+    window_pages = options.window_pages_for(tipo)
+    if window_pages and is_pdf:
+        num_pages = count_pdf_pages(file_path)
+        if num_pages - len(skipped_page_set(pruning)) > window_pages:
+            return pruning, num_pages
+    return pruning, 0
+
+
+def new_extraction_result(doc_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado de extracao vazio (status sucesso) para um documento do catalogo."""
+    return {
         "tipo_documento": doc_info.get('tipo_documento', 'OUTRO'),
         "arquivo_origem": doc_info.get('nome', ''),
         "arquivo_ocr": doc_info.get('arquivo_ocr', ''),
@@ -1070,80 +2574,583 @@ def process_document(
         "erro": None
     }
 
-    try:
-        # 1. Carrega o arquivo original
-        file_path = Path(doc_info.get('caminho_absoluto', ''))
-        content_bytes, mime_type = load_original_file(file_path)
-
-        if content_bytes is None:
-            raise FileLoadError(f"Nao foi possivel carregar: {file_path}")
 
-        # 2. Carrega texto OCR (opcional)
-        ocr_text = None
-        if doc_info.get('arquivo_ocr'):
-            ocr_text = load_ocr_text(doc_info['arquivo_ocr'])
+def sent_page_count(file_path: Path, payload: DocumentPayload) -> int:
+    """
+    Paginas enviadas em um request de documento inteiro (classe de tamanho do orcamento).
 
-        # 3. Carrega prompt especifico (considera tamanho do arquivo para prompts compactos)
-        tipo = doc_info.get('tipo_documento', 'OUTRO')
-        file_size_bytes = file_path.stat().st_size if file_path.exists() else 0
-        prompt = load_prompt(tipo, file_size_bytes)
+    Usa a contagem do payload quando existe; PDFs enviados inteiros contam as
+    paginas do arquivo (menos as em branco descartadas), e textos sem
+    paginas (DOCX) sao estimados em TEXT_CHARS_PER_PAGE caracteres por pagina.
+    """
+    if payload.metadados.get('paginas_enviadas'):
+        return payload.metadados['paginas_enviadas']
+    if file_path.suffix.lower() == SUPPORTED_PDF_EXTENSION:
+        pages = count_pdf_pages(file_path) - len(payload.metadados.get('paginas_descartadas', []))
+        return max(1, pages)
+    if payload.mime_type == 'text/plain' and payload.content:
+        return max(1, math.ceil(len(payload.content) / TEXT_CHARS_PER_PAGE))
+    return 1
 
-        # 4. Chama Gemini (modo texto ou imagem dependendo do mime_type)
-        if mime_type == 'text/plain':
-            # DOCX convertido para texto - usa call_gemini_text_only
-            document_text = content_bytes.decode('utf-8')
-            response = call_gemini_text_only_with_retry(
-                client=client,
-                prompt=prompt,
-                document_text=document_text
-            )
-        else:
-            # PDF/imagem - usa call_gemini com imagem
-            response = call_gemini_with_retry(
-                client=client,
-                prompt=prompt,
-                image_bytes=content_bytes,
-                mime_type=mime_type,
-                ocr_text=ocr_text
-            )
 
-        # 5. Parseia resposta
-        parsed = parse_gemini_response(response)
+def prepare_extraction_request(
+    doc_info: Dict[str, Any],
+    options: ExtractionOptions,
+    result: Dict[str, Any],
+    page_range: Optional[Tuple[int, int]] = None,
+    total_pages: int = 0,
+    pruning: Optional[PagePruning] = None
+) -> ExtractionRequest:
+    """
+    Carrega o documento, o texto OCR e o prompt (a parte local da extracao).
 
-        result["reescrita_interpretada"] = parsed["reescrita"]
-        result["explicacao_contextual"] = parsed["explicacao"]
-        result["dados_catalogados"] = parsed["dados_catalogados"]
+    Registra em result['metadados'] o modo de envio, o tamanho do payload, a
+    poda, o modo de resposta (com options.json_output, tipos cujo prompt
+    tem modelo JSON recebem um response_schema - ver response_schemas.py) e
+    o orcamento de tokens de saida (tipo, modo e classe de tamanho - ver
+    output_budgets.py).
 
-        # Estima tokens (aproximacao)
-        result["metadados"]["tokens_entrada"] = len(prompt.split()) + (len(ocr_text.split()) if ocr_text else 0)
-        result["metadados"]["tokens_saida"] = len(response.split()) if response else 0
+    Args:
+        doc_info: Informacoes do documento do catalogo
+        options: Opcoes de carregamento/envio
+        result: Resultado de new_extraction_result (alterado no lugar)
+        page_range: Faixa (inicio, fim) de uma janela (base 0, fim exclusivo)
+        total_pages: Numero de paginas do documento inteiro (com page_range)
+        pruning: Poda planejada para o documento
 
-    except PromptNotFoundError as e:
-        result["status"] = "erro"
-        result["erro"] = f"Prompt nao encontrado: {e}"
-        logger.error(f"Prompt nao encontrado para {doc_info.get('nome')}: {e}")
+    Returns:
+        Request pronto para o Gemini
 
-    except FileLoadError as e:
-        result["status"] = "erro"
-        result["erro"] = f"Erro ao carregar arquivo: {e}"
-        logger.error(f"Erro ao carregar {doc_info.get('nome')}: {e}")
+    Raises:
+        FileLoadError: Se o arquivo nao puder ser carregado
+        PromptNotFoundError: Se nao houver prompt para o tipo
+    """
+    skip_pages = skipped_page_set(pruning)
+
+    # 1. Carrega o arquivo original
+    file_path = Path(doc_info.get('caminho_absoluto', ''))
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    payload = load_document(
+        file_path,
+        pdf_mode=options.pdf_mode_for(tipo),
+        try_text_layer=options.try_text_layer_for(tipo),
+        render_workers=options.render_workers,
+        blank_ink_ratio=options.blank_ink_ratio,
+        crop_photos=options.crop_photos,
+        profile=options.render_profile_for(tipo),
+        page_range=page_range,
+        crop_cards=options.crop_cards,
+        skip_pages=skip_pages
+    )
+
+    if payload is None:
+        raise FileLoadError(f"Nao foi possivel carregar: {file_path}")
+
+    result["metadados"]["modo_envio"] = payload.modo
+    result["metadados"]["tamanho_payload_bytes"] = payload.size_bytes
+    result["metadados"].update(payload.metadados)
+    if pruning and page_range is None:
+        result["metadados"]["poda_paginas"] = pruning.to_metadata()
+
+    # Paginas deste envio (janela e/ou poda), base 0
+    if page_range is not None or pruning:
+        total_pages = total_pages or pruning.total_pages
+        start, end = page_range or (0, total_pages)
+        sent_pages = [page for page in range(start, end) if page not in skip_pages]
+
+    # 2. Carrega texto OCR (opcional; com poda, so das paginas enviadas se o OCR as separar)
+    ocr_text = None
+    if doc_info.get('arquivo_ocr'):
+        ocr_pages = ocr_page_texts(Path(doc_info['arquivo_ocr'])) if pruning else None
+        if ocr_pages and len(ocr_pages) == pruning.total_pages:
+            ocr_text = select_page_texts(ocr_pages, sent_pages)
+        else:
+            ocr_text = load_ocr_text(doc_info['arquivo_ocr'])
+
+    # 3. Carrega prompt especifico (considera tamanho do arquivo para prompts compactos)
+    file_size_bytes = file_path.stat().st_size if file_path.exists() else 0
+    if page_range is not None or pruning:
+        # Em janelas/poda, o prompt compacto so vale se as paginas enviadas forem muitas
+        file_size_bytes = file_size_bytes * len(sent_pages) // max(total_pages, 1)
+    prompt = load_prompt(tipo, file_size_bytes)
+    response_schema = build_response_schema(tipo, prompt) if options.json_output else None
+    modo_resposta = RESPONSE_MODE_JSON if response_schema else RESPONSE_MODE_SECTIONS
+    result["metadados"]["modo_resposta"] = modo_resposta
+
+    # Orcamento de saida (a classe e registrada mesmo sem orcamento, para o aprendizado)
+    pages = len(sent_pages) if page_range is not None or pruning else sent_page_count(file_path, payload)
+    classe = size_class(pages)
+    if options.output_budgets:
+        max_output_tokens, fonte = output_budget(tipo, modo_resposta, classe)
+    else:
+        max_output_tokens, fonte = DEFAULT_MAX_OUTPUT_TOKENS, BUDGET_SOURCE_DEFAULT
+    result["metadados"]["orcamento_saida"] = {
+        "classe_tamanho": classe,
+        "max_tokens_saida": max_output_tokens,
+        "fonte": fonte
+    }
+
+    if page_range is not None:
+        prompt += MATRICULA_WINDOW_PROMPT.format(inicio=start + 1, fim=end, total=total_pages)
+    if pruning:
+        omitted = [page for page in range(start, end) if page in skip_pages]
+        prompt += MATRICULA_PRUNED_PROMPT.format(
+            total=total_pages,
+            mantidas=', '.join(format_page_ranges(sent_pages)),
+            removidas=', '.join(format_page_ranges(omitted)) or 'restantes'
+        )
+    if response_schema:
+        prompt += JSON_ONLY_PROMPT
+    elif options.stream:
+        prompt += STREAM_DATA_FIRST_PROMPT
+
+    return ExtractionRequest(
+        prompt=prompt,
+        payload=payload,
+        ocr_text=ocr_text,
+        response_schema=response_schema,
+        max_output_tokens=max_output_tokens
+    )
+
+
+def request_contents(request: ExtractionRequest) -> List[Any]:
+    """Conteudo do request para generate_content (modo texto ou imagem conforme o mime_type)."""
+    payload = request.payload
+    if payload.mime_type == 'text/plain':
+        return text_contents(request.prompt, payload.content.decode('utf-8'))
+    return image_contents(request.prompt, payload.content, payload.mime_type, payload.pages)
+
+
+def new_response_stream(
+    options: ExtractionOptions,
+    request: ExtractionRequest,
+    on_data: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Optional[StreamingResponse]:
+    """
+    Cria o acompanhamento do streaming de um request (None sem options.stream).
+
+    Args:
+        options: Opcoes de carregamento/envio
+        request: Request a enviar
+        on_data: Chamado com os dados_catalogados assim que o bloco JSON fecha
+
+    Returns:
+        StreamingResponse, ou None para receber a resposta inteira
+    """
+    if not options.stream:
+        return None
+    return StreamingResponse(
+        json_only=request.response_schema is not None,
+        on_data=on_data,
+        stop_on_data=options.stop_on_data
+    )
+
+
+def apply_extraction_response(
+    result: Dict[str, Any],
+    request: ExtractionRequest,
+    response: str,
+    stream: Optional[StreamingResponse] = None
+) -> None:
+    """
+    Parseia a resposta do Gemini e preenche o resultado.
+
+    No modo JSON a resposta e so o objeto dos dados_catalogados; reescrita e
+    explicacao ficam vazias.
+
+    Args:
+        result: Resultado da extracao (alterado no lugar)
+        request: Request enviado
+        response: Texto da resposta do Gemini
+        stream: Streaming da resposta (registra tempos em metadados['streaming'])
+    """
+    if request.response_schema:
+        parsed = {"reescrita": "", "explicacao": "", "dados_catalogados": parse_json_response(response)}
+    else:
+        parsed = parse_gemini_response(response)
+
+    result["reescrita_interpretada"] = parsed["reescrita"]
+    result["explicacao_contextual"] = parsed["explicacao"]
+    result["dados_catalogados"] = parsed["dados_catalogados"]
+
+    # Estimativa (aproximacao), substituida pelo usage_metadata em record_api_usage
+    ocr_text = request.ocr_text
+    result["metadados"]["tokens_entrada"] = len(request.prompt.split()) + (len(ocr_text.split()) if ocr_text else 0)
+    result["metadados"]["tokens_saida"] = len(response.split()) if response else 0
+    if stream is not None:
+        result["metadados"]["streaming"] = stream.metadata()
+
+
+def record_api_usage(result: Dict[str, Any], usage: CallUsage) -> None:
+    """
+    Registra o uso real da API do request em result['metadados'].
+
+    Grava o registro em metadados['chamadas_api'] (com modo de resposta e
+    classe de tamanho, lidos por output_budgets.py) e, se as respostas trouxeram
+    usage_metadata, troca a estimativa de tokens_entrada/tokens_saida pela
+    contagem real (tokens_saida inclui os de raciocinio, cobrados como
+    saida; tokens_estimados indica qual das duas ficou).
+
+    Args:
+        result: Resultado da extracao (alterado no lugar)
+        usage: Uso acumulado do request
+    """
+    if not usage.tentativas:
+        return  # Erro antes do envio (arquivo, prompt)
+    metadados = result["metadados"]
+    record = usage.to_metadata()
+    record["modo_resposta"] = metadados.get("modo_resposta")
+    record["classe_tamanho"] = metadados.get("orcamento_saida", {}).get("classe_tamanho")
+    if metadados.get("streaming", {}).get("interrompido_nos_dados"):
+        record["interrompido_nos_dados"] = True
+    metadados["chamadas_api"] = [record]
+    if usage.has_tokens:
+        metadados["tokens_entrada"] = usage.tokens_prompt
+        metadados["tokens_saida"] = usage.tokens_resposta + usage.tokens_raciocinio
+    metadados["tokens_estimados"] = not usage.has_tokens
+
+
+def record_extraction_error(result: Dict[str, Any], doc_info: Dict[str, Any], error: Exception) -> None:
+    """
+    Marca o resultado como erro, com a mensagem conforme o tipo da excecao.
+
+    Args:
+        result: Resultado da extracao (alterado no lugar)
+        doc_info: Informacoes do documento do catalogo
+        error: Excecao capturada durante a extracao
+    """
+    result["status"] = "erro"
+    if isinstance(error, PromptNotFoundError):
+        result["erro"] = f"Prompt nao encontrado: {error}"
+        logger.error(f"Prompt nao encontrado para {doc_info.get('nome')}: {error}")
+    elif isinstance(error, FileLoadError):
+        result["erro"] = f"Erro ao carregar arquivo: {error}"
+        logger.error(f"Erro ao carregar {doc_info.get('nome')}: {error}")
+    elif isinstance(error, GeminiExtractionError):
+        result["erro"] = f"Erro na extracao Gemini: {error}"
+        logger.error(f"Erro Gemini para {doc_info.get('nome')}: {error}")
+    else:
+        result["erro"] = f"Erro inesperado: {error}"
+        logger.error(f"Erro inesperado ao processar {doc_info.get('nome')}", exc_info=error)
+
+
+def process_document(
+    client: genai.Client,
+    doc_info: Dict[str, Any],
+    escritura_id: str,
+    options: Optional[ExtractionOptions] = None,
+    page_range: Optional[Tuple[int, int]] = None,
+    total_pages: int = 0,
+    pruning: Optional[PagePruning] = None,
+    on_data: Optional[Callable[[Dict[str, Any]], None]] = None,
+    window_delay: float = 0
+) -> Dict[str, Any]:
+    """
+    Processa um documento completo com Gemini.
+
+    PDFs de WINDOWED_TYPES com mais paginas que options.window_pages_for(tipo)
+    sao extraidos em janelas (process_document_windows).
+
+    Com options.prune_for(tipo), matriculas com texto legivel em todas as
+    paginas sao podadas antes (matricula_pruning.py): so as paginas vigentes
+    sao renderizadas e enviadas, e as faixas removidas ficam em
+    metadados['poda_paginas'].
+
+    Args:
+        client: Cliente Gemini configurado
+        doc_info: Informacoes do documento do catalogo
+        escritura_id: ID da escritura
+        options: Opcoes de carregamento/envio (padrao: ExtractionOptions())
+        page_range: Extrai apenas a faixa (inicio, fim) de paginas - uma janela
+                    de process_document_windows (base 0, fim exclusivo)
+        total_pages: Numero de paginas do documento inteiro (com page_range)
+        pruning: Poda ja planejada para o documento (janelas de
+                 process_document_windows); sem page_range, e planejada aqui
+        on_data: Com options.stream, chamado com os dados_catalogados assim
+                 que o bloco JSON fecha (nao usado em documentos em janelas)
+        window_delay: Pausa (segundos) entre os requests de janelas, no ritmo
+                      de rate limit do runner que chamou
 
-    except GeminiExtractionError as e:
-        result["status"] = "erro"
-        result["erro"] = f"Erro na extracao Gemini: {e}"
-        logger.error(f"Erro Gemini para {doc_info.get('nome')}: {e}")
+    Returns:
+        Dicionario com resultado da extracao
+    """
+    options = options or ExtractionOptions()
+
+    if page_range is None:
+        pruning, num_pages = plan_document(doc_info, options)
+        if num_pages:
+            return process_document_windows(
+                client, doc_info, escritura_id, options, num_pages, pruning, window_delay
+            )
+
+    return extract_document(client, doc_info, options, page_range, total_pages, pruning, on_data)
+
+
+def extract_document(
+    client: genai.Client,
+    doc_info: Dict[str, Any],
+    options: ExtractionOptions,
+    page_range: Optional[Tuple[int, int]] = None,
+    total_pages: int = 0,
+    pruning: Optional[PagePruning] = None,
+    on_data: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Extrai um documento ou uma janela ja planejados (poda e janelas de plan_document), em um request.
+
+    Args:
+        client: Cliente Gemini configurado
+        doc_info: Informacoes do documento do catalogo
+        options: Opcoes de carregamento/envio
+        page_range: Faixa (inicio, fim) de paginas da janela, ou None para o documento inteiro
+        total_pages: Numero de paginas do documento inteiro (com page_range)
+        pruning: Poda do documento (None = sem poda)
+        on_data: Com options.stream, chamado com os dados_catalogados assim
+                 que o bloco JSON fecha
+
+    Returns:
+        Dicionario com resultado da extracao
+    """
+    start_time = time.time()
+    result = new_extraction_result(doc_info)
+    usage = CallUsage()
+
+    try:
+        request = prepare_extraction_request(doc_info, options, result, page_range, total_pages, pruning)
+
+        # 4. Chama Gemini (modo texto ou imagem dependendo do mime_type)
+        payload = request.payload
+        stream = new_response_stream(options, request, on_data)
+        if payload.mime_type == 'text/plain':
+            # DOCX ou PDF com camada de texto - usa call_gemini_text_only
+            response = call_gemini_text_only_with_retry(
+                client=client,
+                prompt=request.prompt,
+                document_text=payload.content.decode('utf-8'),
+                response_schema=request.response_schema,
+                stream=stream,
+                usage=usage,
+                max_output_tokens=request.max_output_tokens
+            )
+        else:
+            # PDF/imagem - usa call_gemini com imagem (ou uma imagem por pagina)
+            response = call_gemini_with_retry(
+                client=client,
+                prompt=request.prompt,
+                image_bytes=payload.content,
+                mime_type=payload.mime_type,
+                ocr_text=request.ocr_text,
+                pages=payload.pages,
+                response_schema=request.response_schema,
+                stream=stream,
+                usage=usage,
+                max_output_tokens=request.max_output_tokens
+            )
+
+        # 5. Parseia resposta
+        apply_extraction_response(result, request, response, stream)
 
     except Exception as e:
-        result["status"] = "erro"
-        result["erro"] = f"Erro inesperado: {e}"
-        logger.exception(f"Erro inesperado ao processar {doc_info.get('nome')}")
+        record_extraction_error(result, doc_info, e)
 
     finally:
+        record_api_usage(result, usage)
         result["metadados"]["tempo_processamento_s"] = round(time.time() - start_time, 2)
 
     return result
 
 
+def plan_document_windows(
+    doc_info: Dict[str, Any],
+    options: ExtractionOptions,
+    total_pages: int,
+    pruning: Optional[PagePruning] = None
+) -> List[Tuple[int, int]]:
+    """
+    Planeja as janelas (inicio, fim) de um documento longo, sobre as paginas mantidas pela poda.
+
+    Paginas em branco (options.blank_ink_ratio) ficam de fora do planejamento:
+    as janelas sao divididas pelas paginas com conteudo, entao nenhuma janela
+    fica so com paginas em branco; se TODAS forem em branco, uma janela unica
+    cobre o documento e o carregador mantem a primeira pagina uma vez.
+
+    Args:
+        doc_info: Informacoes do documento do catalogo
+        options: Opcoes de carregamento/envio
+        total_pages: Numero de paginas do PDF
+        pruning: Poda do documento
+
+    Returns:
+        Janelas em paginas do documento (base 0, fim exclusivo)
+    """
+    window_pages = options.window_pages_for(doc_info.get('tipo_documento', 'OUTRO'))
+    kept_pages = pruning.kept_pages if pruning else list(range(total_pages))
+    blank_pages = blank_pdf_pages(
+        Path(doc_info.get('caminho_absoluto', '')), options.blank_ink_ratio, skipped_page_set(pruning)
+    )
+    content_pages = [page for page in kept_pages if page not in blank_pages] or kept_pages[:1]
+    windows = [
+        (content_pages[start], content_pages[end - 1] + 1)
+        for start, end in plan_page_windows(len(content_pages), window_pages, MATRICULA_WINDOW_OVERLAP)
+    ]
+    # Paginas em branco nas pontas entram na primeira/ultima janela (descartadas no envio)
+    windows[0] = (kept_pages[0], windows[0][1])
+    windows[-1] = (windows[-1][0], kept_pages[-1] + 1)
+
+    logger.info(
+        f"{doc_info.get('nome', '')}: {total_pages} paginas, extraindo em {len(windows)} janelas "
+        f"de {window_pages} paginas"
+    )
+    return windows
+
+
+def process_document_windows(
+    client: genai.Client,
+    doc_info: Dict[str, Any],
+    escritura_id: str,
+    options: ExtractionOptions,
+    total_pages: int,
+    pruning: Optional[PagePruning] = None,
+    window_delay: float = 0
+) -> Dict[str, Any]:
+    """
+    Extrai um documento longo em janelas de paginas sobrepostas e combina os resultados.
+
+    Cada janela e um request independente (extract_document com page_range),
+    entao nenhuma pagina e descartada pelo limite max_pages e a latencia de
+    cada request fica limitada ao tamanho da janela. Aqui (modo serial) as
+    janelas rodam em sequencia, com window_delay entre elas, para que cada
+    uma conte no rate limit; o modo paralelo submete cada janela ao executor
+    como um request proprio (process_window_threadsafe). Os
+    dados_catalogados sao combinados por combine_window_results.
+
+    Args:
+        client: Cliente Gemini configurado
+        doc_info: Informacoes do documento do catalogo
+        escritura_id: ID da escritura
+        options: Opcoes de carregamento/envio
+        total_pages: Numero de paginas do PDF
+        pruning: Poda do documento; as janelas sao planejadas sobre as paginas
+                 mantidas e as removidas nao sao renderizadas
+        window_delay: Pausa (segundos) entre os requests de janelas
+
+    Returns:
+        Dicionario com resultado da extracao (mesmo formato de process_document)
+    """
+    start_time = time.time()
+    windows = plan_document_windows(doc_info, options, total_pages, pruning)
+
+    window_results = []
+    for idx, window in enumerate(windows):
+        if idx and window_delay:
+            logger.debug(f"Rate limiting entre janelas: aguardando {window_delay:.1f}s...")
+            time.sleep(window_delay)
+        window_results.append(extract_document(client, doc_info, options, window, total_pages, pruning))
+
+    return combine_window_results(doc_info, total_pages, pruning, windows, window_results, start_time)
+
+
+def combine_window_results(
+    doc_info: Dict[str, Any],
+    total_pages: int,
+    pruning: Optional[PagePruning],
+    windows: List[Tuple[int, int]],
+    window_results: List[Dict[str, Any]],
+    start_time: float
+) -> Dict[str, Any]:
+    """
+    Combina os resultados das janelas em um resultado unico.
+
+    dados_catalogados sao combinados por matricula_windows.merge_window_data.
+    Se algumas janelas falharem, o resultado segue com as demais e ganha um
+    alerta DOCUMENTO_INCOMPLETO com as paginas que ficaram sem extracao.
+
+    Args:
+        doc_info: Informacoes do documento do catalogo
+        total_pages: Numero de paginas do PDF
+        pruning: Poda do documento
+        windows: Janelas extraidas (base 0, fim exclusivo)
+        window_results: Resultado de cada janela, na ordem de windows
+        start_time: Inicio da extracao do documento (time.time())
+
+    Returns:
+        Dicionario com resultado da extracao (mesmo formato de process_document)
+    """
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    kept_pages = pruning.kept_pages if pruning else list(range(total_pages))
+    succeeded = [(w, r) for w, r in zip(windows, window_results) if r['status'] == 'sucesso']
+    failed = [(w, r) for w, r in zip(windows, window_results) if r['status'] != 'sucesso']
+
+    result = {
+        "tipo_documento": tipo,
+        "arquivo_origem": doc_info.get('nome', ''),
+        "arquivo_ocr": doc_info.get('arquivo_ocr', ''),
+        "data_processamento": datetime.now().isoformat(),
+        "modelo": GEMINI_MODEL,
+        "reescrita_interpretada": merge_window_texts(
+            [(w, r['reescrita_interpretada']) for w, r in succeeded]
+        ),
+        "explicacao_contextual": merge_window_texts(
+            [(w, r['explicacao_contextual']) for w, r in succeeded]
+        ),
+        "dados_catalogados": merge_window_data([r['dados_catalogados'] for _, r in succeeded]),
+        "metadados": {
+            "tokens_entrada": sum(r['metadados'].get('tokens_entrada', 0) for r in window_results),
+            "tokens_saida": sum(r['metadados'].get('tokens_saida', 0) for r in window_results),
+            "tempo_processamento_s": 0,
+            "modo_envio": WINDOWED_MODE,
+            "paginas_documento": total_pages,
+            "tamanho_payload_bytes": sum(
+                r['metadados'].get('tamanho_payload_bytes', 0) for r in window_results
+            ),
+            "chamadas_api": [c for r in window_results for c in r['metadados'].get('chamadas_api', [])],
+            "tokens_estimados": any(r['metadados'].get('tokens_estimados', False) for r in window_results),
+            "janelas": [
+                {
+                    "paginas": f"{start + 1}-{end}",
+                    "status": r['status'],
+                    "modo_envio": r['metadados'].get('modo_envio'),
+                    "paginas_enviadas": r['metadados'].get('paginas_enviadas'),
+                    "tempo_processamento_s": r['metadados'].get('tempo_processamento_s', 0),
+                    "erro": r['erro']
+                }
+                for (start, end), r in zip(windows, window_results)
+            ]
+        },
+        "status": "sucesso" if succeeded else "erro",
+        "erro": None
+    }
+
+    dropped = sorted({p for _, r in succeeded for p in r['metadados'].get('paginas_descartadas', [])})
+    if dropped:
+        result["metadados"]["paginas_descartadas"] = dropped
+    if pruning:
+        result["metadados"]["poda_paginas"] = pruning.to_metadata()
+
+    if not succeeded:
+        result["erro"] = f"Todas as {len(windows)} janelas falharam: {failed[0][1]['erro']}"
+    elif failed:
+        covered = {page for (start, end), _ in succeeded for page in range(start, end)}
+        missing = [page + 1 for page in kept_pages if page not in covered]
+        logger.warning(
+            f"{len(failed)} janela(s) com erro em {doc_info.get('nome', '')}; "
+            f"paginas sem extracao: {missing or 'nenhuma (cobertas pela sobreposicao)'}"
+        )
+        if missing:
+            result["metadados"]["paginas_nao_extraidas"] = missing
+            alertas = result["dados_catalogados"].setdefault("alertas", [])
+            if isinstance(alertas, list):
+                alertas.append({
+                    "gravidade": "ALTA",
+                    "tipo": "DOCUMENTO_INCOMPLETO",
+                    "mensagem": f"Paginas {missing[0]}-{missing[-1]} nao foram extraidas (erro na janela). "
+                                f"Reprocessar o documento."
+                })
+
+    result["metadados"]["tempo_processamento_s"] = round(time.time() - start_time, 2)
+    return result
+
+
 def load_catalog(escritura_id: str) -> Dict[str, Any]:
     """
     Carrega o catalogo de uma escritura.
@@ -1169,11 +3176,94 @@ def load_catalog(escritura_id: str) -> Dict[str, Any]:
     return catalog
 
 
+def skip_preflight_rejections(arquivos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Remove os arquivos rejeitados no preflight do inventario (ver preflight.py).
+
+    Args:
+        arquivos: Arquivos do catalogo
+
+    Returns:
+        Arquivos a extrair
+    """
+    kept = []
+    for arquivo in arquivos:
+        rejection = preflight_rejection(arquivo)
+        if rejection:
+            logger.warning(f"Ignorado pelo preflight: {arquivo['nome']} ({rejection})")
+            continue
+        kept.append(arquivo)
+    return kept
+
+
+def partial_data_path(output_dir: Path, doc_info: Dict[str, Any]) -> Path:
+    """Caminho dos dados parciais (streaming) de um documento."""
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    return output_dir / PARTIAL_DIR_NAME / f"{doc_info['id']}_{tipo}.json"
+
+
+def partial_data_writer(
+    output_dir: Path,
+    doc_info: Dict[str, Any],
+    options: ExtractionOptions
+) -> Optional[Callable[[Dict[str, Any]], None]]:
+    """
+    Retorna o on_data que grava os dados_catalogados assim que chegam no streaming.
+
+    Os dados vao para {output_dir}/parcial/, fora do glob do map_to_fields,
+    e o arquivo e removido quando o resultado final e salvo.
+
+    Args:
+        output_dir: Diretorio de saida da escritura
+        doc_info: Informacoes do documento do catalogo
+        options: Opcoes de carregamento/envio
+
+    Returns:
+        Funcao on_data, ou None sem options.stream
+    """
+    if not options.stream:
+        return None
+    path = partial_data_path(output_dir, doc_info)
+
+    def write_partial(dados: Dict[str, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        parcial = {
+            'id': doc_info['id'],
+            'nome_arquivo': doc_info['nome'],
+            'tipo_documento': doc_info.get('tipo_documento', 'OUTRO'),
+            'status': 'parcial',
+            'data_dados': datetime.now().isoformat(),
+            'dados_catalogados': dados
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(parcial, f, ensure_ascii=False, indent=2)
+        logger.info(f"Dados parciais gravados: {path.name}")
+
+    return write_partial
+
+
+def save_extraction_result(output_dir: Path, doc_info: Dict[str, Any], resultado: Dict[str, Any]) -> None:
+    """
+    Salva o resultado individual de um documento e remove seus dados parciais.
+
+    Args:
+        output_dir: Diretorio de saida da escritura
+        doc_info: Informacoes do documento do catalogo
+        resultado: Resultado da extracao
+    """
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    output_file = output_dir / f"{doc_info['id']}_{tipo}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    partial_data_path(output_dir, doc_info).unlink(missing_ok=True)
+
+
 def run_extraction(
     escritura_id: str,
     limit: Optional[int] = None,
     tipo_filtro: Optional[str] = None,
-    verbose: bool = False
+    verbose: bool = False,
+    options: Optional[ExtractionOptions] = None
 ) -> Dict[str, Any]:
     """
     Executa extracao contextual para toda a escritura.
@@ -1183,11 +3273,13 @@ def run_extraction(
         limit: Limite de arquivos a processar
         tipo_filtro: Filtrar por tipo de documento
         verbose: Modo verbose
+        options: Opcoes de carregamento/envio de documentos
 
     Returns:
         Estatisticas e resultados da extracao
     """
     start_time = datetime.now()
+    options = options or ExtractionOptions()
 
     # Configura Gemini
     api_key = load_environment()
@@ -1201,6 +3293,7 @@ def run_extraction(
 
     # Filtra apenas arquivos classificados com sucesso (exclui erros de classificacao)
     arquivos = [a for a in arquivos if a.get('tipo_documento') is not None]
+    arquivos = skip_preflight_rejections(arquivos)
 
     # Filtra por tipo se especificado
     if tipo_filtro:
@@ -1229,6 +3322,9 @@ def run_extraction(
     logger.info(f"  Escritura: {escritura_id}")
     logger.info(f"  Total de arquivos: {total}")
     logger.info(f"  Modelo: {GEMINI_MODEL}")
+    logger.info(f"  Modo PDF: {options.pdf_mode}")
+    if options.pdf_native_types:
+        logger.info(f"  PDF nativo para: {', '.join(sorted(options.pdf_native_types))}")
     if tipo_filtro:
         logger.info(f"  Filtro de tipo: {tipo_filtro}")
     logger.info(f"  Prompts disponiveis: {len(list_available_prompts())}")
@@ -1250,7 +3346,10 @@ def run_extraction(
         logger.info(f"[{idx}/{total}] Processando: {nome} ({tipo})")
 
         # Processa documento
-        resultado = process_document(client, arquivo, escritura_id)
+        on_data = partial_data_writer(output_dir, arquivo, options)
+        resultado = process_document(
+            client, arquivo, escritura_id, options, on_data=on_data, window_delay=RATE_LIMIT_DELAY
+        )
 
         # Adiciona metadados do catalogo
         resultado['id'] = arquivo['id']
@@ -1271,9 +3370,7 @@ def run_extraction(
         extracoes.append(resultado)
 
         # Salva resultado individual
-        output_file = output_dir / f"{arquivo['id']}_{tipo}.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        save_extraction_result(output_dir, arquivo, resultado)
 
         # Salva progresso
         if idx % SAVE_PROGRESS_INTERVAL == 0:
@@ -1296,10 +3393,24 @@ def run_extraction(
         'tempo_processamento_total': (datetime.now() - start_time).total_seconds(),
         'tempo_medio_por_documento': round(tempo_medio, 2),
         'modelo': GEMINI_MODEL,
+        'modo_pdf': options.pdf_mode,
+        'pdf_nativo_tipos': sorted(options.pdf_native_types),
+        'camada_texto': options.use_text_layer,
+        'recortar_fotos': options.crop_photos,
+        'recortar_cartoes': options.crop_cards,
+        'janela_matricula_paginas': options.window_pages,
+        'podar_matricula': options.prune_matriculas,
+        'saida_json': options.json_output,
+        'streaming': options.stream,
+        'parar_nos_dados': options.stop_on_data,
+        'orcamento_saida': options.output_budgets,
+        'memoria_imagens': get_memory_budget().stats(),
+        'cache_paginas': get_page_cache().stats(),
         'total_arquivos': total,
         'extraidos_sucesso': sucesso,
         'extraidos_erro': erro,
         'taxa_sucesso': round(sucesso / total * 100, 1) if total > 0 else 0,
+        'uso_api': usage_report(extracoes),
         'extracoes': extracoes
     }
 
@@ -1318,6 +3429,8 @@ def run_extraction(
     logger.info(f"  Taxa de sucesso: {resultado_final['taxa_sucesso']}%")
     logger.info(f"  Tempo total: {resultado_final['tempo_processamento_total']:.2f}s")
     logger.info(f"  Tempo medio/doc: {tempo_medio:.2f}s")
+    logger.info(f"  Tokens (usage_metadata): {resultado_final['uso_api']['tokens_total']} "
+                f"em {resultado_final['uso_api']['chamadas']} chamadas")
     logger.info(f"  Saida: {output_dir}")
     logger.info("=" * 60)
 
@@ -1328,6 +3441,60 @@ def run_extraction(
 # FUNCOES DE PROCESSAMENTO PARALELO
 # =============================================================================
 
+@dataclass
+class ParallelWindowedDocument:
+    """
+    Documento em janelas no modo paralelo (process_document_threadsafe).
+
+    Cada janela e submetida ao executor como um request proprio
+    (process_window_threadsafe); quando todas terminam, finish_windowed_document
+    combina os resultados.
+    """
+    doc_info: Dict[str, Any]
+    worker_id: int
+    total_pages: int
+    pruning: Optional[PagePruning]
+    windows: List[Tuple[int, int]]
+    start_time: float
+    window_results: List[Optional[Dict[str, Any]]] = field(default_factory=list)
+
+    @property
+    def done(self) -> bool:
+        """Indica se todas as janelas ja terminaram."""
+        return all(r is not None for r in self.window_results)
+
+
+def finish_parallel_document(
+    resultado: Dict[str, Any],
+    doc_info: Dict[str, Any],
+    output_dir: Path,
+    worker_id: int,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """Adiciona os metadados do catalogo, salva o resultado individual e registra o desfecho."""
+    nome = doc_info['nome']
+
+    # Adiciona metadados do catalogo
+    resultado['id'] = doc_info['id']
+    resultado['nome_arquivo'] = nome
+    resultado['pessoa_relacionada'] = doc_info.get('pessoa_relacionada')
+    resultado['papel_inferido'] = doc_info.get('papel_inferido')
+    resultado['worker_id'] = worker_id
+
+    # Salva resultado individual
+    with _rate_limit_lock:
+        save_extraction_result(output_dir, doc_info, resultado)
+
+    if resultado['status'] == 'sucesso':
+        if verbose:
+            logger.info(f"[Worker {worker_id}] Sucesso: {nome} - "
+                       f"{len(resultado.get('dados_catalogados', {}))} campos, "
+                       f"{resultado['metadados']['tempo_processamento_s']}s")
+    else:
+        logger.warning(f"[Worker {worker_id}] Erro em {nome}: {resultado.get('erro', 'desconhecido')}")
+    return resultado
+
+
 def process_document_threadsafe(
     client: genai.Client,
     doc_info: Dict[str, Any],
@@ -1336,14 +3503,19 @@ def process_document_threadsafe(
     worker_id: int,
     rpm: int,
     num_workers: int,
-    verbose: bool = False
-) -> Dict[str, Any]:
+    verbose: bool = False,
+    options: Optional[ExtractionOptions] = None
+) -> Union[Dict[str, Any], ParallelWindowedDocument]:
     """
     Wrapper thread-safe para processamento de documento com rate limiting.
 
     Usa semaforo global para controlar acesso concorrente e distribui
     o delay de rate limiting entre os workers.
 
+    Documentos em janelas nao sao extraidos aqui: o planejamento volta como
+    ParallelWindowedDocument e run_extraction_parallel submete cada janela
+    como um request proprio, com seu slot no semaforo e seu delay.
+
     Args:
         client: Cliente Gemini configurado
         doc_info: Informacoes do documento do catalogo
@@ -1353,14 +3525,17 @@ def process_document_threadsafe(
         rpm: Requests per minute permitidos
         num_workers: Numero total de workers
         verbose: Modo verbose
+        options: Opcoes de carregamento/envio de documentos
 
     Returns:
-        Dicionario com resultado da extracao
+        Dicionario com resultado da extracao, ou ParallelWindowedDocument
+        com as janelas a extrair
     """
     global _rate_limit_semaphore
 
     nome = doc_info['nome']
     tipo = doc_info.get('tipo_documento', 'OUTRO')
+    options = options or ExtractionOptions()
 
     # Calcula delay distribuido entre workers
     # Se temos 15 RPM e 3 workers, cada worker espera 4s entre suas requisicoes
@@ -1368,33 +3543,23 @@ def process_document_threadsafe(
     delay_per_request = 60.0 / rpm
 
     try:
+        # Planejamento (poda e janelas) nao faz request: fora do semaforo
+        start_time = time.time()
+        pruning, num_pages = plan_document(doc_info, options)
+        if num_pages:
+            windows = plan_document_windows(doc_info, options, num_pages, pruning)
+            return ParallelWindowedDocument(
+                doc_info, worker_id, num_pages, pruning, windows, start_time, [None] * len(windows)
+            )
+
         # Adquire semaforo para controlar concorrencia
         with _rate_limit_semaphore:
             logger.info(f"[Worker {worker_id}] Processando: {nome} ({tipo})")
 
             # Processa o documento
-            resultado = process_document(client, doc_info, escritura_id)
-
-            # Adiciona metadados do catalogo
-            resultado['id'] = doc_info['id']
-            resultado['nome_arquivo'] = nome
-            resultado['pessoa_relacionada'] = doc_info.get('pessoa_relacionada')
-            resultado['papel_inferido'] = doc_info.get('papel_inferido')
-            resultado['worker_id'] = worker_id
-
-            # Salva resultado individual
-            output_file = output_dir / f"{doc_info['id']}_{tipo}.json"
-            with _rate_limit_lock:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(resultado, f, ensure_ascii=False, indent=2)
-
-            if resultado['status'] == 'sucesso':
-                if verbose:
-                    logger.info(f"[Worker {worker_id}] Sucesso: {nome} - "
-                               f"{len(resultado.get('dados_catalogados', {}))} campos, "
-                               f"{resultado['metadados']['tempo_processamento_s']}s")
-            else:
-                logger.warning(f"[Worker {worker_id}] Erro em {nome}: {resultado.get('erro', 'desconhecido')}")
+            on_data = partial_data_writer(output_dir, doc_info, options)
+            resultado = extract_document(client, doc_info, options, pruning=pruning, on_data=on_data)
+            finish_parallel_document(resultado, doc_info, output_dir, worker_id, verbose)
 
             # Rate limiting: espera antes de liberar para proximo
             time.sleep(delay_per_request)
@@ -1414,6 +3579,60 @@ def process_document_threadsafe(
         }
 
 
+def process_window_threadsafe(
+    client: genai.Client,
+    document: ParallelWindowedDocument,
+    window_idx: int,
+    rpm: int,
+    options: ExtractionOptions
+) -> Dict[str, Any]:
+    """
+    Extrai uma janela de um documento no modo paralelo, como um request proprio.
+
+    Cada janela ocupa um slot do semaforo e espera o delay de rate limit,
+    como um documento inteiro em process_document_threadsafe.
+
+    Args:
+        client: Cliente Gemini configurado
+        document: Documento em janelas
+        window_idx: Indice da janela em document.windows
+        rpm: Requests per minute permitidos
+        options: Opcoes de carregamento/envio de documentos
+
+    Returns:
+        Dicionario com resultado da extracao da janela
+    """
+    start, end = document.windows[window_idx]
+    with _rate_limit_semaphore:
+        logger.info(
+            f"[Worker {document.worker_id}] Processando: {document.doc_info['nome']} "
+            f"(janela {window_idx + 1}/{len(document.windows)}, paginas {start + 1}-{end})"
+        )
+        try:
+            resultado = extract_document(
+                client, document.doc_info, options, document.windows[window_idx],
+                document.total_pages, document.pruning
+            )
+        except Exception as e:
+            resultado = new_extraction_result(document.doc_info)
+            record_extraction_error(resultado, document.doc_info, e)
+        time.sleep(60.0 / rpm)
+    return resultado
+
+
+def finish_windowed_document(
+    document: ParallelWindowedDocument,
+    output_dir: Path,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """Combina as janelas de um documento do modo paralelo e salva o resultado."""
+    resultado = combine_window_results(
+        document.doc_info, document.total_pages, document.pruning, document.windows,
+        document.window_results, document.start_time
+    )
+    return finish_parallel_document(resultado, document.doc_info, output_dir, document.worker_id, verbose)
+
+
 def calculate_optimal_workers(rpm: int, base_delay: float = RATE_LIMIT_DELAY) -> int:
     """
     Calcula o numero otimo de workers baseado no RPM disponivel.
@@ -1445,29 +3664,137 @@ def calculate_optimal_workers(rpm: int, base_delay: float = RATE_LIMIT_DELAY) ->
     return min(recommended_workers, 10)
 
 
-def run_extraction_parallel(
+def write_extraction_report(
     escritura_id: str,
-    limit: Optional[int] = None,
-    tipo_filtro: Optional[str] = None,
-    workers: int = DEFAULT_WORKERS,
-    rpm: int = DEFAULT_RPM_FREE,
-    verbose: bool = False,
-    force_workers: bool = False
+    start_time: datetime,
+    output_dir: Path,
+    options: ExtractionOptions,
+    total: int,
+    extracoes: List[Dict[str, Any]],
+    erros_detalhados: List[Dict[str, str]],
+    mode_title: str,
+    run_info: Dict[str, Any],
+    summary_lines: List[str]
 ) -> Dict[str, Any]:
     """
-    Executa extracao contextual em paralelo para toda a escritura.
-
-    Usa ThreadPoolExecutor para processar multiplos documentos simultaneamente,
-    com controle de rate limiting via semaforo.
+    Monta e salva o relatorio dos modos paralelo e assincrono e loga o resumo final.
 
     Args:
         escritura_id: ID da escritura
-        limit: Limite de arquivos a processar
-        tipo_filtro: Filtrar por tipo de documento
-        workers: Numero de workers paralelos
-        rpm: Requests per minute permitidos pela API
+        start_time: Inicio da execucao
+        output_dir: Diretorio de saida da escritura
+        options: Opcoes de carregamento/envio de documentos
+        total: Numero de arquivos enviados ao modo
+        extracoes: Resultados por documento
+        erros_detalhados: Arquivo e erro de cada documento que falhou
+        mode_title: Nome do modo no log (ex: 'PARALELO')
+        run_info: Campos proprios do modo, logo apos data_conclusao (modo, rpm...)
+        summary_lines: Linhas proprias do modo no resumo final
+
+    Returns:
+        Estatisticas e resultados da extracao (relatorio_contextual.json)
+    """
+    # Ordena resultados por ID para manter consistencia
+    extracoes.sort(key=lambda x: x.get('id', ''))
+    sucesso = sum(1 for e in extracoes if e['status'] == 'sucesso')
+    erro = total - sucesso
+
+    # Calcula estatisticas
+    tempos = [e['metadados']['tempo_processamento_s'] for e in extracoes if e.get('metadados')]
+    tempo_medio = sum(tempos) / len(tempos) if tempos else 0
+    tempo_total = (datetime.now() - start_time).total_seconds()
+
+    # Resultado final
+    resultado_final = {
+        'escritura_id': escritura_id,
+        'data_extracao': start_time.isoformat(),
+        'data_conclusao': datetime.now().isoformat(),
+        **run_info,
+        'tempo_processamento_total': tempo_total,
+        'tempo_medio_por_documento': round(tempo_medio, 2),
+        'throughput_docs_por_minuto': round(total / (tempo_total / 60), 2) if tempo_total > 0 else 0,
+        'modelo': GEMINI_MODEL,
+        'modo_pdf': options.pdf_mode,
+        'pdf_nativo_tipos': sorted(options.pdf_native_types),
+        'camada_texto': options.use_text_layer,
+        'recortar_fotos': options.crop_photos,
+        'recortar_cartoes': options.crop_cards,
+        'janela_matricula_paginas': options.window_pages,
+        'podar_matricula': options.prune_matriculas,
+        'saida_json': options.json_output,
+        'streaming': options.stream,
+        'parar_nos_dados': options.stop_on_data,
+        'orcamento_saida': options.output_budgets,
+        'memoria_imagens': get_memory_budget().stats(),
+        'cache_paginas': get_page_cache().stats(),
+        'total_arquivos': total,
+        'extraidos_sucesso': sucesso,
+        'extraidos_erro': erro,
+        'taxa_sucesso': round(sucesso / total * 100, 1) if total > 0 else 0,
+        'uso_api': usage_report(extracoes),
+        'erros_detalhados': erros_detalhados,
+        'extracoes': extracoes
+    }
+
+    # Salva relatorio completo
+    report_path = output_dir / 'relatorio_contextual.json'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(resultado_final, f, ensure_ascii=False, indent=2)
+
+    # Resumo final
+    logger.info("=" * 60)
+    logger.info(f"EXTRACAO CONTEXTUAL CONCLUIDA (MODO {mode_title})")
+    logger.info(f"  Escritura: {escritura_id}")
+    logger.info(f"  Total processados: {total}")
+    logger.info(f"  Sucesso: {sucesso}")
+    logger.info(f"  Erros: {erro}")
+    logger.info(f"  Taxa de sucesso: {resultado_final['taxa_sucesso']}%")
+    logger.info(f"  Tempo total: {tempo_total:.2f}s")
+    logger.info(f"  Tempo medio/doc: {tempo_medio:.2f}s")
+    logger.info(f"  Tokens (usage_metadata): {resultado_final['uso_api']['tokens_total']} "
+                f"em {resultado_final['uso_api']['chamadas']} chamadas")
+    logger.info(f"  Throughput: {resultado_final['throughput_docs_por_minuto']:.1f} docs/min")
+    for line in summary_lines:
+        logger.info(f"  {line}")
+    logger.info(f"  Saida: {output_dir}")
+
+    if erros_detalhados:
+        logger.info("  Erros encontrados:")
+        for err in erros_detalhados[:5]:  # Mostra ate 5 erros
+            logger.info(f"    - {err['arquivo']}: {err['erro'][:50]}...")
+        if len(erros_detalhados) > 5:
+            logger.info(f"    ... e mais {len(erros_detalhados) - 5} erros")
+
+    logger.info("=" * 60)
+
+    return resultado_final
+
+
+def run_extraction_parallel(
+    escritura_id: str,
+    limit: Optional[int] = None,
+    tipo_filtro: Optional[str] = None,
+    workers: int = DEFAULT_WORKERS,
+    rpm: int = DEFAULT_RPM_FREE,
+    verbose: bool = False,
+    force_workers: bool = False,
+    options: Optional[ExtractionOptions] = None
+) -> Dict[str, Any]:
+    """
+    Executa extracao contextual em paralelo para toda a escritura.
+
+    Usa ThreadPoolExecutor para processar multiplos documentos simultaneamente,
+    com controle de rate limiting via semaforo.
+
+    Args:
+        escritura_id: ID da escritura
+        limit: Limite de arquivos a processar
+        tipo_filtro: Filtrar por tipo de documento
+        workers: Numero de workers paralelos
+        rpm: Requests per minute permitidos pela API
         verbose: Modo verbose
         force_workers: Se True, usa o numero de workers solicitado sem auto-ajuste
+        options: Opcoes de carregamento/envio de documentos
 
     Returns:
         Estatisticas e resultados da extracao
@@ -1475,6 +3802,7 @@ def run_extraction_parallel(
     global _rate_limit_semaphore
 
     start_time = datetime.now()
+    options = options or ExtractionOptions()
 
     # Calcula workers otimos e avisa se diferente do solicitado
     optimal_workers = calculate_optimal_workers(rpm)
@@ -1505,6 +3833,7 @@ def run_extraction_parallel(
 
     # Filtra apenas arquivos classificados com sucesso (exclui erros de classificacao)
     arquivos = [a for a in arquivos if a.get('tipo_documento') is not None]
+    arquivos = skip_preflight_rejections(arquivos)
 
     # Filtra por tipo se especificado
     if tipo_filtro:
@@ -1538,6 +3867,9 @@ def run_extraction_parallel(
     logger.info(f"  Workers: {workers}")
     logger.info(f"  RPM configurado: {rpm}")
     logger.info(f"  Modelo: {GEMINI_MODEL}")
+    logger.info(f"  Modo PDF: {options.pdf_mode}")
+    if options.pdf_native_types:
+        logger.info(f"  PDF nativo para: {', '.join(sorted(options.pdf_native_types))}")
     if tipo_filtro:
         logger.info(f"  Filtro de tipo: {tipo_filtro}")
     logger.info(f"  Prompts disponiveis: {len(list_available_prompts())}")
@@ -1555,8 +3887,9 @@ def run_extraction_parallel(
 
     # Processa em paralelo usando ThreadPoolExecutor
     with ThreadPoolExecutor(max_workers=workers) as executor:
-        # Submete todas as tarefas
-        future_to_doc = {
+        # Submete todas as tarefas; janelas de documentos longos entram depois,
+        # como tarefas proprias (nenhuma tarefa espera outra, sem risco de deadlock)
+        pending = {
             executor.submit(
                 process_document_threadsafe,
                 client=client,
@@ -1566,19 +3899,46 @@ def run_extraction_parallel(
                 worker_id=idx % workers,
                 rpm=rpm,
                 num_workers=workers,
-                verbose=verbose
-            ): (idx, arquivo)
+                verbose=verbose,
+                options=options
+            ): (arquivo, None)
             for idx, arquivo in enumerate(arquivos, 1)
         }
 
         # Coleta resultados conforme completam
         completed = 0
-        for future in as_completed(future_to_doc):
-            idx, arquivo = future_to_doc[future]
-            completed += 1
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                arquivo, window = pending.pop(future)
 
-            try:
-                resultado = future.result()
+                try:
+                    resultado = future.result()
+                    if isinstance(resultado, ParallelWindowedDocument):
+                        # Cada janela e um request proprio, com seu slot no semaforo
+                        for window_idx in range(len(resultado.windows)):
+                            window_future = executor.submit(
+                                process_window_threadsafe, client, resultado, window_idx, rpm, options
+                            )
+                            pending[window_future] = (arquivo, (resultado, window_idx))
+                        continue
+                    if window is not None:
+                        document, window_idx = window
+                        document.window_results[window_idx] = resultado
+                        if not document.done:
+                            continue
+                        resultado = finish_windowed_document(document, output_dir, verbose)
+                except Exception as e:
+                    completed += 1
+                    erro += 1
+                    erros_detalhados.append({
+                        'arquivo': arquivo['nome'],
+                        'erro': str(e)
+                    })
+                    logger.error(f"Excecao ao processar {arquivo['nome']}: {e}")
+                    continue
+
+                completed += 1
                 extracoes.append(resultado)
 
                 if resultado['status'] == 'sucesso':
@@ -1595,71 +3955,426 @@ def run_extraction_parallel(
                     logger.info(f"Progresso: {completed}/{total} "
                                f"(sucesso: {sucesso}, erro: {erro})")
 
+    return write_extraction_report(
+        escritura_id, start_time, output_dir, options, total, extracoes, erros_detalhados,
+        mode_title='PARALELO',
+        run_info={'modo': 'paralelo', 'workers': workers, 'rpm': rpm},
+        summary_lines=[f"Workers utilizados: {workers}"]
+    )
+
+
+# =============================================================================
+# MOTOR ASSINCRONO
+# =============================================================================
+
+class AsyncRateLimiter:
+    """
+    Espacamento global de requests (60/rpm segundos) sem bloquear o event loop.
+
+    Cada chamada reserva o proximo horario livre e so entao aguarda
+    (asyncio.sleep) ate ele: ninguem dorme segurando um recurso
+    compartilhado, e a espera de um request nao atrasa a preparacao dos
+    outros.
+    """
+
+    def __init__(self, rpm: int):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self.total_wait_s = 0.0
+
+    async def acquire(self) -> None:
+        """Aguarda o proximo horario livre para enviar um request."""
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        # Sem await entre a leitura e a escrita: a reserva e atomica no event loop
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            self.total_wait_s += slot - now
+            await asyncio.sleep(slot - now)
+
+
+class AsyncExtractionEngine:
+    """
+    Extrai documentos com o cliente assincrono do Gemini (client.aio).
+
+    - Ate max_in_flight requests ficam abertos na API ao mesmo tempo
+      (asyncio.Semaphore), independente de quantos documentos estejam
+      sendo preparados
+    - O ritmo de envio e controlado por AsyncRateLimiter
+    - Carregar/renderizar documentos e planejar poda/janelas roda em
+      prep_workers threads (run_in_executor), em paralelo com os requests
+    - No maximo max_in_flight + prep_workers documentos/janelas ficam
+      carregados em memoria ao mesmo tempo (semaforo de admissao)
+    - Janelas de matriculas sao requests independentes, cada uma passando
+      pelo limite de requests abertos e pelo AsyncRateLimiter
+
+    Deve ser criado dentro do event loop (run_extraction_async).
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        options: ExtractionOptions,
+        rpm: int,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        prep_workers: int = ASYNC_PREP_WORKERS,
+        max_retries: int = MAX_RETRIES
+    ):
+        self.client = client
+        self.options = options
+        self.max_in_flight = max(1, max_in_flight)
+        self.prep_workers = max(1, prep_workers)
+        self.max_retries = max_retries
+        self.rate_limiter = AsyncRateLimiter(rpm)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        self._admission = asyncio.Semaphore(self.max_in_flight + self.prep_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.prep_workers, thread_name_prefix='prep-async')
+        self._open_requests = 0
+        self._stats = {'requests': 0, 'retries': 0, 'pico_em_voo': 0}
+
+    def close(self) -> None:
+        """Encerra as threads de preparacao."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatisticas do motor para o relatorio."""
+        return {
+            **self._stats,
+            'max_em_voo': self.max_in_flight,
+            'workers_preparacao': self.prep_workers,
+            'espera_rate_limit_s': round(self.rate_limiter.total_wait_s, 2)
+        }
+
+    def run_in_background(self, func: Any, *args: Any) -> asyncio.Future:
+        """Agenda uma funcao bloqueante nas threads de preparacao, sem aguardar (ex: gravacoes)."""
+        return asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(func, *args))
+
+    async def _run_blocking(self, func: Any, *args: Any) -> Any:
+        """Executa uma funcao bloqueante nas threads de preparacao."""
+        return await self.run_in_background(func, *args)
+
+    async def _generate(
+        self,
+        contents: List[Any],
+        response_schema: Optional[Dict[str, Any]],
+        stream: Optional[StreamingResponse],
+        usage: Optional[CallUsage],
+        max_output_tokens: int
+    ) -> str:
+        """Um request ao Gemini dentro do limite de requests abertos."""
+        async with self._in_flight:
+            # O horario e reservado ja com a vaga garantida: o envio sai no horario reservado
+            await self.rate_limiter.acquire()
+            self._open_requests += 1
+            self._stats['requests'] += 1
+            self._stats['pico_em_voo'] = max(self._stats['pico_em_voo'], self._open_requests)
+            try:
+                return await generate_with_fallback_async(
+                    self.client, contents, response_schema, stream, usage, max_output_tokens
+                )
+            finally:
+                self._open_requests -= 1
+
+    async def call_with_retry(
+        self,
+        contents: List[Any],
+        response_schema: Optional[Dict[str, Any]] = None,
+        stream: Optional[StreamingResponse] = None,
+        usage: Optional[CallUsage] = None,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS
+    ) -> str:
+        """
+        Chama o Gemini com retry e backoff exponencial (como call_gemini_with_retry).
+
+        Raises:
+            GeminiExtractionError: Se todas as tentativas falharem
+        """
+        last_error = None
+
+        for attempt in range(self.max_retries):
+            try:
+                return await self._generate(contents, response_schema, stream, usage, max_output_tokens)
+
             except Exception as e:
-                erro += 1
-                erros_detalhados.append({
-                    'arquivo': arquivo['nome'],
-                    'erro': str(e)
-                })
-                logger.error(f"Excecao ao processar {arquivo['nome']}: {e}")
+                last_error = e
+                wait_time = (2 ** attempt) * 2  # 2, 4, 8 segundos
+
+                logger.warning(f"Tentativa {attempt + 1}/{self.max_retries} falhou: {e}")
+
+                if attempt < self.max_retries - 1:
+                    self._stats['retries'] += 1
+                    logger.info(f"Aguardando {wait_time}s antes de retry...")
+                    await asyncio.sleep(wait_time)
+
+        raise GeminiExtractionError(f"Falha apos {self.max_retries} tentativas: {last_error}")
+
+    async def extract(
+        self,
+        doc_info: Dict[str, Any],
+        page_range: Optional[Tuple[int, int]] = None,
+        total_pages: int = 0,
+        pruning: Optional[PagePruning] = None,
+        on_data: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Extrai um documento ou uma janela ja planejados (equivale a process_document)."""
+        start_time = time.time()
+        result = new_extraction_result(doc_info)
+        usage = CallUsage()
+
+        async with self._admission:
+            try:
+                request = await self._run_blocking(
+                    prepare_extraction_request, doc_info, self.options, result, page_range, total_pages, pruning
+                )
+                stream = new_response_stream(self.options, request, on_data)
+                response = await self.call_with_retry(
+                    request_contents(request), request.response_schema, stream, usage, request.max_output_tokens
+                )
+                apply_extraction_response(result, request, response, stream)
+            except Exception as e:
+                record_extraction_error(result, doc_info, e)
+            finally:
+                record_api_usage(result, usage)
+                result["metadados"]["tempo_processamento_s"] = round(time.time() - start_time, 2)
 
-    # Ordena resultados por ID para manter consistencia
-    extracoes.sort(key=lambda x: x.get('id', ''))
+        return result
 
-    # Calcula estatisticas
-    tempos = [e['metadados']['tempo_processamento_s'] for e in extracoes if e.get('metadados')]
-    tempo_medio = sum(tempos) / len(tempos) if tempos else 0
-    tempo_total = (datetime.now() - start_time).total_seconds()
+    async def process_document(
+        self,
+        doc_info: Dict[str, Any],
+        on_data: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Processa um documento completo (poda e janelas como process_document).
 
-    # Resultado final
-    resultado_final = {
-        'escritura_id': escritura_id,
-        'data_extracao': start_time.isoformat(),
-        'data_conclusao': datetime.now().isoformat(),
-        'modo': 'paralelo',
-        'workers': workers,
-        'rpm': rpm,
-        'tempo_processamento_total': tempo_total,
-        'tempo_medio_por_documento': round(tempo_medio, 2),
-        'throughput_docs_por_minuto': round(total / (tempo_total / 60), 2) if tempo_total > 0 else 0,
-        'modelo': GEMINI_MODEL,
-        'total_arquivos': total,
-        'extraidos_sucesso': sucesso,
-        'extraidos_erro': erro,
-        'taxa_sucesso': round(sucesso / total * 100, 1) if total > 0 else 0,
-        'erros_detalhados': erros_detalhados,
-        'extracoes': extracoes
-    }
+        Args:
+            doc_info: Informacoes do documento do catalogo
+            on_data: Com options.stream, chamado com os dados_catalogados
+                     assim que o bloco JSON fecha (nao usado em janelas)
 
-    # Salva relatorio completo
-    report_path = output_dir / 'relatorio_contextual.json'
-    with open(report_path, 'w', encoding='utf-8') as f:
-        json.dump(resultado_final, f, ensure_ascii=False, indent=2)
+        Returns:
+            Dicionario com resultado da extracao
+        """
+        start_time = time.time()
+        try:
+            # A admissao e liberada antes das janelas, que a pedem de novo uma a uma
+            async with self._admission:
+                pruning, num_pages = await self._run_blocking(plan_document, doc_info, self.options)
+        except Exception as e:
+            result = new_extraction_result(doc_info)
+            record_extraction_error(result, doc_info, e)
+            return result
+
+        if not num_pages:
+            return await self.extract(doc_info, pruning=pruning, on_data=on_data)
+
+        # O planejamento abre o PDF para achar paginas em branco: fora do event loop
+        windows = await self._run_blocking(plan_document_windows, doc_info, self.options, num_pages, pruning)
+        window_results = await asyncio.gather(
+            *(self.extract(doc_info, window, num_pages, pruning) for window in windows)
+        )
+        return combine_window_results(doc_info, num_pages, pruning, windows, list(window_results), start_time)
+
+
+async def process_document_async(
+    engine: AsyncExtractionEngine,
+    doc_info: Dict[str, Any],
+    output_dir: Path,
+    verbose: bool = False
+) -> Dict[str, Any]:
+    """
+    Processa um documento no motor assincrono e salva o resultado individual.
+
+    As gravacoes (dados parciais do streaming e resultado final) rodam nas
+    threads de preparacao, fora do event loop; as parciais terminam antes do
+    resultado final, que remove o arquivo parcial.
+
+    Args:
+        engine: Motor assincrono
+        doc_info: Informacoes do documento do catalogo
+        output_dir: Diretorio para salvar resultados
+        verbose: Modo verbose
+
+    Returns:
+        Dicionario com resultado da extracao
+    """
+    nome = doc_info['nome']
+    tipo = doc_info.get('tipo_documento', 'OUTRO')
+    logger.info(f"Processando: {nome} ({tipo})")
+
+    write_partial = partial_data_writer(output_dir, doc_info, engine.options)
+    partial_writes: List[asyncio.Future] = []
+
+    def on_data(dados: Dict[str, Any]) -> None:
+        partial_writes.append(engine.run_in_background(write_partial, dados))
+
+    resultado = await engine.process_document(doc_info, on_data if write_partial else None)
+
+    # Adiciona metadados do catalogo
+    resultado['id'] = doc_info['id']
+    resultado['nome_arquivo'] = nome
+    resultado['pessoa_relacionada'] = doc_info.get('pessoa_relacionada')
+    resultado['papel_inferido'] = doc_info.get('papel_inferido')
+
+    # Salva resultado individual (depois das parciais, para nao recriar o arquivo parcial)
+    for error in await asyncio.gather(*partial_writes, return_exceptions=True):
+        if isinstance(error, Exception):
+            logger.warning(f"Falha ao gravar dados parciais de {nome}: {error}")
+    await engine.run_in_background(save_extraction_result, output_dir, doc_info, resultado)
+
+    if resultado['status'] == 'sucesso':
+        if verbose:
+            logger.info(f"Sucesso: {nome} - "
+                        f"{len(resultado.get('dados_catalogados', {}))} campos, "
+                        f"{resultado['metadados']['tempo_processamento_s']}s")
+    else:
+        logger.warning(f"Erro em {nome}: {resultado.get('erro', 'desconhecido')}")
+
+    return resultado
+
+
+async def _run_extraction_async(
+    client: genai.Client,
+    arquivos: List[Dict[str, Any]],
+    output_dir: Path,
+    rpm: int,
+    max_in_flight: int,
+    verbose: bool,
+    options: ExtractionOptions
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Processa os arquivos no event loop; retorna (extracoes, estatisticas do motor)."""
+    engine = AsyncExtractionEngine(client, options, rpm, max_in_flight)
+    total = len(arquivos)
+    extracoes = []
+    sucesso = 0
+
+    try:
+        tasks = [
+            asyncio.ensure_future(process_document_async(engine, arquivo, output_dir, verbose))
+            for arquivo in arquivos
+        ]
+        for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+            resultado = await task
+            extracoes.append(resultado)
+            sucesso += resultado['status'] == 'sucesso'
+
+            # Log de progresso
+            if completed % SAVE_PROGRESS_INTERVAL == 0 or completed == total:
+                logger.info(f"Progresso: {completed}/{total} "
+                            f"(sucesso: {sucesso}, erro: {completed - sucesso})")
+    finally:
+        engine.close()
+
+    return extracoes, engine.stats()
+
+
+def run_extraction_async(
+    escritura_id: str,
+    limit: Optional[int] = None,
+    tipo_filtro: Optional[str] = None,
+    rpm: int = DEFAULT_RPM_FREE,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    verbose: bool = False,
+    options: Optional[ExtractionOptions] = None
+) -> Dict[str, Any]:
+    """
+    Executa extracao contextual no motor assincrono (AsyncExtractionEngine).
+
+    Diferente do modo paralelo, nenhum worker dorme segurando o semaforo:
+    o numero de requests abertos na API (max_in_flight) e o ritmo de envio
+    (rpm) sao controlados separadamente, e a preparacao dos proximos
+    documentos continua enquanto os requests aguardam resposta.
+
+    Args:
+        escritura_id: ID da escritura
+        limit: Limite de arquivos a processar
+        tipo_filtro: Filtrar por tipo de documento
+        rpm: Requests per minute permitidos pela API
+        max_in_flight: Maximo de requests simultaneos na API
+        verbose: Modo verbose
+        options: Opcoes de carregamento/envio de documentos
+
+    Returns:
+        Estatisticas e resultados da extracao
+    """
+    start_time = datetime.now()
+    options = options or ExtractionOptions()
+
+    # Configura Gemini
+    api_key = load_environment()
+    client = configure_gemini(api_key)
+
+    # Carrega catalogo
+    catalog = load_catalog(escritura_id)
+
+    # Filtra arquivos
+    arquivos = catalog.get('arquivos', [])
+
+    # Filtra apenas arquivos classificados com sucesso (exclui erros de classificacao)
+    arquivos = [a for a in arquivos if a.get('tipo_documento') is not None]
+    arquivos = skip_preflight_rejections(arquivos)
+
+    # Filtra por tipo se especificado
+    if tipo_filtro:
+        tipo_upper = tipo_filtro.upper()
+        arquivos = [a for a in arquivos if a.get('tipo_documento') == tipo_upper]
+
+    # Aplica limite
+    if limit:
+        arquivos = arquivos[:limit]
+
+    total = len(arquivos)
+
+    if total == 0:
+        logger.warning("Nenhum arquivo para processar")
+        return {
+            'escritura_id': escritura_id,
+            'data_extracao': start_time.isoformat(),
+            'modo': 'assincrono',
+            'max_em_voo': max_in_flight,
+            'rpm': rpm,
+            'total_arquivos': 0,
+            'extraidos_sucesso': 0,
+            'extraidos_erro': 0,
+            'extracoes': []
+        }
 
-    # Resumo final
     logger.info("=" * 60)
-    logger.info("EXTRACAO CONTEXTUAL CONCLUIDA (MODO PARALELO)")
+    logger.info("EXTRACAO CONTEXTUAL COM GEMINI (MODO ASSINCRONO)")
     logger.info(f"  Escritura: {escritura_id}")
-    logger.info(f"  Total processados: {total}")
-    logger.info(f"  Sucesso: {sucesso}")
-    logger.info(f"  Erros: {erro}")
-    logger.info(f"  Taxa de sucesso: {resultado_final['taxa_sucesso']}%")
-    logger.info(f"  Tempo total: {tempo_total:.2f}s")
-    logger.info(f"  Tempo medio/doc: {tempo_medio:.2f}s")
-    logger.info(f"  Throughput: {resultado_final['throughput_docs_por_minuto']:.1f} docs/min")
-    logger.info(f"  Workers utilizados: {workers}")
-    logger.info(f"  Saida: {output_dir}")
+    logger.info(f"  Total de arquivos: {total}")
+    logger.info(f"  Requests simultaneos: {max_in_flight}")
+    logger.info(f"  RPM configurado: {rpm}")
+    logger.info(f"  Modelo: {GEMINI_MODEL}")
+    logger.info(f"  Modo PDF: {options.pdf_mode}")
+    if options.pdf_native_types:
+        logger.info(f"  PDF nativo para: {', '.join(sorted(options.pdf_native_types))}")
+    if tipo_filtro:
+        logger.info(f"  Filtro de tipo: {tipo_filtro}")
+    logger.info(f"  Prompts disponiveis: {len(list_available_prompts())}")
+    logger.info("=" * 60)
 
-    if erros_detalhados:
-        logger.info(f"  Erros encontrados:")
-        for err in erros_detalhados[:5]:  # Mostra ate 5 erros
-            logger.info(f"    - {err['arquivo']}: {err['erro'][:50]}...")
-        if len(erros_detalhados) > 5:
-            logger.info(f"    ... e mais {len(erros_detalhados) - 5} erros")
+    # Diretorio de saida
+    output_dir = TMP_DIR / 'contextual' / escritura_id
+    output_dir.mkdir(parents=True, exist_ok=True)
 
-    logger.info("=" * 60)
+    extracoes, engine_stats = asyncio.run(
+        _run_extraction_async(client, arquivos, output_dir, rpm, max_in_flight, verbose, options)
+    )
 
-    return resultado_final
+    erros_detalhados = [
+        {'arquivo': e['nome_arquivo'], 'erro': e.get('erro') or 'desconhecido'}
+        for e in extracoes if e['status'] != 'sucesso'
+    ]
+
+    return write_extraction_report(
+        escritura_id, start_time, output_dir, options, total, extracoes, erros_detalhados,
+        mode_title='ASSINCRONO',
+        run_info={'modo': 'assincrono', 'max_em_voo': max_in_flight, 'rpm': rpm, 'motor_assincrono': engine_stats},
+        summary_lines=[f"Requests: {engine_stats['requests']} (pico de {engine_stats['pico_em_voo']} simultaneos)"]
+    )
 
 
 def main():
@@ -1679,6 +4394,15 @@ Exemplos:
   python extract_with_gemini.py FC_515_124_p280509 -p --workers 3
   python extract_with_gemini.py FC_515_124_p280509 -p -w 5 --rpm 150
 
+  # Motor assincrono (client.aio, requests simultaneos limitados por --em-voo)
+  python extract_with_gemini.py FC_515_124_p280509 --async --rpm 150 --em-voo 16
+
+  # Comparar com o modo legado (todas as paginas em uma imagem)
+  python extract_with_gemini.py FC_515_124_p280509 --pdf-mode concatenado
+
+  # Enviar PDFs de certidoes diretamente, sem rasterizar
+  python extract_with_gemini.py FC_515_124_p280509 --pdf-nativo CNDT,ITBI,VVR
+
 O script usa a visao multimodal do Gemini 3 Flash para interpretar documentos
 de cartorio DIRETAMENTE (sem OCR), gerando reescrita organizada, explicacao
 contextual e dados estruturados.
@@ -1690,6 +4414,11 @@ Modo paralelo:
   - O numero de workers e ajustado automaticamente baseado no RPM
   - Use --force-workers para ignorar o auto-ajuste (use com cuidado)
 
+Modo assincrono:
+  - Use --async para o motor assincrono (sem workers dormindo no semaforo)
+  - --em-voo define o maximo de requests simultaneos na API
+  - --rpm controla o ritmo de envio, independente de --em-voo
+
 Prompts disponiveis em: execution/prompts/
         """
     )
@@ -1756,6 +4485,159 @@ Prompts disponiveis em: execution/prompts/
              'Use com cuidado: pode causar erros de rate limiting.'
     )
 
+    parser.add_argument(
+        '--async',
+        action='store_true',
+        dest='use_async',
+        help='Ativa o motor assincrono (client.aio): requests simultaneos limitados por --em-voo, '
+             'ritmo por --rpm e preparacao dos documentos em paralelo com as chamadas'
+    )
+
+    parser.add_argument(
+        '--em-voo',
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f'Maximo de requests simultaneos na API no modo --async '
+             f'(padrao: {DEFAULT_MAX_IN_FLIGHT}, env GEMINI_EM_VOO)'
+    )
+
+    parser.add_argument(
+        '--pdf-mode',
+        choices=PDF_MODES,
+        default=DEFAULT_PDF_MODE,
+        help=f'Como enviar PDFs ao Gemini (padrao: {DEFAULT_PDF_MODE}). '
+             f'"{PDF_MODE_PAGES}" envia uma imagem por pagina no mesmo request; '
+             f'"{PDF_MODE_CONCAT}" empilha todas as paginas em uma unica imagem (legado, para comparacao); '
+             f'"{PDF_MODE_NATIVE}" envia o PDF original sem rasterizar.'
+    )
+
+    parser.add_argument(
+        '--pdf-nativo',
+        type=str,
+        default=None,
+        metavar='TIPOS',
+        help='Tipos de documento cujos PDFs sao enviados no modo nativo, separados por virgula '
+             '(ex: CNDT,ITBI,VVR). Padrao: variavel PDF_NATIVO_TIPOS do .env.'
+    )
+
+    parser.add_argument(
+        '--render-workers',
+        type=int,
+        default=RENDER_WORKERS,
+        metavar='N',
+        help=f'Processos para renderizar PDFs longos (>= {PARALLEL_RENDER_MIN_PAGES} paginas) em faixas '
+             f'paralelas (default: {RENDER_WORKERS}, variavel RENDER_WORKERS). Use 1 para desabilitar.'
+    )
+
+    parser.add_argument(
+        '--manter-paginas-brancas',
+        action='store_true',
+        help=f'Nao descarta paginas em branco de PDFs (por padrao, paginas com menos de '
+             f'{BLANK_PAGE_INK_RATIO:.1%} de tinta sao removidas; variavel BLANK_PAGE_INK_RATIO)'
+    )
+
+    parser.add_argument(
+        '--sem-camada-texto',
+        action='store_true',
+        help=f'Desativa o envio como texto de PDFs nato-digitais ({", ".join(sorted(TEXT_LAYER_TYPES))}); '
+             'todos os PDFs sao rasterizados.'
+    )
+
+    parser.add_argument(
+        '--sem-recorte-cartoes',
+        action='store_true',
+        default=not DEFAULT_CROP_CARDS,
+        help='Envia RG/CNH inteiros, sem recortar os cartoes (frente e verso) da foto ou da '
+             'pagina escaneada (variavel RECORTAR_CARTOES=0).'
+    )
+
+    parser.add_argument(
+        '--janela-matricula',
+        type=int,
+        default=MATRICULA_WINDOW_PAGES,
+        metavar='N',
+        help=f'Matriculas com mais de N paginas sao extraidas em janelas de N paginas '
+             f'(sobreposicao de {MATRICULA_WINDOW_OVERLAP}) e os resultados combinados '
+             f'(default: {MATRICULA_WINDOW_PAGES}, variavel JANELA_MATRICULA_PAGINAS). Use 0 para desabilitar.'
+    )
+
+    parser.add_argument(
+        '--podar-matricula',
+        action='store_true',
+        default=DEFAULT_PRUNE_MATRICULAS,
+        help='Envia so as paginas vigentes de matriculas (abertura, atos desde a ultima transmissao, '
+             'onus nao cancelados e paginas finais), escolhidas pela camada de texto ou pelo OCR; '
+             'as faixas removidas ficam em metadados.poda_paginas (variavel PODAR_MATRICULA). '
+             'Sem texto legivel em todas as paginas, o documento segue inteiro.'
+    )
+
+    parser.add_argument(
+        '--saida-json',
+        action='store_true',
+        default=DEFAULT_JSON_OUTPUT,
+        help='Pede ao Gemini so os dados_catalogados, em JSON validado por um schema montado do '
+             'modelo JSON do prompt de cada tipo (sem reescrita e explicacao; variavel SAIDA_JSON)'
+    )
+
+    parser.add_argument(
+        '--streaming',
+        action='store_true',
+        default=DEFAULT_STREAM,
+        help='Recebe as respostas em streaming e grava os dados_catalogados em parcial/ assim que '
+             'o bloco JSON fecha; o prompt pede os dados antes da reescrita (variavel STREAMING)'
+    )
+
+    parser.add_argument(
+        '--parar-nos-dados',
+        action='store_true',
+        default=DEFAULT_STOP_ON_DATA,
+        help='Com streaming, interrompe a resposta assim que os dados_catalogados chegam: reescrita e '
+             'explicacao nao sao geradas (implica --streaming; variavel PARAR_NOS_DADOS)'
+    )
+
+    parser.add_argument(
+        '--sem-orcamento-saida',
+        action='store_true',
+        default=not DEFAULT_OUTPUT_BUDGETS,
+        help=f'Usa max_output_tokens={DEFAULT_MAX_OUTPUT_TOKENS} em todos os requests, ignorando os '
+             'orcamentos por tipo e tamanho aprendidos do historico (orcamentos_saida.json; '
+             'variavel ORCAMENTO_SAIDA=0)'
+    )
+
+    parser.add_argument(
+        '--recortar-fotos',
+        action='store_true',
+        default=DEFAULT_CROP_PHOTOS,
+        help='Recorta o documento e corrige a inclinacao de fotos (JPG/PNG de celular) antes do '
+             'envio, reduzindo pixels e tokens (variavel RECORTAR_FOTOS).'
+    )
+
+    parser.add_argument(
+        '--memoria-mb',
+        type=int,
+        default=DEFAULT_MEMORY_BUDGET_MB,
+        metavar='MB',
+        help=f'Orcamento de memoria para imagens decodificadas, somado entre os workers: quem '
+             f'ultrapassaria o limite aguarda antes de renderizar (default: {DEFAULT_MEMORY_BUDGET_MB}, '
+             f'variavel MEMORIA_IMAGENS_MB). Use 0 para desabilitar.'
+    )
+
+    parser.add_argument(
+        '--sem-cache-paginas',
+        action='store_true',
+        default=DEFAULT_CACHE_MB <= 0,
+        help='Renderiza todas as paginas de novo, sem ler nem gravar o cache de paginas codificadas '
+             'em .tmp/cache/paginas (limite do cache: variavel CACHE_PAGINAS_MB).'
+    )
+
+    parser.add_argument(
+        '--spill-disco',
+        action='store_true',
+        default=DEFAULT_SPILL_TO_DISK,
+        help='No modo concatenado, grava em disco (.tmp/spill) as paginas de documentos muito '
+             'grandes ate a colagem, em vez de mante-las em memoria (variavel SPILL_IMAGENS).'
+    )
+
     args = parser.parse_args()
 
     # Configura nivel de log
@@ -1777,9 +4659,46 @@ Prompts disponiveis em: execution/prompts/
     if not args.escritura_id:
         parser.error("escritura_id e obrigatorio (ex: FC_515_124_p280509)")
 
+    if 0 < args.janela_matricula <= MATRICULA_WINDOW_OVERLAP:
+        parser.error(f"--janela-matricula deve ser 0 ou maior que {MATRICULA_WINDOW_OVERLAP}")
+
+    if args.memoria_mb < 0:
+        parser.error("--memoria-mb deve ser 0 (sem limite) ou positivo")
+    configure_memory_budget(args.memoria_mb, args.spill_disco)
+    if args.sem_cache_paginas:
+        configure_page_cache(0)
+
+    options = ExtractionOptions(
+        pdf_mode=args.pdf_mode,
+        use_text_layer=not args.sem_camada_texto,
+        render_workers=args.render_workers,
+        blank_ink_ratio=None if args.manter_paginas_brancas else BLANK_PAGE_INK_RATIO,
+        crop_photos=args.recortar_fotos,
+        crop_cards=not args.sem_recorte_cartoes,
+        window_pages=args.janela_matricula,
+        prune_matriculas=args.podar_matricula,
+        json_output=args.saida_json,
+        stream=args.streaming or args.parar_nos_dados,
+        stop_on_data=args.parar_nos_dados,
+        output_budgets=not args.sem_orcamento_saida
+    )
+    if args.pdf_nativo is not None:
+        options.pdf_native_types = {t.strip().upper() for t in args.pdf_nativo.split(',') if t.strip()}
+
     try:
-        # Decide entre modo serial ou paralelo
-        if args.parallel:
+        # Decide entre modo serial, paralelo ou assincrono
+        if args.use_async:
+            logger.info("Modo ASSINCRONO ativado")
+            result = run_extraction_async(
+                escritura_id=args.escritura_id,
+                limit=args.limit,
+                tipo_filtro=args.tipo,
+                rpm=args.rpm,
+                max_in_flight=args.em_voo,
+                verbose=args.verbose,
+                options=options
+            )
+        elif args.parallel:
             logger.info("Modo PARALELO ativado")
             result = run_extraction_parallel(
                 escritura_id=args.escritura_id,
@@ -1788,7 +4707,8 @@ Prompts disponiveis em: execution/prompts/
                 workers=args.workers,
                 rpm=args.rpm,
                 verbose=args.verbose,
-                force_workers=args.force_workers
+                force_workers=args.force_workers,
+                options=options
             )
         else:
             logger.info("Modo SERIAL (padrao)")
@@ -1796,7 +4716,8 @@ Prompts disponiveis em: execution/prompts/
                 escritura_id=args.escritura_id,
                 limit=args.limit,
                 tipo_filtro=args.tipo,
-                verbose=args.verbose
+                verbose=args.verbose,
+                options=options
             )
 
         # Retorna codigo de saida baseado em erros
@@ -211,6 +211,8 @@ def fazer_join_arquivos(
                 "observacao": classificacao.get("observacao", ""),
                 "papel_inferido": inferir_papel(arq.get("subpasta", ""), tipo_doc)
             }
+            if "preflight" in arq:
+                arquivo_final["preflight"] = arq["preflight"]
 
             # Verificar se precisa revisao (baixa confianca ou tipo desconhecido)
             if confianca == "Baixa" or tipo_doc in ["DESCONHECIDO", "OUTRO"]:
@@ -0,0 +1,862 @@
+#!/usr/bin/env python3
+"""
+image_utils.py - Utilitarios de imagem compartilhados pelo pipeline
+
+Centraliza a codificacao de imagens enviadas ao Gemini. Em vez de escolher a
+qualidade JPEG por faixas fixas de megapixels, o encoder recebe um orcamento
+de bytes e uma resolucao minima legivel, e busca a maior qualidade (e, se
+necessario, a menor reducao de escala) que cabe no orcamento.
+
+Assim o tamanho do upload, a latencia e os tokens de entrada ficam previsiveis
+por documento, mesmo para scans muito grandes.
+
+Tambem detecta paginas de PDF escaneado que sao apenas uma imagem embutida,
+permitindo encaminhar o JPEG/PNG original sem decodificar e recodificar, e
+mede a cobertura de tinta de paginas para descartar paginas em branco.
+
+Paginas efetivamente monocromaticas (texto preto sobre papel branco) podem ser
+codificadas em JPEG de tons de cinza ou em PNG/WebP de 1 bit, o que for menor.
+
+Para fotos de celular (ex: WhatsApp), oferece recorte do quadrilatero do
+documento com correcao de perspectiva e de inclinacao, usando apenas NumPy e
+PIL (sem OpenCV). Para RG/CNH, localiza as regioes dos cartoes (frente e
+verso) em fotos e paginas A4 escaneadas.
+
+Uso:
+    from execution.image_utils import encode_image_within_budget
+
+    encoded = encode_image_within_budget(img, max_bytes=1_500_000)
+    part = types.Part.from_bytes(data=encoded.data, mime_type=encoded.mime_type)
+
+    encoded = encode_image_auto(img, max_bytes=1_500_000)  # JPEG cinza/PNG 1 bit se monocromatica
+
+    embedded = extract_embedded_page_image(pdf_doc[0], max_bytes=1_500_000)
+    if embedded:
+        data, mime_type = embedded
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import io
+import logging
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+DEFAULT_MAX_BYTES = 1_500_000  # Orcamento padrao por imagem (~1.4MB)
+DEFAULT_MIN_SHORT_EDGE = 900  # Menor lado minimo para manter texto de cartorio legivel
+DEFAULT_MAX_QUALITY = 90  # Qualidade inicial (acima disso o ganho visual e nulo)
+DEFAULT_MIN_QUALITY = 50  # Abaixo disso surgem artefatos que prejudicam a leitura
+DOWNSCALE_SAFETY = 0.92  # Margem ao estimar o fator de reducao (bytes ~ area)
+MAX_DOWNSCALE_STEPS = 6  # Limite de tentativas de reducao de escala
+
+# Formatos de imagem embutida que podem ser enviados ao Gemini sem conversao
+PASSTHROUGH_IMAGE_FORMATS = {'jpeg': 'image/jpeg', 'png': 'image/png'}
+PASSTHROUGH_COLORSPACES = {1, 3}  # Cinza e RGB (CMYK/indexado exigem conversao)
+PASSTHROUGH_BBOX_TOLERANCE = 2.0  # Pontos de folga entre a area da imagem e a pagina visivel
+
+# Selecao automatica de formato (paginas de texto preto sobre papel branco)
+TONE_RGB = 'RGB'  # Colorida: JPEG RGB
+TONE_GRAY = 'L'  # Monocromatica: JPEG em tons de cinza
+TONE_BILEVEL = '1'  # Monocromatica e sem meios-tons: PNG/WebP de 1 bit
+TONE_SAMPLE_EDGE = 256  # Lado maior da miniatura usada para medir a cor
+TONE_MAX_CHROMA = 24  # Diferenca max-min entre canais ainda considerada cinza
+TONE_MAX_COLOR_RATIO = 0.03  # Fracao maxima de pixels coloridos (logos, selos pequenos)
+BILEVEL_MAX_MIDTONE_RATIO = 0.05  # Fracao maxima de pixels entre 64 e 192 (antialias do texto)
+BILEVEL_WEBP_METHOD = 2  # Esforco do WebP sem perdas (acima de 4 o ganho e minimo e o custo explode)
+
+# Deteccao de paginas em branco (cobertura de tinta)
+INK_SAMPLE_ZOOM = 0.5  # Renderizacao reduzida usada so para medir a tinta (~36 DPI)
+INK_MARGIN_RATIO = 0.03  # Borda ignorada (sombras e marcas do scanner)
+INK_BACKGROUND_PERCENTILE = 90  # Tom do papel (tolera scans acinzentados/amarelados)
+INK_DARKNESS_DELTA = 60  # Quanto mais escuro que o papel um pixel precisa ser para contar como tinta
+DEFAULT_BLANK_INK_RATIO = 0.002  # Paginas com menos de 0.2% de tinta sao consideradas em branco
+
+# Recorte de fotos: deteccao do documento sobre um fundo (mesa, tecido)
+CROP_ANALYSIS_EDGE = 512  # Lado maior da copia reduzida usada na deteccao
+CROP_GRID_CELL = 4  # Pixels (da copia reduzida) por celula da grade de componentes
+CROP_BORDER_RATIO = 0.04  # Faixa da borda usada para estimar a cor do fundo
+CROP_COLOR_DISTANCE = 60  # Distancia (soma RGB) para um pixel ser considerado documento
+CROP_MIN_BORDER_UNIFORMITY = 0.5  # Fracao minima da borda com a cor do fundo
+CROP_MIN_AREA_RATIO = 0.15  # Documento menor que isso provavelmente e ruido
+CROP_MAX_AREA_RATIO = 0.85  # Documento maior que isso ja ocupa o quadro (nada a ganhar)
+CROP_MAX_ANGLE_DEVIATION = 20.0  # Desvio maximo dos cantos em relacao a 90 graus
+CROP_MAX_TOUCHED_SIDES = 2  # Documento encostando em 3+ lados continua fora do quadro
+
+# Recorte de cartoes (RG/CNH) em fotos e paginas escaneadas (mesma grade do recorte de fotos)
+CARD_MIN_AREA_RATIO = 0.03  # Cartao menor que isso (relativo ao quadro) e ruido
+CARD_MAX_AREA_RATIO = 0.85  # Acima disso o cartao ja ocupa o quadro (nada a ganhar)
+CARD_MIN_FILL_RATIO = 0.6  # Fracao da caixa coberta pelo componente (cartoes sao retangulos cheios)
+CARD_MIN_ASPECT = 1.2  # Lado maior / menor: cartao ID-1 ~1.59, RG antigo ~1.5
+CARD_MAX_ASPECT = 3.4  # RG aberto (frente e verso lado a lado) ~3.0
+CARD_MAX_REGIONS = 2  # Frente e verso
+CARD_PADDING_RATIO = 0.02  # Margem em volta de cada recorte (nao corta a borda do cartao)
+CARD_REFINE_PASSES = 2  # Cartao fotografado sobre tecido e colado em pagina A4: dois fundos
+
+# Correcao de inclinacao por perfil de projecao
+DESKEW_ANALYSIS_EDGE = 800
+DESKEW_MAX_ANGLE = 6.0  # Graus testados em cada sentido
+DESKEW_STEP = 0.5
+DESKEW_MIN_ANGLE = 0.75  # Abaixo disso nao vale a pena reamostrar a imagem
+
+
+# =============================================================================
+# ESTRUTURAS DE DADOS
+# =============================================================================
+
+@dataclass
+class PhotoCleanup:
+    """Resultado do recorte/correcao de uma foto de documento."""
+    image: Image.Image
+    cropped: bool = False
+    deskew_angle: float = 0.0
+    original_size: Tuple[int, int] = (0, 0)
+
+    @property
+    def changed(self) -> bool:
+        """Indica se a imagem foi alterada."""
+        return self.cropped or self.deskew_angle != 0.0
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Resumo para os metadados da extracao."""
+        return {
+            'recortado': self.cropped,
+            'angulo_correcao': self.deskew_angle,
+            'tamanho_original': list(self.original_size),
+            'tamanho_final': list(self.image.size)
+        }
+
+
+@dataclass
+class EncodedImage:
+    """Resultado da codificacao de uma imagem dentro do orcamento."""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    quality: int
+    scale: float = 1.0  # Fator aplicado sobre a imagem original (1.0 = sem reducao)
+
+
+# =============================================================================
+# FUNCOES
+# =============================================================================
+
+@contextmanager
+def pixmap_image(pix: "fitz.Pixmap") -> Iterator[Image.Image]:
+    """
+    Expoe um Pixmap do PyMuPDF como imagem PIL sem copiar os pixels.
+
+    A imagem e criada com Image.frombuffer sobre pix.samples_mv (em vez de
+    Image.frombytes(pix.samples), que copia o buffer duas vezes). Em modo 'L'
+    o PIL usa a memoria do Pixmap diretamente; em RGB faz uma unica copia
+    (o PIL armazena RGB com 4 bytes por pixel).
+
+    A imagem so e valida dentro do bloco with e e fechada na saida: o buffer
+    pertence ao Pixmap, que precisa continuar vivo enquanto ela e usada.
+    Quem precisar da imagem depois deve usar image.copy().
+
+    Args:
+        pix: Pixmap sem canal alfa, em cinza (n=1) ou RGB (n=3)
+
+    Yields:
+        Imagem PIL somente leitura sobre o buffer do Pixmap
+    """
+    mode = 'L' if pix.n == 1 else 'RGB'
+    stride = 0 if pix.stride == pix.width * pix.n else pix.stride
+    image = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, 'raw', mode, stride, 1)
+    try:
+        yield image
+    finally:
+        image.close()
+
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    """Codifica uma imagem PIL em JPEG com a qualidade informada."""
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _best_quality_within(
+    image: Image.Image,
+    max_bytes: int,
+    min_quality: int,
+    max_quality: int
+) -> Tuple[bytes, int]:
+    """
+    Busca binaria pela maior qualidade JPEG cujo resultado cabe em max_bytes.
+
+    Returns:
+        Tuple (bytes, qualidade). Se nem min_quality couber, retorna o
+        resultado em min_quality (o chamador decide se reduz a escala).
+    """
+    data = _encode_jpeg(image, max_quality)
+    if len(data) <= max_bytes:
+        return data, max_quality
+
+    best_data, best_quality = None, None
+    low, high = min_quality, max_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _encode_jpeg(image, quality)
+        if len(candidate) <= max_bytes:
+            best_data, best_quality = candidate, quality
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best_data is None:
+        return _encode_jpeg(image, min_quality), min_quality
+    return best_data, best_quality
+
+
+def encode_image_within_budget(
+    image: Image.Image,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    min_short_edge: int = DEFAULT_MIN_SHORT_EDGE,
+    max_quality: int = DEFAULT_MAX_QUALITY,
+    min_quality: int = DEFAULT_MIN_QUALITY
+) -> EncodedImage:
+    """
+    Codifica uma imagem em JPEG ficando logo abaixo de um orcamento de bytes.
+
+    Estrategia:
+    1. Na resolucao original, busca a maior qualidade entre max_quality e
+       min_quality que cabe no orcamento.
+    2. Se nem min_quality cabe, reduz a escala (estimando o fator pela razao
+       entre orcamento e tamanho obtido) e repete, sem deixar o menor lado
+       ficar abaixo de min_short_edge.
+    3. Se mesmo na resolucao minima o orcamento nao for atingido, retorna o
+       menor resultado obtido - a legibilidade tem prioridade sobre o limite.
+
+    Args:
+        image: Imagem PIL (qualquer modo; convertida para RGB se necessario)
+        max_bytes: Orcamento de bytes para o JPEG resultante
+        min_short_edge: Menor lado minimo (em pixels) apos reducao de escala
+        max_quality: Qualidade JPEG maxima tentada
+        min_quality: Qualidade JPEG minima aceita
+
+    Returns:
+        EncodedImage com os bytes JPEG e os parametros escolhidos
+    """
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    original_width, original_height = image.size
+    data, quality = _best_quality_within(image, max_bytes, min_quality, max_quality)
+    current = image
+    scale = 1.0
+
+    for _ in range(MAX_DOWNSCALE_STEPS):
+        if len(data) <= max_bytes:
+            break
+
+        short_edge = min(current.size)
+        if short_edge <= min_short_edge:
+            break
+
+        # Bytes de um JPEG crescem ~ linearmente com a area: fator ~ sqrt(orcamento/tamanho)
+        factor = (max_bytes / len(data)) ** 0.5 * DOWNSCALE_SAFETY
+        factor = max(factor, min_short_edge / short_edge)
+        scale *= factor
+
+        new_size = (
+            max(1, round(original_width * scale)),
+            max(1, round(original_height * scale))
+        )
+        if current is not image:
+            current.close()
+        current = image.resize(new_size, Image.LANCZOS)
+        data, quality = _best_quality_within(current, max_bytes, min_quality, max_quality)
+
+    width, height = current.size
+    if current is not image:
+        current.close()
+
+    if len(data) > max_bytes:
+        logger.warning(
+            f"Imagem acima do orcamento mesmo na resolucao minima: "
+            f"{len(data) / 1024:.0f}KB > {max_bytes / 1024:.0f}KB ({width}x{height}, q{quality})"
+        )
+    elif scale < 1.0:
+        logger.debug(
+            f"Imagem reduzida para caber no orcamento: {original_width}x{original_height} -> "
+            f"{width}x{height}, q{quality}, {len(data) / 1024:.0f}KB"
+        )
+
+    return EncodedImage(
+        data=data,
+        mime_type='image/jpeg',
+        width=width,
+        height=height,
+        quality=quality,
+        scale=scale
+    )
+
+
+def classify_image_tone(image: Image.Image) -> str:
+    """
+    Classifica uma imagem como colorida, em tons de cinza ou bilevel.
+
+    A cor e medida numa miniatura (selos e logos coloridos sobrevivem a
+    reducao); os meios-tons sao medidos na resolucao cheia, onde a borda
+    suavizada das letras ainda e fina.
+
+    Args:
+        image: Imagem PIL
+
+    Returns:
+        TONE_RGB, TONE_GRAY ou TONE_BILEVEL
+    """
+    if _is_chromatic(image):
+        return TONE_RGB
+
+    gray = image if image.mode == 'L' else image.convert('L')
+    tone = _gray_tone(gray)
+    if gray is not image:
+        gray.close()
+    return tone
+
+
+def _is_chromatic(image: Image.Image) -> bool:
+    """Indica se mais de TONE_MAX_COLOR_RATIO da miniatura tem cor."""
+    if image.mode in ('L', '1'):
+        return False
+    sample = image.convert('RGB')
+    sample.thumbnail((TONE_SAMPLE_EDGE, TONE_SAMPLE_EDGE))
+    pixels = np.asarray(sample, dtype=np.int16)
+    chroma = pixels.max(axis=2) - pixels.min(axis=2)
+    return np.count_nonzero(chroma > TONE_MAX_CHROMA) / chroma.size > TONE_MAX_COLOR_RATIO
+
+
+def _gray_tone(gray: Image.Image) -> str:
+    """TONE_BILEVEL se a imagem em cinza quase nao tiver meios-tons, senao TONE_GRAY."""
+    histogram = gray.histogram()
+    midtones = sum(histogram[64:192])
+    if midtones / max(gray.width * gray.height, 1) <= BILEVEL_MAX_MIDTONE_RATIO:
+        return TONE_BILEVEL
+    return TONE_GRAY
+
+
+def _otsu_threshold(gray: Image.Image) -> int:
+    """Limiar de Otsu (maxima variancia entre classes) do histograma."""
+    histogram = np.asarray(gray.histogram()[:256], dtype=np.float64)
+    prob = histogram / max(histogram.sum(), 1.0)
+    weight = np.cumsum(prob)
+    mean = np.cumsum(prob * np.arange(256))
+    between = (mean[-1] * weight - mean) ** 2 / (weight * (1.0 - weight) + 1e-12)
+    return int(np.argmax(between))
+
+
+def _encode_bilevel(gray: Image.Image) -> List[Tuple[bytes, str]]:
+    """Codifica a imagem binarizada em PNG de 1 bit e WebP sem perdas."""
+    threshold = _otsu_threshold(gray)
+    binary = gray.point(lambda value: 255 if value > threshold else 0)
+
+    candidates = []
+    buffer = io.BytesIO()
+    binary.convert('1', dither=Image.Dither.NONE).save(buffer, format='PNG')
+    candidates.append((buffer.getvalue(), 'image/png'))
+
+    buffer = io.BytesIO()
+    binary.save(buffer, format='WEBP', lossless=True, quality=100, method=BILEVEL_WEBP_METHOD)
+    candidates.append((buffer.getvalue(), 'image/webp'))
+
+    binary.close()
+    return candidates
+
+
+def encode_image_auto(
+    image: Image.Image,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    min_short_edge: int = DEFAULT_MIN_SHORT_EDGE,
+    max_quality: int = DEFAULT_MAX_QUALITY,
+    min_quality: int = DEFAULT_MIN_QUALITY
+) -> EncodedImage:
+    """
+    Codifica uma imagem escolhendo o formato pelo conteudo.
+
+    - Colorida: JPEG RGB (encode_image_within_budget)
+    - Monocromatica: JPEG em tons de cinza
+    - Monocromatica sem meios-tons (texto impresso/digital): tambem tenta
+      PNG de 1 bit e WebP sem perdas na resolucao cheia, e fica com o menor
+      resultado que cabe no orcamento
+
+    Args:
+        image: Imagem PIL
+        max_bytes: Orcamento de bytes
+        min_short_edge: Menor lado minimo (em pixels) apos reducao de escala
+        max_quality: Qualidade JPEG maxima tentada
+        min_quality: Qualidade JPEG minima aceita
+
+    Returns:
+        EncodedImage do formato escolhido
+    """
+    if _is_chromatic(image):
+        return encode_image_within_budget(image, max_bytes, min_short_edge, max_quality, min_quality)
+
+    # Uma unica conversao para cinza, usada pela analise e pelos encoders
+    gray = image if image.mode == 'L' else image.convert('L')
+    tone = _gray_tone(gray)
+    best = encode_image_within_budget(gray, max_bytes, min_short_edge, max_quality, min_quality)
+
+    if tone == TONE_BILEVEL:
+        for data, mime_type in _encode_bilevel(gray):
+            if len(data) <= max_bytes and len(data) < len(best.data):
+                best = EncodedImage(
+                    data=data,
+                    mime_type=mime_type,
+                    width=gray.width,
+                    height=gray.height,
+                    quality=100
+                )
+
+    if gray is not image:
+        gray.close()
+
+    logger.debug(f"Formato escolhido ({tone}): {best.mime_type}, {len(best.data) / 1024:.0f}KB")
+    return best
+
+
+def extract_embedded_page_image(
+    page: "fitz.Page",
+    max_bytes: Optional[int] = None
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Retorna o stream original da imagem de uma pagina que e so uma imagem.
+
+    Scans costumam ter exatamente um JPEG por pagina. Nesse caso renderizar a
+    pagina (pixmap -> PIL -> JPEG) custa uma decodificacao e uma recodificacao
+    completas e ainda degrada a imagem. A pagina so e encaminhada sem
+    alteracao se o resultado for identico ao que o usuario ve:
+    - exatamente uma imagem e nenhum texto visivel ou desenho vetorial
+      (carimbos e assinaturas digitais sobrepostos seriam perdidos)
+    - pagina sem rotacao e imagem sem giro/espelhamento
+    - imagem ocupando exatamente a pagina visivel (page.rect, ja com o
+      CropBox): imagem cortada pela pagina mostraria ao modelo conteudo que
+      a pagina nao mostra, e imagem com margens mudaria a proporcao
+    - JPEG ou PNG, em cinza ou RGB, sem mascara de transparencia
+    - dentro do orcamento de bytes (se informado)
+
+    Args:
+        page: Pagina fitz
+        max_bytes: Orcamento de bytes; imagens maiores retornam None
+
+    Returns:
+        Tuple (bytes originais, mime_type) ou None se a pagina precisa ser renderizada
+    """
+    try:
+        images = page.get_images(full=True)
+        if len(images) != 1 or page.rotation != 0:
+            return None
+
+        # Texto visivel (tipo 3 = invisivel, ex: camada OCR de PDFs pesquisaveis)
+        if any(span['type'] != 3 for span in page.get_texttrace()):
+            return None
+        if page.get_drawings():
+            return None
+
+        info = page.get_image_info()
+        if len(info) != 1:
+            return None  # Mesma imagem desenhada mais de uma vez
+        a, b, c, d = info[0]['transform'][:4]
+        if abs(b) > 1e-3 or abs(c) > 1e-3 or a <= 0 or d <= 0:
+            return None
+        bbox = fitz.Rect(info[0]['bbox'])
+        if any(abs(edge - page_edge) > PASSTHROUGH_BBOX_TOLERANCE for edge, page_edge in zip(bbox, page.rect)):
+            return None
+
+        extracted = page.parent.extract_image(images[0][0])
+        if not extracted or extracted.get('smask'):
+            return None
+
+        mime_type = PASSTHROUGH_IMAGE_FORMATS.get(extracted.get('ext'))
+        if mime_type is None or extracted.get('colorspace') not in PASSTHROUGH_COLORSPACES:
+            return None
+
+        data = extracted['image']
+        if max_bytes is not None and len(data) > max_bytes:
+            return None
+
+        return data, mime_type
+
+    except Exception as e:
+        logger.debug(f"Imagem embutida nao extraida (pagina {page.number + 1}): {e}")
+        return None
+
+
+def page_ink_coverage(page: "fitz.Page") -> float:
+    """
+    Mede a fracao da area util de uma pagina coberta por tinta.
+
+    Renderiza a pagina em escala de cinza e baixa resolucao e conta, com
+    NumPy, os pixels significativamente mais escuros que o tom do papel.
+    O tom do papel e estimado por percentil, entao scans amarelados ou com
+    fundo cinza nao sao confundidos com tinta.
+
+    Args:
+        page: Pagina fitz
+
+    Returns:
+        Fracao entre 0.0 (pagina em branco) e 1.0
+    """
+    pix = page.get_pixmap(
+        matrix=fitz.Matrix(INK_SAMPLE_ZOOM, INK_SAMPLE_ZOOM),
+        colorspace=fitz.csGRAY,
+        alpha=False
+    )
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+    margin_y = int(gray.shape[0] * INK_MARGIN_RATIO)
+    margin_x = int(gray.shape[1] * INK_MARGIN_RATIO)
+    gray = gray[margin_y:gray.shape[0] - margin_y, margin_x:gray.shape[1] - margin_x]
+    if gray.size == 0:
+        return 0.0
+
+    background = np.percentile(gray, INK_BACKGROUND_PERCENTILE)
+    return float(np.count_nonzero(gray < background - INK_DARKNESS_DELTA) / gray.size)
+
+
+def is_blank_page(page: "fitz.Page", max_ink_ratio: float = DEFAULT_BLANK_INK_RATIO) -> bool:
+    """
+    Indica se uma pagina esta em branco ou quase (verso, folha separadora).
+
+    Args:
+        page: Pagina fitz
+        max_ink_ratio: Cobertura de tinta maxima para considerar a pagina em branco
+
+    Returns:
+        True se a cobertura de tinta for menor que max_ink_ratio
+    """
+    try:
+        return page_ink_coverage(page) < max_ink_ratio
+    except Exception as e:
+        logger.debug(f"Falha ao medir tinta da pagina {page.number + 1}: {e}")
+        return False
+
+
+def _connected_components(grid: np.ndarray) -> List[List[Tuple[int, int]]]:
+    """Retorna as celulas (linha, coluna) de cada componente 4-conexo da grade."""
+    height, width = grid.shape
+    visited = np.zeros(grid.shape, dtype=bool)
+    components: List[List[Tuple[int, int]]] = []
+
+    for start_y, start_x in zip(*np.nonzero(grid)):
+        if visited[start_y, start_x]:
+            continue
+        component = []
+        queue = deque([(start_y, start_x)])
+        visited[start_y, start_x] = True
+        while queue:
+            y, x = queue.popleft()
+            component.append((y, x))
+            for ny, nx in ((y + 1, x), (y - 1, x), (y, x + 1), (y, x - 1)):
+                if 0 <= ny < height and 0 <= nx < width and grid[ny, nx] and not visited[ny, nx]:
+                    visited[ny, nx] = True
+                    queue.append((ny, nx))
+        components.append(component)
+
+    return components
+
+
+def _largest_component(grid: np.ndarray) -> List[Tuple[int, int]]:
+    """Retorna as celulas (linha, coluna) do maior componente 4-conexo da grade."""
+    components = _connected_components(grid)
+    return max(components, key=len) if components else []
+
+
+def _document_grid(image: Image.Image) -> Optional[Tuple[np.ndarray, float, float]]:
+    """
+    Marca, em uma grade reduzida, as celulas que diferem da cor do fundo.
+
+    O fundo e estimado pela mediana da borda da imagem e precisa ser
+    razoavelmente uniforme (mesa, tecido, papel do scanner).
+
+    Args:
+        image: Imagem PIL
+
+    Returns:
+        (grade booleana, escala x, escala y) - as escalas convertem indices da
+        grade em pixels da imagem original - ou None se o fundo nao for uniforme
+    """
+    small = image.convert('RGB')
+    small.thumbnail((CROP_ANALYSIS_EDGE, CROP_ANALYSIS_EDGE))
+    pixels = np.asarray(small, dtype=np.int16)
+    height, width = pixels.shape[:2]
+
+    band = max(2, int(min(height, width) * CROP_BORDER_RATIO))
+    border = np.concatenate([
+        pixels[:band].reshape(-1, 3), pixels[-band:].reshape(-1, 3),
+        pixels[:, :band].reshape(-1, 3), pixels[:, -band:].reshape(-1, 3)
+    ])
+    background = np.median(border, axis=0)
+
+    # Fundo precisa ser razoavelmente uniforme (mesa), senao e scan/print de tela
+    if np.mean(np.abs(border - background).sum(axis=1) < CROP_COLOR_DISTANCE) < CROP_MIN_BORDER_UNIFORMITY:
+        return None
+
+    mask = np.abs(pixels - background).sum(axis=2) > CROP_COLOR_DISTANCE
+    grid_h, grid_w = height // CROP_GRID_CELL, width // CROP_GRID_CELL
+    if grid_h < 8 or grid_w < 8:
+        return None
+    grid = mask[:grid_h * CROP_GRID_CELL, :grid_w * CROP_GRID_CELL].reshape(
+        grid_h, CROP_GRID_CELL, grid_w, CROP_GRID_CELL
+    ).mean(axis=(1, 3)) > 0.5
+
+    scale_x = image.width / width * CROP_GRID_CELL
+    scale_y = image.height / height * CROP_GRID_CELL
+    return grid, scale_x, scale_y
+
+
+def detect_document_quad(image: Image.Image) -> Optional[List[Tuple[float, float]]]:
+    """
+    Detecta o quadrilatero de um documento fotografado sobre um fundo.
+
+    Estima a cor do fundo pela borda da foto, marca como documento os pixels
+    distantes dessa cor, pega o maior componente conexo (em uma grade
+    reduzida) e usa seus pontos extremos como cantos. A deteccao e
+    conservadora: na duvida retorna None e a foto segue sem recorte.
+
+    Args:
+        image: Imagem PIL (foto)
+
+    Returns:
+        Cantos [superior-esq, inferior-esq, inferior-dir, superior-dir] em
+        coordenadas da imagem original, ou None se nao houver recorte seguro
+    """
+    analysis = _document_grid(image)
+    if analysis is None:
+        return None
+    grid, scale_x, scale_y = analysis
+    grid_h, grid_w = grid.shape
+
+    component = _largest_component(grid)
+    if not component:
+        return None
+    cells = np.array(component, dtype=np.float64)
+    ys, xs = cells[:, 0], cells[:, 1]
+
+    # Documento saindo do quadro por mais de um lado: recortar perderia conteudo
+    touched = sum([ys.min() <= 0, xs.min() <= 0, ys.max() >= grid_h - 1, xs.max() >= grid_w - 1])
+    if touched > CROP_MAX_TOUCHED_SIDES:
+        return None
+
+    sums, diffs = xs + ys, xs - ys
+    corners = np.array([
+        (xs[sums.argmin()], ys[sums.argmin()]),    # superior-esquerdo
+        (xs[diffs.argmin()], ys[diffs.argmin()]),  # inferior-esquerdo
+        (xs[sums.argmax()], ys[sums.argmax()]),    # inferior-direito
+        (xs[diffs.argmax()], ys[diffs.argmax()]),  # superior-direito
+    ])
+
+    # Area (formula do cadarco) relativa ao quadro
+    cx, cy = corners[:, 0], corners[:, 1]
+    area = 0.5 * abs(np.dot(cx, np.roll(cy, 1)) - np.dot(cy, np.roll(cx, 1)))
+    area_ratio = area / (grid_h * grid_w)
+    if not CROP_MIN_AREA_RATIO <= area_ratio <= CROP_MAX_AREA_RATIO:
+        return None
+
+    # Cantos proximos de 90 graus (documento retangular em perspectiva leve)
+    for idx in range(4):
+        v1 = corners[idx - 1] - corners[idx]
+        v2 = corners[(idx + 1) % 4] - corners[idx]
+        norm = np.linalg.norm(v1) * np.linalg.norm(v2)
+        if norm == 0:
+            return None
+        angle = np.degrees(np.arccos(np.clip(np.dot(v1, v2) / norm, -1.0, 1.0)))
+        if abs(angle - 90.0) > CROP_MAX_ANGLE_DEVIATION:
+            return None
+
+    # Converte centro das celulas para coordenadas da imagem original
+    return [((x + 0.5) * scale_x, (y + 0.5) * scale_y) for x, y in corners]
+
+
+def _find_card_boxes(image: Image.Image) -> List[Tuple[int, int, int, int]]:
+    """
+    Uma passada da deteccao de cartoes: componentes retangulares sobre o fundo.
+
+    Args:
+        image: Imagem PIL
+
+    Returns:
+        Caixas (x0, y0, x1, y1) em pixels da imagem, com margem, ordenadas de
+        cima para baixo e da esquerda para a direita (no maximo CARD_MAX_REGIONS)
+    """
+    analysis = _document_grid(image)
+    if analysis is None:
+        return []
+    grid, scale_x, scale_y = analysis
+    grid_h, grid_w = grid.shape
+
+    candidates = []
+    for component in _connected_components(grid):
+        cells = np.array(component)
+        y0, x0 = cells.min(axis=0)
+        y1, x1 = cells.max(axis=0) + 1
+        box_h, box_w = y1 - y0, x1 - x0
+        area_ratio = box_h * box_w / (grid_h * grid_w)
+        fill_ratio = len(component) / (box_h * box_w)
+        aspect = max(box_h, box_w) / min(box_h, box_w)
+        if (CARD_MIN_AREA_RATIO <= area_ratio <= CARD_MAX_AREA_RATIO
+                and fill_ratio >= CARD_MIN_FILL_RATIO
+                and CARD_MIN_ASPECT <= aspect <= CARD_MAX_ASPECT):
+            candidates.append((len(component), (x0, y0, x1, y1)))
+
+    # Maiores componentes primeiro (frente e verso); depois ordem de leitura
+    largest = [box for _, box in sorted(candidates, key=lambda c: c[0], reverse=True)[:CARD_MAX_REGIONS]]
+    largest.sort(key=lambda box: (box[1], box[0]))
+
+    boxes = []
+    for x0, y0, x1, y1 in largest:
+        pad_x = (x1 - x0) * scale_x * CARD_PADDING_RATIO
+        pad_y = (y1 - y0) * scale_y * CARD_PADDING_RATIO
+        boxes.append((
+            max(0, int(x0 * scale_x - pad_x)),
+            max(0, int(y0 * scale_y - pad_y)),
+            min(image.width, int(round(x1 * scale_x + pad_x))),
+            min(image.height, int(round(y1 * scale_y + pad_y)))
+        ))
+    return boxes
+
+
+def detect_card_regions(image: Image.Image) -> List[Tuple[int, int, int, int]]:
+    """
+    Localiza os cartoes de identificacao (RG/CNH, frente e verso) em uma imagem.
+
+    Procura componentes retangulares e cheios, com proporcao de cartao, que
+    se destacam do fundo (mesa, tecido ou papel do scanner). Cada regiao
+    encontrada e analisada de novo contra o seu proprio fundo: uma foto do
+    cartao sobre tecido, colada em uma pagina A4, primeiro rende o retangulo
+    da foto e depois os cartoes dentro dela. A deteccao e conservadora: se
+    nada tiver forma de cartao, retorna lista vazia e a imagem segue inteira.
+
+    Args:
+        image: Imagem PIL (foto ou pagina renderizada)
+
+    Returns:
+        Caixas (x0, y0, x1, y1) em pixels da imagem, em ordem de leitura
+    """
+    boxes = _find_card_boxes(image)
+    for _ in range(CARD_REFINE_PASSES - 1):
+        refined = []
+        for x0, y0, x1, y1 in boxes:
+            inner = _find_card_boxes(image.crop((x0, y0, x1, y1)))
+            if inner:
+                refined.extend((x0 + a, y0 + b, x0 + c, y0 + d) for a, b, c, d in inner)
+            else:
+                refined.append((x0, y0, x1, y1))
+        boxes = refined[:CARD_MAX_REGIONS] if len(refined) > CARD_MAX_REGIONS else refined
+    return boxes
+
+
+def crop_card_region(
+    image: Image.Image,
+    box: Tuple[int, int, int, int],
+    max_short_edge: int
+) -> Image.Image:
+    """
+    Recorta uma regiao de cartao e reduz o menor lado para max_short_edge.
+
+    O menor lado de um cartao e a sua altura (54mm no RG/CNH, inclusive com
+    frente e verso lado a lado), entao fixa-lo mantem a densidade do texto
+    independente da resolucao da foto ou do scan. Nunca amplia.
+
+    Args:
+        image: Imagem PIL
+        box: Caixa (x0, y0, x1, y1) de detect_card_regions
+        max_short_edge: Menor lado maximo do recorte
+
+    Returns:
+        Nova imagem PIL com o recorte
+    """
+    crop = image.crop(box)
+    scale = max_short_edge / min(crop.size)
+    if scale < 1.0:
+        new_size = (max(1, int(crop.width * scale)), max(1, int(crop.height * scale)))
+        crop = crop.resize(new_size, Image.LANCZOS)
+    return crop
+
+
+def estimate_skew_angle(image: Image.Image) -> float:
+    """
+    Estima a inclinacao do texto por perfil de projecao horizontal.
+
+    Testa rotacoes de -DESKEW_MAX_ANGLE a +DESKEW_MAX_ANGLE e escolhe a que
+    maximiza a variancia da soma de tinta por linha (linhas de texto
+    alinhadas produzem picos e vales bem definidos).
+
+    Args:
+        image: Imagem PIL
+
+    Returns:
+        Angulo em graus (sentido anti-horario do PIL) que endireita o texto
+    """
+    gray = image.convert('L')
+    gray.thumbnail((DESKEW_ANALYSIS_EDGE, DESKEW_ANALYSIS_EDGE))
+    pixels = np.asarray(gray, dtype=np.float32)
+    background = np.percentile(pixels, INK_BACKGROUND_PERCENTILE)
+    ink = Image.fromarray(((pixels < background - INK_DARKNESS_DELTA) * 255).astype(np.uint8))
+
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 1e-6, DESKEW_STEP):
+        rotated = np.asarray(ink.rotate(float(angle), resample=Image.NEAREST), dtype=np.float32)
+        score = float(np.var(rotated.sum(axis=1)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def clean_document_photo(image: Image.Image) -> PhotoCleanup:
+    """
+    Recorta e endireita a foto de um documento (ex: WhatsApp).
+
+    1. Aplica a orientacao EXIF (fotos de celular costumam vir deitadas)
+    2. Se o documento ocupa so parte do quadro, recorta o quadrilatero com
+       correcao de perspectiva (transformacao QUAD do PIL)
+    3. Corrige a inclinacao residual do texto por perfil de projecao
+
+    Args:
+        image: Imagem PIL original
+
+    Returns:
+        PhotoCleanup com a imagem resultante e o que foi feito
+    """
+    original_size = image.size
+    result = ImageOps.exif_transpose(image).convert('RGB')
+    cropped = False
+
+    quad = detect_document_quad(result)
+    if quad is not None:
+        (tlx, tly), (blx, bly), (brx, bry), (trx, try_) = quad
+        out_w = int(round((np.hypot(trx - tlx, try_ - tly) + np.hypot(brx - blx, bry - bly)) / 2))
+        out_h = int(round((np.hypot(blx - tlx, bly - tly) + np.hypot(brx - trx, bry - try_)) / 2))
+        if out_w > 0 and out_h > 0:
+            result = result.transform(
+                (out_w, out_h),
+                Image.QUAD,
+                data=(tlx, tly, blx, bly, brx, bry, trx, try_),
+                resample=Image.BICUBIC
+            )
+            cropped = True
+
+    angle = estimate_skew_angle(result)
+    if abs(angle) >= DESKEW_MIN_ANGLE:
+        result = result.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=(255, 255, 255))
+    else:
+        angle = 0.0
+
+    return PhotoCleanup(image=result, cropped=cropped, deskew_angle=angle, original_size=original_size)
@@ -13,6 +13,9 @@ Regras:
     - Ignora subpastas cujo nome é similar ao nome da pasta mãe
     - Filtra apenas extensões suportadas: pdf, jpg, jpeg, png, tiff, docx, doc
     - Ignora arquivos de sistema (.DS_Store, Thumbs.db, arquivos ocultos)
+    - Executa o preflight (execution/preflight.py) em cada arquivo: PDFs corrompidos
+      ou protegidos por senha, arquivos vazios e imagens ilegíveis ficam marcados
+      em arquivo['preflight'] e são ignorados pelas fases seguintes
 """
 
 import argparse
@@ -24,6 +27,13 @@ from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+# Adiciona o diretório raiz ao path para imports
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from execution.prep_pool import DEFAULT_PREP_BACKEND, PREP_BACKENDS
+from execution.preflight import run_preflight
+
 # Configuração de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -137,7 +147,10 @@ def is_supported_extension(file_path: Path) -> bool:
 
 def inventory_folder(
     folder_path: Path,
-    output_path: Optional[Path] = None
+    output_path: Optional[Path] = None,
+    preflight: bool = True,
+    preflight_workers: Optional[int] = None,
+    preflight_backend: str = DEFAULT_PREP_BACKEND
 ) -> dict:
     """
     Gera o inventário de arquivos de uma pasta de escritura.
@@ -145,6 +158,10 @@ def inventory_folder(
     Args:
         folder_path: Caminho da pasta a ser inventariada
         output_path: Caminho opcional para salvar o JSON de saída
+        preflight: Verifica cada arquivo (senha, páginas, decodificação, tamanho)
+                   e anota o resultado em arquivo['preflight']
+        preflight_workers: Workers do preflight (padrão: ver run_preflight)
+        preflight_backend: Backend do preflight ('thread' ou 'process')
 
     Returns:
         Dicionário com o inventário completo
@@ -258,6 +275,10 @@ def inventory_folder(
     logger.info(f"Inventário concluído: {inventory['total_arquivos']} arquivos encontrados")
     logger.info(f"Pastas ignoradas: {len(inventory['pastas_ignoradas'])}")
 
+    # Preflight: marca arquivos corrompidos/protegidos antes das fases caras
+    if preflight:
+        inventory["preflight"] = run_preflight(inventory["arquivos"], preflight_workers, preflight_backend)
+
     # Salva o JSON
     if output_path is None:
         # Determina o diretório de saída padrão
@@ -302,6 +323,26 @@ Exemplos:
         help='Caminho para salvar o arquivo JSON de saída (opcional)'
     )
 
+    parser.add_argument(
+        '--sem-preflight',
+        action='store_true',
+        help='Não verifica os arquivos (senha, páginas, decodificação, tamanho) após o inventário'
+    )
+
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Número de workers do preflight (default: 8 threads ou todos os núcleos com --prep-backend process)'
+    )
+
+    parser.add_argument(
+        '--prep-backend',
+        choices=PREP_BACKENDS,
+        default=DEFAULT_PREP_BACKEND,
+        help=f'Backend do preflight: thread ou process (default: {DEFAULT_PREP_BACKEND}, variável PREP_BACKEND)'
+    )
+
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -318,7 +359,13 @@ Exemplos:
         folder_path = Path(args.pasta)
         output_path = Path(args.output) if args.output else None
 
-        inventory = inventory_folder(folder_path, output_path)
+        inventory = inventory_folder(
+            folder_path,
+            output_path,
+            preflight=not args.sem_preflight,
+            preflight_workers=args.workers,
+            preflight_backend=args.prep_backend
+        )
 
         # Imprime resumo
         print("\n" + "="*60)
@@ -330,6 +377,12 @@ Exemplos:
         if inventory['pastas_ignoradas']:
             for pasta in inventory['pastas_ignoradas']:
                 print(f"  - {pasta}")
+        if 'preflight' in inventory:
+            resumo = inventory['preflight']
+            print(f"Preflight:           {resumo['ok']} ok, {resumo['alerta']} com alerta, "
+                  f"{resumo['erro']} rejeitados")
+            for rejeitado in resumo['rejeitados']:
+                print(f"  - {rejeitado['nome']}: {rejeitado['motivo']}")
         print("="*60)
 
         return 0
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+matricula_pruning.py - Poda de paginas de matriculas pelo conteudo
+
+Matriculas antigas acumulam dezenas de paginas de atos ja superados
+(vendas anteriores, hipotecas canceladas), mas a minuta so precisa da
+situacao atual do imovel. Este modulo le o texto de cada pagina (camada de
+texto do PDF ou o OCR do Document AI, quando ele traz o inicio de cada
+pagina) e escolhe as paginas que vao ao Gemini:
+
+- Abertura: primeira pagina ate o primeiro ato (descricao do imovel),
+  limitada a PRUNE_HEAD_MAX_PAGES
+- Situacao atual: da pagina do ULTIMO ato de transmissao (venda, doacao,
+  partilha...) ate o fim do documento
+- Onus vigentes: paginas anteriores com hipoteca, alienacao fiduciaria,
+  penhora, usufruto... com algum ato que nenhuma averbacao de cancelamento
+  cita pelo numero (e a pagina seguinte, onde o ato pode continuar); sem
+  numero de ato legivel, a pagina fica
+- Fim: as ultimas PRUNE_TAIL_PAGES paginas (certidao e encerramento)
+
+A poda so acontece quando TODAS as paginas tem texto proprio suficiente
+(fora o rodape repetido em todas as paginas, ex: carimbo da ONR) - na
+duvida o documento segue inteiro. As faixas removidas ficam registradas em
+metadados['poda_paginas']; para obter o documento completo basta extrair
+de novo sem --podar-matricula.
+
+Uso:
+    from execution.matricula_pruning import plan_document_pruning
+
+    pruning = plan_document_pruning(pdf_path, ocr_path)
+    if pruning:
+        skip_pages = frozenset(pruning.dropped_pages)
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import logging
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import fitz  # PyMuPDF
+
+from execution.matricula_windows import ACT_NUMBER_PATTERN
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+PRUNE_MIN_CHARS_PER_PAGE = 200  # Texto proprio minimo (sem rodape repetido) para a pagina ser lida
+PRUNE_HEAD_MAX_PAGES = 2  # Paginas de abertura mantidas (descricao do imovel)
+PRUNE_TAIL_PAGES = 2  # Ultimas paginas sempre mantidas
+PRUNE_MIN_DROPPED_PAGES = 2  # Poda menor que isso nao compensa o risco: envia tudo
+BOILERPLATE_MIN_PAGE_RATIO = 0.5  # Linha presente em ao menos metade das paginas = rodape/cabecalho
+
+TEXT_SOURCE_LAYER = 'camada_texto'
+TEXT_SOURCE_OCR = 'ocr'
+
+# Cabecalho do OCR (batch_ocr.py) com o inicio de cada pagina no texto
+OCR_PAGE_OFFSETS_HEADER = 'INICIO_PAGINAS'
+
+# Atos que transmitem a propriedade (texto sem acentos, maiusculo)
+OWNERSHIP_KEYWORDS = (
+    'VENDA E COMPRA', 'COMPRA E VENDA', 'DOACAO', 'PARTILHA', 'ADJUDICACAO', 'ARREMATACAO',
+    'PERMUTA', 'DACAO EM PAGAMENTO', 'INTEGRALIZACAO', 'CONSOLIDACAO DA PROPRIEDADE',
+    'USUCAPIAO', 'FORMAL DE PARTILHA', 'TRANSMITENTE', 'ADQUIRENTE',
+)
+
+# Atos que criam onus ou restricoes que podem continuar vigentes
+ENCUMBRANCE_KEYWORDS = (
+    'HIPOTECA', 'ALIENACAO FIDUCIARIA', 'PENHORA', 'ARRESTO', 'SEQUESTRO', 'USUFRUTO',
+    'INDISPONIBILIDADE', 'CAUCAO', 'SERVIDAO', 'INALIENABILIDADE', 'IMPENHORABILIDADE',
+    'INCOMUNICABILIDADE', 'ENFITEUSE', 'AFORAMENTO', 'PROMESSA DE VENDA', 'COMPROMISSO DE VENDA',
+)
+
+# Averbacoes que cancelam atos anteriores
+CANCELLATION_PATTERN = re.compile(r'CANCELAD[OA]|CANCELAMENTO|BAIXA D[AEO]|EXTINC[AO]')
+
+# Fim do trecho apos a palavra de cancelamento em que os atos citados contam
+# como cancelados: fim de frase, paragrafo ou ressalva de ato que continua
+CANCELLATION_SCOPE_END = re.compile(r'[.;]\s|\n\s*\n|MANTID|SUBSIST|PERMANEC|RATIFIC')
+CANCELLATION_SCOPE_MAX_CHARS = 300
+CANCELLING_ACT_MAX_CHARS = 60  # Distancia maxima entre o numero da averbacao e a palavra de cancelamento
+
+# Paginas em branco marcadas pelo cartorio contam como lidas
+BLANK_PAGE_MARKER = re.compile(r'^\W*EM BRANCO\W*$')
+
+
+# =============================================================================
+# RESULTADO
+# =============================================================================
+
+@dataclass
+class PagePruning:
+    """
+    Paginas de uma matricula escolhidas para envio.
+
+    Attributes:
+        total_pages: Numero de paginas do documento
+        kept_pages: Paginas mantidas (base 0, em ordem)
+        source: Origem do texto usado na decisao (camada_texto ou ocr)
+    """
+    total_pages: int
+    kept_pages: List[int]
+    source: str
+
+    @property
+    def dropped_pages(self) -> List[int]:
+        """Paginas removidas (base 0, em ordem)."""
+        kept = set(self.kept_pages)
+        return [page for page in range(self.total_pages) if page not in kept]
+
+    def to_metadata(self) -> Dict[str, Any]:
+        """Registro para metadados['poda_paginas'] (paginas em base 1)."""
+        return {
+            'fonte_texto': self.source,
+            'paginas_documento': self.total_pages,
+            'paginas_mantidas': format_page_ranges(self.kept_pages),
+            'faixas_removidas': format_page_ranges(self.dropped_pages),
+            'paginas_removidas': len(self.dropped_pages),
+        }
+
+
+def format_page_ranges(pages: Sequence[int]) -> List[str]:
+    """
+    Agrupa paginas (base 0) em faixas legiveis em base 1.
+
+    Args:
+        pages: Paginas em ordem crescente
+
+    Returns:
+        Faixas como ['1-2', '5', '9-12']
+    """
+    ranges: List[str] = []
+    run_start = None
+    for idx, page in enumerate(pages):
+        if run_start is None:
+            run_start = page
+        if idx + 1 == len(pages) or pages[idx + 1] != page + 1:
+            ranges.append(f"{run_start + 1}" if run_start == page else f"{run_start + 1}-{page + 1}")
+            run_start = None
+    return ranges
+
+
+# =============================================================================
+# TEXTO DAS PAGINAS
+# =============================================================================
+
+def _normalize(text: str) -> str:
+    """Remove acentos e coloca em maiusculas."""
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).upper()
+
+
+def strip_repeated_lines(page_texts: Sequence[str]) -> List[str]:
+    """
+    Remove de cada pagina as linhas repetidas na maioria das paginas.
+
+    Rodapes e cabecalhos (carimbo da ONR, nome do cartorio, "pagina X de Y")
+    aparecem em todas as paginas e nao dizem nada sobre os atos; digitos sao
+    ignorados na comparacao para que a numeracao nao os diferencie.
+
+    Args:
+        page_texts: Texto normalizado de cada pagina
+
+    Returns:
+        Texto proprio de cada pagina
+    """
+    def line_key(line: str) -> str:
+        return re.sub(r'\d+', '#', line.strip())
+
+    page_lines = [[line for line in text.splitlines() if line.strip()] for text in page_texts]
+    counts = Counter(key for lines in page_lines for key in {line_key(line) for line in lines})
+    min_pages = max(2, int(len(page_texts) * BOILERPLATE_MIN_PAGE_RATIO))
+    repeated = {key for key, count in counts.items() if count >= min_pages}
+
+    return ['\n'.join(line for line in lines if line_key(line) not in repeated) for lines in page_lines]
+
+
+def pdf_page_texts(pdf_path: Path) -> Optional[List[str]]:
+    """
+    Le a camada de texto de cada pagina de um PDF.
+
+    Args:
+        pdf_path: Caminho do PDF
+
+    Returns:
+        Texto de cada pagina, ou None se o arquivo nao abrir
+    """
+    try:
+        with fitz.open(str(pdf_path)) as doc:
+            return [page.get_text('text') for page in doc]
+    except Exception as e:
+        logger.warning(f"Nao foi possivel ler a camada de texto de {pdf_path}: {e}")
+        return None
+
+
+def ocr_page_texts(ocr_path: Path) -> Optional[List[str]]:
+    """
+    Divide o texto de um arquivo OCR por pagina.
+
+    So funciona com arquivos gerados com o cabecalho INICIO_PAGINAS (posicao
+    de cada pagina no texto apos o ---); arquivos antigos retornam None.
+
+    Args:
+        ocr_path: Caminho do arquivo .txt do OCR
+
+    Returns:
+        Texto de cada pagina, ou None se o arquivo nao tiver as posicoes
+    """
+    try:
+        content = Path(ocr_path).read_text(encoding='utf-8')
+    except OSError:
+        return None
+
+    header, separator, text = content.partition('---\n')
+    if not separator:
+        return None
+
+    for line in header.splitlines():
+        name, _, value = line.partition(':')
+        if name.strip() != OCR_PAGE_OFFSETS_HEADER:
+            continue
+        try:
+            offsets = [int(offset) for offset in value.split(',') if offset.strip()]
+        except ValueError:
+            return None
+        if not offsets or offsets != sorted(offsets):
+            return None
+        bounds = offsets[1:] + [len(text)]
+        return [text[start:end] for start, end in zip(offsets, bounds)]
+
+    return None
+
+
+def select_page_texts(page_texts: Sequence[str], pages: Sequence[int]) -> str:
+    """
+    Junta o texto das paginas escolhidas, com a pagina original de cada trecho.
+
+    Args:
+        page_texts: Texto de cada pagina do documento
+        pages: Paginas a incluir (base 0)
+
+    Returns:
+        Texto das paginas, separado por marcadores "[Pagina N]"
+    """
+    return '\n\n'.join(f"[Pagina {page + 1}]\n{page_texts[page].strip()}" for page in pages)
+
+
+# =============================================================================
+# PLANEJAMENTO
+# =============================================================================
+
+def _page_acts(text: str) -> Set[Tuple[str, int]]:
+    """Atos citados em uma pagina: {('R', 3), ('AV', 12), ...}."""
+    return {(kind.upper(), int(number)) for kind, number in ACT_NUMBER_PATTERN.findall(text)}
+
+
+def _cancellation_acts(text: str) -> Tuple[Set[Tuple[str, int]], Set[Tuple[str, int]]]:
+    """
+    Atos cancelados e averbacoes de cancelamento de uma pagina.
+
+    Um ato so conta como cancelado quando citado pelo numero depois da
+    palavra de cancelamento, no mesmo trecho ("CANCELAMENTO da hipoteca do
+    R-2"); os demais atos da pagina nao sao afetados. A averbacao logo antes
+    da palavra ("AV-5 - CANCELAMENTO ...") e a que cancela: nao e onus.
+
+    Args:
+        text: Texto normalizado da pagina
+
+    Returns:
+        Tupla (atos cancelados, averbacoes de cancelamento)
+    """
+    cancelled: Set[Tuple[str, int]] = set()
+    cancelling: Set[Tuple[str, int]] = set()
+    for match in CANCELLATION_PATTERN.finditer(text):
+        scope = text[match.end():match.end() + CANCELLATION_SCOPE_MAX_CHARS]
+        scope_end = CANCELLATION_SCOPE_END.search(scope)
+        cancelled |= _page_acts(scope[:scope_end.start()] if scope_end else scope)
+
+        before = re.split(r'[.;]\s', text[max(0, match.start() - CANCELLING_ACT_MAX_CHARS):match.start()])[-1]
+        own_acts = ACT_NUMBER_PATTERN.findall(before)
+        if own_acts and own_acts[-1][0].upper() == 'AV':
+            cancelling.add(('AV', int(own_acts[-1][1])))
+    return cancelled, cancelling
+
+
+def _has_any(text: str, keywords: Sequence[str]) -> bool:
+    """Indica se o texto contem alguma das palavras-chave."""
+    return any(keyword in text for keyword in keywords)
+
+
+def plan_matricula_pruning(page_texts: Sequence[str], source: str = TEXT_SOURCE_LAYER) -> Optional[PagePruning]:
+    """
+    Escolhe as paginas de uma matricula a enviar, a partir do texto de cada pagina.
+
+    Args:
+        page_texts: Texto de cada pagina (camada de texto ou OCR)
+        source: Origem do texto (registrada no resultado)
+
+    Returns:
+        PagePruning, ou None se o documento deve ir inteiro (texto
+        insuficiente, nenhum ato de transmissao encontrado ou poda pequena)
+    """
+    total_pages = len(page_texts)
+    if total_pages <= PRUNE_HEAD_MAX_PAGES + PRUNE_TAIL_PAGES + PRUNE_MIN_DROPPED_PAGES:
+        return None
+
+    texts = strip_repeated_lines([_normalize(text) for text in page_texts])
+    for page, text in enumerate(texts):
+        own_chars = len(re.sub(r'\s+', '', text))
+        if own_chars < PRUNE_MIN_CHARS_PER_PAGE and not BLANK_PAGE_MARKER.match(text.strip()):
+            logger.debug(f"Pagina {page + 1} sem texto suficiente ({own_chars} caracteres): sem poda")
+            return None
+
+    acts = [_page_acts(text) for text in texts]
+
+    # Situacao atual: do ultimo ato de transmissao ate o fim
+    ownership_pages = [page for page, text in enumerate(texts) if page > 0 and _has_any(text, OWNERSHIP_KEYWORDS)]
+    if not ownership_pages:
+        return None
+    current_from = ownership_pages[-1]
+
+    kept: Set[int] = set(range(current_from, total_pages))
+    kept.update(range(max(0, total_pages - PRUNE_TAIL_PAGES), total_pages))
+
+    # Abertura: ate a pagina do primeiro ato
+    first_act_page = next((page for page, page_acts in enumerate(acts) if page_acts), 0)
+    kept.update(range(min(first_act_page, PRUNE_HEAD_MAX_PAGES - 1) + 1))
+
+    # Onus anteriores que nao foram cancelados depois: a pagina so sai se
+    # todos os seus atos foram cancelados ou sao os proprios cancelamentos
+    resolved: Set[Tuple[str, int]] = set()
+    for text in texts:
+        cancelled, cancelling = _cancellation_acts(text)
+        resolved |= cancelled | cancelling
+    for page in range(current_from):
+        if not _has_any(texts[page], ENCUMBRANCE_KEYWORDS):
+            continue
+        if not acts[page] or acts[page] - resolved:
+            kept.update((page, page + 1))  # O ato pode continuar na pagina seguinte
+
+    kept_pages = sorted(page for page in kept if page < total_pages)
+    if total_pages - len(kept_pages) < PRUNE_MIN_DROPPED_PAGES:
+        return None
+    return PagePruning(total_pages=total_pages, kept_pages=kept_pages, source=source)
+
+
+def plan_document_pruning(pdf_path: Path, ocr_path: Optional[str] = None) -> Optional[PagePruning]:
+    """
+    Planeja a poda de uma matricula em PDF, pela camada de texto ou pelo OCR.
+
+    Args:
+        pdf_path: Caminho do PDF
+        ocr_path: Arquivo OCR do documento (usado se a camada de texto nao bastar)
+
+    Returns:
+        PagePruning, ou None para enviar o documento inteiro
+    """
+    layer_texts = pdf_page_texts(pdf_path)
+    if not layer_texts:
+        return None
+
+    pruning = plan_matricula_pruning(layer_texts, TEXT_SOURCE_LAYER)
+    if pruning is None and ocr_path:
+        ocr_texts = ocr_page_texts(Path(ocr_path))
+        if ocr_texts and len(ocr_texts) == len(layer_texts):
+            pruning = plan_matricula_pruning(ocr_texts, TEXT_SOURCE_OCR)
+
+    if pruning:
+        logger.info(
+            f"Poda de {pdf_path.name}: mantendo paginas {', '.join(format_page_ranges(pruning.kept_pages))} "
+            f"de {pruning.total_pages} (fonte: {pruning.source})"
+        )
+    return pruning
+
+
+def skipped_page_set(pruning: Optional[PagePruning]) -> FrozenSet[int]:
+    """Paginas (base 0) a pular na renderizacao; vazio sem poda."""
+    return frozenset(pruning.dropped_pages) if pruning else frozenset()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+matricula_windows.py - Extracao de matriculas longas em janelas de paginas
+
+Matriculas com dezenas de paginas nao cabem em um unico request sem perder
+paginas (limite max_pages do perfil) ou esgotar os tokens de saida. Neste
+modo o PDF e dividido em janelas de paginas sobrepostas, cada janela e
+extraida em um request separado e os dados_catalogados sao combinados de
+forma deterministica:
+
+- Campos simples e objetos (imovel, certidao_metadata): primeiro valor
+  preenchido, na ordem das paginas
+- Atos (registros_averbacoes, cadeia_dominial, onus, cessoes, matriculas
+  relacionadas): uniao pela chave do ato (ex: "R-3/12.345"), ordenada pelo
+  numero do ato. Atos repetidos na sobreposicao sao fundidos, partindo da
+  versao mais completa
+- proprietarios_atuais e data_ultima_atualizacao: ultima janela que os informa
+- onus_ativos: remove onus que aparecem cancelados em onus_historicos
+- alertas: uniao sem duplicatas
+
+As janelas sao processadas por extract_with_gemini.py; este modulo so
+planeja as faixas de paginas e combina os resultados.
+
+Uso:
+    from execution.matricula_windows import plan_page_windows, merge_window_data
+
+    windows = plan_page_windows(total_pages=60, window_pages=15, overlap=2)
+    dados = merge_window_data([janela['dados_catalogados'] for janela in resultados])
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+# Listas de atos e o campo que identifica cada ato
+KEYED_LISTS: Dict[str, str] = {
+    'registros_averbacoes': 'numero',
+    'cadeia_dominial': 'registro',
+    'onus_ativos': 'registro',
+    'onus_historicos': 'registro',
+    'cessoes_direitos': 'averbacao',
+    'matriculas_relacionadas': 'numero',
+}
+
+# Campos em que vale a informacao mais recente (ultima janela que os informa)
+LATEST_FIELDS = ('proprietarios_atuais', 'data_ultima_atualizacao')
+
+# Tipo e numero do ato: "R-3/12.345", "AV.12", "Av 4" -> (R, 3), (AV, 12), (AV, 4)
+ACT_NUMBER_PATTERN = re.compile(r'\b(R|AV)\s*[-.]?\s*(\d+)', re.IGNORECASE)
+
+# Ordem de atos sem numero: abertura da matricula primeiro, demais no fim
+OPENING_ACT_ORDER = -1
+UNNUMBERED_ACT_ORDER = float('inf')
+
+
+# =============================================================================
+# PLANEJAMENTO
+# =============================================================================
+
+def plan_page_windows(total_pages: int, window_pages: int, overlap: int) -> List[Tuple[int, int]]:
+    """
+    Divide [0, total_pages) em janelas de ate window_pages paginas sobrepostas.
+
+    Janelas vizinhas compartilham `overlap` paginas, para que atos que cruzam
+    a quebra de pagina aparecam inteiros em pelo menos uma janela. A ultima
+    janela e alinhada ao fim do documento (nunca fica com poucas paginas).
+
+    Args:
+        total_pages: Numero de paginas do documento
+        window_pages: Paginas por janela
+        overlap: Paginas repetidas entre janelas vizinhas
+
+    Returns:
+        Lista de (inicio, fim) com fim exclusivo, em ordem. Uma unica janela
+        se o documento couber em window_pages.
+
+    Raises:
+        ValueError: Se overlap nao for menor que window_pages
+    """
+    if window_pages <= overlap:
+        raise ValueError(f"Janela ({window_pages} paginas) deve ser maior que a sobreposicao ({overlap})")
+
+    if total_pages <= window_pages:
+        return [(0, total_pages)]
+
+    step = window_pages - overlap
+    windows = []
+    start = 0
+    while start + window_pages < total_pages:
+        windows.append((start, start + window_pages))
+        start += step
+    windows.append((total_pages - window_pages, total_pages))
+    return windows
+
+
+# =============================================================================
+# COMBINACAO DOS RESULTADOS
+# =============================================================================
+
+def _is_empty(value: Any) -> bool:
+    """Indica se um valor extraido esta ausente (None, '', lista/dict vazios)."""
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _filled_count(value: Any) -> int:
+    """Conta os campos preenchidos de um valor (recursivo), para escolher a versao mais completa."""
+    if isinstance(value, dict):
+        return sum(_filled_count(v) for v in value.values())
+    if isinstance(value, list):
+        return sum(_filled_count(v) for v in value)
+    return 0 if _is_empty(value) else 1
+
+
+def _merge_values(values: Sequence[Any]) -> Any:
+    """
+    Combina os valores de um campo vindos de varias janelas (na ordem das paginas).
+
+    Dicts sao combinados campo a campo, listas viram a uniao sem duplicatas
+    e valores simples ficam com o primeiro preenchido.
+    """
+    present = [v for v in values if not _is_empty(v)]
+    if not present:
+        return values[0] if values else None
+
+    if all(isinstance(v, dict) for v in present):
+        keys: List[str] = []
+        for value in present:
+            keys.extend(k for k in value if k not in keys)
+        return {k: _merge_values([v.get(k) for v in present]) for k in keys}
+
+    if all(isinstance(v, list) for v in present):
+        merged: List[Any] = []
+        seen = set()
+        for value in present:
+            for item in value:
+                marker = json.dumps(item, sort_keys=True, ensure_ascii=False)
+                if marker not in seen:
+                    seen.add(marker)
+                    merged.append(item)
+        return merged
+
+    return present[0]
+
+
+def _act_key(item: Any, key_field: str) -> Optional[str]:
+    """
+    Chave normalizada de um item (ex: 'R-3/12.345' e 'R.3' -> 'R-3'), ou None.
+
+    Atos sao identificados so pelo tipo e numero - a matricula e a mesma em
+    todo o documento e nem sempre e repetida. Demais valores (ex: numero de
+    matricula relacionada) perdem apenas pontuacao e espacos.
+    """
+    if not isinstance(item, dict) or _is_empty(item.get(key_field)):
+        return None
+    value = str(item[key_field])
+    match = ACT_NUMBER_PATTERN.search(value)
+    if match:
+        return f"{match.group(1).upper()}-{int(match.group(2))}"
+    return re.sub(r'[\s.\-/]', '', value).upper()
+
+
+def act_order(key: Optional[str]) -> float:
+    """
+    Posicao de um ato na matricula pelo seu numero.
+
+    R e AV compartilham a mesma sequencia (R-1, AV-2, R-3...). A abertura da
+    matricula vem antes de todos; atos sem numero reconhecivel vao para o fim.
+
+    Args:
+        key: Identificador do ato (ex: 'R-3/12.345', 'AV-4', 'MATRICULA')
+
+    Returns:
+        Numero do ato para ordenacao
+    """
+    if not key:
+        return UNNUMBERED_ACT_ORDER
+    match = ACT_NUMBER_PATTERN.search(str(key))
+    if match:
+        return int(match.group(2))
+    if 'MATRICULA' in str(key).upper():
+        return OPENING_ACT_ORDER
+    return UNNUMBERED_ACT_ORDER
+
+
+def _merge_keyed_list(lists: Sequence[Any], key_field: str) -> List[Any]:
+    """
+    Une listas de atos pela chave, fundindo as versoes repetidas na sobreposicao.
+
+    A versao com mais campos preenchidos serve de base (a outra janela pode ter
+    visto o ato cortado na quebra de pagina) e a ordem final segue o numero do
+    ato. Itens sem chave sao mantidos no fim, sem duplicatas.
+    """
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    unkeyed: List[Any] = []
+
+    for items in lists:
+        for item in items or []:
+            key = _act_key(item, key_field)
+            if key is None:
+                unkeyed.append(item)
+            else:
+                grouped.setdefault(key, []).append(item)
+
+    merged = []
+    for versions in grouped.values():
+        # sorted() e estavel: em caso de empate prevalece a janela mais antiga
+        ordered = sorted(versions, key=_filled_count, reverse=True)
+        item = _merge_values(ordered)
+        # Mantem a grafia mais completa do identificador ('R-3/12.345' em vez de 'R-3')
+        item[key_field] = max((v[key_field] for v in versions), key=lambda k: len(str(k)))
+        merged.append(item)
+
+    merged.sort(key=lambda item: act_order(item.get(key_field)))
+    return merged + _merge_values([unkeyed])
+
+
+def merge_window_data(windows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combina os dados_catalogados das janelas de uma matricula em um unico JSON.
+
+    Args:
+        windows: dados_catalogados de cada janela, na ordem das paginas
+
+    Returns:
+        dados_catalogados combinados (mesmo formato do prompt da matricula)
+    """
+    windows = [w for w in windows if isinstance(w, dict) and w]
+    if not windows:
+        return {}
+
+    keys: List[str] = []
+    for window in windows:
+        keys.extend(k for k in window if k not in keys and not k.startswith('_'))
+
+    merged: Dict[str, Any] = {}
+    for key in keys:
+        values = [w.get(key) for w in windows]
+        if key in KEYED_LISTS:
+            merged[key] = _merge_keyed_list(values, KEYED_LISTS[key])
+        elif key in LATEST_FIELDS:
+            latest = [v for v in values if not _is_empty(v)]
+            merged[key] = latest[-1] if latest else values[-1]
+        else:
+            merged[key] = _merge_values(values)
+
+    # Cada janela numera a cadeia dominial a partir de 1
+    for idx, item in enumerate(merged.get('cadeia_dominial') or [], start=1):
+        if isinstance(item, dict) and 'sequencia' in item:
+            item['sequencia'] = idx
+
+    # Um onus visto ativo em uma janela pode ter o cancelamento averbado em outra
+    if merged.get('onus_ativos') and merged.get('onus_historicos'):
+        cancelled = {_act_key(item, 'registro') for item in merged['onus_historicos']}
+        merged['onus_ativos'] = [
+            item for item in merged['onus_ativos']
+            if _act_key(item, 'registro') is None or _act_key(item, 'registro') not in cancelled
+        ]
+
+    return merged
+
+
+def merge_window_texts(texts: Sequence[Tuple[Tuple[int, int], str]]) -> str:
+    """
+    Junta os textos (reescrita, explicacao) das janelas com um cabecalho por faixa.
+
+    Args:
+        texts: Lista de ((inicio, fim), texto) na ordem das paginas, fim exclusivo
+
+    Returns:
+        Texto unico; janelas sem texto sao omitidas
+    """
+    sections = [
+        f"### Paginas {start + 1}-{end}\n\n{text.strip()}"
+        for (start, end), text in texts
+        if text and text.strip()
+    ]
+    return "\n\n".join(sections)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+memory_budget.py - Orcamento global de memoria para imagens decodificadas
+
+Com varios workers de classificacao/extracao, varias imagens grandes podem
+ser decodificadas ao mesmo tempo (ex: paginas de PDFs de 50 paginas
+empilhadas em uma unica imagem) e o processo pode ser encerrado por falta de
+memoria. Este modulo contabiliza os bytes decodificados: antes de
+renderizar/decodificar/codificar, a thread reserva uma estimativa do pico de
+memoria e bloqueia ate que a reserva caiba no orcamento.
+
+Reservas que precisam esperar sao atendidas em ordem de chegada: enquanto
+houver alguma na fila, as que chegam depois entram atras dela, mesmo que
+coubessem. Assim uma reserva grande nao e ultrapassada indefinidamente por
+reservas pequenas. Uma reserva maior que o orcamento inteiro nunca fica
+presa: ela espera o orcamento esvaziar e entao roda sozinha. Reservas aninhadas na mesma thread
+ja estao cobertas pela reserva externa: nao bloqueiam nem somam (a thread
+nunca espera por si mesma). Assim o chamador pode reservar o pico de uma
+etapa inteira (ex: renderizar + concatenar + codificar) enquanto as funcoes
+internas continuam protegidas quando chamadas diretamente.
+
+Opcionalmente, imagens grandes podem ser gravadas em disco (spill) enquanto
+aguardam - o modo concatenado da extracao usa isso para nao manter todas as
+paginas em memoria ao mesmo tempo que a imagem final.
+
+O orcamento vale por processo: no backend de preparacao 'process', cada
+processo tem o seu.
+
+Uso:
+    from execution.memory_budget import decoded_image_bytes, get_memory_budget
+
+    budget = get_memory_budget()
+    with budget.reserve(decoded_image_bytes(width, height, 'RGB') * 3):
+        ...  # decodifica, processa e codifica a imagem
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+MB = 1024 * 1024
+DEFAULT_MEMORY_BUDGET_MB = int(os.getenv("MEMORIA_IMAGENS_MB", 2048))  # 0 = sem limite
+DEFAULT_SPILL_TO_DISK = os.getenv("SPILL_IMAGENS", "").lower() in ('1', 'true', 'sim')
+SPILL_DIR = Path(__file__).resolve().parent.parent / '.tmp' / 'spill'
+SPILL_MIN_BYTES = 256 * MB  # Abaixo disso gravar em disco custa mais do que economiza
+
+# Fatores de pico sobre os bytes decodificados de uma imagem
+ENCODE_MEMORY_FACTOR = 3  # Pixmap/decodificacao + copia PIL + copias do encoder (cinza, reducao)
+
+# Bytes por pixel de uma imagem PIL (RGB e guardado como RGBX internamente)
+_BYTES_PER_PIXEL = {'1': 1, 'L': 1, 'P': 1, 'LA': 4, 'RGB': 4, 'RGBA': 4, 'CMYK': 4, 'I;16': 2, 'I': 4, 'F': 4}
+
+
+# =============================================================================
+# FUNCOES AUXILIARES
+# =============================================================================
+
+def decoded_image_bytes(width: float, height: float, mode: str = 'RGB') -> int:
+    """
+    Estima a memoria de uma imagem decodificada.
+
+    Args:
+        width: Largura em pixels
+        height: Altura em pixels
+        mode: Modo PIL ('RGB', 'L', ...)
+
+    Returns:
+        Bytes ocupados pela imagem em memoria
+    """
+    return int(width * height * _BYTES_PER_PIXEL.get(mode, 4))
+
+
+# =============================================================================
+# ORCAMENTO
+# =============================================================================
+
+class MemoryBudget:
+    """
+    Semaforo contado em bytes para imagens decodificadas (thread-safe).
+
+    Args:
+        max_bytes: Orcamento total (0 ou None = sem limite, apenas contabiliza)
+        spill_to_disk: Permite gravar imagens grandes em disco (ver spill_dir_for)
+        spill_min_bytes: Tamanho minimo de uma imagem para ir ao disco
+    """
+
+    def __init__(
+        self,
+        max_bytes: Optional[int] = None,
+        spill_to_disk: bool = False,
+        spill_min_bytes: int = SPILL_MIN_BYTES
+    ):
+        self.max_bytes = max_bytes or 0
+        self.spill_to_disk = spill_to_disk
+        self.spill_min_bytes = spill_min_bytes
+        self._in_use = 0
+        self._peak = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._condition = threading.Condition()
+        self._waiting: deque = deque()  # Fila de espera (uma ficha por reserva, em ordem de chegada)
+        self._local = threading.local()
+
+    @property
+    def in_use(self) -> int:
+        """Bytes reservados no momento."""
+        return self._in_use
+
+    def _fits(self, nbytes: int) -> bool:
+        """Indica se uma reserva cabe agora (reserva maior que o total so roda sozinha)."""
+        return not self.max_bytes or self._in_use == 0 or self._in_use + nbytes <= self.max_bytes
+
+    @contextmanager
+    def reserve(self, nbytes: int, label: str = '') -> Iterator[int]:
+        """
+        Reserva bytes do orcamento durante o bloco, bloqueando ate caberem.
+
+        Args:
+            nbytes: Estimativa do pico de memoria do bloco
+            label: Descricao para o log (ex: nome do arquivo)
+
+        Yields:
+            Bytes reservados (0 se aninhada em outra reserva da mesma thread)
+        """
+        depth = getattr(self._local, 'depth', 0)
+        nbytes = max(0, int(nbytes)) if depth == 0 else 0
+
+        with self._condition:
+            if depth == 0 and (self._waiting or not self._fits(nbytes)):
+                start = time.monotonic()
+                logger.debug(
+                    f"Aguardando memoria para {label or 'imagem'}: {nbytes / MB:.0f}MB "
+                    f"(em uso {self._in_use / MB:.0f}MB de {self.max_bytes / MB:.0f}MB, "
+                    f"{len(self._waiting)} na fila)"
+                )
+                ticket = object()
+                self._waiting.append(ticket)
+                while self._waiting[0] is not ticket or not self._fits(nbytes):
+                    self._condition.wait()
+                self._waiting.popleft()
+                # A proxima da fila pode caber junto com esta
+                self._condition.notify_all()
+                self._waits += 1
+                self._wait_seconds += time.monotonic() - start
+            self._in_use += nbytes
+            self._peak = max(self._peak, self._in_use)
+
+        self._local.depth = depth + 1
+        try:
+            yield nbytes
+        finally:
+            self._local.depth = depth
+            with self._condition:
+                self._in_use -= nbytes
+                self._condition.notify_all()
+
+    def spill_dir_for(self, nbytes: int) -> Optional[Path]:
+        """
+        Retorna o diretorio de spill se uma imagem desse tamanho deve ir ao disco.
+
+        Args:
+            nbytes: Bytes decodificados da imagem (ou conjunto de paginas)
+
+        Returns:
+            Diretorio (criado se necessario) ou None para manter em memoria
+        """
+        if not self.spill_to_disk or nbytes < self.spill_min_bytes:
+            return None
+        SPILL_DIR.mkdir(parents=True, exist_ok=True)
+        return SPILL_DIR
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumo para os relatorios de execucao."""
+        return {
+            'orcamento_mb': round(self.max_bytes / MB) if self.max_bytes else None,
+            'pico_mb': round(self._peak / MB, 1),
+            'esperas': self._waits,
+            'tempo_espera_s': round(self._wait_seconds, 2),
+            'spill_disco': self.spill_to_disk
+        }
+
+
+# Orcamento compartilhado do processo (ver configure_memory_budget)
+_budget = MemoryBudget(DEFAULT_MEMORY_BUDGET_MB * MB, DEFAULT_SPILL_TO_DISK)
+
+
+def get_memory_budget() -> MemoryBudget:
+    """Retorna o orcamento de memoria compartilhado do processo."""
+    return _budget
+
+
+def configure_memory_budget(max_mb: Optional[int], spill_to_disk: bool = False) -> MemoryBudget:
+    """
+    Substitui o orcamento compartilhado (chamar antes de iniciar os workers).
+
+    Args:
+        max_mb: Orcamento em MB (0 ou None = sem limite)
+        spill_to_disk: Permite gravar imagens grandes em disco
+
+    Returns:
+        Novo orcamento compartilhado
+    """
+    global _budget
+    _budget = MemoryBudget((max_mb or 0) * MB, spill_to_disk)
+    if max_mb:
+        logger.info(f"Orcamento de memoria para imagens: {max_mb}MB (spill em disco: {spill_to_disk})")
+    return _budget
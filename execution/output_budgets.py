@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+output_budgets.py - Orcamentos de tokens de saida por tipo de documento
+
+Todo request de extracao usava max_output_tokens=16384, de uma CNDT de uma
+pagina a uma matricula de 50 paginas: uma resposta descontrolada (repeticao,
+transcricao sem fim) consumia latencia e cota ate esse teto. Aqui o teto de
+cada request vem do historico de execucoes:
+
+- Cada request e classificado por tipo de documento, modo de resposta
+  (secoes ou json) e classe de tamanho (paginas enviadas, SIZE_CLASSES)
+- Os registros de metadados.chamadas_api (api_usage.py) das extracoes em
+  .tmp/contextual/ dao a distribuicao de tokens de saida (resposta +
+  raciocinio da ultima resposta de cada request, sem retries nem
+  fallbacks) de cada combinacao
+- O orcamento e o percentil BUDGET_PERCENTILE vezes BUDGET_MARGIN,
+  arredondado para cima em BUDGET_STEP_TOKENS e limitado a
+  [MIN_BUDGET_TOKENS, DEFAULT_MAX_OUTPUT_TOKENS]
+- Combinacoes com menos de MIN_SAMPLES amostras ficam sem orcamento e
+  usam DEFAULT_MAX_OUTPUT_TOKENS
+
+Os orcamentos ficam em execution/orcamentos_saida.json (variavel
+ORCAMENTOS_SAIDA), que pode ser editado a mao. Se uma resposta for cortada
+pelo orcamento (finish_reason MAX_TOKENS), a extracao repete o request com
+DEFAULT_MAX_OUTPUT_TOKENS, e o registro marca orcamento_excedido.
+
+Uso:
+    python execution/output_budgets.py              # Mostra os orcamentos calculados
+    python execution/output_budgets.py --gravar     # Grava em orcamentos_saida.json
+
+    from execution.output_budgets import output_budget, size_class
+    max_tokens, fonte = output_budget('RG', 'json', size_class(2))
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Configurar caminhos
+ROOT_DIR = Path(__file__).resolve().parent.parent
+CONTEXTUAL_DIR = ROOT_DIR / '.tmp' / 'contextual'
+BUDGETS_FILE = Path(os.getenv("ORCAMENTOS_SAIDA", ROOT_DIR / 'execution' / 'orcamentos_saida.json'))
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+DEFAULT_MAX_OUTPUT_TOKENS = 16384  # Teto sem historico (limite usado antes dos orcamentos)
+MIN_BUDGET_TOKENS = 2048  # Piso de qualquer orcamento
+BUDGET_STEP_TOKENS = 256  # Orcamentos arredondados para cima neste passo
+BUDGET_PERCENTILE = 99.0
+BUDGET_MARGIN = 1.5  # Folga sobre o percentil
+MIN_SAMPLES = 20  # Amostras minimas para aprender um orcamento
+
+# Classes de tamanho por paginas enviadas no request: (maximo de paginas, nome)
+SIZE_CLASSES = (
+    (2, 'ate_2_paginas'),
+    (10, 'ate_10_paginas'),
+    (30, 'ate_30_paginas')
+)
+LARGEST_SIZE_CLASS = 'acima_30_paginas'
+
+BUDGET_SOURCE_HISTORY = 'historico'
+BUDGET_SOURCE_DEFAULT = 'padrao'
+
+
+# =============================================================================
+# CONSULTA
+# =============================================================================
+
+def size_class(pages: int) -> str:
+    """Classe de tamanho de um request pelo numero de paginas enviadas."""
+    for max_pages, name in SIZE_CLASSES:
+        if pages <= max_pages:
+            return name
+    return LARGEST_SIZE_CLASS
+
+
+@lru_cache(maxsize=None)
+def load_output_budgets(budgets_file: Path = BUDGETS_FILE) -> Dict[str, Any]:
+    """
+    Carrega os orcamentos (tipo -> modo de resposta -> classe -> orcamento).
+
+    Args:
+        budgets_file: Arquivo de orcamentos
+
+    Returns:
+        Orcamentos por tipo; vazio se o arquivo nao existir ou for invalido
+    """
+    if not budgets_file.exists():
+        return {}
+    try:
+        with open(budgets_file, 'r', encoding='utf-8') as f:
+            return json.load(f).get('orcamentos', {})
+    except (OSError, json.JSONDecodeError, AttributeError) as e:
+        logger.warning(f"Erro ao carregar orcamentos de saida {budgets_file}: {e}")
+        return {}
+
+
+def output_budget(tipo_documento: str, modo_resposta: str, classe: str) -> Tuple[int, str]:
+    """
+    Teto de tokens de saida de um request.
+
+    Args:
+        tipo_documento: Tipo do documento (ex: RG)
+        modo_resposta: 'secoes' ou 'json'
+        classe: Classe de tamanho (size_class)
+
+    Returns:
+        Tupla (max_output_tokens, fonte: 'historico' ou 'padrao')
+    """
+    budget = load_output_budgets().get(tipo_documento, {}).get(modo_resposta, {}).get(classe)
+    if not budget or not budget.get('max_tokens_saida'):
+        return DEFAULT_MAX_OUTPUT_TOKENS, BUDGET_SOURCE_DEFAULT
+    return min(int(budget['max_tokens_saida']), DEFAULT_MAX_OUTPUT_TOKENS), BUDGET_SOURCE_HISTORY
+
+
+# =============================================================================
+# APRENDIZADO A PARTIR DO HISTORICO
+# =============================================================================
+
+def collect_output_samples(contextual_dir: Path = CONTEXTUAL_DIR) -> Dict[Tuple[str, str, str], List[int]]:
+    """
+    Le os tokens de saida reais de cada request das extracoes ja feitas.
+
+    Usa os JSONs por documento de .tmp/contextual/{caso}/ (o mesmo conjunto
+    lido pelo map_to_fields). A amostra e a saida da ultima resposta do
+    request (tokens_saida_ultima_resposta): os totais do registro somam
+    retries, fallbacks e a repeticao apos corte no orcamento. Ficam de fora
+    os requests sem essa contagem ou sem classe de tamanho (extracoes
+    anteriores), os interrompidos nos dados (--parar-nos-dados), cuja saida
+    nao e a completa, os cortados no orcamento e os de extracoes com erro.
+
+    Args:
+        contextual_dir: Diretorio com as extracoes por caso
+
+    Returns:
+        (tipo, modo de resposta, classe) -> tokens de saida por request
+    """
+    samples: Dict[Tuple[str, str, str], List[int]] = {}
+    for json_file in sorted(contextual_dir.glob('*/*.json')):
+        if 'relatorio' in json_file.name:
+            continue
+        try:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignorando {json_file}: {e}")
+            continue
+
+        tipo = result.get('tipo_documento')
+        if not tipo or result.get('status') == 'erro':
+            continue
+        for call in (result.get('metadados') or {}).get('chamadas_api', []):
+            if call.get('tokens_saida_ultima_resposta') is None:
+                continue
+            if call.get('interrompido_nos_dados') or call.get('orcamento_excedido'):
+                continue
+            if not call.get('classe_tamanho') or not call.get('modo_resposta'):
+                continue
+            samples.setdefault((tipo, call['modo_resposta'], call['classe_tamanho']), []).append(
+                call['tokens_saida_ultima_resposta']
+            )
+    return samples
+
+
+def percentile(values: List[int], pct: float) -> int:
+    """Percentil pelo metodo do posto mais proximo (valor observado, sem interpolacao)."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def learn_output_budgets(
+    samples: Dict[Tuple[str, str, str], List[int]],
+    pct: float = BUDGET_PERCENTILE,
+    margin: float = BUDGET_MARGIN,
+    min_samples: int = MIN_SAMPLES
+) -> Dict[str, Any]:
+    """
+    Calcula os orcamentos a partir das amostras.
+
+    Args:
+        samples: Retorno de collect_output_samples
+        pct: Percentil da distribuicao de tokens de saida
+        margin: Multiplicador sobre o percentil
+        min_samples: Amostras minimas por combinacao
+
+    Returns:
+        Conteudo de orcamentos_saida.json
+    """
+    budgets: Dict[str, Any] = {}
+    skipped = 0
+    for (tipo, modo, classe), values in sorted(samples.items()):
+        if len(values) < min_samples:
+            skipped += 1
+            continue
+        observed = percentile(values, pct)
+        budget = math.ceil(observed * margin / BUDGET_STEP_TOKENS) * BUDGET_STEP_TOKENS
+        budgets.setdefault(tipo, {}).setdefault(modo, {})[classe] = {
+            'max_tokens_saida': min(max(budget, MIN_BUDGET_TOKENS), DEFAULT_MAX_OUTPUT_TOKENS),
+            'amostras': len(values),
+            'p50': percentile(values, 50),
+            f'p{pct:g}': observed,
+            'maximo': max(values)
+        }
+    if skipped:
+        logger.info(f"{skipped} combinacao(oes) com menos de {min_samples} amostras: seguem com {DEFAULT_MAX_OUTPUT_TOKENS}")
+
+    return {
+        'gerado_em': datetime.now().isoformat(),
+        'percentil': pct,
+        'margem': margin,
+        'min_amostras': min_samples,
+        'padrao': DEFAULT_MAX_OUTPUT_TOKENS,
+        'orcamentos': budgets
+    }
+
+
+def main():
+    """Funcao principal - entry point do script"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(
+        description='Calcula orcamentos de tokens de saida por tipo a partir das extracoes ja feitas'
+    )
+    parser.add_argument(
+        '--contextual',
+        type=Path,
+        default=CONTEXTUAL_DIR,
+        help=f'Diretorio das extracoes (default: {CONTEXTUAL_DIR})'
+    )
+    parser.add_argument(
+        '--percentil',
+        type=float,
+        default=BUDGET_PERCENTILE,
+        help=f'Percentil dos tokens de saida observados (default: {BUDGET_PERCENTILE:g})'
+    )
+    parser.add_argument(
+        '--margem',
+        type=float,
+        default=BUDGET_MARGIN,
+        help=f'Multiplicador sobre o percentil (default: {BUDGET_MARGIN:g})'
+    )
+    parser.add_argument(
+        '--min-amostras',
+        type=int,
+        default=MIN_SAMPLES,
+        help=f'Requests minimos por tipo/modo/classe para aprender um orcamento (default: {MIN_SAMPLES})'
+    )
+    parser.add_argument(
+        '--gravar',
+        action='store_true',
+        help=f'Grava os orcamentos em {BUDGETS_FILE} (padrao: so mostra)'
+    )
+    args = parser.parse_args()
+
+    if not 0 < args.percentil <= 100 or args.margem < 1 or args.min_amostras < 1:
+        parser.error("--percentil deve estar em (0, 100], --margem >= 1 e --min-amostras >= 1")
+
+    samples = collect_output_samples(args.contextual)
+    if not samples:
+        logger.error(f"Nenhum request com usage_metadata e classe de tamanho em {args.contextual}")
+        sys.exit(1)
+
+    config = learn_output_budgets(samples, args.percentil, args.margem, args.min_amostras)
+    print(json.dumps(config, ensure_ascii=False, indent=2))
+
+    if args.gravar:
+        with open(BUDGETS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        logger.info(f"Orcamentos gravados em {BUDGETS_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+page_cache.py - Cache em disco de paginas renderizadas e codificadas
+
+Cada PDF era renderizado em toda execucao: na classificacao, na extracao e
+de novo a cada reexecucao ou teste de prompt. Este cache guarda os bytes ja
+codificados (JPEG/PNG/WebP) de cada pagina em .tmp/cache/paginas/, com a
+chave derivada do CONTEUDO do arquivo (SHA-256), do numero da pagina e de
+tudo que altera a imagem (perfil de renderizacao, zoom, modo). Renomear ou
+mover o arquivo nao invalida o cache; editar o arquivo ou o perfil sim.
+
+O tamanho total e limitado (CACHE_PAGINAS_MB): ao passar do limite, as
+entradas usadas ha mais tempo sao removidas (LRU pela data de modificacao,
+atualizada a cada acerto). As gravacoes sao atomicas, entao varios
+processos (pool de renderizacao, fases rodando em paralelo) podem
+compartilhar o mesmo diretorio.
+
+Uso:
+    from execution.page_cache import file_digest, get_page_cache, page_key
+
+    cache = get_page_cache()
+    key = page_key(file_digest(pdf_path), page_num, profile, zoom)
+    cached = cache.get(key)
+    if cached is None:
+        data, mime_type = ...  # renderiza e codifica
+        cache.put(key, data, mime_type)
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+MB = 1024 * 1024
+CACHE_DIR = Path(__file__).resolve().parent.parent / '.tmp' / 'cache' / 'paginas'
+DEFAULT_CACHE_MB = int(os.getenv("CACHE_PAGINAS_MB", 1024))  # 0 = cache desativado
+CACHE_VERSION = 1  # Incrementar quando o formato das paginas codificadas mudar
+EVICT_TARGET_RATIO = 0.9  # A limpeza LRU libera espaco ate 90% do limite (evita limpar a cada gravacao)
+DIGEST_CHUNK_BYTES = 1024 * 1024
+
+# Extensao de cada formato guardado (o MIME type e recuperado pela extensao)
+MIME_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+EXTENSION_MIMES = {ext: mime for mime, ext in MIME_EXTENSIONS.items()}
+
+
+# =============================================================================
+# CHAVES
+# =============================================================================
+
+# Hash de cada arquivo, por (caminho, tamanho, data de modificacao)
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(file_path: Path) -> str:
+    """
+    Calcula o SHA-256 do conteudo de um arquivo (memorizado enquanto o arquivo nao mudar).
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        Hash hexadecimal do conteudo
+    """
+    stat = os.stat(file_path)
+    marker = (str(Path(file_path).resolve()), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if marker in _digests:
+            return _digests[marker]
+
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_BYTES), b''):
+            digest.update(chunk)
+
+    with _digests_lock:
+        _digests[marker] = digest.hexdigest()
+    return _digests[marker]
+
+
+def page_key(digest: str, page: Any, *variant: Any) -> str:
+    """
+    Monta a chave de uma pagina renderizada.
+
+    Args:
+        digest: Hash do arquivo (file_digest)
+        page: Numero da pagina (base 0) ou identificador da imagem (ex: 'concat-0-12')
+        *variant: Tudo que altera os bytes gerados - perfil de renderizacao
+                  (dataclass congelada, entra pelo repr), zoom, orcamento...
+
+    Returns:
+        Chave hexadecimal (nome do arquivo no cache)
+    """
+    variant_repr = repr((CACHE_VERSION,) + variant)
+    variant_hash = hashlib.sha256(variant_repr.encode('utf-8')).hexdigest()[:16]
+    return f"{digest}-{page}-{variant_hash}"
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class PageCache:
+    """
+    Cache de paginas codificadas em disco com limite de tamanho (LRU).
+
+    Args:
+        cache_dir: Diretorio do cache
+        max_bytes: Tamanho maximo (0 ou None = cache desativado)
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes or 0
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None  # Calculado na primeira gravacao
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se o cache esta ativo."""
+        return self.max_bytes > 0
+
+    def _path(self, key: str, mime_type: str) -> Path:
+        """Arquivo de uma entrada (subdiretorio pelos 2 primeiros caracteres da chave)."""
+        return self.cache_dir / key[:2] / f"{key}{MIME_EXTENSIONS[mime_type]}"
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Busca uma pagina no cache.
+
+        Args:
+            key: Chave da pagina (page_key)
+
+        Returns:
+            Tuple (bytes, mime_type) ou None se nao estiver no cache
+        """
+        if not self.enabled:
+            return None
+
+        for mime_type in MIME_EXTENSIONS:
+            path = self._path(key, mime_type)
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            try:
+                os.utime(path)  # Marca como usada recentemente (LRU)
+            except OSError:
+                pass
+            self.hits += 1
+            return data, mime_type
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes, mime_type: str) -> None:
+        """
+        Grava uma pagina no cache (falhas de gravacao sao apenas registradas).
+
+        Args:
+            key: Chave da pagina (page_key)
+            data: Bytes codificados
+            mime_type: Formato dos bytes (image/jpeg, image/png ou image/webp)
+        """
+        if not self.enabled or mime_type not in MIME_EXTENSIONS:
+            return
+
+        path = self._path(key, mime_type)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Grava em arquivo temporario e renomeia: leitores nunca veem arquivo parcial
+            temp_path = path.with_name(f".{uuid.uuid4().hex}.tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.debug(f"Falha ao gravar pagina no cache: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _scan_size(self) -> int:
+        """Soma o tamanho das entradas no disco."""
+        return sum(entry.stat().st_size for entry in self.cache_dir.glob('*/*') if entry.suffix in EXTENSION_MIMES)
+
+    def _evict(self) -> None:
+        """Remove as entradas usadas ha mais tempo ate o cache voltar abaixo do limite."""
+        entries = []
+        for entry in self.cache_dir.glob('*/*'):
+            if entry.suffix not in EXTENSION_MIMES:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # Removida por outro processo
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        entries.sort()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        removed = 0
+        for _, entry_size, entry in entries:
+            if size <= target:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+            size -= entry_size
+            removed += 1
+
+        self._size = size
+        logger.debug(f"Cache de paginas: {removed} entrada(s) antigas removidas ({size / MB:.0f}MB em uso)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Resumo para os relatorios de execucao (contadores deste processo)."""
+        return {
+            'ativo': self.enabled,
+            'limite_mb': round(self.max_bytes / MB) if self.enabled else None,
+            'acertos': self.hits,
+            'faltas': self.misses
+        }
+
+
+# Cache compartilhado do processo (ver configure_page_cache)
+_cache = PageCache(CACHE_DIR, DEFAULT_CACHE_MB * MB)
+
+
+def get_page_cache() -> PageCache:
+    """Retorna o cache de paginas compartilhado do processo."""
+    return _cache
+
+
+def configure_page_cache(max_mb: Optional[int]) -> PageCache:
+    """
+    Substitui o cache compartilhado (chamar antes de iniciar os workers).
+
+    Processos do pool de renderizacao leem o limite de CACHE_PAGINAS_MB; o
+    chamador deve exportar a variavel para desativar o cache neles tambem.
+
+    Args:
+        max_mb: Tamanho maximo em MB (0 ou None = cache desativado)
+
+    Returns:
+        Novo cache compartilhado
+    """
+    global _cache
+    _cache = PageCache(CACHE_DIR, (max_mb or 0) * MB)
+    return _cache
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+preflight.py - Verificacao rapida dos arquivos logo apos o inventario
+
+PDFs corrompidos, PDFs protegidos por senha, arquivos vazios e imagens
+enormes so eram descobertos dentro de load_original_file ou na chamada a
+API, depois de ocupar workers e gastar retries. O preflight abre cada
+arquivo do inventario uma vez, sem renderizar o documento inteiro, e anota
+o resultado em arquivo['preflight']:
+
+- PDFs: abre o documento, verifica senha/criptografia, conta as paginas e
+  renderiza uma miniatura da primeira e da ultima pagina (prova que o
+  conteudo decodifica)
+- Imagens: le o cabecalho (dimensoes) e decodifica em escala reduzida
+  (JPEG via draft) ou verifica a integridade (demais formatos)
+- DOCX: confere se e um pacote ZIP com word/document.xml (DOCX protegido
+  por senha e um arquivo OLE, nao ZIP)
+
+Cada arquivo recebe status 'ok', 'alerta' (processavel, com ressalva) ou
+'erro' (nao processavel) e uma acao para as fases seguintes:
+'processar', 'recodificar' (imagem acima do limite inline da API, deve ser
+recodificada antes do envio) ou 'ignorar'. Classificacao, OCR e extracao
+pulam arquivos com status 'erro' imediatamente (preflight_rejection).
+
+Uso:
+    from execution.preflight import preflight_rejection, run_preflight
+
+    resumo = run_preflight(inventario['arquivos'])
+    motivo = preflight_rejection(arquivo)  # None = processar
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from execution.memory_budget import decoded_image_bytes
+from execution.prep_pool import DEFAULT_PREP_BACKEND, create_prep_executor, resolve_prep_workers
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+PREFLIGHT_OK = 'ok'
+PREFLIGHT_WARNING = 'alerta'
+PREFLIGHT_ERROR = 'erro'
+
+ACTION_PROCESS = 'processar'
+ACTION_REENCODE = 'recodificar'
+ACTION_SKIP = 'ignorar'
+
+PREFLIGHT_WORKERS = int(os.getenv("PREFLIGHT_WORKERS", 8))  # Workers no backend de threads
+MAX_INLINE_BYTES = 20 * 1024 * 1024  # Limite de payload inline da API Gemini
+THUMBNAIL_ZOOM = 0.1  # Miniatura usada para provar que a pagina decodifica
+JPEG_DRAFT_SCALE = 8  # JPEG decodificado em 1/8 da resolucao
+
+PDF_EXTENSIONS = {'.pdf'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tiff', '.tif'}
+DOCX_EXTENSIONS = {'.docx'}
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # .doc e DOCX protegido por senha
+
+
+# =============================================================================
+# VERIFICACOES
+# =============================================================================
+
+def _check_pdf(file_path: Path, result: Dict[str, Any]) -> None:
+    """Abre o PDF, verifica senha e paginas e decodifica a primeira e a ultima pagina."""
+    try:
+        doc = fitz.open(str(file_path))
+    except Exception as e:
+        _fail(result, f"PDF corrompido: {e}")
+        return
+
+    with doc:
+        result['criptografado'] = bool(doc.is_encrypted or doc.needs_pass)
+        if doc.needs_pass:
+            _fail(result, "PDF protegido por senha")
+            return
+
+        result['paginas'] = len(doc)
+        if len(doc) == 0:
+            _fail(result, "PDF sem paginas")
+            return
+
+        try:
+            for page_num in sorted({0, len(doc) - 1}):
+                doc[page_num].get_pixmap(matrix=fitz.Matrix(THUMBNAIL_ZOOM, THUMBNAIL_ZOOM), alpha=False)
+        except Exception as e:
+            _fail(result, f"PDF com paginas ilegiveis: {e}")
+            return
+
+        if result['criptografado']:
+            _warn(result, "PDF criptografado sem senha de abertura (processavel)")
+        if result['payload_estimado_bytes'] > MAX_INLINE_BYTES:
+            _warn(result, "PDF acima do limite inline: modo nativo cai para paginas")
+
+
+def _check_image(file_path: Path, result: Dict[str, Any]) -> None:
+    """Le as dimensoes e decodifica a imagem em escala reduzida."""
+    try:
+        with Image.open(file_path) as img:
+            width, height = img.size
+            result['dimensoes'] = [width, height]
+            result['memoria_estimada_bytes'] = decoded_image_bytes(width, height, img.mode)
+            if img.format == 'JPEG':
+                img.draft('RGB', (max(1, width // JPEG_DRAFT_SCALE), max(1, height // JPEG_DRAFT_SCALE)))
+                img.load()
+            else:
+                img.verify()
+    except Exception as e:
+        _fail(result, f"Imagem corrompida ou ilegivel: {e}")
+        return
+
+    if result['payload_estimado_bytes'] > MAX_INLINE_BYTES:
+        _warn(result, "Imagem acima do limite inline da API: sera recodificada", ACTION_REENCODE)
+
+
+def _check_docx(file_path: Path, result: Dict[str, Any]) -> None:
+    """Confere se o DOCX e um pacote ZIP valido."""
+    with open(file_path, 'rb') as f:
+        header = f.read(len(OLE_MAGIC))
+    if header == OLE_MAGIC:
+        _fail(result, "DOCX protegido por senha")
+        result['criptografado'] = True
+        return
+
+    try:
+        with zipfile.ZipFile(file_path) as package:
+            if 'word/document.xml' not in package.namelist():
+                _fail(result, "DOCX sem word/document.xml")
+    except zipfile.BadZipFile as e:
+        _fail(result, f"DOCX corrompido: {e}")
+
+
+def _fail(result: Dict[str, Any], motivo: str) -> None:
+    """Marca o arquivo como nao processavel."""
+    result['status'] = PREFLIGHT_ERROR
+    result['acao'] = ACTION_SKIP
+    result['motivo'] = motivo
+
+
+def _warn(result: Dict[str, Any], motivo: str, acao: Optional[str] = None) -> None:
+    """Marca o arquivo como processavel com ressalva (motivos acumulam)."""
+    result['status'] = PREFLIGHT_WARNING
+    result['motivo'] = f"{result['motivo']}; {motivo}" if result['motivo'] else motivo
+    if acao:
+        result['acao'] = acao
+
+
+def preflight_file(file_info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verifica um arquivo do inventario (funcao de modulo: roda em threads ou processos).
+
+    Args:
+        file_info: Entrada do inventario (usa caminho_absoluto)
+
+    Returns:
+        Resultado do preflight (status, acao, motivo, paginas, dimensoes...)
+    """
+    start_time = time.time()
+    file_path = Path(file_info.get('caminho_absoluto', ''))
+    ext = file_path.suffix.lower()
+    result: Dict[str, Any] = {
+        'status': PREFLIGHT_OK,
+        'acao': ACTION_PROCESS,
+        'motivo': None,
+        'criptografado': False,
+        'payload_estimado_bytes': 0
+    }
+
+    try:
+        size = file_path.stat().st_size
+    except OSError:
+        _fail(result, "Arquivo nao encontrado")
+        return result
+
+    result['payload_estimado_bytes'] = size
+    if size == 0:
+        _fail(result, "Arquivo vazio (0 bytes)")
+    elif ext in PDF_EXTENSIONS:
+        _check_pdf(file_path, result)
+    elif ext in IMAGE_EXTENSIONS:
+        _check_image(file_path, result)
+    elif ext in DOCX_EXTENSIONS:
+        _check_docx(file_path, result)
+
+    result['tempo_s'] = round(time.time() - start_time, 3)
+    return result
+
+
+def run_preflight(
+    arquivos: List[Dict[str, Any]],
+    num_workers: Optional[int] = None,
+    backend: str = DEFAULT_PREP_BACKEND
+) -> Dict[str, Any]:
+    """
+    Executa o preflight em paralelo e anota cada arquivo em arquivo['preflight'].
+
+    Args:
+        arquivos: Entradas do inventario (alteradas no lugar)
+        num_workers: Numero de workers (padrao: PREFLIGHT_WORKERS, ou todos os
+                     nucleos no backend de processos)
+        backend: Backend do executor ('thread' ou 'process')
+
+    Returns:
+        Resumo para o inventario (contagem por status e arquivos rejeitados)
+    """
+    start_time = time.time()
+    workers = resolve_prep_workers(backend, num_workers, PREFLIGHT_WORKERS)
+
+    if arquivos:
+        with create_prep_executor(backend, min(workers, len(arquivos))) as executor:
+            futures = {executor.submit(preflight_file, arquivo): arquivo for arquivo in arquivos}
+            for future in as_completed(futures):
+                arquivo = futures[future]
+                try:
+                    arquivo['preflight'] = future.result()
+                except Exception as e:
+                    arquivo['preflight'] = {
+                        'status': PREFLIGHT_ERROR, 'acao': ACTION_SKIP, 'motivo': f"Falha no preflight: {e}"
+                    }
+
+    rejeitados = [
+        {'id': arquivo['id'], 'nome': arquivo['nome'], 'motivo': arquivo['preflight']['motivo']}
+        for arquivo in arquivos if arquivo['preflight']['status'] == PREFLIGHT_ERROR
+    ]
+    for rejeitado in rejeitados:
+        logger.warning(f"Preflight: {rejeitado['nome']} sera ignorado - {rejeitado['motivo']}")
+
+    resumo = {
+        'ok': sum(1 for arquivo in arquivos if arquivo['preflight']['status'] == PREFLIGHT_OK),
+        'alerta': sum(1 for arquivo in arquivos if arquivo['preflight']['status'] == PREFLIGHT_WARNING),
+        'erro': len(rejeitados),
+        'rejeitados': rejeitados,
+        'tempo_s': round(time.time() - start_time, 2)
+    }
+    logger.info(
+        f"Preflight concluido em {resumo['tempo_s']}s: {resumo['ok']} ok, "
+        f"{resumo['alerta']} com alerta, {resumo['erro']} rejeitados"
+    )
+    return resumo
+
+
+# =============================================================================
+# CONSULTA PELAS FASES SEGUINTES
+# =============================================================================
+
+def preflight_rejection(file_info: Dict[str, Any]) -> Optional[str]:
+    """
+    Retorna o motivo pelo qual o preflight rejeitou o arquivo.
+
+    A anotacao so vale enquanto o arquivo nao mudar: se o tamanho atual
+    difere do inventariado (arquivo substituido), o arquivo e processado.
+
+    Args:
+        file_info: Entrada do inventario/catalogo
+
+    Returns:
+        Motivo da rejeicao, ou None se o arquivo deve ser processado
+    """
+    preflight = file_info.get('preflight') or {}
+    if preflight.get('status') != PREFLIGHT_ERROR:
+        return None
+
+    try:
+        current_size = Path(file_info.get('caminho_absoluto', '')).stat().st_size
+    except OSError:
+        current_size = None
+    if current_size is not None and current_size != file_info.get('tamanho_bytes'):
+        return None
+
+    return preflight.get('motivo') or "Arquivo rejeitado no preflight"
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+prep_pool.py - Executores para os estagios de preparacao do pipeline
+
+A preparacao de documentos (renderizacao PyMuPDF e codificacao JPEG via PIL)
+e CPU-bound. Em um ThreadPoolExecutor ela fica limitada pelo GIL; em um
+ProcessPoolExecutor escala por todos os nucleos da maquina.
+
+Este modulo centraliza a escolha do backend usado por classify_with_gemini.py
+e batch_ocr.py. As funcoes de preparacao submetidas ao pool de processos
+devem ser de nivel de modulo e retornar objetos picklaveis (bytes, dicts,
+dataclasses) - nunca imagens PIL ou documentos fitz abertos.
+
+Tambem mantem um pool de processos compartilhado, criado sob demanda, usado
+para renderizar faixas de paginas de um mesmo PDF em paralelo. Como o pool e
+unico por processo, varias threads de extracao podem submeter trabalho ao
+mesmo tempo sem multiplicar o numero de processos.
+
+Payloads grandes (imagens codificadas, pixels crus, conteudo de arquivos)
+voltam dos processos por multiprocessing.shared_memory em vez de pickle:
+o processo filho copia os bytes uma vez para um bloco compartilhado e
+devolve so o nome do bloco (SharedBytes); o processo principal copia os
+bytes de volta e libera o bloco. No backend de threads nada muda.
+
+Uso:
+    from execution.prep_pool import create_prep_executor, resolve_prep_workers
+
+    workers = resolve_prep_workers(backend, requested=None, thread_default=10)
+    with create_prep_executor(backend, workers) as executor:
+        futures = [executor.submit(prepare_document, info) for info in files]
+
+    pool = get_shared_process_pool(8)
+    future = pool.submit(render_range, pdf_path, 0, 10)
+
+    # No processo filho / no processo principal
+    payload = to_shared_bytes(image_bytes)
+    image_bytes = from_shared_bytes(payload)
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+PREP_BACKEND_THREAD = 'thread'  # Threads: baixo overhead, limitado pelo GIL
+PREP_BACKEND_PROCESS = 'process'  # Processos: escala por todos os nucleos
+PREP_BACKENDS = (PREP_BACKEND_THREAD, PREP_BACKEND_PROCESS)
+DEFAULT_PREP_BACKEND = os.getenv("PREP_BACKEND", PREP_BACKEND_THREAD)
+
+# Payloads menores que isso voltam por pickle (criar um bloco compartilhado custa mais)
+SHARED_BYTES_MIN_SIZE = 256 * 1024
+
+# Pool compartilhado (criado na primeira chamada de get_shared_process_pool)
+_shared_pool: Optional[ProcessPoolExecutor] = None
+_shared_pool_lock = threading.Lock()
+
+
+# =============================================================================
+# FUNCOES
+# =============================================================================
+
+def _start_resource_tracker() -> None:
+    """
+    Inicia o resource_tracker antes de criar processos filhos.
+
+    Assim os filhos (fork ou spawn) usam o mesmo tracker do processo
+    principal: blocos de memoria compartilhada criados por eles e liberados
+    aqui (from_shared_bytes) nao sao apagados de novo quando o filho encerra.
+    """
+    resource_tracker.ensure_running()
+
+
+def resolve_prep_workers(backend: str, requested: Optional[int], thread_default: int) -> int:
+    """
+    Define o numero de workers da preparacao.
+
+    Se o usuario informou um valor, ele e respeitado. Caso contrario, o
+    backend de processos usa todos os nucleos disponiveis e o de threads
+    mantem o padrao do script.
+
+    Args:
+        backend: PREP_BACKEND_THREAD ou PREP_BACKEND_PROCESS
+        requested: Valor passado via --workers (None se omitido)
+        thread_default: Padrao do script para o backend de threads
+
+    Returns:
+        Numero de workers (>= 1)
+    """
+    if requested:
+        return max(1, requested)
+    if backend == PREP_BACKEND_PROCESS:
+        return os.cpu_count() or 1
+    return thread_default
+
+
+def create_prep_executor(backend: str, max_workers: int) -> Executor:
+    """
+    Cria o executor da preparacao para o backend escolhido.
+
+    Args:
+        backend: PREP_BACKEND_THREAD ou PREP_BACKEND_PROCESS
+        max_workers: Numero de workers
+
+    Returns:
+        ThreadPoolExecutor ou ProcessPoolExecutor (usar como context manager)
+    """
+    if backend == PREP_BACKEND_PROCESS:
+        _start_resource_tracker()
+        return ProcessPoolExecutor(max_workers=max_workers)
+    if backend == PREP_BACKEND_THREAD:
+        return ThreadPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Backend de preparacao invalido: {backend} (use um de {PREP_BACKENDS})")
+
+
+def get_shared_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Retorna o pool de processos compartilhado, criando-o na primeira chamada.
+
+    Usa o contexto 'spawn': o pool pode ser criado de dentro de uma thread de
+    extracao, e fork com threads ativas pode herdar locks travados.
+    O tamanho e fixado na criacao; chamadas posteriores reutilizam o pool.
+
+    Args:
+        max_workers: Numero de processos (padrao: um por nucleo)
+
+    Returns:
+        ProcessPoolExecutor compartilhado (encerrado automaticamente no exit)
+    """
+    global _shared_pool
+
+    if _shared_pool is None:
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                _start_resource_tracker()
+                _shared_pool = ProcessPoolExecutor(
+                    max_workers=max_workers or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                atexit.register(shutdown_shared_process_pool)
+    return _shared_pool
+
+
+def shutdown_shared_process_pool() -> None:
+    """Encerra o pool compartilhado (se criado)."""
+    global _shared_pool
+
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.shutdown(wait=True, cancel_futures=True)
+            _shared_pool = None
+
+
+def split_ranges(total: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    Divide [0, total) em ate `parts` faixas contiguas de tamanho equilibrado.
+
+    Args:
+        total: Numero de itens (ex: paginas)
+        parts: Numero desejado de faixas
+
+    Returns:
+        Lista de (inicio, fim) com fim exclusivo, em ordem
+    """
+    parts = max(1, min(parts, total))
+    base, extra = divmod(total, parts)
+    ranges = []
+    start = 0
+    for idx in range(parts):
+        end = start + base + (1 if idx < extra else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+# =============================================================================
+# PAYLOADS EM MEMORIA COMPARTILHADA
+# =============================================================================
+
+@dataclass(frozen=True)
+class SharedBytes:
+    """
+    Referencia picklavel a bytes em um bloco de multiprocessing.shared_memory.
+
+    Criada no processo filho por to_shared_bytes e consumida uma unica vez no
+    processo principal por from_shared_bytes, que libera o bloco.
+    """
+    name: str  # Nome do bloco compartilhado
+    size: int  # Bytes validos (o bloco pode ser arredondado para cima)
+
+
+def _in_child_process() -> bool:
+    """Indica se o codigo roda em um processo filho (pool de processos)."""
+    return multiprocessing.parent_process() is not None
+
+
+def _export_shared_block(size: int, fill: Callable[[memoryview], None]) -> SharedBytes:
+    """Cria um bloco compartilhado de `size` bytes, preenche com `fill` e o entrega ao processo principal."""
+    block = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        fill(block.buf[:size])
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+
+    # O bloco continua registrado no resource_tracker do processo principal
+    # (ver _start_resource_tracker): se nunca for consumido, e apagado no exit
+    block.close()
+    return SharedBytes(block.name, size)
+
+
+def to_shared_bytes(data: Union[bytes, memoryview]) -> Union[bytes, SharedBytes]:
+    """
+    Prepara bytes para voltar de um processo de preparacao.
+
+    Em um processo filho, payloads grandes sao copiados para um bloco de
+    memoria compartilhada e apenas a referencia volta por pickle. No
+    processo principal (backend de threads, renderizacao sem pool) ou para
+    payloads pequenos, retorna os proprios bytes.
+
+    Args:
+        data: Bytes ou memoryview (ex: Pixmap.samples_mv, sem copia extra)
+
+    Returns:
+        bytes ou SharedBytes
+    """
+    if not _in_child_process() or len(data) < SHARED_BYTES_MIN_SIZE:
+        return bytes(data)
+
+    def fill(buffer: memoryview) -> None:
+        buffer[:] = data
+
+    return _export_shared_block(len(data), fill)
+
+
+def read_shared_file(file_path: Path) -> Union[bytes, SharedBytes]:
+    """
+    Le um arquivo inteiro para voltar de um processo de preparacao.
+
+    Em um processo filho, arquivos grandes sao lidos direto para o bloco
+    compartilhado (readinto), sem passar por um objeto bytes intermediario.
+
+    Args:
+        file_path: Caminho do arquivo
+
+    Returns:
+        bytes ou SharedBytes (ver to_shared_bytes)
+    """
+    size = os.path.getsize(file_path)
+    if not _in_child_process() or size < SHARED_BYTES_MIN_SIZE:
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def fill(buffer: memoryview) -> None:
+        with open(file_path, 'rb') as f:
+            if f.readinto(buffer) != size:
+                raise OSError(f"Leitura incompleta de {file_path}")
+
+    return _export_shared_block(size, fill)
+
+
+def from_shared_bytes(payload: Union[bytes, SharedBytes, None]) -> Optional[bytes]:
+    """
+    Recupera os bytes de um payload vindo de to_shared_bytes e libera o bloco.
+
+    Args:
+        payload: bytes, SharedBytes ou None
+
+    Returns:
+        Os bytes (ou None)
+    """
+    if not isinstance(payload, SharedBytes):
+        return payload
+
+    block = shared_memory.SharedMemory(name=payload.name)
+    try:
+        return bytes(block.buf[:payload.size])
+    finally:
+        block.close()
+        block.unlink()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+render_profiles.py - Perfis de renderizacao por tipo de documento e fase
+
+Centraliza os parametros usados para transformar paginas de PDF e fotos em
+imagens enviadas ao Gemini: zoom (DPI), modo de cor, numero maximo de paginas,
+configuracoes do encoder (orcamento de bytes, resolucao minima, qualidade) e
+recorte dos cartoes de documentos de identificacao.
+
+A classificacao so precisa do layout da primeira pagina e usa miniaturas
+baratas. Na extracao, documentos com letras miudas (matriculas, escrituras)
+mantem DPI alto, enquanto certidoes nato-digitais podem ir em tons de cinza.
+
+Todos os loaders de classify_with_gemini.py e extract_with_gemini.py leem
+desta tabela - para ajustar um tipo, basta incluir/editar uma entrada em
+TYPE_PROFILES.
+
+Uso:
+    from execution.render_profiles import FASE_EXTRACAO, get_render_profile
+
+    profile = get_render_profile('MATRICULA_IMOVEL', FASE_EXTRACAO)
+    zoom = profile.zoom_for(num_pages)
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from execution.image_utils import EncodedImage, encode_image_auto, encode_image_within_budget
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+FASE_CLASSIFICACAO = 'classificacao'
+FASE_EXTRACAO = 'extracao'
+FASES = (FASE_CLASSIFICACAO, FASE_EXTRACAO)
+
+COLOR_RGB = 'RGB'  # Sempre colorido (fotos, documentos de identificacao)
+COLOR_GRAY = 'L'  # Renderiza em cinza; PNG/WebP de 1 bit se nao houver meios-tons
+COLOR_AUTO = 'auto'  # Renderiza colorido e escolhe RGB, cinza ou 1 bit pelo conteudo
+COLOR_MODES = (COLOR_RGB, COLOR_GRAY, COLOR_AUTO)
+
+BASE_DPI = 72  # DPI do PDF com zoom 1.0
+
+
+# =============================================================================
+# ESTRUTURAS DE DADOS
+# =============================================================================
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """
+    Parametros de renderizacao e codificacao de um documento.
+
+    Imutavel e picklavel: pode ser enviado aos workers do pool de processos.
+    """
+    zoom: float = 2.0  # Fator de zoom do PyMuPDF (2.0 = 144 DPI)
+    zoom_long_docs: Optional[float] = None  # Zoom para documentos acima de long_doc_pages
+    long_doc_pages: int = 10
+    color_mode: str = COLOR_AUTO
+    max_pages: int = 50
+    max_bytes: int = 1_000_000  # Orcamento de cada imagem enviada
+    min_short_edge: int = 900  # Menor lado minimo apos reducao de escala
+    max_long_edge: Optional[int] = None  # Lado maior maximo (None = sem limite)
+    max_quality: int = 90
+    min_quality: int = 50
+    card_short_edge: Optional[int] = None  # Recorta cartoes (RG/CNH) com este menor lado (None = nao recorta)
+    card_max_bytes: int = 400_000  # Orcamento de cada recorte de cartao
+
+    @property
+    def dpi(self) -> int:
+        """DPI equivalente ao zoom base."""
+        return int(round(self.zoom * BASE_DPI))
+
+    def zoom_for(self, num_pages: int = 1, page_long_side: Optional[float] = None) -> float:
+        """
+        Retorna o zoom a usar para um documento.
+
+        Args:
+            num_pages: Numero de paginas que serao renderizadas
+            page_long_side: Lado maior da pagina em pontos (para respeitar max_long_edge)
+
+        Returns:
+            Fator de zoom
+        """
+        zoom = self.zoom
+        if self.zoom_long_docs is not None and num_pages > self.long_doc_pages:
+            zoom = self.zoom_long_docs
+        if self.max_long_edge and page_long_side:
+            zoom = min(zoom, self.max_long_edge / page_long_side)
+        return zoom
+
+    @property
+    def render_mode(self) -> str:
+        """Modo PIL/PyMuPDF da renderizacao ('RGB' ou 'L')."""
+        return COLOR_GRAY if self.color_mode == COLOR_GRAY else COLOR_RGB
+
+
+# =============================================================================
+# TABELA DE PERFIS
+# =============================================================================
+
+# Perfil padrao de cada fase (usado quando o tipo nao tem entrada propria)
+DEFAULT_PROFILES: Dict[str, RenderProfile] = {
+    # Classificacao: so o layout da primeira pagina (titulos, brasoes)
+    FASE_CLASSIFICACAO: RenderProfile(
+        zoom=2.0,
+        max_pages=1,
+        max_bytes=500_000,
+        min_short_edge=700,
+        max_long_edge=1280
+    ),
+    # Extracao: ~144 DPI, reduzido para ~108 DPI em documentos longos
+    FASE_EXTRACAO: RenderProfile(
+        zoom=2.0,
+        zoom_long_docs=1.5,
+        long_doc_pages=10,
+        max_pages=50,
+        max_bytes=1_000_000,
+        min_short_edge=900
+    ),
+}
+
+_EXTRACAO = DEFAULT_PROFILES[FASE_EXTRACAO]
+
+# Perfis especificos por (tipo_documento, fase)
+TYPE_PROFILES: Dict[Tuple[str, str], RenderProfile] = {
+    # Letras miudas datilografadas e averbacoes: DPI alto mesmo em documentos longos
+    ('MATRICULA_IMOVEL', FASE_EXTRACAO): replace(
+        _EXTRACAO, zoom=2.5, zoom_long_docs=2.0, max_bytes=1_500_000, min_short_edge=1100
+    ),
+    ('ESCRITURA', FASE_EXTRACAO): replace(_EXTRACAO, zoom_long_docs=2.0, max_bytes=1_200_000),
+    # Certidoes e guias nato-digitais: texto preto, a cor nao carrega informacao
+    ('CNDT', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    ('CND_FEDERAL', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    ('CND_ESTADUAL', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    ('CND_MUNICIPAL', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    ('CND_CONDOMINIO', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    ('PROTOCOLO_ONR', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_GRAY),
+    # Documentos de identificacao: poucas paginas, foto e fundo colorido. So os
+    # cartoes sao enviados, com ~300 DPI na altura do cartao (54mm = 640px)
+    ('RG', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_RGB, max_pages=4, card_short_edge=640),
+    ('CNH', FASE_EXTRACAO): replace(_EXTRACAO, color_mode=COLOR_RGB, max_pages=4, card_short_edge=640),
+}
+
+
+# =============================================================================
+# FUNCOES
+# =============================================================================
+
+def get_render_profile(tipo_documento: Optional[str], fase: str) -> RenderProfile:
+    """
+    Retorna o perfil de renderizacao de um tipo de documento em uma fase.
+
+    Args:
+        tipo_documento: Tipo do documento (ex: 'MATRICULA_IMOVEL'); None/'' usa o padrao
+        fase: FASE_CLASSIFICACAO ou FASE_EXTRACAO
+
+    Returns:
+        RenderProfile do tipo, ou o padrao da fase
+
+    Raises:
+        ValueError: Se a fase for invalida
+    """
+    if fase not in DEFAULT_PROFILES:
+        raise ValueError(f"Fase invalida: {fase} (use uma de {FASES})")
+
+    tipo = (tipo_documento or '').upper()
+    return TYPE_PROFILES.get((tipo, fase), DEFAULT_PROFILES[fase])
+
+
+def encode_for_profile(
+    image: Image.Image,
+    profile: RenderProfile,
+    max_bytes: Optional[int] = None
+) -> EncodedImage:
+    """
+    Codifica uma imagem com as configuracoes de encoder do perfil.
+
+    Perfis COLOR_RGB sempre geram JPEG colorido; os demais escolhem o formato
+    pelo conteudo (JPEG cinza ou PNG/WebP de 1 bit em paginas monocromaticas).
+
+    Args:
+        image: Imagem PIL
+        profile: Perfil de renderizacao
+        max_bytes: Orcamento de bytes (padrao: profile.max_bytes)
+
+    Returns:
+        EncodedImage
+    """
+    encoder = encode_image_within_budget if profile.color_mode == COLOR_RGB else encode_image_auto
+    return encoder(
+        image,
+        max_bytes or profile.max_bytes,
+        profile.min_short_edge,
+        profile.max_quality,
+        profile.min_quality
+    )
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+response_schemas.py - Schemas de saida estruturada (JSON puro) para a extracao
+
+No modo padrao, o Gemini responde em tres secoes (REESCRITA, EXPLICACAO e
+um bloco ```json) e parse_gemini_response recorta o JSON com regex. A maior
+parte dos tokens de saida vai para a prosa, que map_to_fields nao le, e um
+bloco JSON mal fechado perde o documento inteiro.
+
+No modo JSON (--saida-json), o request leva response_mime_type
+"application/json" e um response_schema, e o Gemini devolve so os
+dados_catalogados. O schema de cada tipo e montado assim:
+
+- Estrutura: o modelo JSON da secao DADOS CATALOGADOS do proprio prompt do
+  tipo (execution/prompts/) - e o formato que map_to_fields le. Os
+  placeholders numericos dos prompts (00.00, 0000) e comentarios // sao
+  normalizados antes do parse
+- Descricoes e campos obrigatorios: execution/schemas/{tipo}.json, para os
+  campos de primeiro nivel com o mesmo nome
+
+Todos os campos sao nullable (o prompt manda usar null para o que nao
+existe no documento). Tipos sem modelo JSON utilizavel no prompt seguem no
+modo de tres secoes.
+
+Uso:
+    from execution.response_schemas import build_response_schema, parse_json_response
+
+    schema = build_response_schema('RG', prompt)  # None = usar o modo de secoes
+    dados = parse_json_response(response_text)
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import json
+import logging
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+SCHEMAS_DIR = Path(__file__).resolve().parent / 'schemas'
+
+# Secao do prompt com o modelo JSON dos dados_catalogados
+CATALOG_SECTION_PATTERN = re.compile(r'^#+\s*DADOS\s+CATALOGADOS.*$', re.MULTILINE | re.IGNORECASE)
+JSON_BLOCK_PATTERN = re.compile(r'```json\s*\n(.*?)\n```', re.DOTALL)
+
+# Placeholders numericos dos prompts (00.00, 0000) nao sao JSON valido
+NUMERIC_PLACEHOLDER_PATTERN = re.compile(r'(?<![\w.])0+(?=\d)')
+LINE_COMMENT_PATTERN = re.compile(r'//[^\n]*')
+
+JSON_ONLY_PROMPT = """
+
+## MODO DE RESPOSTA: SOMENTE JSON
+
+Ignore as secoes REESCRITA DO DOCUMENTO e EXPLICACAO CONTEXTUAL e o formato
+de saida em tres partes descritos acima. Responda APENAS com o objeto JSON
+dos DADOS CATALOGADOS, seguindo o schema da resposta. Use null para campos
+que nao existem no documento.
+"""
+
+
+# =============================================================================
+# MODELO JSON DO PROMPT
+# =============================================================================
+
+def _normalize_template(block: str) -> str:
+    """Remove comentarios // e zeros a esquerda de numeros fora das strings."""
+    parts = re.split(r'("(?:[^"\\]|\\.)*")', block)
+    for i in range(0, len(parts), 2):  # Indices pares ficam fora das strings
+        segment = LINE_COMMENT_PATTERN.sub('', parts[i])
+        parts[i] = NUMERIC_PLACEHOLDER_PATTERN.sub('', segment)
+    return ''.join(parts)
+
+
+def _parse_template(block: str) -> Optional[Dict[str, Any]]:
+    """Parseia um bloco ```json do prompt; None se nao for um objeto JSON."""
+    for candidate in (block, _normalize_template(block)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) and value else None
+    return None
+
+
+def prompt_json_template(prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Extrai o modelo JSON dos dados_catalogados de um prompt.
+
+    Usa o primeiro bloco ```json depois do ultimo cabecalho DADOS CATALOGADOS;
+    sem esse cabecalho, o maior bloco JSON valido do prompt.
+
+    Args:
+        prompt: Texto do prompt do tipo
+
+    Returns:
+        Modelo JSON, ou None se o prompt nao tiver um utilizavel
+    """
+    headers = list(CATALOG_SECTION_PATTERN.finditer(prompt))
+    if headers:
+        match = JSON_BLOCK_PATTERN.search(prompt, headers[-1].end())
+        template = _parse_template(match.group(1)) if match else None
+        if template:
+            return template
+
+    templates = [_parse_template(block) for block in JSON_BLOCK_PATTERN.findall(prompt)]
+    templates = [template for template in templates if template]
+    if not templates:
+        return None
+    return max(templates, key=lambda template: len(json.dumps(template)))
+
+
+# =============================================================================
+# CONVERSAO PARA RESPONSE_SCHEMA
+# =============================================================================
+
+def schema_from_example(value: Any, description: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Converte um valor de exemplo no schema do Gemini (subconjunto OpenAPI).
+
+    Objetos vazios nao tem schema valido na API e sao omitidos (None).
+
+    Args:
+        value: Valor de exemplo do modelo JSON
+        description: Descricao do campo (opcional)
+
+    Returns:
+        Schema do campo, ou None se o campo deve ser omitido
+    """
+    if isinstance(value, dict):
+        properties = {}
+        for key, item in value.items():
+            item_schema = schema_from_example(item)
+            if item_schema is not None:
+                properties[key] = item_schema
+        if not properties:
+            return None
+        schema = {
+            'type': 'OBJECT',
+            'properties': properties,
+            'property_ordering': list(properties)
+        }
+    elif isinstance(value, list):
+        dict_items = [item for item in value if isinstance(item, dict)]
+        if dict_items:
+            # Itens de exemplo com campos diferentes: uniao dos campos, na ordem em que aparecem
+            merged: Dict[str, Any] = {}
+            for item in dict_items:
+                for key, item_value in item.items():
+                    merged.setdefault(key, item_value)
+            item_schema = schema_from_example(merged)
+        else:
+            item_schema = schema_from_example(value[0]) if value else None
+        schema = {'type': 'ARRAY', 'items': item_schema or {'type': 'STRING'}}
+    elif isinstance(value, bool):
+        schema = {'type': 'BOOLEAN'}
+    elif isinstance(value, (int, float)):
+        schema = {'type': 'NUMBER'}
+    else:
+        schema = {'type': 'STRING'}
+
+    schema['nullable'] = True
+    if description:
+        schema['description'] = description
+    return schema
+
+
+@lru_cache(maxsize=None)
+def load_field_catalog(tipo_documento: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Carrega os campos de primeiro nivel de execution/schemas para o tipo.
+
+    Args:
+        tipo_documento: Tipo do documento (ex: RG)
+
+    Returns:
+        nome do campo -> definicao (descricao, obrigatorio...); vazio se nao houver schema
+    """
+    schema_file = SCHEMAS_DIR / f'{tipo_documento.lower()}.json'
+    if not schema_file.exists():
+        return {}
+    try:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Erro ao carregar schema {schema_file}: {e}")
+        return {}
+    return {campo['nome']: campo for campo in schema.get('campos', []) if campo.get('nome')}
+
+
+@lru_cache(maxsize=64)
+def build_response_schema(tipo_documento: str, prompt: str) -> Optional[Dict[str, Any]]:
+    """
+    Monta o response_schema dos dados_catalogados de um tipo.
+
+    Args:
+        tipo_documento: Tipo do documento (ex: RG)
+        prompt: Prompt carregado para o tipo (o modelo JSON vem dele)
+
+    Returns:
+        Schema para GenerateContentConfig.response_schema, ou None se o
+        prompt nao tiver modelo JSON (o tipo segue no modo de secoes)
+    """
+    template = prompt_json_template(prompt)
+    if template is None:
+        logger.warning(f"Prompt de {tipo_documento} sem modelo JSON: usando resposta em secoes")
+        return None
+
+    fields = load_field_catalog(tipo_documento)
+    properties = {}
+    for key, value in template.items():
+        field_schema = schema_from_example(value, fields.get(key, {}).get('descricao'))
+        if field_schema is not None:
+            properties[key] = field_schema
+
+    required = [key for key in properties if fields.get(key, {}).get('obrigatorio')]
+    schema: Dict[str, Any] = {
+        'type': 'OBJECT',
+        'properties': properties,
+        'property_ordering': list(properties)
+    }
+    if required:
+        schema['required'] = required
+    return schema
+
+
+# =============================================================================
+# PARSING DA RESPOSTA
+# =============================================================================
+
+def parse_json_response(response: str) -> Dict[str, Any]:
+    """
+    Parseia a resposta do modo JSON (o corpo inteiro e o objeto).
+
+    Args:
+        response: Texto da resposta do Gemini
+
+    Returns:
+        dados_catalogados (com _raw_json/_parse_error se o JSON vier invalido,
+        como em parse_gemini_response)
+    """
+    if not response:
+        logger.warning("Resposta do Gemini vazia ou None")
+        return {}
+
+    text = response.strip()
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Erro ao fazer parsing do JSON: {e}")
+        try:
+            # Remove caracteres de controle
+            value = json.loads(re.sub(r'[\x00-\x1f\x7f-\x9f]', '', text))
+        except json.JSONDecodeError:
+            return {"_raw_json": text, "_parse_error": str(e)}
+
+    if not isinstance(value, dict):
+        return {"_raw_json": text, "_parse_error": "Resposta JSON nao e um objeto"}
+    return value
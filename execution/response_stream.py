@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+response_stream.py - Leitura incremental de respostas do Gemini em streaming
+
+Sem streaming, parse_gemini_response so roda depois que a resposta inteira
+chega, e respostas longas (max_output_tokens ate 16384) levam dezenas de
+segundos. Com generate_content_stream, cada trecho recebido passa por
+StreamingResponse, que:
+
+- registra quando cada secao comeca (REESCRITA, EXPLICACAO, DADOS)
+- detecta o fechamento do bloco ```json dos DADOS CATALOGADOS (ou, no modo
+  JSON puro, do objeto de primeiro nivel) e parseia os dados na hora
+- chama on_data uma unica vez com os dados_catalogados, para que sejam
+  gravados antes do fim da resposta
+- opcionalmente pede a interrupcao do streaming assim que os dados chegam
+  (stop_on_data): a prosa restante nao e gerada
+
+No modo de secoes, o prompt pede o bloco de dados PRIMEIRO
+(STREAM_DATA_FIRST_PROMPT); parse_gemini_response aceita as secoes em
+qualquer ordem.
+
+Uso:
+    from execution.response_stream import StreamingResponse
+
+    stream = StreamingResponse(json_only=False, on_data=salvar, stop_on_data=True)
+    stream.start()
+    for chunk in client.models.generate_content_stream(...):
+        if stream.feed(chunk.text):
+            break
+    texto = stream.text
+
+Autor: Pipeline de Minutas
+Data: Janeiro 2026
+"""
+
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONSTANTES
+# =============================================================================
+
+SECTION_PATTERNS = {
+    'reescrita': re.compile(r'##\s*REESCRITA', re.IGNORECASE),
+    'explicacao': re.compile(r'##\s*EXPLICA[CÇ][AÃ]O', re.IGNORECASE),
+    'dados': re.compile(r'##\s*DADOS\s+CATALOGADOS', re.IGNORECASE)
+}
+JSON_FENCE_OPEN = re.compile(r'```json\s*\n')
+JSON_FENCE_CLOSE = re.compile(r'\n```')
+SECTION_LOOKBACK_CHARS = 64  # Cabecalho pode chegar partido entre dois trechos
+
+STREAM_DATA_FIRST_PROMPT = """
+
+## ORDEM DA RESPOSTA
+Escreva PRIMEIRO a secao "## DADOS CATALOGADOS (JSON)" com o bloco ```json completo,
+e so depois "## REESCRITA DO DOCUMENTO" e "## EXPLICACAO CONTEXTUAL".
+"""
+
+
+# =============================================================================
+# PARSING INCREMENTAL
+# =============================================================================
+
+def _load_json(json_str: str) -> Optional[Dict[str, Any]]:
+    """Parseia um objeto JSON (com a mesma limpeza de parse_gemini_response); None se invalido."""
+    for candidate in (json_str, re.sub(r'[\x00-\x1f\x7f-\x9f]', '', json_str)):
+        try:
+            value = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+
+class StreamingResponse:
+    """
+    Estado de uma resposta em streaming: texto acumulado, secoes vistas e dados_catalogados.
+
+    Uma instancia acompanha um request inteiro; start() e chamado a cada
+    tentativa (retry ou modelo de fallback) e descarta o texto anterior,
+    mas on_data so e chamado uma vez.
+    """
+
+    def __init__(
+        self,
+        json_only: bool = False,
+        on_data: Optional[Callable[[Dict[str, Any]], None]] = None,
+        stop_on_data: bool = False
+    ):
+        self.json_only = json_only
+        self.on_data = on_data
+        self.stop_on_data = stop_on_data
+        self.data: Optional[Dict[str, Any]] = None
+        self.stopped = False
+        self._request_start = time.time()
+        self._first_chunk_s: Optional[float] = None
+        self._data_s: Optional[float] = None
+        self._delivered = False
+        self.start()
+
+    def start(self) -> None:
+        """Inicia uma tentativa: zera o texto e o estado do parser."""
+        self._chunks: List[str] = []
+        self._length = 0
+        self._chunk_count = 0
+        self.data = None
+        self.stopped = False
+        self.sections: Dict[str, float] = {}
+        # Estado do parser de secoes
+        self._section_scan = 0
+        self._fence_start: Optional[int] = None
+        self._scan_from = 0
+        # Estado do parser de JSON puro
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Texto recebido ate agora na tentativa atual."""
+        if len(self._chunks) > 1:
+            self._chunks = [''.join(self._chunks)]
+        return self._chunks[0] if self._chunks else ''
+
+    def feed(self, chunk: Optional[str]) -> bool:
+        """
+        Processa um trecho da resposta.
+
+        Args:
+            chunk: Texto do trecho (pode ser None/vazio)
+
+        Returns:
+            True se o streaming deve ser interrompido (dados completos e stop_on_data)
+        """
+        if not chunk:
+            return False
+        if self._first_chunk_s is None:
+            self._first_chunk_s = time.time() - self._request_start
+
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        self._chunk_count += 1
+
+        had_data = self.data is not None
+        if not self.json_only:
+            self._scan_sections()
+        elif not had_data:
+            self._scan_json(chunk, offset)
+        if self.data is not None and not had_data:
+            self._data_ready()
+
+        if self.data is not None and self.stop_on_data:
+            self.stopped = True
+            return True
+        return False
+
+    def _scan_sections(self) -> None:
+        """Registra os cabecalhos novos e procura o fechamento do bloco ```json."""
+        text = self.text
+        elapsed = time.time() - self._request_start
+        scan_start = max(0, self._section_scan - SECTION_LOOKBACK_CHARS)
+        for name, pattern in SECTION_PATTERNS.items():
+            match = pattern.search(text, scan_start) if name not in self.sections else None
+            if match:
+                self.sections[name] = round(elapsed, 2)
+                if name == 'dados':
+                    self._scan_from = match.end()  # O bloco ```json vem depois do cabecalho
+        self._section_scan = len(text)
+
+        if self.data is not None or 'dados' not in self.sections:
+            return
+        if self._fence_start is None:
+            match = JSON_FENCE_OPEN.search(text, self._scan_from)
+            if not match:
+                self._scan_from = max(self._scan_from, len(text) - SECTION_LOOKBACK_CHARS)
+                return
+            self._fence_start = match.end()
+            self._scan_from = match.end()
+        match = JSON_FENCE_CLOSE.search(text, max(self._fence_start, self._scan_from - 4))
+        if not match:
+            self._scan_from = len(text)
+            return
+        self.data = _load_json(text[self._fence_start:match.start()].strip())
+        if self.data is None:
+            # Bloco invalido: o parse final (parse_gemini_response) registra o erro
+            self._fence_start = None
+            self._scan_from = match.end()
+
+    def _scan_json(self, chunk: str, offset: int) -> None:
+        """Acompanha a profundidade do objeto JSON de primeiro nivel (fora das strings)."""
+        for i, char in enumerate(chunk):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._object_start = offset + i
+                self._depth += 1
+            elif char == '}' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.data = _load_json(self.text[self._object_start:offset + i + 1])
+                    if self.data is not None:
+                        self.sections['dados'] = round(time.time() - self._request_start, 2)
+                        return
+
+    def _data_ready(self) -> None:
+        """Marca o tempo ate os dados e entrega os dados_catalogados (uma vez)."""
+        if self._data_s is None:
+            self._data_s = round(time.time() - self._request_start, 2)
+        if self.on_data and not self._delivered:
+            self._delivered = True
+            try:
+                self.on_data(self.data)
+            except Exception as e:
+                logger.warning(f"Falha ao gravar dados parciais: {e}")
+
+    def metadata(self) -> Dict[str, Any]:
+        """Metadados do streaming para metadados['streaming']."""
+        return {
+            'tempo_primeiro_trecho_s': round(self._first_chunk_s, 2) if self._first_chunk_s is not None else None,
+            'tempo_ate_dados_s': self._data_s,
+            'inicio_secoes_s': dict(self.sections),
+            'trechos': self._chunk_count,
+            'interrompido_nos_dados': self.stopped
+        }
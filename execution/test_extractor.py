@@ -51,6 +51,9 @@ except ImportError as e:
     print("Instale as dependencias: pip install python-dotenv google-genai Pillow PyMuPDF")
     sys.exit(1)
 
+from execution.page_cache import file_digest, get_page_cache, page_key
+from execution.render_profiles import FASE_EXTRACAO, get_render_profile
+
 # Carrega variaveis de ambiente
 load_dotenv(ROOT_DIR / '.env')
 
@@ -127,10 +130,18 @@ def load_prompt(tipo_documento: str) -> str:
 # FUNCOES DE PROCESSAMENTO DE ARQUIVOS
 # =============================================================================
 
-def extract_all_pages_from_pdf(pdf_path: Path, max_pages: int = 50) -> Optional[Image.Image]:
+def extract_all_pages_from_pdf(
+    pdf_path: Path,
+    max_pages: Optional[int] = None,
+    tipo_documento: Optional[str] = None
+) -> Optional[Image.Image]:
     """
     Extrai todas as paginas de um PDF e concatena em uma unica imagem vertical.
+    Zoom e numero maximo de paginas vem do perfil de extracao do tipo.
     """
+    profile = get_render_profile(tipo_documento, FASE_EXTRACAO)
+    max_pages = max_pages or profile.max_pages
+
     try:
         doc = fitz.open(str(pdf_path))
         num_pages = len(doc)
@@ -144,7 +155,7 @@ def extract_all_pages_from_pdf(pdf_path: Path, max_pages: int = 50) -> Optional[
         logger.info(f"Extraindo {pages_to_process} pagina(s) de: {pdf_path.name}")
 
         page_images: List[Image.Image] = []
-        zoom = 2.0 if pages_to_process <= 10 else 1.5
+        zoom = profile.zoom_for(pages_to_process)
         mat = fitz.Matrix(zoom, zoom)
 
         for page_num in range(pages_to_process):
@@ -182,7 +193,10 @@ def extract_all_pages_from_pdf(pdf_path: Path, max_pages: int = 50) -> Optional[
         return None
 
 
-def load_file_as_bytes(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]:
+def load_file_as_bytes(
+    file_path: Path,
+    tipo_documento: Optional[str] = None
+) -> Tuple[Optional[bytes], Optional[str]]:
     """
     Carrega arquivo como bytes e retorna junto com o MIME type.
     """
@@ -207,9 +221,17 @@ def load_file_as_bytes(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]
         return None, None
 
     try:
-        # Para PDFs, converte para imagem
+        # Para PDFs, converte para imagem (reexecucoes leem a imagem do cache de paginas)
         if ext == '.pdf':
-            img = extract_all_pages_from_pdf(file_path)
+            cache = get_page_cache()
+            profile = get_render_profile(tipo_documento, FASE_EXTRACAO)
+            key = page_key(file_digest(file_path), 'test-concat', profile) if cache.enabled else None
+            cached = cache.get(key) if key else None
+            if cached is not None:
+                logger.info(f"PDF lido do cache de paginas: {file_path.name}")
+                return cached
+
+            img = extract_all_pages_from_pdf(file_path, tipo_documento=tipo_documento)
             if img is None:
                 return None, None
 
@@ -231,6 +253,8 @@ def load_file_as_bytes(file_path: Path) -> Tuple[Optional[bytes], Optional[str]]
             logger.info(f"PDF convertido: {img.width}x{img.height} pixels, {size_mb:.2f}MB")
 
             img.close()
+            if key:
+                cache.put(key, image_bytes, 'image/jpeg')
             return image_bytes, 'image/jpeg'
 
         # Para imagens, le diretamente
@@ -400,7 +424,7 @@ def process_document(
 
     try:
         # 1. Carrega o arquivo
-        image_bytes, mime_type = load_file_as_bytes(file_path)
+        image_bytes, mime_type = load_file_as_bytes(file_path, tipo_documento)
         if image_bytes is None:
             raise ValueError(f"Nao foi possivel carregar: {file_path}")
 
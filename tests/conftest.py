@@ -0,0 +1,7 @@
+"""Configuracao dos testes: raiz do repositorio no path (imports execution.*)."""
+
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
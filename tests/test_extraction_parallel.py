@@ -0,0 +1,76 @@
+"""Testes das janelas no modo paralelo (execution/extract_with_gemini.py)."""
+
+import json
+import threading
+import time
+
+import pytest
+
+import execution.extract_with_gemini as extraction
+
+WINDOWS = [(0, 15), (13, 28), (26, 40)]
+
+
+@pytest.fixture
+def parallel_run(tmp_path, monkeypatch):
+    """Roda run_extraction_parallel com o Gemini trocado por uma extracao falsa que mede a concorrencia."""
+    state = {'active': 0, 'max_active': 0, 'requests': []}
+    lock = threading.Lock()
+
+    def fake_extract(client, doc_info, options, page_range=None, total_pages=0, pruning=None, on_data=None):
+        with lock:
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+            state['requests'].append((doc_info['nome'], page_range))
+        time.sleep(0.05)
+        with lock:
+            state['active'] -= 1
+        result = extraction.new_extraction_result(doc_info)
+        result['dados_catalogados'] = {'paginas': f'{page_range}'}
+        return result
+
+    def fake_plan(doc_info, options):
+        return None, (40 if doc_info['tipo_documento'] == 'MATRICULA' else 0)
+
+    monkeypatch.setattr(extraction, 'TMP_DIR', tmp_path)
+    monkeypatch.setattr(extraction, 'load_environment', lambda: 'chave')
+    monkeypatch.setattr(extraction, 'configure_gemini', lambda api_key: object())
+    monkeypatch.setattr(extraction, 'plan_document', fake_plan)
+    monkeypatch.setattr(extraction, 'plan_document_windows', lambda *args: list(WINDOWS))
+    monkeypatch.setattr(extraction, 'extract_document', fake_extract)
+
+    def run(arquivos, workers):
+        (tmp_path / 'catalogos').mkdir(exist_ok=True)
+        catalog = {'arquivos': arquivos}
+        (tmp_path / 'catalogos' / 'caso.json').write_text(json.dumps(catalog), encoding='utf-8')
+        report = extraction.run_extraction_parallel(
+            'caso', workers=workers, rpm=60000, force_workers=True, options=extraction.ExtractionOptions()
+        )
+        return report, state
+
+    return run
+
+
+def _doc(doc_id, tipo):
+    return {'id': doc_id, 'nome': f'{doc_id}.pdf', 'tipo_documento': tipo, 'caminho_absoluto': f'/tmp/{doc_id}.pdf'}
+
+
+def test_windows_run_as_concurrent_requests(parallel_run):
+    report, state = parallel_run([_doc('001', 'MATRICULA')], workers=3)
+
+    assert sorted(window for _, window in state['requests']) == WINDOWS
+    assert state['max_active'] == 3
+    (result,) = report['extracoes']
+    assert result['status'] == 'sucesso'
+    assert [w['paginas'] for w in result['metadados']['janelas']] == ['1-15', '14-28', '27-40']
+    assert result['id'] == '001'
+
+
+def test_windows_respect_worker_limit_without_deadlock(parallel_run):
+    arquivos = [_doc('001', 'MATRICULA'), _doc('002', 'MATRICULA'), _doc('003', 'RG')]
+    report, state = parallel_run(arquivos, workers=2)
+
+    assert len(state['requests']) == 7  # 3 janelas x 2 matriculas + 1 RG
+    assert state['max_active'] <= 2
+    assert report['extraidos_sucesso'] == 3
+    assert sorted(e['id'] for e in report['extracoes']) == ['001', '002', '003']
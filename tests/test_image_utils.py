@@ -0,0 +1,51 @@
+"""Testes do envio direto de imagens embutidas em PDFs (execution/image_utils.py)."""
+
+import io
+
+import fitz
+import pytest
+from PIL import Image
+
+from execution.image_utils import extract_embedded_page_image
+
+
+@pytest.fixture
+def jpeg_400x600():
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 600), (200, 180, 160)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def _image_page(jpeg, page_size, image_rect=None, cropbox=None):
+    doc = fitz.open()
+    page = doc.new_page(width=page_size[0], height=page_size[1])
+    page.insert_image(fitz.Rect(image_rect) if image_rect else page.rect, stream=jpeg)
+    if cropbox:
+        page.set_cropbox(fitz.Rect(cropbox))
+    return page
+
+
+def test_full_page_image_is_forwarded_unchanged(jpeg_400x600):
+    page = _image_page(jpeg_400x600, (200, 300))
+
+    assert extract_embedded_page_image(page) == (jpeg_400x600, 'image/jpeg')
+    assert extract_embedded_page_image(page, max_bytes=len(jpeg_400x600) - 1) is None
+
+
+def test_image_cropped_by_page_is_rendered(jpeg_400x600):
+    # Imagem maior que a pagina: so o canto superior esquerdo fica visivel
+    page = _image_page(jpeg_400x600, (200, 300), image_rect=(0, 0, 400, 600))
+
+    assert extract_embedded_page_image(page) is None
+
+
+def test_image_cropped_by_cropbox_is_rendered(jpeg_400x600):
+    page = _image_page(jpeg_400x600, (400, 600), cropbox=(100, 100, 300, 400))
+
+    assert extract_embedded_page_image(page) is None
+
+
+def test_image_with_margins_is_rendered(jpeg_400x600):
+    page = _image_page(jpeg_400x600, (400, 600), image_rect=(50, 50, 350, 550))
+
+    assert extract_embedded_page_image(page) is None
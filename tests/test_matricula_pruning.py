@@ -0,0 +1,140 @@
+"""Testes da poda de paginas de matriculas (execution/matricula_pruning.py)."""
+
+from execution.matricula_pruning import (
+    TEXT_SOURCE_OCR,
+    format_page_ranges,
+    plan_matricula_pruning,
+    strip_repeated_lines,
+)
+
+FILLER = 'Texto do ato lavrado pelo oficial com as qualificacoes das partes e do titulo apresentado. ' * 3
+FOOTER = 'Documento assinado digitalmente - ONR - pagina 1'
+
+
+def _page(content: str) -> str:
+    """Pagina com texto proprio suficiente e o rodape repetido do cartorio."""
+    return f"{content}. {FILLER}\n{FOOTER}"
+
+
+def _matricula(*middle: str) -> list:
+    """Abertura, R-1, paginas do meio, ultima transmissao e duas paginas finais."""
+    return [
+        _page('MATRICULA 12.345 - Imovel: apartamento com area privativa, descricao completa do imovel'),
+        _page('R-1 VENDA E COMPRA a primeira proprietaria adquiriu o imovel'),
+        *middle,
+        _page('R-10 VENDA E COMPRA o atual proprietario adquiriu o imovel'),
+        _page('AV-11 Averbacao de construcao concluida no terreno'),
+        _page('Certidao expedida a pedido da parte interessada, encerramento'),
+    ]
+
+
+def test_active_lien_sharing_page_with_cancellation_is_kept():
+    pages = _matricula(
+        _page('R-2 HIPOTECA em favor do banco credor ... AV-3 CANCELADA a penhora R-9'),
+        _page('AV-4 Averbacao de alteracao do estado civil do proprietario'),
+        _page('AV-5 Averbacao de mudanca de numeracao predial'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+    )
+
+    pruning = plan_matricula_pruning(pages)
+
+    assert pruning is not None
+    assert 2 in pruning.kept_pages  # R-2 continua vigente
+    assert 3 in pruning.kept_pages  # O ato pode continuar na pagina seguinte
+    assert pruning.dropped_pages == [4, 5]
+
+
+def test_lien_cancelled_by_number_is_dropped():
+    pages = _matricula(
+        _page('R-2 HIPOTECA em favor do banco credor em garantia da divida'),
+        _page('AV-4 Averbacao de alteracao do estado civil do proprietario'),
+        _page('AV-5 CANCELAMENTO da hipoteca objeto do R-2, autorizado pelo credor'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+    )
+
+    pruning = plan_matricula_pruning(pages)
+
+    assert pruning is not None
+    assert pruning.dropped_pages == [2, 3, 4, 5]
+
+
+def test_cancellation_scope_ends_at_sentence():
+    pages = _matricula(
+        _page('R-2 HIPOTECA em favor do banco credor em garantia da divida'),
+        _page('R-3 PENHORA determinada pelo juizo da vara civel'),
+        _page('AV-5 CANCELAMENTO da hipoteca do R-2. Consta ainda a penhora do R-3'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+        _page('AV-7 Averbacao de retificacao da area do terreno'),
+        _page('AV-8 Averbacao de abertura de rua lateral'),
+    )
+
+    pruning = plan_matricula_pruning(pages)
+
+    assert pruning is not None
+    assert 2 not in pruning.kept_pages
+    assert {3, 4} <= set(pruning.kept_pages)  # R-3 segue vigente; AV-5 tambem o cita
+    assert pruning.dropped_pages == [2, 6, 7]
+
+
+def test_lien_kept_when_cancellation_keeps_it():
+    pages = _matricula(
+        _page('R-2 HIPOTECA em favor do banco credor em garantia da divida'),
+        _page('AV-4 Averbacao de alteracao do estado civil do proprietario'),
+        _page('AV-5 CANCELADA a penhora do R-3, mantida a hipoteca do R-2'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+        _page('AV-7 Averbacao de retificacao da area do terreno'),
+        _page('AV-8 Averbacao de abertura de rua lateral'),
+    )
+
+    pruning = plan_matricula_pruning(pages)
+
+    assert pruning is not None
+    assert pruning.dropped_pages == [6, 7]
+
+
+def test_lien_without_act_number_is_kept():
+    pages = _matricula(
+        _page('Consta HIPOTECA em favor do banco credor sem numero de ato legivel'),
+        _page('AV-4 Averbacao de alteracao do estado civil do proprietario'),
+        _page('AV-5 Averbacao de mudanca de numeracao predial'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+    )
+
+    pruning = plan_matricula_pruning(pages, TEXT_SOURCE_OCR)
+
+    assert pruning is not None
+    assert pruning.source == TEXT_SOURCE_OCR
+    assert pruning.dropped_pages == [4, 5]
+
+
+def test_small_document_is_not_pruned():
+    assert plan_matricula_pruning(_matricula()) is None
+
+
+def test_page_without_own_text_disables_pruning():
+    pages = _matricula(
+        _page('AV-4 Averbacao de alteracao do estado civil do proprietario'),
+        FOOTER,
+        _page('AV-5 Averbacao de mudanca de numeracao predial'),
+        _page('AV-6 Averbacao de inscricao municipal do imovel'),
+    )
+
+    assert plan_matricula_pruning(pages) is None
+
+
+def test_no_ownership_act_disables_pruning():
+    pages = [_page(f'AV-{number} Averbacao numero {word} sem transmissao')
+             for number, word in enumerate(('um', 'dois', 'tres', 'quatro', 'cinco', 'seis', 'sete', 'oito'), 1)]
+
+    assert plan_matricula_pruning(pages) is None
+
+
+def test_strip_repeated_lines_ignores_page_numbers():
+    texts = ['ATO A\nRODAPE PAGINA 1', 'ATO B\nRODAPE PAGINA 2', 'ATO C\nRODAPE PAGINA 3']
+
+    assert strip_repeated_lines(texts) == ['ATO A', 'ATO B', 'ATO C']
+
+
+def test_format_page_ranges():
+    assert format_page_ranges([0, 1, 4, 8, 9, 10]) == ['1-2', '5', '9-11']
+    assert format_page_ranges([]) == []
@@ -0,0 +1,103 @@
+"""Testes das janelas de paginas de matriculas (execution/matricula_windows.py)."""
+
+import pytest
+
+from execution.matricula_windows import act_order, merge_window_data, merge_window_texts, plan_page_windows
+
+
+def test_plan_page_windows_overlaps_and_aligns_last_window():
+    assert plan_page_windows(40, 15, 2) == [(0, 15), (13, 28), (25, 40)]
+
+
+def test_plan_page_windows_single_window_when_document_fits():
+    assert plan_page_windows(15, 15, 2) == [(0, 15)]
+    assert plan_page_windows(3, 15, 2) == [(0, 3)]
+
+
+def test_plan_page_windows_covers_every_page():
+    windows = plan_page_windows(61, 15, 2)
+
+    covered = {page for start, end in windows for page in range(start, end)}
+    assert covered == set(range(61))
+    assert all(end - start == 15 for start, end in windows)
+    assert all(prev_end - start >= 2 for (_, prev_end), (start, _) in zip(windows, windows[1:]))
+
+
+def test_plan_page_windows_rejects_overlap_not_smaller_than_window():
+    with pytest.raises(ValueError):
+        plan_page_windows(40, 2, 2)
+
+
+def test_act_order():
+    assert act_order('R-3/12.345') == 3
+    assert act_order('Av.12') == 12
+    assert act_order('MATRICULA') < act_order('R-1')
+    assert act_order(None) == act_order('sem numero') == float('inf')
+
+
+def test_merge_acts_by_key_keeps_most_complete_version():
+    first = {'registros_averbacoes': [
+        {'numero': 'R-1', 'ato': 'VENDA', 'data': '2001-01-01'},
+        {'numero': 'R.3', 'ato': 'HIPOTECA', 'data': None},
+    ]}
+    second = {'registros_averbacoes': [
+        {'numero': 'R-3/12.345', 'ato': 'HIPOTECA', 'data': '2005-05-05'},
+        {'numero': 'AV-2', 'ato': 'CASAMENTO', 'data': '2003-03-03'},
+    ]}
+
+    merged = merge_window_data([first, second])['registros_averbacoes']
+
+    assert [item['numero'] for item in merged] == ['R-1', 'AV-2', 'R-3/12.345']
+    assert merged[2]['data'] == '2005-05-05'
+
+
+def test_merge_unkeyed_items_without_duplicates():
+    window = {'registros_averbacoes': [{'numero': None, 'ato': 'ILEGIVEL'}]}
+
+    merged = merge_window_data([window, window])['registros_averbacoes']
+
+    assert merged == [{'numero': None, 'ato': 'ILEGIVEL'}]
+
+
+def test_merge_latest_fields_and_first_filled_values():
+    first = {'imovel': {'area': '50 m2', 'endereco': None}, 'proprietarios_atuais': [{'nome': 'ANA'}]}
+    second = {'imovel': {'area': '51 m2', 'endereco': 'RUA A'}, 'proprietarios_atuais': [{'nome': 'BRUNO'}]}
+    third = {'proprietarios_atuais': []}
+
+    merged = merge_window_data([first, second, third])
+
+    assert merged['imovel'] == {'area': '50 m2', 'endereco': 'RUA A'}
+    assert merged['proprietarios_atuais'] == [{'nome': 'BRUNO'}]
+
+
+def test_merge_renumbers_cadeia_dominial():
+    first = {'cadeia_dominial': [{'registro': 'R-1', 'sequencia': 1}]}
+    second = {'cadeia_dominial': [{'registro': 'R-5', 'sequencia': 1}]}
+
+    merged = merge_window_data([first, second])['cadeia_dominial']
+
+    assert [(item['registro'], item['sequencia']) for item in merged] == [('R-1', 1), ('R-5', 2)]
+
+
+def test_onus_ativos_drops_liens_cancelled_in_another_window():
+    first = {'onus_ativos': [
+        {'registro': 'R-2', 'tipo': 'HIPOTECA'},
+        {'registro': 'R-4', 'tipo': 'PENHORA'},
+        {'registro': None, 'tipo': 'USUFRUTO'},
+    ]}
+    second = {'onus_historicos': [{'registro': 'R-2/12.345', 'tipo': 'HIPOTECA', 'cancelamento': 'AV-7'}]}
+
+    merged = merge_window_data([first, second])
+
+    assert [item['tipo'] for item in merged['onus_ativos']] == ['PENHORA', 'USUFRUTO']
+
+
+def test_merge_ignores_empty_windows_and_private_keys():
+    assert merge_window_data([{}, None]) == {}
+    assert merge_window_data([{'_raw': 'x', 'numero_matricula': '123'}]) == {'numero_matricula': '123'}
+
+
+def test_merge_window_texts_skips_empty_windows():
+    text = merge_window_texts([((0, 15), 'Primeira'), ((13, 28), '  '), ((25, 40), 'Ultima')])
+
+    assert text == "### Paginas 1-15\n\nPrimeira\n\n### Paginas 26-40\n\nUltima"
@@ -0,0 +1,126 @@
+"""Testes do orcamento de memoria (execution/memory_budget.py)."""
+
+import threading
+import time
+
+from execution.memory_budget import MemoryBudget, decoded_image_bytes
+
+WAIT_S = 2.0
+
+
+def _reserve_in_thread(budget, nbytes, admitted, release, order=None, name=''):
+    """Inicia uma thread que reserva nbytes, marca admitted e segura ate release."""
+    def run():
+        with budget.reserve(nbytes, name):
+            if order is not None:
+                order.append(name)
+            admitted.set()
+            release.wait(WAIT_S)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_queued(budget, count):
+    """Espera ate count reservas estarem na fila."""
+    deadline = time.monotonic() + WAIT_S
+    while len(budget._waiting) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(budget._waiting) == count
+
+
+def test_decoded_image_bytes():
+    assert decoded_image_bytes(100, 50, 'L') == 5000
+    assert decoded_image_bytes(100, 50, 'RGB') == 20000  # RGB guardado como RGBX
+
+
+def test_nested_reservation_is_covered_by_outer():
+    budget = MemoryBudget(100)
+
+    with budget.reserve(80) as outer:
+        with budget.reserve(80) as inner:
+            assert (outer, inner) == (80, 0)
+            assert budget.in_use == 80
+    assert budget.in_use == 0
+
+
+def test_unlimited_budget_never_waits():
+    budget = MemoryBudget(0)
+
+    with budget.reserve(10 ** 12), budget.reserve(10 ** 12):
+        pass
+    assert budget.stats()['esperas'] == 0
+
+
+def test_oversized_reservation_runs_alone():
+    budget = MemoryBudget(100)
+    small_admitted, small_release = threading.Event(), threading.Event()
+    large_admitted, large_release = threading.Event(), threading.Event()
+
+    small = _reserve_in_thread(budget, 10, small_admitted, small_release)
+    assert small_admitted.wait(WAIT_S)
+    large = _reserve_in_thread(budget, 500, large_admitted, large_release)
+    _wait_queued(budget, 1)
+    assert not large_admitted.is_set()
+
+    small_release.set()
+    assert large_admitted.wait(WAIT_S)
+    assert budget.in_use == 500
+    large_release.set()
+    small.join(WAIT_S)
+    large.join(WAIT_S)
+    assert budget.in_use == 0
+    assert budget.stats()['esperas'] == 1
+
+
+def test_large_waiter_is_not_starved_by_smaller_reservations():
+    budget = MemoryBudget(100)
+    order = []
+    holder_admitted, holder_release = threading.Event(), threading.Event()
+    large_admitted, large_release = threading.Event(), threading.Event()
+    late_admitted, late_release = threading.Event(), threading.Event()
+
+    holder = _reserve_in_thread(budget, 60, holder_admitted, holder_release, order, 'holder')
+    assert holder_admitted.wait(WAIT_S)
+    large = _reserve_in_thread(budget, 100, large_admitted, large_release, order, 'large')
+    _wait_queued(budget, 1)
+
+    # Caberia ao lado de holder, mas chegou depois da reserva grande
+    late = _reserve_in_thread(budget, 30, late_admitted, late_release, order, 'late')
+    _wait_queued(budget, 2)
+    assert not late_admitted.is_set()
+
+    holder_release.set()
+    assert large_admitted.wait(WAIT_S)
+    assert not late_admitted.is_set()
+    large_release.set()
+    assert late_admitted.wait(WAIT_S)
+    late_release.set()
+
+    for thread in (holder, large, late):
+        thread.join(WAIT_S)
+    assert order == ['holder', 'large', 'late']
+    assert budget.in_use == 0
+
+
+def test_queued_reservations_are_admitted_together_when_they_fit():
+    budget = MemoryBudget(100)
+    holder_admitted, holder_release = threading.Event(), threading.Event()
+    first_admitted, second_admitted, release = threading.Event(), threading.Event(), threading.Event()
+
+    holder = _reserve_in_thread(budget, 100, holder_admitted, holder_release)
+    assert holder_admitted.wait(WAIT_S)
+    first = _reserve_in_thread(budget, 40, first_admitted, release)
+    _wait_queued(budget, 1)
+    second = _reserve_in_thread(budget, 40, second_admitted, release)
+    _wait_queued(budget, 2)
+
+    holder_release.set()
+    assert first_admitted.wait(WAIT_S)
+    assert second_admitted.wait(WAIT_S)
+    assert budget.in_use == 80
+    release.set()
+    for thread in (holder, first, second):
+        thread.join(WAIT_S)
+    assert budget.in_use == 0
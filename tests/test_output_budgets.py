@@ -0,0 +1,141 @@
+"""Testes dos orcamentos de tokens de saida (execution/output_budgets.py)."""
+
+import json
+from types import SimpleNamespace
+
+from execution.api_usage import CallUsage
+from execution.output_budgets import (
+    DEFAULT_MAX_OUTPUT_TOKENS,
+    MIN_BUDGET_TOKENS,
+    collect_output_samples,
+    learn_output_budgets,
+    percentile,
+    size_class,
+)
+
+
+def test_size_class_boundaries():
+    assert size_class(1) == 'ate_2_paginas'
+    assert size_class(2) == 'ate_2_paginas'
+    assert size_class(3) == 'ate_10_paginas'
+    assert size_class(30) == 'ate_30_paginas'
+    assert size_class(31) == 'acima_30_paginas'
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))  # 1..100
+
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 99.5) == 100
+    assert percentile(values, 100) == 100
+    # Posto minimo 1; valores fora de ordem sao ordenados
+    assert percentile([30, 10, 20], 1) == 10
+    assert percentile([30, 10, 20], 34) == 20
+    assert percentile([7], 99) == 7
+
+
+def test_budget_rounded_up_to_step_with_margin():
+    # p99 de 20 amostras = maior valor (posto 20); 3000 * 1.5 = 4500 -> 4608
+    samples = {('RG', 'json', 'ate_2_paginas'): [1000] * 19 + [3000]}
+    budget = learn_output_budgets(samples, min_samples=20)['orcamentos']['RG']['json']['ate_2_paginas']
+
+    assert budget['max_tokens_saida'] == 4608
+    assert budget['amostras'] == 20
+    assert budget['p50'] == 1000
+    assert budget['p99'] == 3000
+    assert budget['maximo'] == 3000
+
+
+def test_budget_clamped_to_floor_and_ceiling():
+    samples = {
+        ('CNDT', 'secoes', 'ate_2_paginas'): [100] * 20,
+        ('MATRICULA', 'secoes', 'acima_30_paginas'): [15000] * 20
+    }
+    budgets = learn_output_budgets(samples)['orcamentos']
+
+    assert budgets['CNDT']['secoes']['ate_2_paginas']['max_tokens_saida'] == MIN_BUDGET_TOKENS
+    assert budgets['MATRICULA']['secoes']['acima_30_paginas']['max_tokens_saida'] == DEFAULT_MAX_OUTPUT_TOKENS
+
+
+def test_combinations_below_min_samples_are_skipped():
+    samples = {
+        ('RG', 'json', 'ate_2_paginas'): [1000] * 5,
+        ('RG', 'json', 'ate_10_paginas'): [1000] * 5
+    }
+    config = learn_output_budgets(samples, min_samples=5)
+    assert set(config['orcamentos']['RG']['json']) == {'ate_2_paginas', 'ate_10_paginas'}
+
+    config = learn_output_budgets(samples, min_samples=6)
+    assert config['orcamentos'] == {}
+    assert config['min_amostras'] == 6
+
+
+def _write_result(path, tipo, calls, status='sucesso'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    result = {'tipo_documento': tipo, 'status': status, 'metadados': {'chamadas_api': calls}}
+    path.write_text(json.dumps(result), encoding='utf-8')
+
+
+def _response(output_tokens, thoughts=0, finish='STOP'):
+    """Resposta falsa do Gemini com usage_metadata."""
+    metadata = SimpleNamespace(
+        prompt_token_count=3000,
+        candidates_token_count=output_tokens,
+        cached_content_token_count=0,
+        thoughts_token_count=thoughts,
+        total_token_count=3000 + output_tokens + thoughts
+    )
+    return SimpleNamespace(
+        usage_metadata=metadata,
+        model_version=None,
+        candidates=[SimpleNamespace(finish_reason=finish)]
+    )
+
+
+def test_collect_output_samples(tmp_path):
+    call = {'tokens_total': 5000, 'tokens_resposta': 800, 'tokens_raciocinio': 200,
+            'tokens_saida_ultima_resposta': 1000,
+            'classe_tamanho': 'ate_2_paginas', 'modo_resposta': 'json'}
+    _write_result(tmp_path / 'caso1' / 'rg.json', 'RG', [
+        call,
+        {**call, 'tokens_saida_ultima_resposta': 800},
+        {**call, 'interrompido_nos_dados': True},  # Saida incompleta
+        {**call, 'orcamento_excedido': True},  # Cortado no orcamento
+        {key: value for key, value in call.items() if key != 'tokens_saida_ultima_resposta'},  # Sem usage_metadata
+        {key: value for key, value in call.items() if key != 'classe_tamanho'}  # Anterior aos orcamentos
+    ])
+    _write_result(tmp_path / 'caso2' / 'cndt.json', 'CNDT', [{**call, 'modo_resposta': 'secoes'}])
+    _write_result(tmp_path / 'caso2' / 'rg_erro.json', 'RG', [call], status='erro')
+    _write_result(tmp_path / 'caso2' / 'relatorio_extracao.json', 'RG', [call])
+    (tmp_path / 'caso2' / 'quebrado.json').write_text('{', encoding='utf-8')
+
+    assert collect_output_samples(tmp_path) == {
+        ('RG', 'json', 'ate_2_paginas'): [1000, 800],
+        ('CNDT', 'secoes', 'ate_2_paginas'): [1000]
+    }
+
+
+def test_samples_use_only_final_response_of_retried_call(tmp_path):
+    usage = CallUsage()
+    # Modelo principal: resposta vazia (fallback); seguinte: cortada no orcamento; repeticao com o teto padrao
+    usage.record(_response(0, thoughts=500), 'gemini-principal', usage.start_attempt())
+    usage.record(_response(4096, finish='MAX_TOKENS'), 'gemini-fallback', usage.start_attempt())
+    usage.record(_response(5000, thoughts=300), 'gemini-fallback', usage.start_attempt())
+    record = usage.to_metadata()
+
+    assert record['tentativas'] == 3
+    assert record['tokens_resposta'] + record['tokens_raciocinio'] == 9896
+    assert record['tokens_saida_ultima_resposta'] == 5300
+
+    call = {**record, 'classe_tamanho': 'ate_10_paginas', 'modo_resposta': 'secoes'}
+    _write_result(tmp_path / 'caso' / 'matricula.json', 'MATRICULA', [call])
+    assert collect_output_samples(tmp_path) == {('MATRICULA', 'secoes', 'ate_10_paginas'): [5300]}
+
+
+def test_failed_final_attempt_has_no_sample():
+    usage = CallUsage()
+    usage.record(_response(1200), 'gemini-principal', usage.start_attempt())
+    usage.start_attempt()  # Retry que terminou em excecao, sem resposta
+
+    assert 'tokens_saida_ultima_resposta' not in usage.to_metadata()
@@ -0,0 +1,56 @@
+"""Testes do pool de preparacao (execution/prep_pool.py)."""
+
+import pytest
+
+from execution.prep_pool import (
+    SHARED_BYTES_MIN_SIZE, SharedBytes, from_shared_bytes, get_shared_process_pool, read_shared_file,
+    split_ranges, to_shared_bytes
+)
+
+LARGE_PAYLOAD = bytes(range(256)) * (SHARED_BYTES_MIN_SIZE // 256 + 1)
+
+
+@pytest.mark.parametrize('total, parts, expected', [
+    (10, 3, [(0, 4), (4, 7), (7, 10)]),
+    (4, 4, [(0, 1), (1, 2), (2, 3), (3, 4)]),
+    (2, 8, [(0, 1), (1, 2)]),
+    (7, 1, [(0, 7)]),
+    (5, 0, [(0, 5)]),
+])
+def test_split_ranges(total, parts, expected):
+    assert split_ranges(total, parts) == expected
+
+
+def test_split_ranges_is_contiguous_and_balanced():
+    ranges = split_ranges(103, 8)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == 103
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    sizes = [end - start for start, end in ranges]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_to_shared_bytes_in_main_process_returns_bytes():
+    payload = to_shared_bytes(memoryview(LARGE_PAYLOAD))
+
+    assert isinstance(payload, bytes)
+    assert from_shared_bytes(payload) == LARGE_PAYLOAD
+    assert from_shared_bytes(None) is None
+
+
+def test_shared_memory_round_trip_from_child_process(tmp_path):
+    pool = get_shared_process_pool(1)
+    file_path = tmp_path / 'pagina.bin'
+    file_path.write_bytes(LARGE_PAYLOAD[::-1])
+
+    shared = pool.submit(to_shared_bytes, LARGE_PAYLOAD).result(timeout=60)
+    shared_file = pool.submit(read_shared_file, file_path).result(timeout=60)
+    small = pool.submit(to_shared_bytes, b'pequeno').result(timeout=60)
+
+    assert isinstance(shared, SharedBytes) and shared.size == len(LARGE_PAYLOAD)
+    assert from_shared_bytes(shared) == LARGE_PAYLOAD
+    assert from_shared_bytes(shared_file) == LARGE_PAYLOAD[::-1]
+    assert small == b'pequeno'
+    # O bloco e liberado na leitura: uma segunda leitura falha
+    with pytest.raises(FileNotFoundError):
+        from_shared_bytes(shared)
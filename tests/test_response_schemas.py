@@ -0,0 +1,107 @@
+"""Testes do response_schema montado a partir dos prompts (execution/response_schemas.py)."""
+
+from execution.response_schemas import (
+    build_response_schema,
+    parse_json_response,
+    prompt_json_template,
+    schema_from_example,
+)
+
+PROMPT = '''
+# PROMPT DE RG
+
+Exemplo de saida intermediaria:
+```json
+{"rascunho": true}
+```
+
+## DADOS CATALOGADOS (JSON)
+```json
+{
+  "numero_rg": "00.000.000-0",
+  "nome_completo": "NOME",
+  "idade": 0000, // numero de anos
+  "ativo": true,
+  "filiacao": {"pai": "NOME", "mae": "NOME"},
+  "extras": {},
+  "enderecos": [{"rua": "RUA"}, {"rua": "RUA", "cep": "00000-000"}],
+  "observacoes": ["texto // nao e comentario"]
+}
+```
+'''
+
+
+def test_template_comes_from_catalog_section_and_is_normalized():
+    template = prompt_json_template(PROMPT)
+
+    assert list(template) == [
+        'numero_rg', 'nome_completo', 'idade', 'ativo', 'filiacao', 'extras', 'enderecos', 'observacoes'
+    ]
+    # Zeros a esquerda e comentarios // so sao removidos fora das strings
+    assert template['idade'] == 0
+    assert template['numero_rg'] == '00.000.000-0'
+    assert template['observacoes'] == ['texto // nao e comentario']
+
+
+def test_template_without_catalog_header_uses_largest_block():
+    prompt = '```json\n{"a": 1}\n```\n\ntexto\n\n```json\n{"a": 1, "b": {"c": "x"}}\n```\n```json\n[1, 2]\n```\n'
+
+    assert prompt_json_template(prompt) == {'a': 1, 'b': {'c': 'x'}}
+
+
+def test_template_missing_returns_none():
+    assert prompt_json_template('## DADOS CATALOGADOS\nsem bloco json') is None
+    assert prompt_json_template('```json\n{}\n```') is None
+
+
+def test_schema_from_example_types():
+    assert schema_from_example('x') == {'type': 'STRING', 'nullable': True}
+    assert schema_from_example(1.5) == {'type': 'NUMBER', 'nullable': True}
+    assert schema_from_example(True) == {'type': 'BOOLEAN', 'nullable': True}
+    assert schema_from_example(None, 'Campo') == {'type': 'STRING', 'nullable': True, 'description': 'Campo'}
+    assert schema_from_example([]) == {'type': 'ARRAY', 'items': {'type': 'STRING'}, 'nullable': True}
+
+
+def test_schema_from_example_omits_empty_objects():
+    assert schema_from_example({}) is None
+    schema = schema_from_example({'vazio': {}, 'nome': 'x'})
+    assert schema['properties'] == {'nome': {'type': 'STRING', 'nullable': True}}
+    assert schema['property_ordering'] == ['nome']
+
+
+def test_schema_from_example_merges_list_item_fields_in_order():
+    schema = schema_from_example([{'rua': 'RUA'}, {'numero': 1, 'rua': 'RUA'}])
+
+    items = schema['items']
+    assert items['type'] == 'OBJECT'
+    assert items['property_ordering'] == ['rua', 'numero']
+    assert items['properties']['numero']['type'] == 'NUMBER'
+
+
+def test_build_response_schema_uses_field_catalog():
+    schema = build_response_schema('RG', PROMPT)
+
+    assert schema['type'] == 'OBJECT'
+    assert 'extras' not in schema['properties']
+    assert schema['property_ordering'] == list(schema['properties'])
+    # Obrigatorios e descricoes vem de execution/schemas/rg.json
+    assert schema['required'] == ['numero_rg', 'nome_completo']
+    assert schema['properties']['numero_rg']['description']
+    assert 'description' not in schema['properties']['ativo']
+
+
+def test_build_response_schema_without_template_returns_none():
+    assert build_response_schema('RG', 'Prompt sem modelo JSON') is None
+
+
+def test_parse_json_response():
+    assert parse_json_response('  {"nome": "JOAO"}\n') == {'nome': 'JOAO'}
+    assert parse_json_response('{"nome": "JO\x01AO"}') == {'nome': 'JOAO'}
+    assert parse_json_response('') == {}
+
+    invalid = parse_json_response('{"nome": ')
+    assert invalid['_raw_json'] == '{"nome":'
+    assert '_parse_error' in invalid
+
+    not_object = parse_json_response('[1, 2]')
+    assert not_object['_parse_error'] == 'Resposta JSON nao e um objeto'
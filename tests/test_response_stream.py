@@ -0,0 +1,124 @@
+"""Testes da leitura incremental de respostas em streaming (execution/response_stream.py)."""
+
+from execution.response_stream import StreamingResponse
+
+SECTIONS_RESPONSE = (
+    '## DADOS CATALOGADOS (JSON)\n'
+    '```json\n'
+    '{"nome": "MARIA DA SILVA", "cpf": "123.456.789-00"}\n'
+    '```\n\n'
+    '## REESCRITA DO DOCUMENTO\n'
+    'Texto reescrito.\n\n'
+    '## EXPLICACAO CONTEXTUAL\n'
+    'Explicacao.\n'
+)
+
+
+def _feed_chunks(stream, chunks):
+    """Alimenta os trechos e retorna o indice do trecho que pediu a interrupcao (ou None)."""
+    for i, chunk in enumerate(chunks):
+        if stream.feed(chunk):
+            return i
+    return None
+
+
+def _split_every(text, size):
+    """Parte o texto em trechos de size caracteres."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_sections_data_parsed_when_fence_closes():
+    stream = StreamingResponse()
+    _feed_chunks(stream, [SECTIONS_RESPONSE])
+
+    assert stream.data == {'nome': 'MARIA DA SILVA', 'cpf': '123.456.789-00'}
+    assert set(stream.sections) == {'dados', 'reescrita', 'explicacao'}
+    assert stream.text == SECTIONS_RESPONSE
+
+
+def test_section_header_split_across_chunks():
+    stream = StreamingResponse()
+    cut = SECTIONS_RESPONSE.index('DADOS')
+    _feed_chunks(stream, ['##', SECTIONS_RESPONSE[2:cut], SECTIONS_RESPONSE[cut:]])
+
+    assert 'dados' in stream.sections
+    assert stream.data == {'nome': 'MARIA DA SILVA', 'cpf': '123.456.789-00'}
+
+
+def test_sections_parsed_with_single_character_chunks():
+    # Cabecalhos, abertura e fechamento do bloco ```json chegam partidos em todos os pontos
+    stream = StreamingResponse()
+    _feed_chunks(stream, _split_every(SECTIONS_RESPONSE, 1))
+
+    assert stream.data == {'nome': 'MARIA DA SILVA', 'cpf': '123.456.789-00'}
+    assert set(stream.sections) == {'dados', 'reescrita', 'explicacao'}
+
+
+def test_fence_close_split_across_chunks():
+    close = SECTIONS_RESPONSE.index('\n```\n\n')
+    for cut in range(close, close + 4):
+        stream = StreamingResponse()
+        _feed_chunks(stream, [SECTIONS_RESPONSE[:cut + 1], SECTIONS_RESPONSE[cut + 1:]])
+        assert stream.data == {'nome': 'MARIA DA SILVA', 'cpf': '123.456.789-00'}, cut
+
+
+def test_data_not_ready_before_fence_closes():
+    stream = StreamingResponse()
+    close = SECTIONS_RESPONSE.index('\n```\n\n')
+    stream.feed(SECTIONS_RESPONSE[:close])
+
+    assert 'dados' in stream.sections
+    assert stream.data is None
+
+
+def test_stop_on_data_interrupts_and_delivers_once():
+    delivered = []
+    stream = StreamingResponse(on_data=delivered.append, stop_on_data=True)
+    chunks = _split_every(SECTIONS_RESPONSE, 10)
+    stopped_at = _feed_chunks(stream, chunks)
+
+    assert stopped_at is not None and stopped_at < len(chunks) - 1
+    assert stream.stopped
+    assert stream.metadata()['interrompido_nos_dados'] is True
+    assert delivered == [{'nome': 'MARIA DA SILVA', 'cpf': '123.456.789-00'}]
+
+    # Nova tentativa (retry): o texto e zerado, mas on_data nao e chamado de novo
+    stream.start()
+    assert stream.text == ''
+    _feed_chunks(stream, [SECTIONS_RESPONSE])
+    assert len(delivered) == 1
+
+
+def test_invalid_sections_block_leaves_data_empty():
+    stream = StreamingResponse()
+    _feed_chunks(stream, ['## DADOS CATALOGADOS\n```json\n{"nome": \n```\n', '## REESCRITA\nTexto\n'])
+
+    assert stream.data is None
+    assert 'reescrita' in stream.sections
+
+
+def test_json_only_ignores_braces_inside_strings():
+    response = '{"obs": "chave } fechada { aberta", "aspas": "diz \\"}\\"", "lista": [{"a": 1}]}'
+    stream = StreamingResponse(json_only=True)
+    _feed_chunks(stream, [response])
+
+    assert stream.data == {'obs': 'chave } fechada { aberta', 'aspas': 'diz "}"', 'lista': [{'a': 1}]}
+
+
+def test_json_only_scans_across_chunk_boundaries():
+    response = 'Resposta:\n{"obs": "a } b \\\\", "nested": {"x": "}"}}\ntexto final'
+    expected = {'obs': 'a } b \\', 'nested': {'x': '}'}}
+    for size in (1, 2, 3, 7):
+        stream = StreamingResponse(json_only=True)
+        _feed_chunks(stream, _split_every(response, size))
+        assert stream.data == expected, size
+        assert 'dados' in stream.sections
+
+
+def test_json_only_data_not_ready_while_object_open():
+    stream = StreamingResponse(json_only=True)
+    stream.feed('{"nome": "JOAO", "endereco": {"rua": "A"}')
+
+    assert stream.data is None
+    stream.feed('}')
+    assert stream.data == {'nome': 'JOAO', 'endereco': {'rua': 'A'}}